@@ -0,0 +1,339 @@
+"""
+Incrementally maintained aggregates and leaderboards.
+Per-scope totals (aggregate_stats) and per-scope ranking rows
+(leaderboard_entries) are updated from each write's old and new row values,
+so dashboard queries read a handful of rows instead of scanning `fictions`
+and decoding every tags JSON string.
+
+Scopes: "all", "tag:<tag>", "status:<status>", "type:<fiction_type>".
+
+Usage:
+    python aggregates.py stats --kind status       # counts/averages per status
+    python aggregates.py top --scope tag:Fantasy --by followers -n 20
+    python aggregates.py verify                    # compare with a full recompute
+    python aggregates.py rebuild                   # recompute from scratch
+"""
+import argparse
+import json
+from collections import defaultdict
+
+from sqlalchemy import select, delete, func, bindparam, and_
+from sqlalchemy.dialects.sqlite import insert
+
+from db import Fiction, AggregateStat, LeaderboardEntry
+
+# Fiction columns that feed the aggregates
+TRACKED = ("tags", "status", "fiction_type", "followers", "avg_rating", "views", "pages")
+SUMS = ("fiction_count", "followers_sum", "views_sum", "pages_sum", "rating_sum", "rating_count")
+RANKINGS = ("followers", "avg_rating", "views")
+SCOPE_KINDS = {"tag": "tag:", "status": "status:", "type": "type:"}
+
+
+def scopes_for(values):
+    """
+    Scopes a fiction belongs to.
+
+    Args:
+        values (dict): Fiction column values (tags as a JSON string)
+
+    Returns:
+        list: Scope names, "all" first
+    """
+    scopes = ["all"]
+    try:
+        tags = json.loads(values.get("tags") or "[]")
+    except (TypeError, ValueError):
+        tags = []
+    for tag in dict.fromkeys(tags):
+        scopes.append(f"tag:{tag}")
+    if values.get("status"):
+        scopes.append(f"status:{values['status']}")
+    if values.get("fiction_type"):
+        scopes.append(f"type:{values['fiction_type']}")
+    return scopes
+
+
+def _contribution(values):
+    rating = values.get("avg_rating")
+    return (1, values.get("followers") or 0, values.get("views") or 0, values.get("pages") or 0,
+            rating or 0.0, 0 if rating is None else 1)
+
+
+def values_of(fiction):
+    """Tracked values of a Fiction ORM object, as a row dict for apply()"""
+    return {"fiction_id": fiction.fiction_id, **{name: getattr(fiction, name) for name in TRACKED}}
+
+
+def snapshot(session, fiction_ids):
+    """
+    Current tracked values for the given fictions (call before writing them).
+
+    Returns:
+        dict: fiction_id -> {column: value}
+    """
+    if not fiction_ids:
+        return {}
+    columns = [getattr(Fiction, name) for name in TRACKED]
+    result = {}
+    ids = list(fiction_ids)
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for row in session.execute(select(Fiction.fiction_id, *columns)
+                                   .where(Fiction.fiction_id.in_(chunk))):
+            result[row[0]] = dict(zip(TRACKED, row[1:]))
+    return result
+
+
+def apply(session, old, rows):
+    """
+    Apply the aggregate/leaderboard deltas for a batch of fiction writes.
+
+    Call in the same transaction as the write. Rows may be partial (only the
+    columns that were written); missing columns keep their old values.
+
+    Args:
+        session: SQLAlchemy session
+        old (dict): snapshot() taken before the write
+        rows (list): Row dicts that were written (must include fiction_id)
+    """
+    deltas = defaultdict(lambda: [0, 0, 0, 0, 0.0, 0])
+    board = []
+    removed = []
+
+    for row in rows:
+        fiction_id = row["fiction_id"]
+        before = old.get(fiction_id)
+        after = dict(before or {})
+        after.update({k: row[k] for k in TRACKED if k in row})
+        if before is not None and all(before.get(k) == after.get(k) for k in TRACKED):
+            continue
+
+        new_scopes = scopes_for(after)
+        if before is not None:
+            old_scopes = scopes_for(before)
+            for scope in old_scopes:
+                d = deltas[scope]
+                for i, value in enumerate(_contribution(before)):
+                    d[i] -= value
+            removed.extend({"b_scope": s, "b_id": fiction_id}
+                           for s in old_scopes if s not in new_scopes)
+        for scope in new_scopes:
+            d = deltas[scope]
+            for i, value in enumerate(_contribution(after)):
+                d[i] += value
+            board.append({"scope": scope, "fiction_id": fiction_id,
+                          **{name: after.get(name) for name in RANKINGS}})
+
+    stats_table = AggregateStat.__table__
+    board_table = LeaderboardEntry.__table__
+    changed = [dict(zip(SUMS, d), scope=scope) for scope, d in deltas.items() if any(d)]
+    if changed:
+        stmt = insert(stats_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["scope"],
+            set_={name: stats_table.c[name] + stmt.excluded[name] for name in SUMS})
+        session.execute(stmt, changed)
+        session.execute(delete(stats_table).where(
+            stats_table.c.scope.in_([c["scope"] for c in changed]),
+            stats_table.c.fiction_count <= 0))
+    if removed:
+        session.execute(
+            delete(board_table).where(and_(board_table.c.scope == bindparam("b_scope"),
+                                           board_table.c.fiction_id == bindparam("b_id"))),
+            removed)
+    if board:
+        stmt = insert(board_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["scope", "fiction_id"],
+            set_={name: stmt.excluded[name] for name in RANKINGS})
+        session.execute(stmt, board)
+
+
+def needs_rebuild(session):
+    """True if the aggregate tables do not reflect the fictions table"""
+    total = session.execute(select(func.count()).select_from(Fiction)).scalar()
+    built = session.execute(
+        select(AggregateStat.fiction_count).where(AggregateStat.scope == "all")).scalar()
+    return (built or 0) != total
+
+
+def rebuild(session, chunk_size=2000):
+    """
+    Recompute all aggregates and leaderboards from the fictions table.
+
+    Returns:
+        int: Number of fictions aggregated
+    """
+    session.execute(delete(AggregateStat.__table__))
+    session.execute(delete(LeaderboardEntry.__table__))
+    columns = [getattr(Fiction, name) for name in TRACKED]
+    count = 0
+    last_id = 0
+    while True:
+        rows = [
+            {"fiction_id": r[0], **dict(zip(TRACKED, r[1:]))}
+            for r in session.execute(
+                select(Fiction.fiction_id, *columns)
+                .where(Fiction.fiction_id > last_id)
+                .order_by(Fiction.fiction_id).limit(chunk_size))
+        ]
+        if not rows:
+            break
+        apply(session, {}, rows)
+        count += len(rows)
+        last_id = rows[-1]["fiction_id"]
+    session.commit()
+    return count
+
+
+def verify(session):
+    """
+    Recompute everything in memory and compare with the stored tables.
+
+    Returns:
+        list: Human-readable mismatch descriptions (empty if consistent)
+    """
+    expected = defaultdict(lambda: [0, 0, 0, 0, 0.0, 0])
+    expected_board = {}
+    columns = [getattr(Fiction, name) for name in TRACKED]
+    for r in session.execute(select(Fiction.fiction_id, *columns)):
+        values = dict(zip(TRACKED, r[1:]))
+        for scope in scopes_for(values):
+            d = expected[scope]
+            for i, value in enumerate(_contribution(values)):
+                d[i] += value
+            expected_board[(scope, r[0])] = tuple(values.get(name) for name in RANKINGS)
+
+    problems = []
+    stored = {row.scope: row for row in session.execute(select(AggregateStat)).scalars()}
+    for scope in sorted(set(expected) | set(stored)):
+        want = expected.get(scope)
+        have = stored.get(scope)
+        if have is None or want is None:
+            problems.append(f"{scope}: {'missing' if have is None else 'unexpected'} aggregate row")
+            continue
+        for name, value in zip(SUMS, want):
+            got = getattr(have, name)
+            if abs((got or 0) - value) > 1e-6 * max(1.0, abs(value)):
+                problems.append(f"{scope}: {name} is {got}, expected {value}")
+
+    board = {
+        (e.scope, e.fiction_id): tuple(getattr(e, name) for name in RANKINGS)
+        for e in session.execute(select(LeaderboardEntry)).scalars()
+    }
+    missing = expected_board.keys() - board.keys()
+    extra = board.keys() - expected_board.keys()
+    stale = [k for k in expected_board.keys() & board.keys() if expected_board[k] != board[k]]
+    if missing:
+        problems.append(f"leaderboard: {len(missing):,} entries missing")
+    if extra:
+        problems.append(f"leaderboard: {len(extra):,} entries for fictions no longer in scope")
+    if stale:
+        problems.append(f"leaderboard: {len(stale):,} entries with stale values")
+    return problems
+
+
+# =============================================================================
+# Dashboard reads
+# =============================================================================
+
+def top(session, scope="all", by="followers", limit=10):
+    """
+    Top-N fictions in a scope.
+
+    Args:
+        session: SQLAlchemy session
+        scope (str): "all", "tag:<tag>", "status:<status>" or "type:<type>"
+        by (str): "followers", "avg_rating" or "views"
+        limit (int): Number of entries
+
+    Returns:
+        list: (fiction_id, title, value) tuples, highest first
+    """
+    if by not in RANKINGS:
+        raise ValueError(f"Unknown ranking: {by} (choose from {', '.join(RANKINGS)})")
+    column = getattr(LeaderboardEntry, by)
+    query = (select(LeaderboardEntry.fiction_id, Fiction.title, column)
+             .join(Fiction, Fiction.fiction_id == LeaderboardEntry.fiction_id)
+             .where(LeaderboardEntry.scope == scope, column.is_not(None))
+             .order_by(column.desc()).limit(limit))
+    return [tuple(row) for row in session.execute(query)]
+
+
+def scope_stats(session, kind=None):
+    """
+    Counts and averages per scope.
+
+    Args:
+        session: SQLAlchemy session
+        kind (str): "tag", "status", "type", or None for every scope
+
+    Returns:
+        list: dicts with scope, fictions, avg_followers, avg_rating, avg_views, pages
+              sorted by fiction count
+    """
+    query = select(AggregateStat).order_by(AggregateStat.fiction_count.desc())
+    if kind:
+        query = query.where(AggregateStat.scope.like(SCOPE_KINDS[kind] + "%"))
+    result = []
+    for s in session.execute(query).scalars():
+        result.append({
+            "scope": s.scope,
+            "fictions": s.fiction_count,
+            "avg_followers": s.followers_sum / s.fiction_count if s.fiction_count else None,
+            "avg_rating": s.rating_sum / s.rating_count if s.rating_count else None,
+            "avg_views": s.views_sum / s.fiction_count if s.fiction_count else None,
+            "pages": s.pages_sum,
+        })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialized aggregates and leaderboards")
+    sub = parser.add_subparsers(dest="command")
+    st = sub.add_parser("stats", help="Counts and averages per scope")
+    st.add_argument("--kind", choices=sorted(SCOPE_KINDS), default=None)
+    st.add_argument("-n", type=int, default=30)
+    tp = sub.add_parser("top", help="Top-N leaderboard for a scope")
+    tp.add_argument("--scope", default="all")
+    tp.add_argument("--by", choices=RANKINGS, default="followers")
+    tp.add_argument("-n", type=int, default=20)
+    sub.add_parser("verify", help="Compare stored aggregates with a full recompute")
+    sub.add_parser("rebuild", help="Recompute aggregates from scratch")
+    args = parser.parse_args(argv)
+
+    from db import init_db, get_session
+    init_db()
+    session = get_session()
+    try:
+        if args.command in (None, "stats"):
+            kind = getattr(args, "kind", None)
+            limit = getattr(args, "n", 30)
+            print(f"{'Scope':<36}{'fictions':>10}{'avg foll.':>12}{'avg rating':>12}{'avg views':>14}")
+            print("-" * 84)
+            for s in scope_stats(session, kind)[:limit]:
+                rating = f"{s['avg_rating']:.2f}" if s["avg_rating"] is not None else "-"
+                print(f"{s['scope'][:35]:<36}{s['fictions']:>10,}{s['avg_followers']:>12,.0f}"
+                      f"{rating:>12}{s['avg_views']:>14,.0f}")
+        elif args.command == "top":
+            for rank, (fiction_id, title, value) in enumerate(top(session, args.scope, args.by, args.n), 1):
+                shown = f"{value:.2f}" if args.by == "avg_rating" else f"{value:,}"
+                print(f"{rank:>4}. {title[:50]:<52}{shown:>14}  (ID {fiction_id})")
+        elif args.command == "verify":
+            problems = verify(session)
+            if problems:
+                for p in problems[:50]:
+                    print(f"✗ {p}")
+                print(f"\n⚠ {len(problems)} mismatches - run: python aggregates.py rebuild")
+            else:
+                print("✓ Aggregates and leaderboards match the fictions table")
+        elif args.command == "rebuild":
+            count = rebuild(session)
+            print(f"✓ Rebuilt aggregates for {count:,} fictions")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
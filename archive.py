@@ -0,0 +1,604 @@
+"""
+Replayable archive of fetched pages.
+Every page fetched through scraper.py is appended to a segment file under
+ARCHIVE_DIR (one compressed record per page, WARC-style header + body) and
+indexed by fiction_id and fetch time in a small SQLite index. When the
+parser learns a new field, `reparse` streams the archive through a
+multiprocessing parse + bulk-update pipeline instead of re-downloading.
+
+Records are compressed with zstd using a dictionary trained on archived
+Royal Road pages (`train`); without the optional zstandard package, zlib
+is used instead.
+
+Usage:
+    python archive.py stats                     # segments, records, compression ratio
+    python archive.py train                     # train a zstd dictionary on archived pages
+    python archive.py reparse                   # backfill every field from the archive
+    python archive.py reparse --fields fiction_type,warn_tags,content_warnings
+    python archive.py show 21220                # print the latest archived page for an ID
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to zlib
+    zstandard = None
+
+from config import (
+    ARCHIVE_ENABLED,
+    ARCHIVE_DIR,
+    ARCHIVE_SEGMENT_BYTES,
+    ARCHIVE_ZSTD_LEVEL,
+    ARCHIVE_DICT_SIZE,
+    ARCHIVE_DICT_SAMPLES,
+    ARCHIVE_REPARSE_SLACK_SECONDS,
+)
+
+MAGIC = b"RRA1"
+FICTION_KINDS = ("fiction", "fiction-head")
+FICTION_ID_RE = re.compile(r"/fiction/(\d+)")
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    fiction_id INTEGER,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_length INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    dict_id INTEGER NOT NULL DEFAULT 0,
+    truncated INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_pages_fiction ON pages (fiction_id, fetched_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# =============================================================================
+# Compression
+# =============================================================================
+
+class Codecs:
+    """Compressors/decompressors keyed by dictionary id (0 = no dictionary)"""
+
+    def __init__(self, root):
+        self.root = root
+        self._dicts = {}
+        self._compressors = {}
+        self._decompressors = {}
+
+    def dictionary(self, dict_id):
+        if dict_id not in self._dicts:
+            with open(os.path.join(self.root, f"dict-{dict_id}.zdict"), "rb") as f:
+                self._dicts[dict_id] = zstandard.ZstdCompressionDict(f.read())
+        return self._dicts[dict_id]
+
+    def compress(self, data, dict_id=0):
+        """
+        Returns:
+            tuple: (codec, dict_id, payload)
+        """
+        if zstandard is None:
+            return "zlib", 0, zlib.compress(data, 9)
+        if dict_id not in self._compressors:
+            kwargs = {"dict_data": self.dictionary(dict_id)} if dict_id else {}
+            self._compressors[dict_id] = zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL, **kwargs)
+        return "zstd", dict_id, self._compressors[dict_id].compress(data)
+
+    def decompress(self, codec, dict_id, payload):
+        if codec == "zlib":
+            return zlib.decompress(payload)
+        if codec != "zstd":
+            raise ValueError(f"Unknown archive codec: {codec}")
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd archive records")
+        if dict_id not in self._decompressors:
+            kwargs = {"dict_data": self.dictionary(dict_id)} if dict_id else {}
+            self._decompressors[dict_id] = zstandard.ZstdDecompressor(**kwargs)
+        return self._decompressors[dict_id].decompress(payload)
+
+
+def encode_record(header, payload):
+    """Serialize one record: magic, sizes, JSON header, compressed body"""
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return b"%s %d %d\n" % (MAGIC, len(head), len(payload)) + head + payload + b"\n"
+
+
+def decode_record(blob):
+    """
+    Split a serialized record.
+
+    Returns:
+        tuple: (header dict, compressed payload bytes)
+    """
+    line, _, rest = blob.partition(b"\n")
+    magic, head_len, payload_len = line.split(b" ")
+    if magic != MAGIC:
+        raise ValueError("Not an archive record")
+    head_len, payload_len = int(head_len), int(payload_len)
+    header = json.loads(rest[:head_len])
+    return header, rest[head_len:head_len + payload_len]
+
+
+# =============================================================================
+# Archive
+# =============================================================================
+
+class PageArchive:
+    """Append-only segmented page archive with a SQLite offset index"""
+
+    def __init__(self, root=ARCHIVE_DIR, segment_bytes=ARCHIVE_SEGMENT_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        os.makedirs(root, exist_ok=True)
+        self.codecs = Codecs(root)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._segment = None
+        self._segment_file = None
+        self._dict_id = None  # Cached meta.dict_id (see current_dict_id)
+
+    def _index(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(INDEX_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def current_dict_id(self):
+        """
+        Dictionary new records are compressed with. Read from the index once
+        and cached; `train_dictionary` updates the cache, and a dictionary
+        trained by another process is picked up when the next segment opens.
+        """
+        if self._dict_id is None:
+            row = self._index().execute("SELECT value FROM meta WHERE key = 'dict_id'").fetchone()
+            self._dict_id = int(row[0]) if row and zstandard is not None else 0
+        return self._dict_id
+
+    def _open_segment(self):
+        # One writer per process and segment, so concurrent tools never interleave
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._dict_id = None
+        self.current_dict_id()
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        self._segment = f"seg-{stamp}-{os.getpid()}.rra"
+        self._segment_file = open(os.path.join(self.root, self._segment), "ab")
+
+    def append(self, url, html, kind, fiction_id=None, fetched_at=None, truncated=False):
+        """
+        Compress and append one fetched page.
+
+        Args:
+            url (str): Fetched URL
+            html (str): Response body as returned by the scraper
+            kind (str): "listing", "fiction" or "fiction-head"
+            fiction_id (int): Fiction ID (parsed from the URL if omitted)
+            fetched_at (str): ISO timestamp (defaults to now)
+            truncated (bool): Body was cut short by a streaming head fetch
+        """
+        if fiction_id is None:
+            match = FICTION_ID_RE.search(url)
+            fiction_id = int(match.group(1)) if match else None
+        fetched_at = fetched_at or datetime.utcnow().isoformat()
+        raw = html.encode("utf-8")
+
+        with self._lock:
+            codec, dict_id, payload = self.codecs.compress(raw, self.current_dict_id())
+            header = {"url": url, "kind": kind, "fiction_id": fiction_id, "fetched_at": fetched_at,
+                      "truncated": truncated, "codec": codec, "dict_id": dict_id}
+            record = encode_record(header, payload)
+
+            if self._segment_file is None or self._segment_file.tell() + len(record) > self.segment_bytes:
+                self._open_segment()
+            offset = self._segment_file.tell()
+            self._segment_file.write(record)
+            self._segment_file.flush()
+
+            conn = self._index()
+            conn.execute(
+                "INSERT INTO pages (fiction_id, kind, url, fetched_at, segment, offset, length, "
+                "raw_length, codec, dict_id, truncated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fiction_id, kind, url, fetched_at, self._segment, offset, len(record),
+                 len(raw), codec, dict_id, int(truncated)))
+            conn.commit()
+
+    def read_blob(self, segment, offset, length, handles=None):
+        """Read one serialized record (optionally reusing open segment handles)"""
+        if handles is None:
+            with open(os.path.join(self.root, segment), "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        f = handles.get(segment)
+        if f is None:
+            f = handles[segment] = open(os.path.join(self.root, segment), "rb")
+        f.seek(offset)
+        return f.read(length)
+
+    def latest(self, fiction_id):
+        """
+        Latest archived page for a fiction.
+
+        Returns:
+            tuple: (header dict, html str), or None if never archived
+        """
+        row = self._index().execute(
+            "SELECT segment, offset, length FROM pages WHERE fiction_id = ? AND kind IN (?, ?) "
+            "ORDER BY fetched_at DESC LIMIT 1", (fiction_id, *FICTION_KINDS)).fetchone()
+        if row is None:
+            return None
+        header, payload = decode_record(self.read_blob(*row))
+        html = self.codecs.decompress(header["codec"], header["dict_id"], payload)
+        return header, html.decode("utf-8")
+
+    def latest_fiction_records(self, since=None):
+        """
+        Index entries for the newest archived page of every fiction,
+        in segment/offset order so the archive is read sequentially.
+
+        Returns:
+            list: (fiction_id, segment, offset, length, fetched_at) tuples
+        """
+        # SQLite returns the bare columns from the row holding MAX(fetched_at)
+        query = ("SELECT fiction_id, segment, offset, length, MAX(fetched_at) FROM pages "
+                 "WHERE kind IN (?, ?) AND fiction_id IS NOT NULL")
+        params = list(FICTION_KINDS)
+        if since:
+            query += " AND fetched_at >= ?"
+            params.append(since)
+        rows = self._index().execute(query + " GROUP BY fiction_id", params).fetchall()
+        return sorted(rows, key=lambda r: (r[1], r[2]))
+
+    def train_dictionary(self, samples=ARCHIVE_DICT_SAMPLES, size=ARCHIVE_DICT_SIZE):
+        """
+        Train a zstd dictionary on recently archived fiction pages and use it
+        for all records appended from now on.
+
+        Returns:
+            int: The new dictionary id
+        """
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed (pip install zstandard)")
+        rows = self._index().execute(
+            "SELECT segment, offset, length FROM pages WHERE kind IN (?, ?) "
+            "ORDER BY id DESC LIMIT ?", (*FICTION_KINDS, samples)).fetchall()
+        if len(rows) < 20:
+            raise ValueError(f"Need at least 20 archived fiction pages to train (have {len(rows)})")
+        handles = {}
+        try:
+            pages = []
+            for row in rows:
+                header, payload = decode_record(self.read_blob(*row, handles=handles))
+                pages.append(self.codecs.decompress(header["codec"], header["dict_id"], payload))
+        finally:
+            for f in handles.values():
+                f.close()
+
+        trained = zstandard.train_dictionary(size, pages)
+        dict_id = trained.dict_id()
+        with open(os.path.join(self.root, f"dict-{dict_id}.zdict"), "wb") as f:
+            f.write(trained.as_bytes())
+        conn = self._index()
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dict_id', ?)", (str(dict_id),))
+        conn.commit()
+        self._dict_id = dict_id
+        return dict_id
+
+    def stats(self):
+        """
+        Returns:
+            dict: records, fictions, segments, raw and stored bytes, by codec/kind
+        """
+        conn = self._index()
+        records, fictions, raw, stored = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT fiction_id), COALESCE(SUM(raw_length), 0), "
+            "COALESCE(SUM(length), 0) FROM pages").fetchone()
+        segments = conn.execute("SELECT COUNT(DISTINCT segment) FROM pages").fetchone()[0]
+        by_kind = dict(conn.execute("SELECT kind, COUNT(*) FROM pages GROUP BY kind"))
+        by_codec = dict(conn.execute(
+            "SELECT codec || CASE dict_id WHEN 0 THEN '' ELSE '+dict' END, COUNT(*) "
+            "FROM pages GROUP BY 1"))
+        return {"records": records, "fictions": fictions, "segments": segments,
+                "raw_bytes": raw, "stored_bytes": stored, "by_kind": by_kind,
+                "by_codec": by_codec, "dict_id": self.current_dict_id()}
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+
+
+_archive = None
+_archive_lock = threading.Lock()
+_enabled = ARCHIVE_ENABLED
+
+
+def set_enabled(enabled):
+    """Turn page archiving on/off for this process"""
+    global _enabled
+    _enabled = enabled
+
+
+def get_archive():
+    """Process-wide PageArchive instance"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = PageArchive()
+        return _archive
+
+
+def record_page(url, html, kind, truncated=False):
+    """
+    Archive a page fetched by scraper.py.
+    No-op when disabled (ARCHIVE_ENABLED / RR_ARCHIVE=0 / set_enabled). Archive
+    failures never fail the fetch; they are reported and the crawl continues.
+    """
+    if not _enabled:
+        return
+    try:
+        get_archive().append(url, html, kind, truncated=truncated)
+    except (OSError, sqlite3.Error, ValueError) as e:
+        print(f"⚠ Warning: could not archive {url}: {e}")
+
+
+# =============================================================================
+# Offline re-parse
+# =============================================================================
+
+_worker_codecs = None
+
+
+def _init_worker(root):
+    global _worker_codecs
+    _worker_codecs = Codecs(root)
+
+
+def _parse_batch(batch):
+    """
+    Worker: decompress and parse a batch of archived fiction pages.
+
+    Args:
+        batch (list): (fiction_id, serialized record) tuples
+
+    Returns:
+        tuple: (rows, errors) - FictionRecords and the count of unparseable pages
+    """
+    from parser import parse_fiction_full
+    from normalizer import normalize_batch
+
+    raws = []
+    errors = 0
+    for fiction_id, blob in batch:
+        try:
+            header, payload = decode_record(blob)
+            html = _worker_codecs.decompress(header["codec"], header["dict_id"], payload)
+            raw = parse_fiction_full(html.decode("utf-8"))
+            if not raw.get("title") or not raw.get("author"):
+                errors += 1
+                continue
+            raw["fiction_id"] = fiction_id
+            raws.append(raw)
+        except Exception:
+            errors += 1
+    return normalize_batch(raws), errors
+
+
+def _read_batches(archive, records, batch_size):
+    handles = {}
+    try:
+        batch = []
+        for fiction_id, segment, offset, length, _ in records:
+            batch.append((fiction_id, archive.read_blob(segment, offset, length, handles)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        for f in handles.values():
+            f.close()
+
+
+def _is_stale(fetched_at, scraped_at):
+    """True if a page fetched at `fetched_at` predates the stored scrape"""
+    try:
+        fetched = datetime.fromisoformat(fetched_at)
+        scraped = datetime.fromisoformat(scraped_at)
+    except (TypeError, ValueError):
+        return False
+    return (scraped - fetched).total_seconds() > ARCHIVE_REPARSE_SLACK_SECONDS
+
+
+def _bulk_update(session, rows, fields, fetched_at):
+    """
+    Update only `fields` of existing fictions whose stored scrape is not
+    newer than the archived page (`fetched_at`: fiction_id -> ISO timestamp).
+
+    Returns:
+        tuple: (updated, missing, stale)
+    """
+    from sqlalchemy import bindparam, select, update
+    from db import Fiction
+    import aggregates
+
+    ids = [row["fiction_id"] for row in rows]
+    old = aggregates.snapshot(session, ids)
+    scraped_at = {}
+    for start in range(0, len(ids), 500):
+        scraped_at.update(session.execute(select(Fiction.fiction_id, Fiction.scraped_at)
+                                          .where(Fiction.fiction_id.in_(ids[start:start + 500]))).all())
+    present = [row for row in rows if row["fiction_id"] in old
+               and not _is_stale(fetched_at[row["fiction_id"]], scraped_at[row["fiction_id"]])]
+    params = [{"b_fiction_id": row["fiction_id"], **{f: row.get(f) for f in fields}}
+              for row in present]
+    if params:
+        stmt = (update(Fiction.__table__)
+                .where(Fiction.__table__.c.fiction_id == bindparam("b_fiction_id"))
+                .values({f: bindparam(f) for f in fields}))
+        session.execute(stmt, params)
+        aggregates.apply(session, old, [{"fiction_id": row["fiction_id"], **{f: row.get(f) for f in fields}}
+                                        for row in present])
+        session.commit()
+    stale = sum(1 for row in rows if row["fiction_id"] in old) - len(present)
+    return len(params), len(rows) - len(old), stale
+
+
+def reparse(session, archive=None, fields=None, workers=None, since=None,
+            chunk_size=64, commit_size=1000, should_stop=None):
+    """
+    Re-parse the newest archived page of every fiction and update the database.
+
+    Pages are read sequentially from the segments by the calling process,
+    parsed by a pool of worker processes and written back in bulk UPDATEs
+    that touch only `fields`; scraped_at is left alone since nothing was
+    re-fetched. Fictions missing from the database are skipped, and so are
+    fictions scraped after their archived page was fetched (allowing
+    ARCHIVE_REPARSE_SLACK_SECONDS between the fetch and the scrape stamping
+    it), so older pages never overwrite fresher stats.
+
+    Args:
+        session: SQLAlchemy session
+        archive (PageArchive): Archive to read (defaults to ARCHIVE_DIR)
+        fields (list): Columns to update (default: every parsed column)
+        workers (int): Parser processes (default: CPU count)
+        since (str): Only pages fetched at or after this ISO timestamp
+        chunk_size (int): Pages per worker task
+        commit_size (int): Rows per bulk UPDATE
+        should_stop (callable): Optional callback returning True to abort
+
+    Returns:
+        dict: pages, updated, missing, stale, errors, seconds
+    """
+    from db import Fiction
+
+    archive = archive or get_archive()
+    columns = [c.name for c in Fiction.__table__.columns if c.name not in ("fiction_id", "scraped_at")]
+    fields = list(fields or columns)
+    unknown = set(fields) - set(columns)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    start = time.time()
+    records = archive.latest_fiction_records(since)
+    fetched_at = {record[0]: record[4] for record in records}
+    stats = {"pages": len(records), "updated": 0, "missing": 0, "stale": 0, "errors": 0}
+    pending = []
+
+    def flush():
+        nonlocal pending
+        updated, missing, stale = _bulk_update(session, pending, fields, fetched_at)
+        stats["updated"] += updated
+        stats["missing"] += missing
+        stats["stale"] += stale
+        pending = []
+
+    workers = workers or os.cpu_count() or 1
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(archive.root,)) as pool:
+        batches = _read_batches(archive, records, chunk_size)
+        for rows, errors in pool.imap_unordered(_parse_batch, batches):
+            stats["errors"] += errors
+            pending.extend(rows)
+            if len(pending) >= commit_size:
+                flush()
+            if should_stop and should_stop():
+                pool.terminate()
+                break
+    if pending:
+        flush()
+
+    stats["seconds"] = round(time.time() - start, 2)
+    return stats
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def print_stats(archive):
+    s = archive.stats()
+    ratio = s["raw_bytes"] / s["stored_bytes"] if s["stored_bytes"] else 0
+    print("=" * 60)
+    print("Page Archive")
+    print("=" * 60)
+    print(f"Directory:    {os.path.abspath(archive.root)}")
+    print(f"Records:      {s['records']:,} ({s['fictions']:,} fictions, {s['segments']} segments)")
+    print(f"Size:         {s['stored_bytes'] / 1e6:,.1f} MB stored, {s['raw_bytes'] / 1e6:,.1f} MB raw "
+          f"({ratio:.1f}x)")
+    print(f"Kinds:        {', '.join(f'{k} {v:,}' for k, v in sorted(s['by_kind'].items())) or '-'}")
+    print(f"Codecs:       {', '.join(f'{k} {v:,}' for k, v in sorted(s['by_codec'].items())) or '-'}")
+    print(f"Dictionary:   {s['dict_id'] or 'none'}"
+          f"{'' if zstandard else '  (zstandard not installed - using zlib)'}")
+    print("=" * 60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replayable archive of fetched pages")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("stats", help="Show archive size and compression")
+    train = sub.add_parser("train", help="Train a zstd dictionary on archived pages")
+    train.add_argument("--samples", type=int, default=ARCHIVE_DICT_SAMPLES)
+    rp = sub.add_parser("reparse", help="Backfill database fields from archived pages")
+    rp.add_argument("--fields", default=None, help="Comma-separated columns (default: all)")
+    rp.add_argument("--workers", type=int, default=None)
+    rp.add_argument("--since", default=None, help="Only pages fetched since this ISO date")
+    show = sub.add_parser("show", help="Print the latest archived page for a fiction")
+    show.add_argument("fiction_id", type=int)
+    args = parser.parse_args(argv)
+
+    archive = get_archive()
+    if args.command in (None, "stats"):
+        print_stats(archive)
+    elif args.command == "train":
+        dict_id = archive.train_dictionary(samples=args.samples)
+        print(f"✓ Trained dictionary {dict_id}; new records will use it")
+    elif args.command == "show":
+        found = archive.latest(args.fiction_id)
+        if found is None:
+            print(f"✗ Fiction {args.fiction_id} is not in the archive")
+            sys.exit(1)
+        header, html = found
+        print(json.dumps(header), file=sys.stderr)
+        print(html)
+    elif args.command == "reparse":
+        from db import init_db, get_session
+        fields = args.fields.split(",") if args.fields else None
+        print("=" * 60)
+        print(f"Re-parsing archive → database ({', '.join(fields) if fields else 'all fields'})")
+        print("=" * 60)
+        init_db()
+        session = get_session()
+        try:
+            stats = reparse(session, archive, fields=fields, workers=args.workers, since=args.since)
+        finally:
+            session.close()
+        rate = stats["pages"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"✓ {stats['pages']:,} pages in {stats['seconds']}s ({rate:,.0f} pages/s)")
+        print(f"  Updated: {stats['updated']:,}  Not in DB: {stats['missing']:,}  "
+              f"Scraped since: {stats['stale']:,}  Unparseable: {stats['errors']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+"""
+Offline benchmark suite for the scraping pipeline.
+Measures throughput, CPU time and memory per page against a recorded HTML corpus,
+and fails loudly when results fall below the committed thresholds.
+
+Usage:
+    python benchmark.py record [--pages 2] [--fictions 12]   # capture a new corpus
+    python benchmark.py run [--iterations 5] [--no-e2e]       # measure + compare
+    python benchmark.py run --records 100000                  # rows for the record stages
+    python benchmark.py compare <results.json>                # re-check a results file
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from config import BASE_URL, RATE_LIMIT_BETWEEN_FICTIONS, JITTER_FICTIONS
+
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+MANIFEST_FILE = os.path.join(CORPUS_DIR, "manifest.json")
+THRESHOLDS_FILE = os.path.join(BENCH_DIR, "thresholds.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+# =============================================================================
+# Corpus
+# =============================================================================
+
+def load_manifest():
+    """Load the corpus manifest (list of recorded pages)"""
+    with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_corpus(kind):
+    """
+    Load recorded pages of one kind from the corpus.
+
+    Args:
+        kind (str): "listing" or "fiction"
+
+    Returns:
+        list: List of (manifest_entry, html) tuples
+    """
+    pages = []
+    for entry in load_manifest()["entries"]:
+        if entry["kind"] != kind:
+            continue
+        with open(os.path.join(CORPUS_DIR, entry["file"]), "r", encoding="utf-8") as f:
+            pages.append((entry, f.read()))
+    return pages
+
+
+def record_corpus(num_pages=2, num_fictions=12):
+    """
+    Record listing and fiction pages from the live site into the corpus.
+
+    Args:
+        num_pages (int): Number of best-rated listing pages to record
+        num_fictions (int): Maximum number of fiction pages to record
+    """
+    from scraper import fetch_listing_page, fetch_fiction_page
+    from parser import parse_listing_links
+    from run_scrape import extract_fiction_id
+    from utils import sleep_with_jitter
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    entries = []
+    links = []
+
+    for page in range(1, num_pages + 1):
+        print(f"Recording listing page {page}...", end=" ")
+        html = fetch_listing_page(page)
+        filename = f"listing-best-rated-p{page}.html"
+        _write_page(filename, html)
+        entries.append({
+            "kind": "listing",
+            "path": f"/fictions/best-rated?page={page}",
+            "file": filename,
+            "fiction_id": None,
+            "recorded_at": datetime.utcnow().isoformat(),
+        })
+        links.extend(parse_listing_links(html))
+        print(f"✓ {len(html):,} bytes")
+        sleep_with_jitter(RATE_LIMIT_BETWEEN_FICTIONS, JITTER_FICTIONS)
+
+    for link in links[:num_fictions]:
+        fiction_id = extract_fiction_id(link)
+        print(f"Recording fiction {fiction_id}...", end=" ")
+        try:
+            html = fetch_fiction_page(link)
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            continue
+        filename = f"fiction-{fiction_id}.html"
+        _write_page(filename, html)
+        entries.append({
+            "kind": "fiction",
+            "path": link[len(BASE_URL):],
+            "file": filename,
+            "fiction_id": fiction_id,
+            "recorded_at": datetime.utcnow().isoformat(),
+        })
+        print(f"✓ {len(html):,} bytes")
+        sleep_with_jitter(RATE_LIMIT_BETWEEN_FICTIONS, JITTER_FICTIONS)
+
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump({"base_url": BASE_URL, "entries": entries}, f, indent=2)
+    print(f"✓ Recorded {len(entries)} pages into {CORPUS_DIR}")
+
+
+def _write_page(filename, html):
+    with open(os.path.join(CORPUS_DIR, filename), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+# =============================================================================
+# Measurement
+# =============================================================================
+
+def measure(func, items, iterations=5):
+    """
+    Measure a pipeline stage over a list of inputs.
+
+    Timing and memory are measured in separate passes so tracemalloc
+    overhead does not distort the throughput numbers.
+
+    Args:
+        func (callable): Stage function taking one item
+        items (list): Inputs, one per page
+        iterations (int): Number of timed passes over the inputs
+
+    Returns:
+        dict: pages_per_sec, wall/cpu ms per page and peak KB per page
+    """
+    # Warm-up pass (imports, regex/selector caches)
+    for item in items:
+        func(item)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        for item in items:
+            func(item)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    total = len(items) * iterations
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for item in items:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func(item)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "pages": len(items),
+        "iterations": iterations,
+        "pages_per_sec": round(total / wall, 2) if wall else None,
+        "wall_ms_per_page": round(wall * 1000 / total, 3),
+        "cpu_ms_per_page": round(cpu * 1000 / total, 3),
+        "peak_kb_per_page": round(max(peaks) / 1024, 1),
+        "mean_peak_kb_per_page": round(sum(peaks) / len(peaks) / 1024, 1),
+    }
+
+
+def bench_parsers(iterations):
+    """Benchmark the parsing and normalization stages"""
+    from parser import (parse_listing_links, parse_fiction_page, parse_fiction_details,
+                        parse_fiction_full, truncate_fiction_head)
+    from normalizer import normalize_fiction
+
+    listings = [html for _, html in load_corpus("listing")]
+    fictions = load_corpus("fiction")
+    fiction_html = [html for _, html in fictions]
+    # What the streaming fetch (scraper.fetch_fiction_head) hands to the parsers
+    head_html = [truncate_fiction_head(html)[0] for html in fiction_html]
+
+    raws = []
+    for entry, html in fictions:
+        raw = parse_fiction_page(html)
+        raw["fiction_id"] = entry["fiction_id"]
+        raws.append(raw)
+
+    return {
+        "parse_listing_links": measure(parse_listing_links, listings, iterations),
+        "parse_fiction_page": measure(parse_fiction_page, fiction_html, iterations),
+        "parse_fiction_details": measure(parse_fiction_details, fiction_html, iterations),
+        "parse_fiction_full": measure(parse_fiction_full, fiction_html, iterations),
+        "parse_fiction_head": dict(
+            measure(parse_fiction_full, head_html, iterations),
+            bytes_ratio=round(sum(map(len, head_html)) / sum(map(len, fiction_html)), 3)),
+        "normalize_fiction": measure(normalize_fiction, raws, iterations * 100),
+    }
+
+
+def bench_records(count=100_000):
+    """
+    Normalize `count` rows both ways - one dict per row (normalize_fiction)
+    and one FictionRecord batch (normalize_batch) - and report CPU per row
+    and the memory the finished rows keep alive (as peak_kb_per_page).
+
+    Args:
+        count (int): Rows to normalize
+
+    Returns:
+        dict: Results keyed by stage
+    """
+    import gc
+    from parser import parse_fiction_page
+    from normalizer import normalize_fiction, normalize_batch
+
+    raws = []
+    for entry, html in load_corpus("fiction"):
+        raw = parse_fiction_page(html)
+        raw["fiction_id"] = entry["fiction_id"]
+        raws.append(raw)
+    batch = [dict(raws[i % len(raws)], fiction_id=i) for i in range(count)]
+
+    ways = (
+        ("normalize_dicts", lambda: [normalize_fiction(raw) for raw in batch]),
+        ("normalize_batch", lambda: normalize_batch(batch)),
+    )
+    results = {}
+    for stage, convert in ways:
+        convert()  # warm-up (tag cache, interned strings)
+        gc.collect()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rows = convert()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        del rows
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            rows = convert()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del rows
+
+        results[stage] = {
+            "pages": count,
+            "iterations": 1,
+            "pages_per_sec": round(count / wall, 2) if wall else None,
+            "wall_ms_per_page": round(wall * 1000 / count, 4),
+            "cpu_ms_per_page": round(cpu * 1000 / count, 4),
+            "peak_kb_per_page": round(retained / count / 1024, 3),
+            "retained_mb": round(retained / (1024 * 1024), 1),
+            "peak_mb": round(peak / (1024 * 1024), 1),
+        }
+    return results
+
+
+def bench_upsert(iterations):
+    """Benchmark upsert_fictions against a throwaway SQLite database"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from db import Base
+    from parser import parse_fiction_page
+    from normalizer import normalize_fiction
+    from loader import upsert_fictions
+
+    rows = []
+    for entry, html in load_corpus("fiction"):
+        raw = parse_fiction_page(html)
+        raw["fiction_id"] = entry["fiction_id"]
+        rows.append(normalize_fiction(raw))
+
+    # Scale the recorded rows up to a realistic listing-page batch size
+    batch = []
+    for copy in range(100):
+        for row in rows:
+            batch.append(dict(row, fiction_id=row["fiction_id"] * 1000 + copy))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        chunks = [batch[i:i + 20] for i in range(0, len(batch), 20)]
+        try:
+            result = measure(lambda chunk: upsert_fictions(session, chunk), chunks, iterations)
+        finally:
+            session.close()
+            engine.dispose()
+
+    # Report per row rather than per 20-row chunk
+    per_chunk = 20
+    result["pages"] = len(batch)
+    result["pages_per_sec"] = round(result["pages_per_sec"] * per_chunk, 2)
+    result["wall_ms_per_page"] = round(result["wall_ms_per_page"] / per_chunk, 3)
+    result["cpu_ms_per_page"] = round(result["cpu_ms_per_page"] / per_chunk, 3)
+    result["peak_kb_per_page"] = round(result["peak_kb_per_page"] / per_chunk, 1)
+    result["mean_peak_kb_per_page"] = round(result["mean_peak_kb_per_page"] / per_chunk, 1)
+    return result
+
+
+def bench_end_to_end():
+    """
+    Run the fetch → parse → normalize → upsert pipeline against the local
+    stand-in server (mock_server.py) replaying the corpus.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from db import Base
+    from scraper import fetch_fiction_page, fetch_fiction_head
+    from parser import parse_listing_links, parse_fiction_page
+    from normalizer import normalize_fiction
+    from loader import upsert_fictions
+    from run_scrape import extract_fiction_id
+    from mock_server import start_server
+    import rate_budget
+    import archive
+
+    # The stand-in is local; the host-wide budget only guards the real site,
+    # and replayed corpus pages do not belong in the page archive
+    rate_budget.set_enabled(False)
+    archive.set_enabled(False)
+    server, local_url = start_server(fictions=100)
+
+    listing_paths = [entry["path"] for entry, _ in load_corpus("listing")]
+    fetched = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'e2e.db')}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            for path in listing_paths:
+                links = parse_listing_links(fetch_fiction_page(local_url + path))
+                fetched += 1
+                batch = []
+                for link in links:
+                    raw = parse_fiction_page(fetch_fiction_head(link.replace(BASE_URL, local_url)))
+                    raw["fiction_id"] = extract_fiction_id(link)
+                    batch.append(normalize_fiction(raw))
+                    fetched += 1
+                upsert_fictions(session, batch)
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            session.close()
+            engine.dispose()
+            server.shutdown()
+            server.server_close()
+
+    return {
+        "pages": fetched,
+        "iterations": 1,
+        "pages_per_sec": round(fetched / wall, 2) if wall else None,
+        "wall_ms_per_page": round(wall * 1000 / fetched, 3),
+        "cpu_ms_per_page": round(cpu * 1000 / fetched, 3),
+    }
+
+
+# =============================================================================
+# Thresholds
+# =============================================================================
+
+def compare_to_thresholds(results, thresholds):
+    """
+    Compare benchmark results against thresholds.
+
+    Each stage in thresholds may define:
+        - min_pages_per_sec
+        - max_cpu_ms_per_page
+        - max_peak_kb_per_page
+
+    Args:
+        results (dict): Stage results as produced by run_benchmarks()
+        thresholds (dict): Stage thresholds loaded from thresholds.json
+
+    Returns:
+        list: Human-readable regression messages (empty if all passed)
+    """
+    failures = []
+    for stage, limits in thresholds.items():
+        stats = results.get("stages", {}).get(stage)
+        if stats is None:
+            continue
+        floor = limits.get("min_pages_per_sec")
+        if floor is not None and stats.get("pages_per_sec") is not None and stats["pages_per_sec"] < floor:
+            failures.append(f"{stage}: {stats['pages_per_sec']} pages/s < {floor} pages/s")
+        ceiling = limits.get("max_cpu_ms_per_page")
+        if ceiling is not None and stats.get("cpu_ms_per_page") is not None and stats["cpu_ms_per_page"] > ceiling:
+            failures.append(f"{stage}: {stats['cpu_ms_per_page']} ms CPU/page > {ceiling} ms")
+        ceiling = limits.get("max_peak_kb_per_page")
+        if ceiling is not None and stats.get("peak_kb_per_page") is not None and stats["peak_kb_per_page"] > ceiling:
+            failures.append(f"{stage}: {stats['peak_kb_per_page']} KB peak/page > {ceiling} KB")
+    return failures
+
+
+def load_thresholds(path=THRESHOLDS_FILE):
+    """Load the committed benchmark thresholds"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_benchmarks(iterations=5, end_to_end=True, records=100_000):
+    """
+    Run all benchmark stages.
+
+    Args:
+        iterations (int): Timed passes per parser/upsert stage
+        end_to_end (bool): Include the mock-server run
+        records (int): Rows for the dict vs FictionRecord normalization stages
+
+    Returns:
+        dict: Results keyed by stage, plus run metadata
+    """
+    stages = bench_parsers(iterations)
+    stages.update(bench_records(records))
+    stages["upsert_fictions"] = bench_upsert(iterations)
+    if end_to_end:
+        stages["end_to_end"] = bench_end_to_end()
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "stages": stages,
+    }
+
+
+def print_results(results):
+    """Print a results table"""
+    print("=" * 80)
+    print(f"{'Stage':<24}{'pages/s':>12}{'wall ms':>12}{'cpu ms':>12}{'peak KB':>12}")
+    print("-" * 80)
+    for stage, stats in results["stages"].items():
+        peak = stats.get("peak_kb_per_page")
+        print(f"{stage:<24}{stats['pages_per_sec']:>12}{stats['wall_ms_per_page']:>12}"
+              f"{stats['cpu_ms_per_page']:>12}{peak if peak is not None else '-':>12}")
+    print("=" * 80)
+
+
+def check(results):
+    """Compare results against thresholds and report. Returns an exit code."""
+    failures = compare_to_thresholds(results, load_thresholds())
+    if failures:
+        print("✗ PERFORMANCE REGRESSION:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("✓ All stages within thresholds")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Royal Road scraper benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record a new corpus from the live site")
+    rec.add_argument("--pages", type=int, default=2)
+    rec.add_argument("--fictions", type=int, default=12)
+
+    run = sub.add_parser("run", help="Run benchmarks and compare against thresholds")
+    run.add_argument("--iterations", type=int, default=5)
+    run.add_argument("--no-e2e", action="store_true", help="Skip the end-to-end stage")
+    run.add_argument("--records", type=int, default=100_000,
+                     help="Rows for the dict vs FictionRecord normalization stages")
+    run.add_argument("--output", default=None, help="Results JSON path")
+
+    cmp_ = sub.add_parser("compare", help="Compare a stored results file against thresholds")
+    cmp_.add_argument("results")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record_corpus(args.pages, args.fictions)
+        return 0
+
+    if args.command == "compare":
+        with open(args.results, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        print_results(results)
+        return check(results)
+
+    results = run_benchmarks(args.iterations, end_to_end=not args.no_e2e, records=args.records)
+    print_results(results)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✓ Results saved to {output}")
+    return check(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
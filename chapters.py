@@ -0,0 +1,269 @@
+"""
+Incremental chapter table-of-contents tracking.
+Fiction refreshes (frontier, incremental) keep each fiction's chapter list in
+the `chapters` table and a derived release cadence in `chapter_stats`.
+
+Keeping it cheap across the whole catalogue:
+- The chapter count (data-chapters on the table of contents) arrives before
+  the chapter rows, so the streaming fetch only reads the rest of the table
+  when the count differs from the stored one (or the periodic full check in
+  CHAPTER_FULL_CHECK_DAYS is due); unchanged fictions cost nothing extra.
+- A read table is diffed against the stored rows and only new, changed or
+  removed chapters are written.
+- The release cadence (chapters/week over the last CHAPTER_RATE_SAMPLE
+  releases) sets a per-fiction refresh TTL, so the frontier skips dormant
+  fictions for longer than its freshness window.
+
+Usage:
+    python chapters.py status
+    python chapters.py show FICTION_ID
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from db import Chapter, ChapterStat, Fiction, init_db, get_session
+from parser import parse_chapter_count, parse_chapters, _soup
+from utils import format_number
+from config import (
+    FRONTIER_FRESHNESS_HOURS,
+    CHAPTER_RATE_SAMPLE,
+    CHAPTER_FULL_CHECK_DAYS,
+    CHAPTER_TTL_FACTOR,
+    CHAPTER_DORMANT_FACTOR,
+    CHAPTER_TTL_MAX_HOURS,
+)
+
+
+def release_rate(published, sample=CHAPTER_RATE_SAMPLE):
+    """
+    Release cadence over the most recent chapters.
+
+    Args:
+        published (list): Release times (Unix) of the chapters; None entries are ignored
+        sample (int): Number of most recent release intervals to average
+
+    Returns:
+        tuple: (chapters per week, hours between releases), or (None, None)
+               with fewer than two dated chapters
+    """
+    times = sorted(t for t in published if t is not None)[-(sample + 1):]
+    if len(times) < 2:
+        return None, None
+    interval_hours = (times[-1] - times[0]) / (len(times) - 1) / 3600
+    if interval_hours <= 0:
+        return None, None
+    return 168 / interval_hours, interval_hours
+
+
+def refresh_hours(interval_hours, last_published, now=None):
+    """
+    Refresh TTL for a fiction with the given release cadence.
+
+    A fiction is not due before a fraction of its release interval has passed,
+    and dormant fictions back off in proportion to the time since their last
+    chapter. The result never drops below FRONTIER_FRESHNESS_HOURS.
+
+    Returns:
+        float: Hours a refresh stays fresh
+    """
+    now = time.time() if now is None else now
+    hours = 0.0
+    if interval_hours is not None:
+        hours = interval_hours * CHAPTER_TTL_FACTOR
+    if last_published is not None:
+        hours = max(hours, (now - last_published) / 3600 * CHAPTER_DORMANT_FACTOR)
+    return min(max(hours, FRONTIER_FRESHNESS_HOURS), CHAPTER_TTL_MAX_HOURS)
+
+
+def fresh_ids(session, fiction_ids, now=None):
+    """
+    IDs whose last scrape is still inside their release-cadence TTL.
+
+    Fictions without chapter stats are never reported (the caller's default
+    freshness window applies to them).
+
+    Returns:
+        set: Fresh fiction IDs
+    """
+    now = time.time() if now is None else now
+    oldest = (datetime.utcfromtimestamp(now) - timedelta(hours=CHAPTER_TTL_MAX_HOURS)).isoformat()
+    rows = session.execute(
+        select(Fiction.fiction_id, Fiction.scraped_at,
+               ChapterStat.interval_hours, ChapterStat.last_published)
+        .join(ChapterStat, ChapterStat.fiction_id == Fiction.fiction_id)
+        .where(Fiction.fiction_id.in_(fiction_ids))
+        .where(Fiction.scraped_at >= oldest))
+    fresh = set()
+    current = datetime.utcfromtimestamp(now)
+    for fiction_id, scraped_at, interval_hours, last_published in rows:
+        age = (current - datetime.fromisoformat(scraped_at)).total_seconds() / 3600
+        if age < refresh_hours(interval_hours, last_published, now):
+            fresh.add(fiction_id)
+    return fresh
+
+
+class ChapterTracker:
+    """
+    Keeps the chapters table in step with fetched fiction pages.
+
+    Call toc_for() before fetching a fiction (its result goes to
+    scraper.fetch_fiction_head(url, toc=...)), observe() with the fetched
+    page, and flush() to commit with the caller's batch.
+    """
+
+    def __init__(self, session, full_check_days=CHAPTER_FULL_CHECK_DAYS):
+        self.session = session
+        self.full_check = timedelta(days=full_check_days)
+        self._known = {}  # fiction_id -> (chapter_count, toc_checked_at) before the fetch
+        self.stats = {"skipped": 0, "read": 0, "unchanged": 0,
+                      "inserted": 0, "updated": 0, "deleted": 0}
+
+    def toc_for(self, fiction_id):
+        """
+        Decide, per fetch, whether the chapter table is worth reading.
+
+        Returns:
+            callable: toc(chapter_count) -> bool for the streaming scanner
+        """
+        row = self.session.execute(
+            select(ChapterStat.chapter_count, ChapterStat.toc_checked_at)
+            .where(ChapterStat.fiction_id == fiction_id)).first()
+        self._known[fiction_id] = tuple(row) if row else None
+        return lambda count: self.wants_toc(fiction_id, count)
+
+    def wants_toc(self, fiction_id, count):
+        """True if the stored chapter list may be out of date"""
+        known = self._known.get(fiction_id)
+        if known is None or count is None or count != known[0]:
+            return True
+        return datetime.utcnow() - datetime.fromisoformat(known[1]) >= self.full_check
+
+    def observe(self, fiction_id, html):
+        """
+        Diff a fetched page's chapter table against the stored chapters.
+
+        Nothing is read or written when the page holds no complete table
+        (the scanner skipped it because the chapter count is unchanged).
+
+        Returns:
+            int: Chapters inserted, updated or deleted (None if the table was not read)
+        """
+        soup = _soup(html)
+        count = parse_chapter_count(soup)
+        if fiction_id not in self._known:
+            self.toc_for(fiction_id)
+        if not self.wants_toc(fiction_id, count):
+            self.stats["skipped"] += 1
+            return None
+        chapters = parse_chapters(soup)
+        if count is None or len(chapters) != count:
+            self.stats["skipped"] += 1
+            return None
+        self.stats["read"] += 1
+
+        stored = {row.chapter_id: (row.position, row.title, row.published)
+                  for row in self.session.execute(
+                      select(Chapter.chapter_id, Chapter.position, Chapter.title, Chapter.published)
+                      .where(Chapter.fiction_id == fiction_id))}
+        new, changed = [], []
+        for ch in chapters:
+            current = stored.pop(ch["chapter_id"], None)
+            if current is None:
+                new.append({"fiction_id": fiction_id, **ch})
+            elif current != (ch["position"], ch["title"], ch["published"]):
+                changed.append(ch)
+        if new:
+            self.session.execute(insert(Chapter), new)
+        for ch in changed:
+            self.session.execute(
+                update(Chapter).where(Chapter.chapter_id == ch["chapter_id"])
+                .values(fiction_id=fiction_id, position=ch["position"],
+                        title=ch["title"], published=ch["published"]))
+        if stored:
+            self.session.execute(delete(Chapter).where(Chapter.chapter_id.in_(list(stored))))
+        self.stats["inserted"] += len(new)
+        self.stats["updated"] += len(changed)
+        self.stats["deleted"] += len(stored)
+        if not (new or changed or stored):
+            self.stats["unchanged"] += 1
+
+        published = [ch["published"] for ch in chapters]
+        dated = [t for t in published if t is not None]
+        rate, interval = release_rate(published)
+        values = {"chapter_count": count, "release_rate": rate, "interval_hours": interval,
+                  "first_published": min(dated) if dated else None,
+                  "last_published": max(dated) if dated else None,
+                  "toc_checked_at": datetime.utcnow().isoformat()}
+        stat = self.session.get(ChapterStat, fiction_id)
+        if stat is None:
+            self.session.add(ChapterStat(fiction_id=fiction_id, **values))
+        else:
+            for key, value in values.items():
+                setattr(stat, key, value)
+        self._known[fiction_id] = (count, values["toc_checked_at"])
+        return len(new) + len(changed) + len(stored)
+
+    def flush(self):
+        """Commit the pending chapter writes"""
+        self.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chapter table-of-contents tracking")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("status", help="Tracked fictions, chapters and release cadence")
+    show = sub.add_parser("show", help="Chapters and cadence of one fiction")
+    show.add_argument("fiction_id", type=int)
+    args = parser.parse_args(argv)
+
+    init_db()
+    session = get_session()
+    try:
+        if args.command == "show":
+            stat = session.get(ChapterStat, args.fiction_id)
+            if stat is None:
+                print(f"✗ Fiction {args.fiction_id} has no tracked chapters")
+                return 1
+            print("=" * 60)
+            print(f"Fiction {args.fiction_id}: {format_number(stat.chapter_count)} chapters")
+            print("=" * 60)
+            for ch in (session.query(Chapter).filter(Chapter.fiction_id == args.fiction_id)
+                       .order_by(Chapter.position)):
+                when = (datetime.utcfromtimestamp(ch.published).strftime("%Y-%m-%d %H:%M")
+                        if ch.published else "?")
+                print(f"{ch.position:>5}  {when}  {ch.title[:45]}")
+            print("-" * 60)
+            if stat.interval_hours:
+                print(f"Release rate: {stat.release_rate:.2f}/week (every {stat.interval_hours:.1f}h)")
+            ttl = refresh_hours(stat.interval_hours, stat.last_published)
+            print(f"Refresh TTL:  {ttl:.0f}h   Table last read: {stat.toc_checked_at}")
+            print("=" * 60)
+            return 0
+
+        stats = session.query(ChapterStat).all()
+        chapters = session.query(Chapter).count()
+        rated = sorted(s.release_rate for s in stats if s.release_rate)
+        print("=" * 60)
+        print("Chapter Tracking")
+        print("=" * 60)
+        print(f"Fictions tracked: {format_number(len(stats))}")
+        print(f"Chapters stored:  {format_number(chapters)}")
+        if rated:
+            print(f"Median release rate: {rated[len(rated) // 2]:.2f} chapters/week")
+        now = time.time()
+        ttls = sorted(refresh_hours(s.interval_hours, s.last_published, now) for s in stats)
+        if ttls:
+            print(f"Refresh TTL: median {ttls[len(ttls) // 2]:.0f}h, "
+                  f"{sum(t > FRONTIER_FRESHNESS_HOURS for t in ttls)} fictions past the "
+                  f"{FRONTIER_FRESHNESS_HOURS}h freshness window")
+        print("=" * 60)
+        return 0
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
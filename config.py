@@ -1,7 +1,9 @@
 # Configuration constants for Royal Road scraper
+import os
 
 # Base URL and headers
-BASE_URL = "https://www.royalroad.com"
+# Override with RR_BASE_URL to point the scraper at a local stand-in (mock_server.py)
+BASE_URL = os.environ.get("RR_BASE_URL", "https://www.royalroad.com").rstrip("/")
 HEADERS = {
     "User-Agent": "detektive-rr-scraper/0.1 (hydrafore@gmail.com)"
 }
@@ -17,10 +19,211 @@ JITTER_FICTIONS = 0.2  # Random jitter for fiction delays (0 to 0.2s)
 # Scraping limits
 MAX_PAGES = 3000  # Maximum listing pages to scrape (~60k novels)
 MAX_NOVELS = 65000  # Hard cap on total novels to scrape
-TIMEOUT = 15  # HTTP request timeout in seconds
+
+# Batch sizes (rows per database write)
+CRAWL_BATCH_SIZE = 20  # frontier.py / incremental.py
+UPDATE_BATCH_SIZE = 50  # update_db.py
+
+# HTTP deadlines (in seconds)
+CONNECT_TIMEOUT = 5  # TCP/TLS connect
+READ_TIMEOUT = 10  # Max silence between bytes of the response
+TOTAL_TIMEOUT = 15  # Whole request, including the body download
+TIMEOUT = TOTAL_TIMEOUT  # Kept for older scripts
+
+# Hedged requests (scraper.py): a request still running past the observed
+# percentile for its endpoint gets one speculative duplicate; first response wins
+HEDGE_ENABLED = True
+HEDGE_PERCENTILE = 95  # Hedge after this latency percentile
+HEDGE_BUDGET = 0.05  # Max fraction of requests that may be hedged
+HEDGE_MIN_SAMPLES = 20  # Latency samples needed before hedging an endpoint
+HEDGE_MIN_DELAY = 0.25  # Never hedge sooner than this many seconds
+
+# Stream fiction pages and stop downloading after the last section the parsers
+# need (scraper.fetch_fiction_head); False always downloads whole pages
+STREAM_FICTION_HEAD = True
+
+# HTTP/2 transport (transport.py): multiplex concurrent fetches as streams over a
+# couple of connections (needs: pip install "httpx[http2]"); hosts that do not
+# speak HTTP/2 fall back to HTTP/1.1 automatically
+HTTP2_ENABLED = False
+HTTP2_MAX_CONNECTIONS = 2  # Connections per host; each carries many concurrent streams
+HTTP2_FALLBACK_SECONDS = 600  # After a failed HTTP/2 attempt, stay on HTTP/1.1 this long
 
 # Checkpoint system
 CHECKPOINT_FILE = "scraper_checkpoint.json"  # File to save progress
 
 # Database
 DB_PATH = "sqlite:///royalroad.db"
+
+# ID-space crawler (id_crawler.py)
+ID_CRAWL_WORKERS = 4  # Concurrent workers walking ID chunks
+ID_CRAWL_CHUNK = 1000  # IDs per work unit
+ID_DEAD_ZONE_MISSES = 40  # Consecutive 404s before switching to skip mode
+ID_MAX_SKIP = 256  # Largest stride (IDs) taken while probing a dead zone
+ID_CRAWL_STATE_FILE = "id_crawl_state.json"  # Per-chunk cursors for resume
+ID_EXISTS_FILE = "id_exists.bitmap"  # Bitmap of IDs known to exist
+ID_MISSING_FILE = "id_missing.bitmap"  # Bitmap of IDs known to 404
+
+# Incremental crawl (incremental.py / run_scrape.py --incremental)
+INCREMENTAL_STATE_FILE = "incremental_state.json"  # Persisted high-watermark
+INCREMENTAL_MAX_PAGES = 500  # Safety cap on latest-updates pages per run
+INCREMENTAL_INITIAL_LOOKBACK_HOURS = 24  # Window used when no watermark exists yet
+INCREMENTAL_OVERLAP_SECONDS = 300  # Re-check this much below the watermark (clock/order slack)
+
+# Crawl frontier (frontier.py / run_scrape.py --frontier)
+# Seed listings and their priority weights: a fiction ranked r on a listing
+# with weight w is queued with score r / w (lower scores are fetched first)
+FRONTIER_SEEDS = {
+    "trending": 2.0,
+    "rising-stars": 2.0,
+    "new": 1.5,
+    "best-rated": 1.0,
+    "complete": 0.5,
+}
+FRONTIER_MAX_PAGES_PER_SEED = 3000  # Listing pages walked per seed
+FRONTIER_FRESHNESS_HOURS = 72  # Skip fictions scraped within this window
+FRONTIER_QUEUE_LOW_WATER = 100  # Expand seeds when fewer than this many are queued
+FRONTIER_STATE_FILE = "frontier_state.json"  # Seed cursors + pending queue
+FRONTIER_SEEN_FILE = "frontier_seen.bitmap"  # Fictions fetched this freshness window
+FRONTIER_SEED_MAX_FAILURES = 3  # Consecutive listing errors before a seed backs off
+FRONTIER_SEED_BACKOFF_SECONDS = 900  # ... for this long (its cursor is kept)
+
+# Shared request budget (rate_budget.py)
+# A host-wide token bucket in a small SQLite file that every fetch path
+# acquires from, so concurrent tools never exceed the combined rate
+RATE_BUDGET_ENABLED = os.environ.get("RR_RATE_BUDGET", "1") != "0"
+RATE_BUDGET_DB = "rate_budget.db"
+RATE_BUDGET_RPS = 2.0  # Aggregate requests/sec across all tools on this host
+RATE_BUDGET_BURST = 4  # Bucket capacity (max back-to-back requests)
+RATE_BUDGET_ACTIVE_WINDOW = 10  # Seconds since last request for a tool to count as active
+# Weighted fair share between active tools (idle tools' share goes to the others)
+RATE_BUDGET_WEIGHTS = {
+    "run_scrape": 1.0,
+    "incremental": 1.0,
+    "frontier": 1.0,
+    "id_crawler": 0.75,
+    "update_db": 0.5,
+    "verify_status_fix": 0.25,
+    "inspect_status": 0.25,
+    "inspect_specific_ids": 0.25,
+    "default": 0.5,
+}
+
+# Page archive (archive.py): every fetched page is appended, compressed, to
+# segment files under ARCHIVE_DIR so new parser fields can be backfilled offline
+ARCHIVE_ENABLED = os.environ.get("RR_ARCHIVE", "1") != "0"
+ARCHIVE_DIR = "archive"
+ARCHIVE_SEGMENT_BYTES = 256 * 1024 * 1024  # Start a new segment file past this size
+ARCHIVE_ZSTD_LEVEL = 9  # zstd level (zlib level 9 is used when zstandard is missing)
+ARCHIVE_DICT_SIZE = 112640  # Bytes of trained zstd dictionary
+ARCHIVE_DICT_SAMPLES = 2000  # Recent pages sampled to train the dictionary
+ARCHIVE_REPARSE_SLACK_SECONDS = 600  # reparse treats a page fetched this long before scraped_at as that scrape's page
+
+# Read API (read_api.py): read-only HTTP/JSON service over the fictions DB
+READ_API_HOST = "127.0.0.1"
+READ_API_PORT = 8780
+READ_API_CACHE_SIZE = 4096  # Cached responses (LRU), dropped whenever the DB changes
+READ_API_PAGE_SIZE = 50  # Default page size for list queries
+READ_API_MAX_PAGE_SIZE = 500  # Upper bound for ?limit= and ?ids=
+
+# Similarity index (similarity.py): sparse fiction x tag matrix with IDF weights
+SIMILARITY_DIR = "similarity_index"
+SIMILARITY_STATS_WEIGHT = 0.0  # Share of each vector given to normalized stats (0 = tags only)
+SIMILARITY_BLOCK_ROWS = 512  # Rows scored per block by the all-pairs batch
+
+# Profiling mode (profiling.py): --profile on run_scrape.py / update_db.py
+PROFILE_DIR = "profiles"  # One timestamped report directory per profiled run
+PROFILE_SLOW_PAGES = 20  # Slowest pages kept (URL + HTML + stage timings) for replay
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples in "sample" mode
+PROFILE_TOP = 25  # Functions / allocation sites listed per section of the report
+
+# Parser health monitor (health.py): trips and pauses the crawl when field
+# extraction starts failing (e.g. after a Royal Road markup change)
+HEALTH_REQUIRED_FIELDS = ("title", "author", "followers", "views", "pages")
+HEALTH_WINDOW = 50  # Rolling window of fiction pages
+HEALTH_MIN_PAGES = 10  # Pages needed before the coverage check applies
+HEALTH_MIN_COVERAGE = 0.8  # Trip when a required field is found on fewer of the window's pages
+HEALTH_MAX_CONSECUTIVE = 5  # ...or when this many pages in a row miss a required field
+HEALTH_ALERT_FILE = "parser_health_alert.json"  # While present, crawls refuse to start
+HEALTH_SAMPLES_DIR = "health_samples"  # Failing pages kept for diagnosis
+HEALTH_MAX_SAMPLES = 20
+
+# Sampling mode (sampling.py): stratified random samples of fictions for
+# catalogue-wide estimates with confidence intervals
+SAMPLE_DIR = "samples"  # Saved samples (re-estimate offline without new requests)
+SAMPLE_STRATA = 10  # Equal-width strata over the ID range or listing pages
+SAMPLE_INITIAL_SIZE = 200  # Units drawn before the first estimate
+SAMPLE_MAX_REQUESTS = 1000  # Request cap when growing towards --target
+SAMPLE_CONFIDENCE = 0.95  # Confidence level of reported intervals
+SAMPLE_MIN_GROUP = 10  # Smallest group (sampled fictions) shown in --by breakdowns
+
+# Read snapshots (snapshot.py): consistent read-only copies of the database made
+# with SQLite's online backup API, for analysts and heavy readers
+SNAPSHOT_DIR = "snapshots"  # Snapshot files plus the LATEST pointer
+SNAPSHOT_INTERVAL = 900  # Seconds between snapshots in watch mode
+SNAPSHOT_KEEP = 3  # Snapshots kept (older ones are deleted; open readers keep working)
+SNAPSHOT_PAGES_PER_STEP = 1024  # Database pages copied per backup step
+SNAPSHOT_STEP_SLEEP = 0.005  # Pause between steps (seconds) so the crawl keeps its I/O
+SNAPSHOT_MAX_RESTARTS = 20  # Rollback-journal databases: restarts before pinning a read lock
+
+# Shard databases (shards.py): with --shard, each crawler process writes to its
+# own SQLite file instead of royalroad.db; `shards.py merge` folds them in
+SHARD_DIR = "shards"
+SHARD_ATTACH_BATCH = 8  # Shards attached at once while merging (SQLite allows 10)
+
+# Runtime settings (runtime_config.py): rate limits, timeouts, limits, worker
+# count and batch sizes above can be changed while a crawl runs, through this
+# file (JSON) or RR_<NAME> environment variables; running tools re-read it when
+# it changes or on SIGHUP
+RUNTIME_CONFIG_FILE = "runtime_config.json"
+RUNTIME_ACTIVE_DIR = "runtime"  # Each running tool's active values
+RUNTIME_CHECK_INTERVAL = 2.0  # Seconds between checks for a changed file
+
+# Chapter tracking (chapters.py): fiction refreshes keep each fiction's table of
+# contents in the chapters table; the table is only read when its chapter count
+# changed, and the release cadence stretches the refresh TTL of slow fictions
+CHAPTERS_ENABLED = True
+CHAPTER_RATE_SAMPLE = 10  # Recent release intervals averaged into the release rate
+CHAPTER_FULL_CHECK_DAYS = 30  # Re-read an unchanged table this often (edits, re-dates)
+CHAPTER_TTL_FACTOR = 0.5  # Refresh TTL >= this fraction of the release interval
+CHAPTER_DORMANT_FACTOR = 0.25  # ... and >= this fraction of the time since the last chapter
+CHAPTER_TTL_MAX_HOURS = 24 * 14  # Never wait longer than this between refreshes
+
+# Daemon (daemon.py): one long-running process runs the crawl jobs on a schedule
+# instead of cron-launched one-shot scripts. Per job: seconds between runs,
+# fiction fetches per run, and UTC time windows ("HH:MM-HH:MM", None = any time)
+DAEMON_JOBS = {
+    "incremental": {"interval": 900, "budget": 300, "windows": None},
+    "frontier": {"interval": 3600, "budget": 500, "windows": None},
+    "refresh": {"interval": 1800, "budget": 200, "windows": ["00:00-08:00"]},
+}
+DAEMON_PID_FILE = "daemon.pid"  # Locked while a daemon runs (one per working directory)
+DAEMON_STATUS_FILE = "daemon_status.json"
+DAEMON_IDLE_SLEEP = 60  # Longest sleep between scheduler checks (seconds)
+# Refresh job: a fiction that fails to refresh (other than a 404, which marks it
+# missing in ID_MISSING_FILE) waits this long before its next try, doubling per failure
+REFRESH_RETRY_HOURS = 6
+REFRESH_RETRY_MAX_HOURS = 24 * 7
+
+# Migrations (migrations.py): backfills update rows in keyset-ordered chunks, each
+# in its own short transaction, so a running crawl waits at most one chunk
+BACKFILL_CHUNK_SIZE = 500  # Rows in the first chunk
+BACKFILL_MAX_CHUNK_SIZE = 5000
+BACKFILL_TARGET_SECONDS = 0.1  # Chunk size adapts so a chunk holds the write lock about this long
+BACKFILL_DUTY_CYCLE = 0.5  # Fraction of time spent writing (the runner sleeps in between)
+
+# Event log (events.py): run_scrape.py / update_db.py emit their per-fiction
+# progress as events; a background thread writes them as JSON lines to
+# EVENT_LOG_DIR/<tool>.jsonl and renders them on the console
+EVENTS_ENABLED = os.environ.get("RR_EVENTS", "1") != "0"
+EVENT_LOG_DIR = "logs"
+EVENT_LOG_MAX_BYTES = 20 * 1024 * 1024  # Rotate (and gzip) the log past this size
+EVENT_LOG_BACKUPS = 10  # Rotated files kept
+# Fraction of info events kept in the JSON log per event type (1.0 = all; the
+# console shows every event); sampled events carry their sample_rate. Lower
+# fiction.scraped / fiction.updated on very large crawls
+EVENT_SAMPLE_RATES = {
+    "fiction.scraped": 1.0,
+    "fiction.updated": 1.0,
+}
+EVENT_CONSOLE_LEVEL = "INFO"  # "WARNING" shows only skipped/failed fictions on the console
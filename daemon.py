@@ -0,0 +1,575 @@
+"""
+Long-running crawl daemon.
+Runs the discovery and refresh jobs continuously from one process instead of
+cron-launched one-shot scripts, so the engine, session, frontier queue,
+watermark and parser health state stay warm between runs and two runs can
+never overlap (the daemon holds a lock on DAEMON_PID_FILE).
+
+Jobs (DAEMON_JOBS sets each one's interval, fetch budget and time windows):
+- incremental: fictions updated since the watermark (incremental.py)
+- frontier:    the multi-seed frontier (frontier.py)
+- refresh:     the fictions scraped longest ago whose refresh TTL has passed
+
+Each run stops at its fetch budget; the job's state (watermark, frontier
+queue) carries the rest over to its next run. SIGINT/SIGTERM finish the
+current batch, checkpoint and exit; SIGHUP reloads the runtime settings.
+While a parser health alert is active, every job is paused.
+
+Usage:
+    python daemon.py run
+    python daemon.py status
+    python daemon.py stop
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks: overlapping daemons are not detected
+    fcntl = None
+
+import requests
+
+from db import Fiction, RefreshFailure, init_db, get_session
+from scraper import fetch_fiction_head, print_latency_summary
+from profiling import profiler
+import health
+import rate_budget
+from parser import parse_fiction_full
+from normalizer import normalize_record
+from loader import upsert_fictions
+from chapters import ChapterTracker, fresh_ids as cadence_fresh_ids
+from id_bitmap import IdBitmap
+from utils import sleep_with_jitter, format_number
+from runtime_config import settings
+from config import (
+    BASE_URL,
+    DAEMON_JOBS,
+    DAEMON_PID_FILE,
+    DAEMON_STATUS_FILE,
+    DAEMON_IDLE_SLEEP,
+    FRONTIER_FRESHNESS_HOURS,
+    FRONTIER_STATE_FILE,
+    FRONTIER_SEEN_FILE,
+    INCREMENTAL_STATE_FILE,
+    HEALTH_ALERT_FILE,
+    CHAPTERS_ENABLED,
+    ID_MISSING_FILE,
+    REFRESH_RETRY_HOURS,
+    REFRESH_RETRY_MAX_HOURS,
+)
+
+# Set by SIGINT/SIGTERM; wakes the scheduler from its sleep
+stop_event = threading.Event()
+
+
+def signal_handler(signum, frame):
+    """Handle Ctrl+C / SIGTERM gracefully"""
+    print("\n\n⚠ Stop requested! Finishing current batch and checkpointing...")
+    stop_event.set()
+
+
+def parse_window(spec):
+    """
+    Parse a "HH:MM-HH:MM" UTC time window.
+
+    Returns:
+        tuple: (start, end) in minutes after midnight; end < start wraps past midnight
+    """
+    start, end = spec.split("-")
+    minutes = []
+    for part in (start, end):
+        hours, mins = part.strip().split(":")
+        minutes.append(int(hours) * 60 + int(mins))
+    return tuple(minutes)
+
+
+def in_windows(windows, when):
+    """True if `when` (a UTC datetime) falls inside any window (or windows is empty/None)"""
+    if not windows:
+        return True
+    now = when.hour * 60 + when.minute
+    for spec in windows:
+        start, end = parse_window(spec)
+        if (start <= now < end) if start <= end else (now >= start or now < end):
+            return True
+    return False
+
+
+def stale_ids(session, limit, now=None, chunk=500, missing=None):
+    """
+    The fictions scraped longest ago that are due for a refresh.
+
+    Fictions inside the freshness window, or inside their release-cadence TTL
+    (chapters.refresh_hours), are skipped, as are IDs known to 404 (`missing`)
+    and fictions whose last refresh failed until their retry_after.
+
+    Returns:
+        list: Up to `limit` fiction IDs, oldest scrape first
+    """
+    now = time.time() if now is None else now
+    cutoff = (datetime.utcfromtimestamp(now) - timedelta(hours=FRONTIER_FRESHNESS_HOURS)).isoformat()
+    result = []
+    after = ("", 0)
+    while len(result) < limit:
+        rows = (session.query(Fiction.fiction_id, Fiction.scraped_at)
+                .filter(Fiction.scraped_at < cutoff)
+                .filter((Fiction.scraped_at > after[0]) |
+                        ((Fiction.scraped_at == after[0]) & (Fiction.fiction_id > after[1])))
+                .order_by(Fiction.scraped_at, Fiction.fiction_id)
+                .limit(chunk).all())
+        if not rows:
+            break
+        ids = [fid for fid, _ in rows if missing is None or fid not in missing]
+        skip = cadence_fresh_ids(session, ids, now) if CHAPTERS_ENABLED and ids else set()
+        skip |= {fid for (fid,) in session.query(RefreshFailure.fiction_id)
+                 .filter(RefreshFailure.fiction_id.in_(ids))
+                 .filter(RefreshFailure.retry_after > now)}
+        result.extend(fid for fid in ids if fid not in skip)
+        after = (rows[-1][1], rows[-1][0])
+    return result[:limit]
+
+
+def record_failure(session, fiction_id, error, now=None):
+    """
+    Push a fiction whose refresh failed behind the healthy stale rows: it is
+    retried after REFRESH_RETRY_HOURS, doubling with each failure in a row.
+    """
+    now = time.time() if now is None else now
+    failure = session.get(RefreshFailure, fiction_id)
+    if failure is None:
+        failure = RefreshFailure(fiction_id=fiction_id, failures=0)
+        session.add(failure)
+    failure.failures += 1
+    hours = min(REFRESH_RETRY_HOURS * 2 ** (failure.failures - 1), REFRESH_RETRY_MAX_HOURS)
+    failure.retry_after = now + hours * 3600
+    failure.last_error = str(error)[:200]
+
+
+def refresh_stale(session, max_fetches, should_stop=None, fiction_delay=True, monitor=None,
+                  missing_file=ID_MISSING_FILE):
+    """
+    Re-fetch the stalest fictions (see stale_ids).
+
+    A 404 adds the ID to the missing-ID bitmap shared with id_crawler.py, so
+    it is not retried; any other failure is retried later (record_failure).
+
+    Args:
+        session: SQLAlchemy session
+        max_fetches (int): Fiction fetches this run
+        should_stop (callable): Optional callback returning True to abort
+        fiction_delay (bool): Sleep between fiction fetches
+        monitor (health.ParseHealth): Parser health monitor; the run stops when it trips
+        missing_file (str): Bitmap of IDs known to 404
+
+    Returns:
+        dict: Run statistics (fetched, errors, missing)
+    """
+    monitor = monitor or health.ParseHealth(tool="refresh")
+    tracker = ChapterTracker(session) if CHAPTERS_ENABLED else None
+    stats = {"fetched": 0, "errors": 0, "missing": 0}
+    batch = []
+    fetched_ids = []
+    new_missing = []
+
+    def flush():
+        nonlocal batch, fetched_ids, new_missing
+        if fetched_ids:
+            session.query(RefreshFailure).filter(RefreshFailure.fiction_id.in_(fetched_ids)).delete()
+        if batch:
+            upsert_fictions(session, batch)
+        session.commit()
+        if tracker:
+            tracker.flush()
+        if new_missing:
+            # Re-read first: id_crawler.py may have saved the bitmap meanwhile
+            known = IdBitmap.load(missing_file)
+            for fiction_id in new_missing:
+                known.add(fiction_id)
+            known.save(missing_file)
+        batch, fetched_ids, new_missing = [], [], []
+
+    for fiction_id in stale_ids(session, max_fetches, missing=IdBitmap.load(missing_file)):
+        if should_stop and should_stop():
+            break
+        url = f"{BASE_URL}/fiction/{fiction_id}"
+        print(f"  Refreshing fiction {fiction_id}...", end=" ")
+        try:
+            with profiler.page(url):
+                html = fetch_fiction_head(url, toc=tracker.toc_for(fiction_id) if tracker else None)
+                raw = parse_fiction_full(html)
+            missing = monitor.observe(url, raw, html)
+            if missing:
+                raise ValueError(f"{', '.join(missing)} not found on page")
+            raw["fiction_id"] = fiction_id
+            if tracker:
+                tracker.observe(fiction_id, html)
+            batch.append(normalize_record(raw))
+            fetched_ids.append(fiction_id)
+            stats["fetched"] += 1
+            print(f"✓ {raw['title'][:40]}")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                stats["missing"] += 1
+                new_missing.append(fiction_id)
+                print("✗ 404 - marked missing")
+            else:
+                stats["errors"] += 1
+                record_failure(session, fiction_id, e)
+                print(f"✗ ERROR: {e}")
+        except Exception as e:
+            stats["errors"] += 1
+            record_failure(session, fiction_id, e)
+            print(f"✗ ERROR: {e}")
+        if monitor.tripped:
+            break
+        if len(batch) >= settings.CRAWL_BATCH_SIZE:
+            flush()
+        if fiction_delay:
+            sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
+
+    flush()
+    return stats
+
+
+class Job:
+    """One scheduled job and its run history"""
+
+    def __init__(self, name, interval, budget, windows=None):
+        self.name = name
+        self.interval = interval
+        self.budget = budget
+        self.windows = windows
+        self.next_run = 0.0  # Unix time; 0 = due at startup
+        self.runs = 0
+        self.fetched = 0
+        self.errors = 0
+        self.last_run = None
+        self.last_seconds = None
+        self.last_error = None
+
+    def due(self, now):
+        """True if the job's interval has passed and `now` (Unix time) is inside its windows"""
+        return now >= self.next_run and in_windows(self.windows, datetime.utcfromtimestamp(now))
+
+    def status(self):
+        return {
+            "interval": self.interval,
+            "budget": self.budget,
+            "windows": self.windows,
+            "runs": self.runs,
+            "fetched": self.fetched,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "last_seconds": self.last_seconds,
+            "last_error": self.last_error,
+            "next_run": datetime.utcfromtimestamp(self.next_run).isoformat() if self.next_run else None,
+        }
+
+
+class Daemon:
+    """
+    Scheduler that runs the jobs in one process with warm state.
+
+    The due job whose next run is earliest goes first; between jobs the
+    scheduler sleeps until the next one is due (at most idle_sleep seconds,
+    so window and health changes are noticed).
+    """
+
+    def __init__(self, session, jobs=None, pid_file=DAEMON_PID_FILE, status_file=DAEMON_STATUS_FILE,
+                 idle_sleep=DAEMON_IDLE_SLEEP, delays=True, alert_file=HEALTH_ALERT_FILE,
+                 incremental_state=INCREMENTAL_STATE_FILE, frontier_state=FRONTIER_STATE_FILE,
+                 frontier_seen=FRONTIER_SEEN_FILE, missing_file=ID_MISSING_FILE, stop=None):
+        self.session = session
+        self.jobs = [Job(name, spec["interval"], spec["budget"], spec.get("windows"))
+                     for name, spec in (jobs or DAEMON_JOBS).items()]
+        unknown = [job.name for job in self.jobs if not hasattr(self, f"_run_{job.name}")]
+        if unknown:
+            raise ValueError(f"Unknown daemon jobs: {', '.join(unknown)}")
+        self.pid_file = pid_file
+        self.status_file = status_file
+        self.idle_sleep = idle_sleep
+        self.delays = delays
+        self.alert_file = alert_file
+        self.incremental_state = incremental_state
+        self.frontier_state = frontier_state
+        self.frontier_seen = frontier_seen
+        self.missing_file = missing_file
+        self.stop_event = stop or stop_event
+        self.started_at = datetime.utcnow().isoformat()
+        self.state = "starting"
+        self.current = None
+        self._lock_file = None
+        self._watermark = None
+        self._frontier = None
+        self._monitors = {}
+
+    # -------------------------------------------------------------------------
+    # Single instance
+    # -------------------------------------------------------------------------
+
+    def acquire(self):
+        """
+        Take the daemon lock.
+
+        Returns:
+            bool: False if another daemon already holds it
+        """
+        lock_file = open(self.pid_file, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._lock_file = lock_file
+        return True
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    # -------------------------------------------------------------------------
+    # Jobs
+    # -------------------------------------------------------------------------
+
+    def _monitor(self, name):
+        if name not in self._monitors:
+            self._monitors[name] = health.ParseHealth(tool=f"daemon-{name}", alert_file=self.alert_file)
+        return self._monitors[name]
+
+    def _should_stop(self):
+        return self.stop_event.is_set()
+
+    def _run_incremental(self, budget):
+        from incremental import Watermark, run_incremental
+
+        if self._watermark is None:
+            self._watermark = Watermark(self.incremental_state)
+        stats = run_incremental(self.session, self._watermark, should_stop=self._should_stop,
+                                fiction_delay=self.delays, monitor=self._monitor("incremental"),
+                                max_fetches=budget)
+        return {"fetched": stats["refreshed"], "errors": stats["errors"]}
+
+    def _run_frontier(self, budget):
+        from frontier import CrawlFrontier, run_frontier
+
+        if self._frontier is None or self._frontier.expired():
+            self._frontier = CrawlFrontier(self.session, state_file=self.frontier_state,
+                                           seen_file=self.frontier_seen, page_delay=self.delays)
+        stats = run_frontier(self.session, self._frontier, should_stop=self._should_stop,
+                             max_fetches=budget, fiction_delay=self.delays,
+                             monitor=self._monitor("frontier"))
+        return {"fetched": stats["fetched"], "errors": stats["errors"]}
+
+    def _run_refresh(self, budget):
+        return refresh_stale(self.session, budget, should_stop=self._should_stop,
+                             fiction_delay=self.delays, monitor=self._monitor("refresh"),
+                             missing_file=self.missing_file)
+
+    def run_job(self, job):
+        """Run one job up to its budget and schedule its next run"""
+        self.state, self.current = "running", job.name
+        self.write_status()
+        print(f"\n▶ {job.name} (budget {job.budget})")
+        start = time.monotonic()
+        try:
+            stats = getattr(self, f"_run_{job.name}")(job.budget)
+            job.fetched += stats["fetched"]
+            job.errors += stats["errors"]
+            job.last_error = None
+            print(f"✓ {job.name}: {stats['fetched']} fetched, {stats['errors']} errors")
+        except Exception as e:
+            self.session.rollback()
+            job.last_error = str(e)
+            print(f"✗ {job.name} failed: {e}")
+        job.runs += 1
+        job.last_run = datetime.utcnow().isoformat()
+        job.last_seconds = round(time.monotonic() - start, 1)
+        job.next_run = time.time() + job.interval
+        self.current = None
+        self.write_status()
+
+    def next_due(self, now=None):
+        """The due job whose scheduled time is earliest, or None"""
+        now = time.time() if now is None else now
+        due = [job for job in self.jobs if job.due(now)]
+        return min(due, key=lambda job: job.next_run) if due else None
+
+    def _paused(self):
+        alert = health.active_alert(self.alert_file)
+        if alert is None:
+            if any(m.tripped for m in self._monitors.values()):
+                self._monitors = {}  # alert cleared: start with fresh monitors
+            return False
+        if self.state != "paused":
+            print(f"⚠ Parser health alert active ({alert.get('reason')}); jobs paused until "
+                  f"`python health.py clear`")
+        return True
+
+    def run(self, max_runs=None):
+        """
+        Schedule jobs until a stop is requested (or max_runs jobs have run).
+
+        Returns:
+            int: Number of job runs
+        """
+        runs = 0
+        try:
+            while not self.stop_event.is_set() and (max_runs is None or runs < max_runs):
+                if self._paused():
+                    self.state = "paused"
+                    self.write_status()
+                    self.stop_event.wait(self.idle_sleep)
+                    continue
+                job = self.next_due()
+                if job is None:
+                    self.state = "idle"
+                    self.write_status()
+                    wait = min([max(job.next_run - time.time(), 0.1) for job in self.jobs] +
+                               [self.idle_sleep])
+                    self.stop_event.wait(wait)
+                    continue
+                self.run_job(job)
+                runs += 1
+        finally:
+            self.state = "stopped"
+            self.write_status()
+        return runs
+
+    # -------------------------------------------------------------------------
+    # Status
+    # -------------------------------------------------------------------------
+
+    def write_status(self):
+        status = {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "updated_at": datetime.utcnow().isoformat(),
+            "state": self.state,
+            "current_job": self.current,
+            "jobs": {job.name: job.status() for job in self.jobs},
+        }
+        tmp = f"{self.status_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp, self.status_file)
+
+
+def is_running(pid_file=DAEMON_PID_FILE):
+    """True while a daemon holds the lock on pid_file"""
+    if fcntl is None or not os.path.exists(pid_file):
+        return False
+    with open(pid_file) as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+    return False
+
+
+def read_status(status_file=DAEMON_STATUS_FILE):
+    """The last status the daemon wrote, or None"""
+    try:
+        with open(status_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def show_status():
+    status = read_status()
+    running = is_running()
+    print("=" * 60)
+    print("Crawl Daemon")
+    print("=" * 60)
+    if status is None:
+        print("Never run")
+        print("=" * 60)
+        return 1
+    state = status["state"] if running else "not running"
+    if not running and status["state"] != "stopped":
+        state += f" (last state {status['state']}, exited without cleanup)"
+    print(f"State:    {state}" + (f" - {status['current_job']}" if running and status["current_job"] else ""))
+    print(f"PID:      {status['pid']}   Started: {status['started_at']}")
+    print(f"Updated:  {status['updated_at']}")
+    print("-" * 60)
+    for name, job in status["jobs"].items():
+        windows = ", ".join(job["windows"]) if job["windows"] else "any time"
+        print(f"{name:<12} every {job['interval']}s, budget {job['budget']}, {windows}")
+        print(f"  runs {job['runs']}  fetched {format_number(job['fetched'])}  errors {job['errors']}  "
+              f"last {job['last_run'] or '-'}  next {job['next_run'] or 'now'}")
+        if job["last_error"]:
+            print(f"  ✗ last error: {job['last_error']}")
+    print("=" * 60)
+    return 0 if running else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-running crawl daemon")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("run", help="Run the scheduled jobs until stopped")
+    sub.add_parser("status", help="Daemon state and per-job counters")
+    sub.add_parser("stop", help="Ask the running daemon to checkpoint and exit")
+    args = parser.parse_args(argv)
+
+    if args.command == "stop":
+        status = read_status()
+        if status is None or not is_running():
+            print("No daemon running")
+            return 1
+        os.kill(status["pid"], signal.SIGTERM)
+        print(f"✓ Sent SIGTERM to daemon (pid {status['pid']})")
+        return 0
+    if args.command != "run":
+        return show_status()
+
+    init_db()
+    session = get_session()
+    daemon = Daemon(session)
+    if not daemon.acquire():
+        print(f"✗ Another daemon is already running (lock held on {DAEMON_PID_FILE})")
+        session.close()
+        return 1
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    settings.install("daemon")
+    rate_budget.set_tool("daemon")
+
+    print("=" * 80)
+    print("Royal Road Crawl Daemon - Starting")
+    print("=" * 80)
+    for job in daemon.jobs:
+        windows = ", ".join(job.windows) if job.windows else "any time"
+        print(f"{job.name:<12} every {job.interval}s, up to {job.budget} fetches, {windows} (UTC)")
+    print("=" * 80)
+
+    try:
+        runs = daemon.run()
+    finally:
+        session.close()
+        daemon.release()
+
+    print("\n" + "=" * 80)
+    print(f"Daemon stopped after {runs} job runs")
+    for job in daemon.jobs:
+        print(f"  {job.name:<12} {job.runs} runs, {format_number(job.fetched)} fetched, {job.errors} errors")
+    print_latency_summary()
+    print("=" * 80)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
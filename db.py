@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, Text
+    create_engine, event, Column, Integer, String, Float, Text, Index
 )
 from sqlalchemy.orm import declarative_base, sessionmaker
 from config import DB_PATH
@@ -34,19 +34,172 @@ class Fiction(Base):
 
     scraped_at   = Column(String, nullable=False)
 
+    __table_args__ = (
+        Index("ix_fictions_scraped_at", "scraped_at"),  # Stalest-first refresh, freshness checks
+    )
+
     def __repr__(self):
         return f"<Fiction(id={self.fiction_id}, title='{self.title}', author='{self.author}')>"
 
 
+class AggregateStat(Base):
+    """
+    Materialized per-scope totals, kept current by aggregates.py.
+    A scope is "all", "tag:<tag>", "status:<status>" or "type:<fiction_type>".
+    """
+    __tablename__ = "aggregate_stats"
+
+    scope         = Column(String, primary_key=True)
+    fiction_count = Column(Integer, nullable=False, default=0)
+    followers_sum = Column(Integer, nullable=False, default=0)
+    views_sum     = Column(Integer, nullable=False, default=0)
+    pages_sum     = Column(Integer, nullable=False, default=0)
+    rating_sum    = Column(Float, nullable=False, default=0.0)
+    rating_count  = Column(Integer, nullable=False, default=0)  # fictions with a rating
+
+    def __repr__(self):
+        return f"<AggregateStat(scope='{self.scope}', fictions={self.fiction_count})>"
+
+
+class LeaderboardEntry(Base):
+    """
+    One row per (scope, fiction), indexed by the ranking columns so top-N
+    per scope is an index range scan instead of a full table scan.
+    """
+    __tablename__ = "leaderboard_entries"
+
+    scope      = Column(String, primary_key=True)
+    fiction_id = Column(Integer, primary_key=True)
+    followers  = Column(Integer)
+    avg_rating = Column(Float)
+    views      = Column(Integer)
+
+    # fiction_id breaks ties, so keyset pagination (read_api.py) stays on the index
+    __table_args__ = (
+        Index("ix_leaderboard_followers", "scope", "followers", "fiction_id"),
+        Index("ix_leaderboard_rating", "scope", "avg_rating", "fiction_id"),
+        Index("ix_leaderboard_views", "scope", "views", "fiction_id"),
+    )
+
+
+class Chapter(Base):
+    """One entry of a fiction's table of contents, kept in sync by chapters.py"""
+    __tablename__ = "chapters"
+
+    chapter_id = Column(Integer, primary_key=True)
+    fiction_id = Column(Integer, nullable=False)
+    position   = Column(Integer, nullable=False)  # 1-based order in the table of contents
+    title      = Column(String, nullable=False)
+    published  = Column(Integer)                  # Unix time of release
+
+    __table_args__ = (
+        Index("ix_chapters_fiction", "fiction_id", "position"),
+    )
+
+    def __repr__(self):
+        return f"<Chapter(id={self.chapter_id}, fiction={self.fiction_id}, title='{self.title}')>"
+
+
+class ChapterStat(Base):
+    """
+    Per-fiction chapter summary and release cadence (chapters.py). The
+    frontier compares chapter_count with a page's chapter count to decide
+    whether the table of contents needs reading at all.
+    """
+    __tablename__ = "chapter_stats"
+
+    fiction_id      = Column(Integer, primary_key=True)
+    chapter_count   = Column(Integer, nullable=False)
+    first_published = Column(Integer)  # Unix time
+    last_published  = Column(Integer)  # Unix time
+    release_rate    = Column(Float)    # Chapters per week over recent releases
+    interval_hours  = Column(Float)    # Typical hours between recent releases
+    toc_checked_at  = Column(String, nullable=False)  # Last full table-of-contents read
+
+
+class RefreshFailure(Base):
+    """
+    A fiction whose last refresh failed (daemon.py). The refresh job skips it
+    until retry_after, so failing pages never crowd out the healthy stale rows.
+    """
+    __tablename__ = "refresh_failures"
+
+    fiction_id  = Column(Integer, primary_key=True)
+    failures    = Column(Integer, nullable=False, default=1)  # Failed refreshes in a row
+    retry_after = Column(Float, nullable=False)  # Unix time
+    last_error  = Column(String)
+
+
+class SchemaVersion(Base):
+    """One applied schema migration (migrations.py)"""
+    __tablename__ = "schema_version"
+
+    version    = Column(Integer, primary_key=True)
+    name       = Column(String, nullable=False)
+    applied_at = Column(String, nullable=False)
+
+
+class BackfillProgress(Base):
+    """Resume point of a chunked backfill (migrations.py)"""
+    __tablename__ = "backfill_progress"
+
+    name         = Column(String, primary_key=True)
+    last_key     = Column(Integer, nullable=False, default=0)  # Highest key already processed
+    rows_updated = Column(Integer, nullable=False, default=0)
+    started_at   = Column(String, nullable=False)
+    completed_at = Column(String)
+
+
 # Create engine and session factory
-engine = create_engine(DB_PATH, echo=False)
-SessionLocal = sessionmaker(bind=engine)
+# The engine is created on first use, so importing the models (or a CLI that
+# never touches the DB) doesn't pay for engine setup
+_engine = None
+_session_factory = None
+
+
+def _sqlite_pragmas(dbapi_conn, record):
+    """WAL lets readers (read_api.py, ad-hoc queries) run alongside the scraper's writes"""
+    if DB_PATH.startswith("sqlite"):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+def get_engine():
+    """Get the shared engine, creating it on first call"""
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_engine(DB_PATH, echo=False)
+        event.listen(_engine, "connect", _sqlite_pragmas)
+        _session_factory = sessionmaker(bind=_engine)
+    return _engine
+
+def __getattr__(name):
+    # `from db import engine` / `db.SessionLocal` still work, created lazily
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        get_engine()
+        return _session_factory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def init_db():
     """Initialize the database by creating all tables"""
-    Base.metadata.create_all(engine)
+    Base.metadata.create_all(get_engine())
     print(f"Database initialized at {DB_PATH}")
 
+    # Databases created before the aggregate tables existed get them filled once
+    import aggregates
+    session = get_session()
+    try:
+        if aggregates.needs_rebuild(session):
+            print("Building aggregate tables from existing fictions...")
+            count = aggregates.rebuild(session)
+            print(f"✓ Aggregates built for {count:,} fictions")
+    finally:
+        session.close()
+
 def get_session():
     """Get a new database session"""
-    return SessionLocal()
+    get_engine()
+    return _session_factory()
@@ -0,0 +1,344 @@
+"""
+Structured crawl event log.
+The per-fiction progress of run_scrape.py and update_db.py is emitted as
+events instead of printed. `emit` only samples and enqueues a log record; a
+background listener thread writes each event as one JSON line to
+EVENT_LOG_DIR/<tool>.jsonl and renders it for the console, so a slow
+terminal, SSH session or redirected stdout never stalls the crawl.
+
+- The JSON log rotates past EVENT_LOG_MAX_BYTES; rotated files are gzipped
+  (<tool>.jsonl.1.gz is the newest) and EVENT_LOG_BACKUPS are kept.
+- High-volume events can be sampled in the JSON log with EVENT_SAMPLE_RATES;
+  kept events carry their sample_rate so counts can be re-weighted. Warnings
+  and errors are never sampled, and the console still shows every event.
+- With events disabled (RR_EVENTS=0), or before `start`, the console lines
+  are written directly and no JSON log is kept.
+- Code that prints straight to stdout while events may be queued (health
+  alerts, profiling) calls `flush()` first, so console lines stay in order.
+
+Usage:
+    python events.py show logs/run_scrape.jsonl             # render a log for reading
+    python events.py show logs/update_db.jsonl.1.gz --event fiction.error
+    python events.py stats logs/run_scrape.jsonl            # events per type and level
+"""
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+from config import (
+    EVENTS_ENABLED,
+    EVENT_LOG_DIR,
+    EVENT_LOG_MAX_BYTES,
+    EVENT_LOG_BACKUPS,
+    EVENT_SAMPLE_RATES,
+    EVENT_CONSOLE_LEVEL,
+)
+
+_enabled = EVENTS_ENABLED
+
+_logger = logging.getLogger("rr.events")
+_logger.propagate = False
+_logger.setLevel(logging.DEBUG)
+_logger.addHandler(logging.NullHandler())
+
+_tool = None
+_started = False
+_attached = []  # Handlers on the logger
+_sinks = []  # Handlers that write the events
+_listener = None
+_sample_rates = dict(EVENT_SAMPLE_RATES)
+_CONSOLE_LEVEL = logging.getLevelName(EVENT_CONSOLE_LEVEL)
+
+# Console lines per event type; other events are rendered as "event key=value ..."
+CONSOLE_FORMATS = {
+    "page.start": "\n[Page {page}/{max_pages}] Fetching listing page... ({scraped:,}/{max_novels:,} novels, "
+                  "~{remaining} remaining)",
+    "page.links": "  Found {links} fiction links",
+    "page.empty": "  No links found on page {page}. Stopping.",
+    "page.inserted": "  ✓ Inserted {rows} records (Total: {total:,})",
+    "page.sleep": "  Sleeping {seconds}s ±{jitter}s...",
+    "page.error": "  ERROR on page {page}: {error}",
+    "crawl.limit": "  ✓ Reached maximum novel limit ({max_novels:,})",
+    "crawl.shutdown": "\n⚠ Shutdown requested. Saving checkpoint...",
+    "crawl.error": "\n✗ Critical Error: {error}",
+    "fiction.scraped": "  [{index}/{count}] Scraping fiction {fiction_id}... ✓ {title:.40}",
+    "fiction.skipped": "  [{index}/{count}] Scraping fiction {fiction_id}... ✗ Missing {missing} - skipped",
+    "fiction.error": "  [{index}/{count}] Scraping fiction {fiction_id}... ✗ ERROR: {error}",
+    "fiction.updated": "[{index}] Updating {title:.30} (ID: {fiction_id})... ✓ Done",
+    "fiction.update_skipped": "[{index}] Updating {title:.30} (ID: {fiction_id})... ✗ Missing {missing} - skipped",
+    "fiction.update_error": "[{index}] Updating {title:.30} (ID: {fiction_id})... ✗ Error: {error}",
+    "transport.fallback": "\n⚠ {host} does not speak HTTP/2; using HTTP/1.1 for {seconds:g}s",
+}
+
+
+def set_enabled(enabled):
+    """Turn the background JSON event log on/off for this process"""
+    global _enabled
+    _enabled = enabled
+
+
+def set_sample_rate(event, rate):
+    """Keep this fraction (0-1) of the info/debug events of one type in the JSON log"""
+    _sample_rates[event] = rate
+
+
+def _timestamp(created):
+    return datetime.fromtimestamp(created, timezone.utc).isoformat(timespec="milliseconds")
+
+
+def event_dict(record):
+    """The JSON-lines form of one event record"""
+    data = {"ts": _timestamp(record.created), "level": record.levelname.lower(),
+            "event": record.msg, "tool": _tool}
+    data.update(getattr(record, "fields", {}))
+    if getattr(record, "sample_rate", None) is not None:
+        data["sample_rate"] = record.sample_rate
+    return data
+
+
+def render(event, fields):
+    """
+    Human-readable console line for one event.
+
+    Args:
+        event (str): Event type, e.g. "fiction.scraped"
+        fields (dict): Event fields
+
+    Returns:
+        str: The line from CONSOLE_FORMATS, or "event key=value ..." for
+             event types without a format (or with fields missing)
+    """
+    fmt = CONSOLE_FORMATS.get(event)
+    if fmt is not None:
+        try:
+            return fmt.format(**fields)
+        except (KeyError, ValueError, TypeError):
+            pass
+    return " ".join([event] + [f"{k}={v}" for k, v in fields.items() if k != "sample_rate"])
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per event"""
+
+    def format(self, record):
+        return json.dumps(event_dict(record), ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The human-readable line for an event (see CONSOLE_FORMATS)"""
+
+    def format(self, record):
+        return render(record.msg, getattr(record, "fields", {}))
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler whose rotated files are gzipped (<name>.1.gz, <name>.2.gz, ...)"""
+
+    def __init__(self, filename, max_bytes=EVENT_LOG_MAX_BYTES, backups=EVENT_LOG_BACKUPS):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keeps a fraction of the info/debug events of each type (EVENT_SAMPLE_RATES)
+    and tags the kept ones with their sample_rate. Only the JSON log is
+    sampled: the console handler sees every event.
+    """
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = _sample_rates.get(record.msg, 1.0)
+        if rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue as they are: the stock prepare() formats the
+    message on the calling thread, which is the work this log moves off it.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def start(tool, log_dir=EVENT_LOG_DIR, console=True, max_bytes=EVENT_LOG_MAX_BYTES,
+          backups=EVENT_LOG_BACKUPS, console_level=EVENT_CONSOLE_LEVEL, stream=None):
+    """
+    Start logging events for this process.
+
+    Args:
+        tool (str): Name recorded with every event; also names the log file
+        log_dir (str): Directory for <tool>.jsonl
+        console (bool): Also render events on the console
+        max_bytes (int): Rotate the JSON log past this size
+        backups (int): Gzipped rotated files to keep
+        console_level (str): Lowest level shown on the console ("INFO", "WARNING", ...)
+        stream: Console stream (default: sys.stdout)
+
+    Returns:
+        str: Path of the JSON log, or None when events are disabled
+    """
+    global _tool, _listener, _started
+    stop()
+    _tool = tool
+    _started = True
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler(stream or sys.stdout)
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(ConsoleFormatter())
+        handlers.append(console_handler)
+
+    path = None
+    if _enabled:
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, f"{tool}.jsonl")
+        file_handler = CompressingRotatingFileHandler(path, max_bytes, backups)
+        file_handler.setFormatter(JsonLinesFormatter())
+        file_handler.addFilter(SampleFilter())
+        handlers.append(file_handler)
+        _listener = logging.handlers.QueueListener(queue.Queue(), *handlers, respect_handler_level=True)
+        _attached.append(_EnqueueHandler(_listener.queue))
+        _listener.start()
+    else:
+        # No background thread: console lines are written as they are emitted
+        _attached.extend(handlers)
+    _sinks.extend(handlers)
+    for handler in _attached:
+        _logger.addHandler(handler)
+    return path
+
+
+def emit(event, level=logging.INFO, **fields):
+    """
+    Record one event (returns immediately; writing happens on the listener thread).
+    Before `start`, the event's console line is printed instead.
+
+    Args:
+        event (str): Event type, e.g. "fiction.scraped"
+        level (int): logging level; WARNING and above are never sampled
+        **fields: JSON-serialisable event fields
+    """
+    if not _started:
+        if level >= _CONSOLE_LEVEL:
+            print(render(event, fields))
+        return
+    _logger.log(level, event, extra={"fields": fields})
+
+
+def flush():
+    """Wait until every event emitted so far has been written"""
+    if _listener is not None:
+        _listener.queue.join()
+
+
+def stop():
+    """Write out queued events and detach the handlers"""
+    global _listener, _started
+    _started = False
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in _attached:
+        _logger.removeHandler(handler)
+    for handler in _sinks:
+        handler.close()
+    _attached.clear()
+    _sinks.clear()
+
+
+atexit.register(stop)
+
+
+def read_events(path):
+    """
+    Iterate over the events in a JSON-lines log (plain or gzipped).
+
+    Args:
+        path (str): Log file
+
+    Yields:
+        dict: One event per line (lines that are not JSON are skipped)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut off by a crash
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Structured crawl event log")
+    sub = parser.add_subparsers(dest="command")
+    show = sub.add_parser("show", help="Render a JSON-lines log as console lines")
+    show.add_argument("path")
+    show.add_argument("--event", help="Only this event type")
+    show.add_argument("--level", help="Only this level (info, warning, error)")
+    stats = sub.add_parser("stats", help="Events per type and level")
+    stats.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+    if not os.path.exists(args.path):
+        print(f"✗ No event log at {args.path}")
+        return 1
+
+    if args.command == "show":
+        for data in read_events(args.path):
+            if args.event and data.get("event") != args.event:
+                continue
+            if args.level and data.get("level") != args.level:
+                continue
+            fields = {k: v for k, v in data.items() if k not in ("ts", "level", "event", "tool")}
+            print(f"{data.get('ts', '?')[11:23]}  {render(data.get('event', '?'), fields).strip()}")
+        return 0
+
+    counts, levels, first, last = Counter(), Counter(), None, None
+    for data in read_events(args.path):
+        # A sampled event stands for 1/sample_rate events
+        counts[data.get("event")] += 1 / data.get("sample_rate", 1)
+        levels[data.get("level")] += 1
+        first = first or data.get("ts")
+        last = data.get("ts")
+    print("=" * 60)
+    print(f"Event Log: {args.path}")
+    print("=" * 60)
+    print(f"From {first or '-'} to {last or '-'}")
+    print("Levels: " + ", ".join(f"{name} {n:,}" for name, n in levels.most_common()))
+    print("-" * 60)
+    for name, n in counts.most_common():
+        print(f"{name:<30}{round(n):>12,}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""
+Multi-seed crawl frontier.
+Merges several seed listings (trending, rising stars, new releases, best-rated,
+complete) into one priority queue so each fiction is fetched at most once per
+freshness window, however many listings mention it.
+
+Usage:
+    python frontier.py            (or: python run_scrape.py --frontier)
+    python frontier.py --shard    # write to a shard DB (merge with shards.py)
+    python frontier.py --show
+    python frontier.py --reset
+"""
+import argparse
+import heapq
+import json
+import os
+import signal
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from db import Fiction, init_db, get_session
+from scraper import fetch_listing_page, fetch_fiction_head, print_latency_summary
+from profiling import profiler
+import health
+from parser import parse_listing_links, parse_fiction_full
+from normalizer import normalize_record
+from loader import upsert_fictions
+import rate_budget
+from id_bitmap import IdBitmap
+from run_scrape import extract_fiction_id
+from chapters import ChapterTracker, fresh_ids as cadence_fresh_ids
+from utils import sleep_with_jitter, format_number
+from runtime_config import settings
+from config import (
+    FRONTIER_SEEDS,
+    FRONTIER_MAX_PAGES_PER_SEED,
+    FRONTIER_FRESHNESS_HOURS,
+    FRONTIER_QUEUE_LOW_WATER,
+    FRONTIER_STATE_FILE,
+    FRONTIER_SEEN_FILE,
+    FRONTIER_SEED_MAX_FAILURES,
+    FRONTIER_SEED_BACKOFF_SECONDS,
+    CHAPTERS_ENABLED,
+)
+
+LISTING_PAGE_SIZE = 20
+
+# Global flag for graceful shutdown
+shutdown_requested = False
+
+
+def signal_handler(signum, frame):
+    """Handle Ctrl+C gracefully"""
+    global shutdown_requested
+    print("\n\n⚠ Interrupt received! Finishing current batch and saving frontier...")
+    shutdown_requested = True
+
+
+class CrawlFrontier:
+    """
+    Priority queue of fictions to fetch, fed by several seed listings.
+
+    - A fiction ranked r on a seed with weight w is queued with score r / w;
+      if several seeds mention it, the best (lowest) score wins.
+    - Fictions fetched during the current freshness window are kept in a
+      persistent bitmap and never queued again until the window rolls over.
+    - Fictions whose scraped_at is within the window are suppressed too, so
+      work done by other tools (update_db, incremental) is not repeated.
+      With chapter tracking, a fiction's release cadence can stretch that
+      window (see chapters.refresh_hours).
+    """
+
+    def __init__(self, session, seeds=None, freshness_hours=FRONTIER_FRESHNESS_HOURS,
+                 max_pages_per_seed=FRONTIER_MAX_PAGES_PER_SEED,
+                 state_file=FRONTIER_STATE_FILE, seen_file=FRONTIER_SEEN_FILE,
+                 page_delay=True):
+        self.session = session
+        self.seeds = dict(seeds or FRONTIER_SEEDS)
+        self.freshness = timedelta(hours=freshness_hours)
+        self.max_pages_per_seed = max_pages_per_seed
+        self.state_file = state_file
+        self.seen_file = seen_file
+        self.page_delay = page_delay
+
+        self.seen = IdBitmap.load(seen_file)
+        self.heap = []
+        self.best = {}  # fiction_id -> best queued score
+        self.urls = {}
+        self.inflight = set()  # popped but not yet committed
+        self.cursors = {name: 1 for name in self.seeds}
+        self.exhausted = set()
+        self.failures = {}  # seed -> consecutive listing errors
+        self.backoff_until = {}  # seed -> monotonic time it is retried after
+        self.progressed = True  # Last expand() moved a seed on (see next)
+        self.window_start = datetime.utcnow()
+        self.stats = {"listing_pages": 0, "listing_errors": 0, "mentions": 0, "duplicates": 0,
+                      "fresh": 0, "queued": 0}
+        self._load_state()
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠ Warning: Could not load frontier state: {e}")
+            return
+
+        window_start = datetime.fromisoformat(state["window_start"])
+        if datetime.utcnow() - window_start >= self.freshness:
+            print("✓ Freshness window expired - starting a new frontier pass")
+            self.seen = IdBitmap()
+            return
+
+        self.window_start = window_start
+        self.cursors.update({k: v for k, v in state["cursors"].items() if k in self.seeds})
+        self.exhausted = set(state.get("exhausted", [])) & set(self.seeds)
+        for score, fiction_id, url in state.get("pending", []):
+            self._push(fiction_id, url, score)
+        print(f"✓ Resuming frontier: {len(self.best)} queued, "
+              f"{format_number(len(self.seen))} already fetched this window")
+
+    def save(self):
+        """Persist seed cursors, the pending queue and the seen bitmap"""
+        self.seen.save(self.seen_file)
+        pending = [[score, fid, self.urls[fid]] for score, fid in self.heap
+                   if self.best.get(fid) == score]
+        state = {
+            "window_start": self.window_start.isoformat(),
+            "cursors": self.cursors,
+            "exhausted": sorted(self.exhausted),
+            "pending": pending,
+        }
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    # -------------------------------------------------------------------------
+    # Queue
+    # -------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.best)
+
+    def _push(self, fiction_id, url, score):
+        current = self.best.get(fiction_id)
+        if current is not None and current <= score:
+            return False
+        self.best[fiction_id] = score
+        self.urls[fiction_id] = url
+        heapq.heappush(self.heap, (score, fiction_id))
+        return current is None
+
+    def pop(self):
+        """
+        Pop the highest-priority fiction.
+
+        Returns:
+            tuple: (fiction_id, url) or None if the queue is empty
+        """
+        while self.heap:
+            score, fiction_id = heapq.heappop(self.heap)
+            if self.best.get(fiction_id) != score:
+                continue  # stale entry superseded by a better score
+            del self.best[fiction_id]
+            self.inflight.add(fiction_id)
+            return fiction_id, self.urls.pop(fiction_id)
+        return None
+
+    def mark_fetched(self, fiction_id):
+        """Record a committed fetch so no seed queues it again this window"""
+        self.seen.add(fiction_id)
+        self.inflight.discard(fiction_id)
+
+    def release(self, fiction_id):
+        """Forget a failed fetch so a later mention can queue it again"""
+        self.inflight.discard(fiction_id)
+
+    def expired(self):
+        """True once the freshness window has rolled over (a new pass is due)"""
+        return datetime.utcnow() - self.window_start >= self.freshness
+
+    def _fresh_ids(self, fiction_ids):
+        """IDs whose scraped_at falls inside the freshness window (or their release-cadence TTL)"""
+        cutoff = (datetime.utcnow() - self.freshness).isoformat()
+        rows = (self.session.query(Fiction.fiction_id)
+                .filter(Fiction.fiction_id.in_(fiction_ids))
+                .filter(Fiction.scraped_at >= cutoff))
+        fresh = {fid for (fid,) in rows}
+        if CHAPTERS_ENABLED:
+            fresh |= cadence_fresh_ids(self.session, fiction_ids)
+        return fresh
+
+    def offer(self, seed, page, links):
+        """
+        Offer the links from one seed listing page to the queue.
+
+        Returns:
+            int: Number of fictions newly queued
+        """
+        weight = self.seeds[seed]
+        candidates = []
+        for rank, url in enumerate(links, (page - 1) * LISTING_PAGE_SIZE + 1):
+            fiction_id = extract_fiction_id(url)
+            self.stats["mentions"] += 1
+            if fiction_id in self.seen or fiction_id in self.inflight:
+                self.stats["duplicates"] += 1
+                continue
+            candidates.append((fiction_id, url, rank / weight))
+
+        fresh = self._fresh_ids([c[0] for c in candidates]) if candidates else set()
+        added = 0
+        for fiction_id, url, score in candidates:
+            if fiction_id in fresh:
+                self.stats["fresh"] += 1
+                self.seen.add(fiction_id)
+                continue
+            if self._push(fiction_id, url, score):
+                added += 1
+            else:
+                self.stats["duplicates"] += 1
+        self.stats["queued"] += added
+        return added
+
+    def expand(self):
+        """
+        Fetch the next page of every active seed, highest weight first.
+        Sets `progressed` to False when no seed moved on (every remaining seed
+        failed or is backing off).
+
+        Returns:
+            bool: False if every seed is exhausted
+        """
+        active = [s for s in sorted(self.seeds, key=lambda s: -self.seeds[s])
+                  if s not in self.exhausted]
+        self.progressed = False
+        for seed in active:
+            page = self.cursors[seed]
+            if page > self.max_pages_per_seed:
+                self.exhausted.add(seed)
+                self.progressed = True
+                continue
+            if self.backoff_until.get(seed, 0) > time.monotonic():
+                continue
+            try:
+                links = parse_listing_links(fetch_listing_page(page, listing=seed))
+            except requests.RequestException as e:
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code == 404:
+                    self.exhausted.add(seed)
+                    self.progressed = True
+                else:
+                    self._listing_failed(seed, page, e)
+                    if self.page_delay:
+                        sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_PAGES, settings.JITTER_PAGES)
+                continue
+            self.failures.pop(seed, None)
+            self.progressed = True
+            self.stats["listing_pages"] += 1
+            if not links:
+                self.exhausted.add(seed)
+                continue
+            added = self.offer(seed, page, links)
+            print(f"  [{seed} p{page}] {len(links)} links, {added} new")
+            self.cursors[seed] = page + 1
+            if self.page_delay:
+                sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_PAGES, settings.JITTER_PAGES)
+        return len(self.exhausted) < len(self.seeds)
+
+    def _listing_failed(self, seed, page, error):
+        """Count a failed listing page; back the seed off after too many in a row"""
+        self.stats["listing_errors"] += 1
+        self.failures[seed] = self.failures.get(seed, 0) + 1
+        print(f"  [{seed} p{page}] ERROR: {error}")
+        if self.failures[seed] >= FRONTIER_SEED_MAX_FAILURES:
+            self.failures[seed] = 0
+            self.backoff_until[seed] = time.monotonic() + FRONTIER_SEED_BACKOFF_SECONDS
+            print(f"  ⚠ {seed}: {FRONTIER_SEED_MAX_FAILURES} listing errors in a row - "
+                  f"retrying in {FRONTIER_SEED_BACKOFF_SECONDS}s")
+
+    def next(self):
+        """
+        Return the next fiction to fetch, expanding seeds when the queue runs low.
+
+        Returns:
+            tuple: (fiction_id, url), or None when the queue is empty and every
+                   seed is exhausted, failing or backing off
+        """
+        while len(self) < FRONTIER_QUEUE_LOW_WATER and self.expand():
+            if not self.progressed:
+                break  # Listings are failing: drain the queue, retry on a later call
+        return self.pop()
+
+
+def run_frontier(session, frontier, should_stop=None, max_fetches=None, fiction_delay=True,
+                 monitor=None, writer=None):
+    """
+    Fetch fictions from the frontier until it is exhausted.
+
+    Args:
+        session: SQLAlchemy session
+        frontier (CrawlFrontier): Frontier to drain
+        should_stop (callable): Optional callback returning True to abort
+        max_fetches (int): Optional cap on fiction fetches this run
+        fiction_delay (bool): Sleep between fiction fetches
+        monitor (health.ParseHealth): Parser health monitor; the run stops when it trips
+        writer (callable): Stores a batch of rows instead of upsert_fictions
+                           (e.g. a shards.ShardWriter's write)
+
+    Returns:
+        dict: Run statistics
+    """
+    monitor = monitor or health.ParseHealth(tool="frontier")
+    tracker = ChapterTracker(session) if CHAPTERS_ENABLED else None
+    stats = {"fetched": 0, "errors": 0}
+    batch = []
+    fetched_ids = []
+
+    def flush():
+        nonlocal batch, fetched_ids
+        if batch:
+            if writer:
+                writer(batch)
+            else:
+                upsert_fictions(session, batch)
+        if tracker:
+            tracker.flush()
+        for fiction_id in fetched_ids:
+            frontier.mark_fetched(fiction_id)
+        batch, fetched_ids = [], []
+        frontier.save()
+
+    while True:
+        if should_stop and should_stop():
+            break
+        if max_fetches is not None and stats["fetched"] + stats["errors"] >= max_fetches:
+            break
+        item = frontier.next()
+        if item is None:
+            break
+        fiction_id, url = item
+        print(f"  Scraping fiction {fiction_id}...", end=" ")
+        try:
+            with profiler.page(url):
+                html = fetch_fiction_head(url, toc=tracker.toc_for(fiction_id) if tracker else None)
+                raw = parse_fiction_full(html)
+            missing = monitor.observe(url, raw, html)
+            if missing:
+                raise ValueError(f"{', '.join(missing)} not found on page")
+            raw["fiction_id"] = fiction_id
+            if tracker:
+                tracker.observe(fiction_id, html)
+            batch.append(normalize_record(raw))
+            fetched_ids.append(fiction_id)
+            stats["fetched"] += 1
+            print(f"✓ {raw['title'][:40]}")
+        except Exception as e:
+            stats["errors"] += 1
+            frontier.release(fiction_id)
+            print(f"✗ ERROR: {e}")
+        if monitor.tripped:
+            break
+        if len(batch) >= settings.CRAWL_BATCH_SIZE:
+            flush()
+        if fiction_delay:
+            sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
+
+    flush()
+    stats.update(frontier.stats)
+    if tracker:
+        stats["chapters"] = tracker.stats
+    return stats
+
+
+def main(argv=None):
+    """Frontier crawl entry point"""
+    parser = argparse.ArgumentParser(description="Crawl from several seed listings with deduplication")
+    parser.add_argument("--frontier", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--show", action="store_true", help="Show frontier state and exit")
+    parser.add_argument("--reset", action="store_true", help="Start a new freshness window")
+    parser.add_argument("--shard", action="store_true",
+                        help="Write to this process's own shard DB (merge with shards.py)")
+    args = parser.parse_args(argv)
+
+    if args.reset:
+        for path in (FRONTIER_STATE_FILE, FRONTIER_SEEN_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+        print("✓ Frontier reset")
+        return
+
+    init_db()
+    session = get_session()
+    frontier = CrawlFrontier(session)
+
+    if args.show:
+        print("=" * 60)
+        print("Crawl Frontier")
+        print("=" * 60)
+        print(f"Window started:  {frontier.window_start.isoformat()}")
+        print(f"Fetched:         {format_number(len(frontier.seen))} fictions this window")
+        print(f"Queued:          {format_number(len(frontier))}")
+        for seed, weight in frontier.seeds.items():
+            state = "exhausted" if seed in frontier.exhausted else f"next page {frontier.cursors[seed]}"
+            print(f"  {seed:<14} weight {weight:<4} {state}")
+        print("=" * 60)
+        session.close()
+        return
+
+    if not health.require_healthy():
+        session.close()
+        return 1
+
+    signal.signal(signal.SIGINT, signal_handler)
+    settings.install("frontier")
+    rate_budget.set_tool("frontier")
+
+    print("=" * 80)
+    print("Royal Road Frontier Crawl - Starting")
+    print("=" * 80)
+    print(f"Seeds: {', '.join(f'{s} (x{w})' for s, w in frontier.seeds.items())}")
+    print(f"Freshness window: {FRONTIER_FRESHNESS_HOURS}h")
+    shard = None
+    if args.shard:
+        from shards import ShardWriter
+        shard = ShardWriter(tool="frontier")
+        print(f"Writing to shard: {shard.path}")
+    print("=" * 80)
+
+    try:
+        stats = run_frontier(session, frontier, should_stop=lambda: shutdown_requested,
+                             writer=shard.write if shard else None)
+    finally:
+        session.close()
+        if shard:
+            shard.close()
+
+    print("\n" + "=" * 80)
+    print(f"Frontier crawl {'paused' if shutdown_requested else 'complete'}!")
+    print(f"Listing pages: {stats['listing_pages']} ({stats['listing_errors']} errors)  "
+          f"Mentions: {format_number(stats['mentions'])}  "
+          f"Duplicates: {format_number(stats['duplicates'])}  Fresh: {format_number(stats['fresh'])}")
+    print(f"Fetched: {format_number(stats['fetched'])}  Errors: {stats['errors']}")
+    print_latency_summary()
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
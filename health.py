@@ -0,0 +1,242 @@
+"""
+Parser health monitor.
+Tracks how often each field is extracted over the last HEALTH_WINDOW fiction
+pages. When a required field's coverage drops below HEALTH_MIN_COVERAGE, or
+HEALTH_MAX_CONSECUTIVE pages in a row miss one, the monitor trips: the crawl
+checkpoints and stops, an alert file is written, and later crawls refuse to
+start until it is cleared. A markup change then costs a handful of requests
+instead of a night's budget of empty rows.
+
+Pages missing a required field are never upserted, and the most recent ones
+are saved under HEALTH_SAMPLES_DIR for diagnosis.
+
+Usage:
+    python health.py status          # active alert, saved samples
+    python health.py check <file>    # run the field checks on a saved page
+    python health.py clear           # after fixing the parser
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import events
+from config import (
+    HEALTH_REQUIRED_FIELDS,
+    HEALTH_WINDOW,
+    HEALTH_MIN_PAGES,
+    HEALTH_MIN_COVERAGE,
+    HEALTH_MAX_CONSECUTIVE,
+    HEALTH_ALERT_FILE,
+    HEALTH_SAMPLES_DIR,
+    HEALTH_MAX_SAMPLES,
+)
+
+
+def extracted(value):
+    """True if a parsed value counts as found (not None, empty string or empty list)"""
+    return value not in (None, "", [], {})
+
+
+class ParseHealth:
+    """Rolling per-field extraction coverage with a trip wire (thread-safe)"""
+
+    def __init__(self, required=HEALTH_REQUIRED_FIELDS, window=HEALTH_WINDOW,
+                 min_pages=HEALTH_MIN_PAGES, min_coverage=HEALTH_MIN_COVERAGE,
+                 max_consecutive=HEALTH_MAX_CONSECUTIVE, alert_file=HEALTH_ALERT_FILE,
+                 samples_dir=HEALTH_SAMPLES_DIR, max_samples=HEALTH_MAX_SAMPLES, tool=None):
+        self.required = tuple(required)
+        self.window = window
+        self.min_pages = min_pages
+        self.min_coverage = min_coverage
+        self.max_consecutive = max_consecutive
+        self.alert_file = alert_file
+        self.samples_dir = samples_dir
+        self.max_samples = max_samples
+        self.tool = tool
+        self.pages = deque()
+        self.found = {}
+        self.consecutive = 0
+        self.observed = 0
+        self.tripped = None
+        self._lock = threading.Lock()
+
+    def observe(self, url, raw, html=None):
+        """
+        Record which fields one parsed page yielded.
+
+        Args:
+            url (str): Page URL
+            raw (dict): Parser output
+            html (str): Page HTML, saved as a sample if a required field is missing
+
+        Returns:
+            list: Required fields missing from this page (empty if the page is usable)
+        """
+        present = frozenset(k for k, v in raw.items() if extracted(v))
+        missing = [f for f in self.required if f not in present]
+        with self._lock:
+            self.observed += 1
+            self.pages.append(present)
+            for field in present:
+                self.found[field] = self.found.get(field, 0) + 1
+            if len(self.pages) > self.window:
+                for field in self.pages.popleft():
+                    self.found[field] -= 1
+            self.consecutive = self.consecutive + 1 if missing else 0
+            if self.tripped is None:
+                self._check(url)
+        if missing and html is not None:
+            self._save_sample(url, html, missing)
+        return missing
+
+    def coverage(self):
+        """Share of the window's pages on which each seen field was found"""
+        with self._lock:
+            n = len(self.pages) or 1
+            return {field: count / n for field, count in sorted(self.found.items())}
+
+    def _check(self, url):
+        n = len(self.pages)
+        low = {f: self.found.get(f, 0) / n for f in self.required
+               if self.found.get(f, 0) / n < self.min_coverage}
+        if self.consecutive >= self.max_consecutive:
+            reason = f"{self.consecutive} pages in a row missing required fields"
+        elif n >= self.min_pages and low:
+            reason = f"coverage below {self.min_coverage:.0%} over the last {n} pages"
+        else:
+            return
+        self.tripped = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "tool": self.tool,
+            "reason": reason,
+            "last_url": url,
+            "pages_observed": self.observed,
+            "coverage": {f: round(self.found.get(f, 0) / n, 3) for f in self.required},
+            "samples_dir": self.samples_dir,
+        }
+        self._write_alert()
+
+    def _write_alert(self):
+        tmp = f"{self.alert_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.tripped, f, indent=2)
+        os.replace(tmp, self.alert_file)
+        events.flush()  # After the fiction lines that led to the alert
+        print("\n" + "!" * 80)
+        print(f"✗ PARSER HEALTH ALERT: {self.tripped['reason']}")
+        for field, share in self.tripped["coverage"].items():
+            flag = "✗" if share < self.min_coverage else "✓"
+            print(f"  {flag} {field:<12}{share:>7.0%}")
+        print(f"  Failing pages saved to {self.samples_dir}/ - crawl paused.")
+        print(f"  After fixing the parser run: python health.py clear")
+        print("!" * 80)
+
+    def _save_sample(self, url, html, missing):
+        try:
+            os.makedirs(self.samples_dir, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "-", url.split("//", 1)[-1])[-60:].strip("-")
+            base = os.path.join(self.samples_dir, f"{time.time_ns()}-{slug}")
+            with open(base + ".html", "w", encoding="utf-8") as f:
+                f.write(html)
+            with open(base + ".json", "w") as f:
+                json.dump({"url": url, "missing": missing, "time": time.time()}, f)
+            self._prune_samples()
+        except OSError as e:
+            events.flush()
+            print(f"  ⚠ Could not save health sample: {e}")
+
+    def _prune_samples(self):
+        pages = sorted(p for p in os.listdir(self.samples_dir) if p.endswith(".html"))
+        for name in pages[:max(len(pages) - self.max_samples, 0)]:
+            for path in (name, name[:-5] + ".json"):
+                try:
+                    os.remove(os.path.join(self.samples_dir, path))
+                except FileNotFoundError:
+                    pass
+
+
+def active_alert(alert_file=HEALTH_ALERT_FILE):
+    """The stored alert, or None if the parser is considered healthy"""
+    if not os.path.exists(alert_file):
+        return None
+    try:
+        with open(alert_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"reason": "unreadable alert file"}
+
+
+def require_healthy(alert_file=HEALTH_ALERT_FILE):
+    """
+    Refuse to start while a parser health alert is active.
+
+    Returns:
+        bool: True if the crawl may start
+    """
+    alert = active_alert(alert_file)
+    if alert is None:
+        return True
+    print(f"✗ Parser health alert from {alert.get('time', '?')}: {alert.get('reason')}")
+    print(f"  Check the samples in {alert.get('samples_dir', HEALTH_SAMPLES_DIR)}/, fix the parser, "
+          f"then run: python health.py clear")
+    return False
+
+
+def clear_alert(alert_file=HEALTH_ALERT_FILE):
+    """Remove the alert so crawls can start again"""
+    if os.path.exists(alert_file):
+        os.remove(alert_file)
+        return True
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parser health alerts and samples")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("status", help="Show the active alert and saved samples")
+    ck = sub.add_parser("check", help="Run the field checks on saved HTML pages")
+    ck.add_argument("files", nargs="+")
+    sub.add_parser("clear", help="Clear the alert after fixing the parser")
+    args = parser.parse_args(argv)
+
+    if args.command == "clear":
+        print("✓ Alert cleared" if clear_alert() else "No active alert")
+    elif args.command == "check":
+        from parser import parse_fiction_full
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                raw = parse_fiction_full(f.read())
+            missing = [f for f in HEALTH_REQUIRED_FIELDS if not extracted(raw.get(f))]
+            found = sorted(k for k, v in raw.items() if extracted(v))
+            print(f"{'✗' if missing else '✓'} {path}")
+            if missing:
+                print(f"    missing: {', '.join(missing)}")
+            print(f"    found:   {', '.join(found)}")
+    else:
+        alert = active_alert()
+        print("=" * 60)
+        print("Parser Health")
+        print("=" * 60)
+        if alert:
+            print(f"⚠ Alert ({alert.get('time')}, {alert.get('tool') or '-'}): {alert.get('reason')}")
+            for field, share in (alert.get("coverage") or {}).items():
+                print(f"  {field:<12}{share:>7.0%}")
+            print(f"  Last URL: {alert.get('last_url')}")
+        else:
+            print("✓ No active alert")
+        if os.path.isdir(HEALTH_SAMPLES_DIR):
+            samples = sorted(p for p in os.listdir(HEALTH_SAMPLES_DIR) if p.endswith(".json"))
+            print(f"\nSaved samples: {len(samples)} in {HEALTH_SAMPLES_DIR}/")
+            for name in samples[-10:]:
+                with open(os.path.join(HEALTH_SAMPLES_DIR, name)) as f:
+                    info = json.load(f)
+                print(f"  {info['url']}  missing {', '.join(info['missing'])}")
+        print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compact bitmap set for fiction IDs.
+One bit per ID, so the whole Royal Road ID space (~120k IDs) fits in ~15 KB.
+"""
+import os
+
+
+class IdBitmap:
+    """Growable bitmap of non-negative integer IDs with atomic file persistence"""
+
+    MAGIC = b"RRID1\n"
+
+    def __init__(self, data=None):
+        self.bits = bytearray(data or b"")
+
+    def _ensure(self, fiction_id):
+        needed = (fiction_id >> 3) + 1
+        if needed > len(self.bits):
+            # Grow geometrically to avoid reallocating on every new high ID
+            self.bits.extend(b"\x00" * max(needed - len(self.bits), len(self.bits) // 2))
+
+    def add(self, fiction_id):
+        """Set the bit for an ID"""
+        self._ensure(fiction_id)
+        self.bits[fiction_id >> 3] |= 1 << (fiction_id & 7)
+
+    def discard(self, fiction_id):
+        """Clear the bit for an ID (no-op if not set)"""
+        index = fiction_id >> 3
+        if index < len(self.bits):
+            self.bits[index] &= ~(1 << (fiction_id & 7)) & 0xFF
+
+    def __contains__(self, fiction_id):
+        index = fiction_id >> 3
+        return index < len(self.bits) and bool(self.bits[index] & (1 << (fiction_id & 7)))
+
+    def __len__(self):
+        # bin().count rather than int.bit_count(), which needs Python 3.10
+        return bin(int.from_bytes(self.bits, "little")).count("1")
+
+    def __iter__(self):
+        for index, byte in enumerate(self.bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield (index << 3) | bit
+
+    def count_range(self, start, end):
+        """Count set IDs in [start, end)"""
+        return sum(1 for fiction_id in range(start, end) if fiction_id in self)
+
+    def max_id(self):
+        """Highest ID in the set, or None if empty"""
+        for index in range(len(self.bits) - 1, -1, -1):
+            byte = self.bits[index]
+            if byte:
+                return (index << 3) | (byte.bit_length() - 1)
+        return None
+
+    def save(self, filepath):
+        """Write the bitmap to disk atomically (temp file + rename)"""
+        tmp = f"{filepath}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(self.bits.rstrip(b"\x00"))
+        os.replace(tmp, filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        """Load a bitmap from disk, or return an empty one if the file is missing"""
+        if not os.path.exists(filepath):
+            return cls()
+        with open(filepath, "rb") as f:
+            data = f.read()
+        if not data.startswith(cls.MAGIC):
+            raise ValueError(f"{filepath} is not an ID bitmap file")
+        return cls(data[len(cls.MAGIC):])
+
+    def __repr__(self):
+        return f"IdBitmap(count={len(self)}, max_id={self.max_id()})"
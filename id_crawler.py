@@ -0,0 +1,440 @@
+"""
+ID-space crawler for Royal Road.
+Walks fiction ID ranges directly instead of discovering fictions through
+listing pages. Learns dead zones from 404s, keeps compact bitmaps of known
+existing/missing IDs and resumes mid-range from per-chunk cursors.
+
+Usage:
+    python id_crawler.py [--start 1] [--end 80000] [--workers 4]
+    python id_crawler.py --shard      # write to a shard DB (merge with shards.py)
+    python id_crawler.py --status
+    python id_crawler.py --reset
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import threading
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+from scraper import fetch_fiction_head
+from parser import parse_fiction_page
+from normalizer import normalize_record
+from loader import upsert_fictions
+from id_bitmap import IdBitmap
+import health
+from utils import LiveRateLimiter, format_number
+from runtime_config import settings
+from config import (
+    BASE_URL,
+    ID_CRAWL_CHUNK,
+    ID_DEAD_ZONE_MISSES,
+    ID_MAX_SKIP,
+    ID_CRAWL_STATE_FILE,
+    ID_EXISTS_FILE,
+    ID_MISSING_FILE,
+)
+
+HIT, MISS, ERROR = "hit", "miss", "error"
+MAX_SAVED_ERRORS = 10000
+
+
+class IdRangeCrawler:
+    """
+    Concurrent crawler over a fiction ID range.
+
+    The range is split into chunks that workers pull from a queue. Within a
+    chunk, a worker walks IDs sequentially; after ID_DEAD_ZONE_MISSES
+    consecutive 404s it doubles its stride (up to ID_MAX_SKIP) to probe past
+    the dead zone, and when a probe hits again it walks backwards to pick up
+    fictions it skipped near the edge of the live region.
+    """
+
+    def __init__(self, session, start=1, end=None, workers=None,
+                 chunk_size=ID_CRAWL_CHUNK, rate_limiter=None, batch_size=20,
+                 skip_known_missing=True, only_unknown=False,
+                 state_file=ID_CRAWL_STATE_FILE, exists_file=ID_EXISTS_FILE,
+                 missing_file=ID_MISSING_FILE, monitor=None, writer=None):
+        self.session = session
+        # Where batches go: the main DB, or e.g. a shards.ShardWriter's write()
+        self.writer = writer or (lambda rows: upsert_fictions(session, rows))
+        self.monitor = monitor or health.ParseHealth(tool="id_crawler")
+        # None follows the live ID_CRAWL_WORKERS setting (runtime_config.py)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.skip_known_missing = skip_known_missing
+        self.only_unknown = only_unknown
+        self.rate_limiter = rate_limiter or LiveRateLimiter()
+        self.state_file = state_file
+        self.exists_file = exists_file
+        self.missing_file = missing_file
+
+        self.exists = IdBitmap.load(exists_file)
+        self.missing = IdBitmap.load(missing_file)
+        self.lock = threading.Lock()
+        self.batch = []
+        self.stats = Counter()
+        self.stop_event = threading.Event()
+        self.max_requests = None
+        self.active_workers = 0
+
+        state = self._load_state()
+        if state:
+            self.start = state["start"]
+            self.chunk_size = state["chunk_size"]
+            self.end = max(state["end"], end or 0)
+            self.cursors = {int(k): v for k, v in state["cursors"].items()}
+            self.errors = set(state.get("errors", []))
+            print(f"✓ Resuming ID crawl over {self.start:,}-{self.end:,}")
+        else:
+            self.start = start
+            self.chunk_size = chunk_size
+            self.end = end
+            self.cursors = {}
+            self.errors = set()
+
+        # Add chunks for any newly extended range
+        for chunk_start in range(self.start, self.end + 1, self.chunk_size):
+            self.cursors.setdefault(chunk_start, chunk_start)
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def _load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠ Warning: Could not load ID crawl state: {e}")
+        return None
+
+    def _save_locked(self):
+        """Persist bitmaps and cursors. Caller must hold self.lock."""
+        self.exists.save(self.exists_file)
+        self.missing.save(self.missing_file)
+        state = {
+            "start": self.start,
+            "end": self.end,
+            "chunk_size": self.chunk_size,
+            "cursors": {str(k): v for k, v in sorted(self.cursors.items())},
+            "errors": sorted(self.errors)[:MAX_SAVED_ERRORS],
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    def _flush_locked(self):
+        """Upsert the pending batch, then persist state. Caller must hold self.lock."""
+        if self.batch:
+            self.writer(self.batch)
+            self.stats["inserted"] += len(self.batch)
+            self.batch = []
+        self._save_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    # -------------------------------------------------------------------------
+    # Crawling
+    # -------------------------------------------------------------------------
+
+    def chunk_end(self, chunk_start):
+        return min(chunk_start + self.chunk_size, self.end + 1)
+
+    def pending_chunks(self):
+        """Chunk starts whose cursor has not reached the end of the chunk"""
+        return [s for s, cursor in sorted(self.cursors.items()) if cursor < self.chunk_end(s)]
+
+    def _stopping(self):
+        if self.stop_event.is_set():
+            return True
+        if self.max_requests is not None and self.stats["requests"] >= self.max_requests:
+            return True
+        return False
+
+    def _should_skip(self, fiction_id):
+        if self.skip_known_missing and fiction_id in self.missing:
+            return True
+        return self.only_unknown and fiction_id in self.exists
+
+    def probe(self, fiction_id):
+        """
+        Fetch one fiction ID and record the outcome.
+
+        Returns:
+            str: HIT, MISS or ERROR
+        """
+        self.rate_limiter.wait()
+        with self.lock:
+            self.stats["requests"] += 1
+
+        url = f"{BASE_URL}/fiction/{fiction_id}"
+        try:
+            html = fetch_fiction_head(url)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                with self.lock:
+                    self.missing.add(fiction_id)
+                    self.exists.discard(fiction_id)
+                    self.errors.discard(fiction_id)
+                    self.stats["missing"] += 1
+                return MISS
+            return self._record_error(fiction_id)
+        except requests.RequestException:
+            return self._record_error(fiction_id)
+
+        raw = parse_fiction_page(html)
+        if self.monitor.observe(url, raw, html):
+            if self.monitor.tripped:
+                self.stop()
+            return self._record_error(fiction_id)
+        raw["fiction_id"] = fiction_id
+        row = normalize_record(raw)
+
+        with self.lock:
+            self.exists.add(fiction_id)
+            self.missing.discard(fiction_id)
+            self.errors.discard(fiction_id)
+            self.stats["found"] += 1
+            self.batch.append(row)
+            if len(self.batch) >= self.batch_size:
+                self._flush_locked()
+        return HIT
+
+    def _record_error(self, fiction_id):
+        with self.lock:
+            self.errors.add(fiction_id)
+            self.stats["errors"] += 1
+        return ERROR
+
+    def _backfill(self, hit_id, last_probe):
+        """Walk backwards from a hit over IDs skipped while probing a dead zone"""
+        misses = 0
+        for fiction_id in range(hit_id - 1, last_probe, -1):
+            if self._stopping() or misses >= ID_DEAD_ZONE_MISSES:
+                break
+            if self._should_skip(fiction_id) or fiction_id in self.exists:
+                continue
+            outcome = self.probe(fiction_id)
+            misses = misses + 1 if outcome == MISS else 0
+
+    def walk_chunk(self, chunk_start):
+        """Walk one chunk from its saved cursor to its end"""
+        chunk_end = self.chunk_end(chunk_start)
+        cursor = self.cursors[chunk_start]
+        misses = 0
+        stride = 1
+        last_probe = cursor - 1
+
+        while cursor < chunk_end and not self._stopping():
+            fiction_id = cursor
+            if self._should_skip(fiction_id):
+                if fiction_id in self.missing:
+                    misses += 1
+                outcome = None
+            else:
+                outcome = self.probe(fiction_id)
+
+            if outcome == HIT:
+                if stride > 1:
+                    with self.lock:
+                        self.stats["dead_zone_exits"] += 1
+                    self._backfill(fiction_id, last_probe)
+                misses = 0
+                stride = 1
+            elif outcome == MISS:
+                misses += 1
+                if misses >= ID_DEAD_ZONE_MISSES:
+                    if stride == 1:
+                        with self.lock:
+                            self.stats["dead_zones"] += 1
+                    stride = min(stride * 2, ID_MAX_SKIP)
+
+            if outcome is not None:
+                last_probe = fiction_id
+            skipped = min(stride, chunk_end - fiction_id) - 1 if stride > 1 else 0
+            cursor = min(fiction_id + stride, chunk_end)
+            with self.lock:
+                self.stats["skipped"] += skipped
+                self.cursors[chunk_start] = cursor
+
+    def target_workers(self):
+        """Worker count to run with now"""
+        return self.workers if self.workers is not None else settings.ID_CRAWL_WORKERS
+
+    def _worker(self, work):
+        retired = False
+        try:
+            while not self._stopping():
+                # Lowered worker count: the surplus exits between chunks
+                with self.lock:
+                    if self.active_workers > self.target_workers():
+                        self.active_workers -= 1
+                        retired = True
+                        return
+                try:
+                    chunk_start = work.get_nowait()
+                except queue.Empty:
+                    return
+                self.walk_chunk(chunk_start)
+        finally:
+            if not retired:
+                with self.lock:
+                    self.active_workers -= 1
+
+    def run(self, max_requests=None):
+        """
+        Crawl all pending chunks (and retry earlier errors) concurrently.
+
+        Args:
+            max_requests (int): Optional request budget for this run
+
+        Returns:
+            Counter: Run statistics
+        """
+        self.max_requests = max_requests
+
+        for fiction_id in sorted(self.errors):
+            if self._stopping():
+                break
+            self.probe(fiction_id)
+
+        work = queue.Queue()
+        for chunk_start in self.pending_chunks():
+            work.put(chunk_start)
+
+        threads = []
+        try:
+            while True:
+                # (Re)fill the pool up to the current worker count
+                with self.lock:
+                    spawn = 0
+                    if not work.empty() and not self._stopping():
+                        spawn = max(self.target_workers() - self.active_workers, 0)
+                    self.active_workers += spawn
+                for _ in range(spawn):
+                    t = threading.Thread(target=self._worker, args=(work,), daemon=True)
+                    t.start()
+                    threads.append(t)
+                threads = [t for t in threads if t.is_alive()]
+                if not threads:
+                    break
+                threads[0].join(timeout=0.5)
+        finally:
+            self.flush()
+        return self.stats
+
+    def stop(self):
+        self.stop_event.set()
+
+    def print_status(self):
+        pending = self.pending_chunks()
+        done_ids = sum(self.cursors[s] - s for s in self.cursors)
+        total_ids = self.end - self.start + 1
+        print("=" * 60)
+        print("ID Crawl Status")
+        print("=" * 60)
+        print(f"Range:           {self.start:,} - {self.end:,}")
+        print(f"Progress:        {done_ids / total_ids:.1%} ({len(pending)} chunks pending)")
+        print(f"Known existing:  {format_number(len(self.exists))}")
+        print(f"Known missing:   {format_number(len(self.missing))}")
+        print(f"Errored IDs:     {format_number(len(self.errors))}")
+        print("=" * 60)
+
+
+def default_end(session, exists):
+    """Choose an end ID a few chunks past the highest ID we know of"""
+    from sqlalchemy import func
+    from db import Fiction
+
+    known = max(session.query(func.max(Fiction.fiction_id)).scalar() or 0, exists.max_id() or 0)
+    if not known:
+        return 100000
+    return known + 5 * ID_CRAWL_CHUNK
+
+
+def main(argv=None):
+    from db import init_db, get_session
+
+    parser = argparse.ArgumentParser(description="Crawl Royal Road by fiction ID range")
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--end", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Fixed worker count (default: the live ID_CRAWL_WORKERS setting)")
+    parser.add_argument("--only-unknown", action="store_true",
+                        help="Skip IDs already known to exist (discovery only)")
+    parser.add_argument("--recheck-missing", action="store_true",
+                        help="Re-probe IDs previously seen as 404")
+    parser.add_argument("--shard", action="store_true",
+                        help="Write to this process's own shard DB (merge with shards.py)")
+    parser.add_argument("--status", action="store_true", help="Show progress and exit")
+    parser.add_argument("--reset", action="store_true", help="Clear cursors (bitmaps are kept)")
+    args = parser.parse_args(argv)
+
+    if args.reset and os.path.exists(ID_CRAWL_STATE_FILE):
+        os.remove(ID_CRAWL_STATE_FILE)
+        print("✓ ID crawl cursors cleared")
+
+    if not args.status and not health.require_healthy():
+        return 1
+
+    init_db()
+    session = get_session()
+    end = args.end or default_end(session, IdBitmap.load(ID_EXISTS_FILE))
+    shard = None
+    if args.shard and not args.status:
+        from shards import ShardWriter
+        shard = ShardWriter(tool="id_crawler")
+    crawler = IdRangeCrawler(session, start=args.start, end=end, workers=args.workers,
+                             skip_known_missing=not args.recheck_missing,
+                             only_unknown=args.only_unknown,
+                             writer=shard.write if shard else None)
+
+    if args.status:
+        crawler.print_status()
+        session.close()
+        return
+
+    def handle_signal(signum, frame):
+        print("\n\n⚠ Interrupt received! Finishing in-flight requests and saving state...")
+        crawler.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    settings.install("id_crawler")
+
+    print("=" * 80)
+    print("Royal Road ID Crawler - Starting")
+    print("=" * 80)
+    print(f"Range: {crawler.start:,} - {crawler.end:,} ({len(crawler.pending_chunks())} chunks pending)")
+    print(f"Workers: {crawler.target_workers()}  Rate: {settings.RATE_LIMIT_BETWEEN_FICTIONS}s "
+          f"±{settings.JITTER_FICTIONS}s (shared)")
+    if shard:
+        print(f"Writing to shard: {shard.path}")
+    print("=" * 80)
+
+    try:
+        stats = crawler.run()
+    finally:
+        session.close()
+        if shard:
+            shard.close()
+
+    print("\n" + "=" * 80)
+    print(f"ID crawl {'paused' if crawler.stop_event.is_set() else 'complete'}!")
+    print(f"Requests: {format_number(stats['requests'])}  Found: {format_number(stats['found'])}  "
+          f"404s: {format_number(stats['missing'])}  Errors: {format_number(stats['errors'])}")
+    print(f"Dead zones: {stats['dead_zones']}  IDs skipped: {format_number(stats['skipped'])}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Watermark-based incremental crawl.
+Walks the latest-updates listing newest-first, stops once it passes the
+previous run's high-watermark and refreshes only the fictions seen above it.
+
+Usage:
+    python incremental.py            (or: python run_scrape.py --incremental)
+    python incremental.py --since-hours 48   # ignore the stored watermark
+    python incremental.py --show
+"""
+import argparse
+import json
+import os
+import signal
+import time
+from datetime import datetime
+
+from db import init_db, get_session
+from scraper import fetch_listing_page, fetch_fiction_head, print_latency_summary
+from profiling import profiler
+import health
+from parser import parse_latest_updates, parse_fiction_full
+from normalizer import normalize_record
+from loader import upsert_fictions
+import rate_budget
+from run_scrape import extract_fiction_id
+from chapters import ChapterTracker
+from utils import sleep_with_jitter, format_number
+from runtime_config import settings
+from config import (
+    INCREMENTAL_STATE_FILE,
+    INCREMENTAL_MAX_PAGES,
+    INCREMENTAL_INITIAL_LOOKBACK_HOURS,
+    INCREMENTAL_OVERLAP_SECONDS,
+    CHAPTERS_ENABLED,
+)
+
+
+# Global flag for graceful shutdown
+shutdown_requested = False
+
+
+def signal_handler(signum, frame):
+    """Handle Ctrl+C gracefully"""
+    global shutdown_requested
+    print("\n\n⚠ Interrupt received! Finishing current batch and saving watermark...")
+    shutdown_requested = True
+
+
+class Watermark:
+    """Persisted high-watermark (unix time of the newest update already refreshed)"""
+
+    def __init__(self, filepath=INCREMENTAL_STATE_FILE):
+        self.filepath = filepath
+        self.data = {"watermark": None, "last_run": None, "refreshed": 0}
+        if os.path.exists(self.filepath):
+            try:
+                with open(self.filepath, "r") as f:
+                    self.data.update(json.load(f))
+            except Exception as e:
+                print(f"⚠ Warning: Could not load incremental state: {e}")
+
+    @property
+    def value(self):
+        return self.data["watermark"]
+
+    def save(self, watermark, refreshed):
+        self.data = {
+            "watermark": watermark,
+            "last_run": datetime.utcnow().isoformat(),
+            "refreshed": refreshed,
+        }
+        tmp = f"{self.filepath}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.filepath)
+
+
+def collect_updates(since, max_pages=INCREMENTAL_MAX_PAGES, should_stop=None, page_delay=True):
+    """
+    Walk latest-updates pages until an item at or below `since` is seen.
+
+    Args:
+        since (int): Unix time floor; items updated at or before it are skipped
+        max_pages (int): Safety cap on listing pages
+        should_stop (callable): Optional callback returning True to abort
+        page_delay (bool): Sleep between listing pages
+
+    Returns:
+        tuple: (items, pages_fetched, complete) where items is a list of
+               (fiction_id, url, unixtime) deduplicated by fiction_id, and
+               complete is False if max_pages or should_stop ended the walk
+               before it reached `since`
+    """
+    seen = set()
+    items = []
+    pages = 0
+    complete = False
+
+    for page in range(1, max_pages + 1):
+        if should_stop and should_stop():
+            break
+        listing = parse_latest_updates(fetch_listing_page(page, listing="latest-updates"))
+        pages += 1
+        if not listing:
+            complete = True
+            break
+
+        reached = False
+        for url, updated in listing:
+            if updated is not None and updated <= since:
+                reached = True
+                continue
+            fiction_id = extract_fiction_id(url)
+            if fiction_id in seen:
+                continue
+            seen.add(fiction_id)
+            items.append((fiction_id, url, updated))
+
+        print(f"  [Page {page}] {len(listing)} items, {len(items)} above watermark so far")
+        if reached:
+            complete = True
+            break
+        if page_delay:
+            sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_PAGES, settings.JITTER_PAGES)
+
+    return items, pages, complete
+
+
+def run_incremental(session, watermark, since=None, max_pages=INCREMENTAL_MAX_PAGES,
+                    should_stop=None, fiction_delay=True, monitor=None, max_fetches=None):
+    """
+    Refresh every fiction updated since the watermark.
+
+    Fictions are refreshed oldest-first, and the watermark advances after each
+    committed batch, so an interrupted run resumes without skipping anything.
+    A failed fetch freezes the watermark just below that fiction's update
+    time so the next run retries it. If the listing walk stops (max_pages,
+    should_stop) before reaching the watermark, the fictions found are still
+    refreshed but the watermark stays put, since updates on the pages not
+    visited would otherwise be skipped for good.
+
+    Args:
+        session: SQLAlchemy session
+        watermark (Watermark): Persisted watermark state
+        since (int): Override the stored watermark (unix time)
+        max_pages (int): Safety cap on listing pages
+        should_stop (callable): Optional callback returning True to abort
+        fiction_delay (bool): Sleep between fiction fetches
+        monitor (health.ParseHealth): Parser health monitor; the run stops
+            (watermark frozen) when it trips
+        max_fetches (int): Optional cap on fiction fetches this run; the
+            rest are picked up by the next run
+
+    Returns:
+        dict: Run statistics (pages, found, refreshed, errors, watermark)
+    """
+    if since is None:
+        since = watermark.value
+    if since is None:
+        since = int(time.time()) - INCREMENTAL_INITIAL_LOOKBACK_HOURS * 3600
+        print(f"  No watermark yet - looking back {INCREMENTAL_INITIAL_LOOKBACK_HOURS}h")
+    floor = since - INCREMENTAL_OVERLAP_SECONDS
+
+    items, pages, complete = collect_updates(floor, max_pages, should_stop, page_delay=fiction_delay)
+    items.sort(key=lambda item: item[2] or 0)
+    if not complete:
+        print(f"⚠ Stopped after {pages} listing pages without reaching the watermark; "
+              f"it stays at {datetime.utcfromtimestamp(since).isoformat()} (raise --max-pages to catch up)")
+
+    monitor = monitor or health.ParseHealth(tool="incremental")
+    tracker = ChapterTracker(session) if CHAPTERS_ENABLED else None
+    stats = {"pages": pages, "found": len(items), "refreshed": 0, "errors": 0,
+             "watermark": since}
+    batch = []
+    batch_high = since
+    frozen = not complete
+
+    def flush():
+        nonlocal batch
+        if batch:
+            upsert_fictions(session, batch)
+            stats["refreshed"] += len(batch)
+            batch = []
+        if tracker:
+            tracker.flush()
+        if batch_high > stats["watermark"]:
+            stats["watermark"] = batch_high
+        watermark.save(stats["watermark"], stats["refreshed"])
+
+    for idx, (fiction_id, url, updated) in enumerate(items, 1):
+        if should_stop and should_stop():
+            break
+        if max_fetches is not None and idx > max_fetches:
+            break
+        print(f"  [{idx}/{len(items)}] Refreshing fiction {fiction_id}...", end=" ")
+        try:
+            with profiler.page(url):
+                html = fetch_fiction_head(url, toc=tracker.toc_for(fiction_id) if tracker else None)
+                raw = parse_fiction_full(html)
+            missing = monitor.observe(url, raw, html)
+            if missing:
+                raise ValueError(f"{', '.join(missing)} not found on page")
+            raw["fiction_id"] = fiction_id
+            if tracker:
+                tracker.observe(fiction_id, html)
+            batch.append(normalize_record(raw))
+            print(f"✓ {raw['title'][:40]}")
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"✗ ERROR: {e}")
+            if updated is not None and not frozen:
+                batch_high = max(batch_high, updated - 1)
+            frozen = True
+        if updated is not None and not frozen:
+            batch_high = max(batch_high, updated)
+        if monitor.tripped:
+            break
+        if len(batch) >= settings.CRAWL_BATCH_SIZE:
+            flush()
+        if fiction_delay:
+            sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
+
+    flush()
+    return stats
+
+
+def show_state():
+    wm = Watermark()
+    value = wm.value
+    print("=" * 60)
+    print("Incremental Crawl State")
+    print("=" * 60)
+    print(f"Watermark:  {value} ({datetime.utcfromtimestamp(value).isoformat() if value else 'never run'})")
+    print(f"Last run:   {wm.data['last_run']}")
+    print(f"Refreshed:  {wm.data['refreshed']:,} fictions in last run")
+    print("=" * 60)
+
+
+def main(argv=None):
+    """Incremental refresh entry point"""
+    parser = argparse.ArgumentParser(description="Refresh fictions updated since the last run")
+    parser.add_argument("--incremental", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--since-hours", type=float, default=None,
+                        help="Ignore the stored watermark and look back this many hours")
+    parser.add_argument("--max-pages", type=int, default=INCREMENTAL_MAX_PAGES)
+    parser.add_argument("--show", action="store_true", help="Show the stored watermark and exit")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        show_state()
+        return
+
+    if not health.require_healthy():
+        return 1
+
+    signal.signal(signal.SIGINT, signal_handler)
+    settings.install("incremental")
+    rate_budget.set_tool("incremental")
+
+    print("=" * 80)
+    print("Royal Road Incremental Crawl - Starting")
+    print("=" * 80)
+
+    init_db()
+    session = get_session()
+    watermark = Watermark()
+    since = None
+    if args.since_hours is not None:
+        since = int(time.time() - args.since_hours * 3600)
+    elif watermark.value:
+        print(f"✓ Watermark: {datetime.utcfromtimestamp(watermark.value).isoformat()}")
+
+    try:
+        stats = run_incremental(session, watermark, since=since, max_pages=args.max_pages,
+                                should_stop=lambda: shutdown_requested)
+    finally:
+        session.close()
+
+    print("\n" + "=" * 80)
+    print(f"Incremental crawl {'paused' if shutdown_requested else 'complete'}!")
+    print(f"Listing pages: {stats['pages']}  Updated fictions: {format_number(stats['found'])}  "
+          f"Refreshed: {format_number(stats['refreshed'])}  Errors: {stats['errors']}")
+    print(f"New watermark: {datetime.utcfromtimestamp(stats['watermark']).isoformat()}")
+    print_latency_summary()
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
-import requests
 from bs4 import BeautifulSoup
+from config import BASE_URL
+from scraper import fetch_fiction_page
 
 def inspect_ids(ids):
     print("Inspecting specific IDs for missed status...")
     for fid in ids:
-        url = f"https://www.royalroad.com/fiction/{fid}"
+        url = f"{BASE_URL}/fiction/{fid}"
         try:
-            r = requests.get(url, headers={'User-Agent': 'detektive-rr-scraper/0.1'})
-            soup = BeautifulSoup(r.text, 'html.parser')
+            soup = BeautifulSoup(fetch_fiction_page(url), 'html.parser')
             print(f"\nID {fid}: {soup.select_one('h1').get_text(strip=True)}")
             
             # Print all labels to see what we're missing
@@ -1,15 +1,16 @@
 """
 Inspect ALL labels on fictions to identify missed status types.
 """
-import requests
+import sys
 from bs4 import BeautifulSoup
+from config import BASE_URL
+from scraper import fetch_fiction_page
 
 def inspect_labels(fiction_id):
-    url = f"https://www.royalroad.com/fiction/{fiction_id}"
+    url = f"{BASE_URL}/fiction/{fiction_id}"
     print(f"\nChecking ID: {fiction_id} ({url})")
     try:
-        r = requests.get(url, headers={'User-Agent': 'detektive-rr-scraper/0.1'})
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = BeautifulSoup(fetch_fiction_page(url), 'html.parser')
         
         title = soup.select_one('h1').get_text(strip=True) if soup.select_one('h1') else "Unknown"
         print(f"Title: {title}")
@@ -22,10 +23,14 @@ def inspect_labels(fiction_id):
     except Exception as e:
         print(f"Error: {e}")
 
-if __name__ == "__main__":
+def main():
+    """Inspect the IDs given on the command line (or a default mix)"""
     # Test a mix of IDs, hoping to catch Hiatus/Dropped/Inactive
     # You can add the specific ID you saw issues with here
-    test_ids = [21220, 3, 22, 25, 59, 100, 1000] 
+    test_ids = [int(a) for a in sys.argv[1:]] or [21220, 3, 22, 25, 59, 100, 1000]
     
     for fid in test_ids:
         inspect_labels(fid)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-endpoint latency tracking for HTTP requests.
+Keeps a sliding window of recent request durations per endpoint
+("listing", "fiction", ...) and answers percentile queries, which
+scraper.py uses to decide when a slow request deserves a hedge.
+"""
+import threading
+from collections import deque
+
+WINDOW = 500  # Recent samples kept per endpoint
+
+
+class LatencyTracker:
+    """Thread-safe sliding-window latency percentiles per endpoint"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        """Record one completed request duration"""
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    def count(self, endpoint):
+        """Number of samples currently in the window"""
+        with self._lock:
+            return len(self._samples.get(endpoint, ()))
+
+    def percentile(self, endpoint, pct):
+        """
+        Latency percentile over the recent window.
+
+        Args:
+            endpoint (str): Endpoint name
+            pct (float): Percentile, 0-100
+
+        Returns:
+            float: Seconds, or None if no samples exist yet
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def summary(self):
+        """
+        Summarize every endpoint.
+
+        Returns:
+            dict: endpoint -> {"count", "p50", "p95", "p99", "max"}
+        """
+        with self._lock:
+            endpoints = list(self._samples)
+            counts = dict(self._counts)
+        result = {}
+        for endpoint in endpoints:
+            result[endpoint] = {
+                "count": counts.get(endpoint, 0),
+                "p50": self.percentile(endpoint, 50),
+                "p95": self.percentile(endpoint, 95),
+                "p99": self.percentile(endpoint, 99),
+                "max": self.percentile(endpoint, 100),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
@@ -4,16 +4,22 @@ Handles batch insertion and upsert operations.
 """
 from sqlalchemy.dialects.sqlite import insert
 from db import Fiction
+from records import as_rows
+import aggregates
+from profiling import timed
 
 
+@timed("upsert")
 def upsert_fictions(session, rows):
     """
     Insert or update fiction records in the database.
     Uses SQLite's INSERT OR REPLACE functionality.
+    Aggregate and leaderboard tables are updated from the old and new
+    values in the same transaction (see aggregates.py).
     
     Args:
         session: SQLAlchemy session
-        rows (list): List of dictionaries containing fiction data
+        rows (list): FictionRecords or dictionaries containing fiction data
         
     Returns:
         None
@@ -21,26 +27,53 @@ def upsert_fictions(session, rows):
     if not rows:
         return
     
+    rows = _collapse(as_rows(rows))
+    old = aggregates.snapshot(session, [row["fiction_id"] for row in rows])
+    
+    # Rows that provide different columns (a detail refresh next to a listing
+    # row) go in separate statements, one per column set
+    groups = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    for provided, group in groups.items():
+        session.execute(_upsert_statement(group, provided))
+
+    aggregates.apply(session, old, rows)
+    session.commit()
+
+
+def _collapse(rows):
+    """
+    One row per fiction_id. A fiction listed twice in a batch would otherwise
+    be counted twice in the aggregates; later rows win column by column.
+    """
+    by_id = {}
+    for row in rows:
+        fiction_id = row["fiction_id"]
+        by_id[fiction_id] = {**by_id[fiction_id], **row} if fiction_id in by_id else row
+    return list(by_id.values())
+
+
+def _upsert_statement(rows, provided):
     # Create insert statement
     stmt = insert(Fiction).values(rows)
     
-    # Get all columns except the primary key for updating
+    # Update only the columns the rows provide (except the primary key), so a
+    # partial refresh does not wipe fields it did not scrape (e.g. fiction_type)
     update_cols = {
         c.name: c 
         for c in stmt.excluded 
-        if c.name != "fiction_id"
+        if c.name != "fiction_id" and c.name in provided
     }
 
     # Create upsert statement (insert or update on conflict)
-    stmt = stmt.on_conflict_do_update(
+    return stmt.on_conflict_do_update(
         index_elements=["fiction_id"],
         set_=update_cols
     )
 
-    session.execute(stmt)
-    session.commit()
-
 
+@timed("upsert")
 def insert_fictions(session, rows):
     """
     Simple batch insert of fiction records.
@@ -48,7 +81,7 @@ def insert_fictions(session, rows):
     
     Args:
         session: SQLAlchemy session
-        rows (list): List of dictionaries containing fiction data
+        rows (list): FictionRecords or dictionaries containing fiction data
         
     Returns:
         None
@@ -56,5 +89,7 @@ def insert_fictions(session, rows):
     if not rows:
         return
     
+    rows = as_rows(rows)
     session.bulk_insert_mappings(Fiction, rows)
+    aggregates.apply(session, {}, rows)
     session.commit()
@@ -0,0 +1,325 @@
+"""
+Versioned schema migrations with a chunked, resumable backfill runner.
+Each migration has a version number, schema steps (ALTER TABLE, CREATE
+INDEX, ...) and optionally a backfill. Applied versions are recorded in the
+schema_version table.
+
+Schema steps run in one short transaction per migration. A backfill never
+runs as one big UPDATE: it walks the table in keyset order (key > last_key,
+ORDER BY key, LIMIT n) and updates one key range per transaction, recording
+its position in backfill_progress in the same transaction. A running crawl
+waits for at most one chunk. The chunk size adapts to BACKFILL_TARGET_SECONDS
+and the runner sleeps between chunks (BACKFILL_DUTY_CYCLE). An interrupted
+backfill resumes from its last committed chunk.
+
+Usage:
+    python migrations.py status
+    python migrations.py up                  # apply pending migrations, then run their backfills
+    python migrations.py up --schema-only    # backfills later (python migrations.py backfill)
+    python migrations.py backfill            # resume unfinished backfills
+"""
+import argparse
+import signal
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from db import SchemaVersion, BackfillProgress, get_engine
+from utils import format_number
+from config import (
+    BACKFILL_CHUNK_SIZE,
+    BACKFILL_MAX_CHUNK_SIZE,
+    BACKFILL_TARGET_SECONDS,
+    BACKFILL_DUTY_CYCLE,
+)
+
+MIN_CHUNK_SIZE = 10
+
+# Global flag for graceful shutdown
+shutdown_requested = False
+
+
+def signal_handler(signum, frame):
+    """Handle Ctrl+C gracefully"""
+    global shutdown_requested
+    print("\n\n⚠ Interrupt received! Finishing current chunk...")
+    shutdown_requested = True
+
+
+class Backfill:
+    """
+    A data change applied one key range at a time.
+
+    `sql` is a statement with :lo and :hi bind parameters that must only
+    touch rows with lo < key <= hi and be safe to run twice on a range.
+    """
+
+    def __init__(self, name, table, sql, key="fiction_id"):
+        self.name = name
+        self.table = table
+        self.sql = sql
+        self.key = key
+
+
+class Migration:
+    """
+    One schema version.
+
+    `schema` steps are SQL strings or callables taking a connection; they
+    should be idempotent, because databases created by init_db() already
+    have the current model's tables and columns.
+    """
+
+    def __init__(self, version, name, schema=(), backfill=None):
+        self.version = version
+        self.name = name
+        self.schema = list(schema)
+        self.backfill = backfill
+
+
+def add_column(table, column, column_type):
+    """Schema step adding a column unless the table already has it"""
+    def step(conn):
+        columns = [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+    step.__doc__ = f"ADD COLUMN {table}.{column}"
+    return step
+
+
+MIGRATIONS = [
+    Migration(1, "fiction detail columns", schema=[
+        add_column("fictions", "fiction_type", "VARCHAR"),
+        add_column("fictions", "warn_tags", "TEXT"),
+        add_column("fictions", "content_warnings", "TEXT"),
+    ]),
+    Migration(2, "scraped_at index", schema=[
+        "CREATE INDEX IF NOT EXISTS ix_fictions_scraped_at ON fictions (scraped_at)",
+    ]),
+    # Rows scraped from a detail page before the warning columns existed hold
+    # NULL where a current scrape stores an empty list
+    Migration(3, "empty warning lists", backfill=Backfill(
+        "empty_warning_lists", "fictions",
+        "UPDATE fictions SET warn_tags = COALESCE(warn_tags, '[]'), "
+        "content_warnings = COALESCE(content_warnings, '[]') "
+        "WHERE fiction_id > :lo AND fiction_id <= :hi AND fiction_type IS NOT NULL "
+        "AND (warn_tags IS NULL OR content_warnings IS NULL)")),
+]
+
+
+def _ensure_tables(engine):
+    SchemaVersion.__table__.create(engine, checkfirst=True)
+    BackfillProgress.__table__.create(engine, checkfirst=True)
+
+
+def applied_versions(engine):
+    """
+    Returns:
+        dict: version -> applied_at
+    """
+    _ensure_tables(engine)
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT version, applied_at FROM schema_version")).all())
+
+
+def pending(engine, migrations=MIGRATIONS):
+    """Migrations not yet applied, in version order"""
+    applied = applied_versions(engine)
+    return [m for m in sorted(migrations, key=lambda m: m.version) if m.version not in applied]
+
+
+def apply_schema(engine, migration):
+    """Run a migration's schema steps and record it (one transaction)"""
+    now = datetime.utcnow().isoformat()
+    with engine.begin() as conn:
+        for step in migration.schema:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(text(step))
+        conn.execute(text("INSERT INTO schema_version (version, name, applied_at) "
+                          "VALUES (:v, :n, :t)"), {"v": migration.version, "n": migration.name, "t": now})
+        if migration.backfill:
+            conn.execute(text("INSERT OR IGNORE INTO backfill_progress "
+                              "(name, last_key, rows_updated, started_at) VALUES (:n, 0, 0, :t)"),
+                         {"n": migration.backfill.name, "t": now})
+
+
+def run_backfill(engine, backfill, chunk_size=BACKFILL_CHUNK_SIZE, max_chunk_size=BACKFILL_MAX_CHUNK_SIZE,
+                 target_seconds=BACKFILL_TARGET_SECONDS, duty_cycle=BACKFILL_DUTY_CYCLE,
+                 should_stop=None, max_chunks=None):
+    """
+    Run (or resume) a backfill in keyset-ordered chunks.
+
+    Args:
+        engine: SQLAlchemy engine
+        backfill (Backfill): Backfill to run
+        chunk_size (int): Rows in the first chunk
+        max_chunk_size (int): Upper bound for the adaptive chunk size
+        target_seconds (float): Chunk duration the size adapts towards
+        duty_cycle (float): Fraction of time spent in write transactions
+        should_stop (callable): Optional callback returning True to pause
+        max_chunks (int): Optional cap on chunks this call
+
+    Returns:
+        dict: chunks, rows (updated this call), last_key, completed, seconds
+    """
+    key, table = backfill.key, backfill.table
+    with engine.begin() as conn:
+        row = conn.execute(text("SELECT last_key, completed_at FROM backfill_progress WHERE name = :n"),
+                           {"n": backfill.name}).first()
+        if row is None:
+            conn.execute(text("INSERT INTO backfill_progress (name, last_key, rows_updated, started_at) "
+                              "VALUES (:n, 0, 0, :t)"),
+                         {"n": backfill.name, "t": datetime.utcnow().isoformat()})
+            last_key, completed = 0, None
+        else:
+            last_key, completed = row
+    stats = {"chunks": 0, "rows": 0, "last_key": last_key, "completed": completed is not None,
+             "seconds": 0.0}
+    if completed:
+        return stats
+
+    start = time.monotonic()
+    size = chunk_size
+    next_range = text(f"SELECT MAX(k) FROM (SELECT {key} AS k FROM {table} WHERE {key} > :lo "
+                      f"ORDER BY {key} LIMIT :n)")
+    while not (should_stop and should_stop()):
+        if max_chunks is not None and stats["chunks"] >= max_chunks:
+            break
+        # Find the range outside the write transaction, so the transaction
+        # starts with its write and waits (busy_timeout) for the crawl's lock
+        with engine.connect() as conn:
+            hi = conn.execute(next_range, {"lo": last_key, "n": size}).scalar()
+        if hi is None:
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE backfill_progress SET completed_at = :t WHERE name = :n"),
+                             {"t": datetime.utcnow().isoformat(), "n": backfill.name})
+            stats["completed"] = True
+            break
+
+        chunk_start = time.monotonic()
+        with engine.begin() as conn:
+            updated = conn.execute(text(backfill.sql), {"lo": last_key, "hi": hi}).rowcount
+            conn.execute(text("UPDATE backfill_progress SET last_key = :hi, "
+                              "rows_updated = rows_updated + :u WHERE name = :n"),
+                         {"hi": hi, "u": max(updated, 0), "n": backfill.name})
+        elapsed = time.monotonic() - chunk_start
+        last_key = hi
+        stats["chunks"] += 1
+        stats["rows"] += max(updated, 0)
+        stats["last_key"] = last_key
+
+        if elapsed > target_seconds:
+            size = max(MIN_CHUNK_SIZE, size // 2)
+        elif elapsed < target_seconds / 2:
+            size = min(max_chunk_size, size * 2)
+        if duty_cycle < 1:
+            time.sleep(elapsed * (1 - duty_cycle) / duty_cycle)
+
+    stats["seconds"] = time.monotonic() - start
+    return stats
+
+
+def unfinished_backfills(engine, migrations=MIGRATIONS):
+    """Backfills of applied migrations that have not completed"""
+    applied = applied_versions(engine)
+    with engine.connect() as conn:
+        done = {name for (name,) in conn.execute(
+            text("SELECT name FROM backfill_progress WHERE completed_at IS NOT NULL"))}
+    return [m.backfill for m in sorted(migrations, key=lambda m: m.version)
+            if m.backfill and m.version in applied and m.backfill.name not in done]
+
+
+def run_backfills(engine, migrations=MIGRATIONS, should_stop=None, **backfill_options):
+    """
+    Run (or resume) every unfinished backfill of the applied migrations.
+
+    Returns:
+        dict: backfill name -> run_backfill stats
+    """
+    result = {}
+    for backfill in unfinished_backfills(engine, migrations):
+        if should_stop and should_stop():
+            break
+        print(f"Backfilling {backfill.name}...")
+        stats = run_backfill(engine, backfill, should_stop=should_stop, **backfill_options)
+        result[backfill.name] = stats
+        state = "complete" if stats["completed"] else f"paused at {backfill.key} {stats['last_key']}"
+        print(f"{'✓' if stats['completed'] else '⚠'} {backfill.name}: {format_number(stats['rows'])} rows "
+              f"in {stats['chunks']} chunks, {stats['seconds']:.1f}s ({state})")
+    return result
+
+
+def migrate(engine=None, migrations=MIGRATIONS, schema_only=False, should_stop=None, **backfill_options):
+    """
+    Apply pending migrations, then run their backfills.
+
+    Returns:
+        dict: applied (versions), backfills (name -> run_backfill stats)
+    """
+    engine = engine or get_engine()
+    result = {"applied": [], "backfills": {}}
+    for migration in pending(engine, migrations):
+        apply_schema(engine, migration)
+        result["applied"].append(migration.version)
+        print(f"✓ Applied migration {migration.version}: {migration.name}")
+    if not schema_only:
+        result["backfills"] = run_backfills(engine, migrations, should_stop, **backfill_options)
+    return result
+
+
+def show_status(engine=None, migrations=MIGRATIONS):
+    engine = engine or get_engine()
+    applied = applied_versions(engine)
+    with engine.connect() as conn:
+        progress = {row[0]: row[1:] for row in conn.execute(text(
+            "SELECT name, last_key, rows_updated, completed_at FROM backfill_progress"))}
+    print("=" * 60)
+    print("Schema Migrations")
+    print("=" * 60)
+    for m in sorted(migrations, key=lambda m: m.version):
+        state = f"applied {applied[m.version]}" if m.version in applied else "pending"
+        print(f"{m.version:>3}  {m.name:<28} {state}")
+        if m.backfill and m.backfill.name in progress:
+            last_key, rows, completed_at = progress[m.backfill.name]
+            with engine.connect() as conn:
+                top = conn.execute(text(f"SELECT MAX({m.backfill.key}) FROM {m.backfill.table}")).scalar()
+            done = "complete" if completed_at else f"at {m.backfill.key} {last_key} of {top or 0}"
+            print(f"     backfill {m.backfill.name}: {format_number(rows)} rows, {done}")
+    print("=" * 60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned schema migrations and chunked backfills")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("status", help="Applied and pending migrations, backfill progress")
+    up = sub.add_parser("up", help="Apply pending migrations and run their backfills")
+    up.add_argument("--schema-only", action="store_true", help="Leave the backfills for later")
+    sub.add_parser("backfill", help="Resume unfinished backfills")
+    args = parser.parse_args(argv)
+
+    if args.command not in ("up", "backfill"):
+        show_status()
+        return 0
+
+    signal.signal(signal.SIGINT, signal_handler)
+    engine = get_engine()
+    print("=" * 80)
+    print(f"Migrating database at {engine.url}")
+    print("=" * 80)
+    if args.command == "backfill":
+        if not run_backfills(engine, should_stop=lambda: shutdown_requested):
+            print("No unfinished backfills")
+    elif not migrate(engine, schema_only=args.schema_only,
+                     should_stop=lambda: shutdown_requested)["applied"]:
+        print("Schema is up to date")
+    if shutdown_requested:
+        print("⚠ Paused - run `python migrations.py backfill` to resume")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,619 @@
+"""
+Local Royal Road stand-in server for load-testing the crawler end to end.
+Serves listing and fiction routes from recorded fixtures or synthesized pages,
+with configurable latency, error/429 injection and ETag/304 support. With
+--http2 it speaks cleartext HTTP/2 (prior knowledge, needs the h2 package)
+instead of HTTP/1.1, answering the streams of a connection concurrently.
+
+Usage:
+    python mock_server.py --port 8765 --fictions 60000 --latency lognormal:0.08,0.6
+    RR_BASE_URL=http://127.0.0.1:8765 python run_scrape.py
+    python mock_server.py --http2        # for the HTTP/2 transport (HTTP2_ENABLED)
+"""
+import argparse
+import hashlib
+import html as html_lib
+import json
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+except ImportError:  # Optional: only needed for the HTTP/2 server
+    h2 = None
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus")
+LISTING_PAGE_SIZE = 20
+
+TAG_POOL = [
+    "Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Mystery",
+    "Psychological", "Romance", "Satire", "Sci-fi", "Short Story", "Tragedy",
+    "Contemporary", "Historical", "LitRPG", "Magic", "Portal Fantasy / Isekai",
+    "Progression", "Male Lead", "Female Lead", "Strong Lead", "Anti-Hero Lead",
+    "Time Loop", "Slice of Life", "Dungeon", "Reincarnation", "Strategy",
+    "Super Heroes", "Cultivation",
+]
+WARNING_POOL = ["Gore", "Profanity", "Sexual Content", "Traumatising content", "Graphic Violence"]
+CONTENT_WARNING_POOL = ["AI-Assisted Content", "AI-Generated Content", "Profanity", "Sexual Content"]
+STATUS_POOL = ["ONGOING"] * 5 + ["COMPLETED"] * 2 + ["HIATUS", "STUB", "DROPPED", "INACTIVE"]
+WORDS = ("the of a sword mage dungeon loop system hero rogue lord demon queen tower "
+         "star shadow ember crown ashes void dragon path").split()
+
+FICTION_ROUTE = re.compile(r"^/fiction/(\d+)(?:/[^/]*)?/?$")
+LISTING_ROUTE = re.compile(r"^/fictions/(best-rated|latest-updates|trending|rising-stars|complete|new)/?$")
+
+
+# =============================================================================
+# Latency distributions
+# =============================================================================
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution spec into a sampling function.
+
+    Supported specs (all values in seconds):
+        - "none"
+        - "fixed:0.05"
+        - "uniform:0.01,0.2"
+        - "lognormal:0.08,0.6"   (median, sigma)
+        - "pareto:0.05,2.5"      (minimum, alpha) - heavy tail
+
+    Args:
+        spec (str): Distribution spec
+
+    Returns:
+        callable: Function taking a random.Random and returning seconds
+    """
+    if not spec or spec == "none":
+        return lambda rng: 0.0
+    name, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if name == "fixed":
+        return lambda rng: values[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if name == "lognormal":
+        import math
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    if name == "pareto":
+        return lambda rng: values[0] * rng.paretovariate(values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# =============================================================================
+# Synthetic catalogue
+# =============================================================================
+
+class Catalogue:
+    """
+    Deterministic synthetic fiction catalogue.
+
+    Fiction IDs are allocated densely from 1 upward, with a configurable
+    fraction of missing IDs and whole dead 1000-ID blocks, so the ID space
+    looks like the real site (mostly dense with sparse regions).
+    """
+
+    def __init__(self, size, seed=0, density=0.9, dead_zone_rate=0.05):
+        self.seed = seed
+        rng = random.Random(seed)
+        ids = []
+        fid = 0
+        dead = False
+        while len(ids) < size:
+            fid += 1
+            if fid % 1000 == 1:
+                dead = rng.random() < dead_zone_rate
+            if not dead and rng.random() < density:
+                ids.append(fid)
+        self.ids = ids
+        self.id_set = set(ids)
+        self.max_id = fid
+        self._meta = {}
+        self._latest = None
+        self.ranking = sorted(ids, key=lambda f: -self.meta(f)["rating"])
+        self.orders = {
+            "best-rated": self.ranking,
+            "trending": sorted(ids, key=lambda f: -self.meta(f)["followers"] * self.meta(f)["rating"]),
+            "rising-stars": sorted(
+                (f for f in ids if self.meta(f)["chapters"] < 50),
+                key=lambda f: -self.meta(f)["followers"]),
+            "complete": [f for f in self.ranking if self.meta(f)["status"] == "COMPLETED"],
+            "new": sorted(ids, key=lambda f: -self.meta(f)["first_release"]),
+        }
+
+    def __contains__(self, fiction_id):
+        return fiction_id in self.id_set
+
+    def __len__(self):
+        return len(self.ids)
+
+    def meta(self, fiction_id):
+        """Synthesized metadata for one fiction (cached)"""
+        cached = self._meta.get(fiction_id)
+        if cached is not None:
+            return cached
+        rng = random.Random(self.seed * 1_000_003 + fiction_id)
+        title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 5)))
+        followers = int(rng.paretovariate(1.1) * 40)
+        chapters = min(int(rng.paretovariate(1.3) * 8), 3000)
+        meta = {
+            "fiction_id": fiction_id,
+            "title": f"{title} {fiction_id}",
+            "slug": f"{title.lower().replace(' ', '-')}-{fiction_id}",
+            "author": f"author{rng.randint(1, 20000)}",
+            "tags": rng.sample(TAG_POOL, rng.randint(2, 8)),
+            "warnings": rng.sample(WARNING_POOL, rng.choice([0, 0, 0, 1, 2])),
+            "content_warnings": rng.sample(CONTENT_WARNING_POOL, rng.choice([0, 0, 0, 1])),
+            "status": rng.choice(STATUS_POOL),
+            "fiction_type": "Fanfiction" if rng.random() < 0.1 else "Original",
+            "followers": followers,
+            "favorites": followers // 4,
+            "rating_count": followers // 7,
+            "views": followers * rng.randint(20, 60),
+            "rating": round(rng.uniform(2.5, 5.0), 5),
+            "chapters": chapters,
+            "first_release": 1420070400 + rng.randint(0, 300_000_000),
+            "release_interval": rng.randint(40_000, 900_000),
+            "extra_releases": [],
+        }
+        self._meta[fiction_id] = meta
+        return meta
+
+    def chapter_times(self, fiction_id):
+        """Release timestamps of every chapter, oldest first"""
+        m = self.meta(fiction_id)
+        base = [m["first_release"] + i * m["release_interval"] for i in range(1, m["chapters"] + 1)]
+        return base + m["extra_releases"]
+
+    def last_release(self, fiction_id):
+        times = self.chapter_times(fiction_id)
+        return times[-1] if times else self.meta(fiction_id)["first_release"]
+
+    def touch(self, fiction_id, timestamp=None):
+        """Simulate an author publishing a new chapter"""
+        self.meta(fiction_id)["extra_releases"].append(int(timestamp or time.time()))
+        self._latest = None
+
+    def listing_order(self, listing):
+        """Fiction IDs in the order a listing presents them"""
+        if listing == "latest-updates":
+            if self._latest is None:
+                self._latest = sorted(self.ids, key=lambda f: -self.last_release(f))
+            return self._latest
+        return self.orders.get(listing, self.ranking)
+
+
+# =============================================================================
+# Page rendering
+# =============================================================================
+
+def render_listing(catalogue, listing, page):
+    """Render a listing page for the given 1-indexed page number"""
+    start = (page - 1) * LISTING_PAGE_SIZE
+    ids = catalogue.listing_order(listing)[start:start + LISTING_PAGE_SIZE]
+    items = []
+    for fid in ids:
+        m = catalogue.meta(fid)
+        last_release = catalogue.last_release(fid)
+        items.append(
+            f'<div class="fiction-list-item row">'
+            f'<div class="col"><h2 class="fiction-title"><a href="/fiction/{fid}/{m["slug"]}" '
+            f'class="font-red-sunglo bold">{html_lib.escape(m["title"])}</a></h2>'
+            f'<div class="row stats">'
+            f'<div class="col-sm-6"><span>{m["followers"]:,} Followers</span></div>'
+            f'<div class="col-sm-6"><span>{len(catalogue.chapter_times(fid))} Chapters</span></div>'
+            f'<div class="col-sm-6"><span><time unixtime="{last_release}">recently</time></span></div>'
+            f'</div></div></div>'
+        )
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>{listing.replace("-", " ").title()} | Royal Road</title></head>'
+        '<body><div class="page-content"><div class="fiction-list">'
+        + "".join(items) +
+        '</div></div></body></html>'
+    )
+
+
+def render_fiction(catalogue, fiction_id):
+    """Render a fiction page with header, info, stats and chapter table"""
+    m = catalogue.meta(fiction_id)
+    tags = m["tags"] + m["warnings"]
+    tag_links = "".join(
+        f'<a class="label label-default label-sm bg-default fiction-tag" '
+        f'href="/fictions/search?tagsAdd={t.lower()}">{html_lib.escape(t)}</a>' for t in tags
+    )
+    warning_box = ""
+    if m["content_warnings"]:
+        warning_box = (
+            '<div style="padding: 5px 0" class="text-center font-red-sunglo">'
+            '<strong>This fiction contains:</strong><ul class="list-inline">'
+            + "".join(f"<li>{w}</li>" for w in m["content_warnings"]) +
+            '</ul></div>'
+        )
+    stats = [
+        ("Total Views", m["views"]), ("Average Views", m["views"] // max(m["chapters"], 1)),
+        ("Followers", m["followers"]), ("Favorites", m["favorites"]),
+        ("Ratings", m["rating_count"]), ("Pages", m["chapters"] * 9),
+    ]
+    stats_html = "".join(
+        f'<li class="bold uppercase">{label} :</li>'
+        f'<li class="bold uppercase font-red-sunglo">{value:,}</li>' for label, value in stats
+    )
+    rows = []
+    chapter_times = catalogue.chapter_times(fiction_id)
+    for i, ts in enumerate(chapter_times, 1):
+        chapter_id = fiction_id * 10_000 + i
+        href = f'/fiction/{fiction_id}/{m["slug"]}/chapter/{chapter_id}/chapter-{i}'
+        iso = time.strftime("%Y-%m-%dT%H:%M:%S.0000000Z", time.gmtime(ts))
+        rows.append(
+            f'<tr style="cursor: pointer" data-url="{href}" class="chapter-row">'
+            f'<td><a href="{href}">Chapter {i}</a></td>'
+            f'<td data-content="{i - 1}" class="text-right"><a href="{href}">'
+            f'<time unixtime="{ts}" datetime="{iso}" format="agoshort">ago</time></a></td></tr>'
+        )
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>{html_lib.escape(m["title"])} | Royal Road</title>'
+        f'<meta property="books:rating:value" content="{m["rating"]}">'
+        '<meta property="books:rating:scale" content="5"></head>'
+        '<body><div class="page-content">'
+        '<div class="fic-header"><div class="fic-title">'
+        f'<h1 class="font-white">{html_lib.escape(m["title"])}</h1>'
+        f'<h4 class="font-white"><span class="small font-white">by </span>'
+        f'<span><a href="/profile/{fiction_id}" class="font-white">{m["author"]}</a></span></h4>'
+        '</div></div>'
+        '<div class="fiction-info"><div class="portlet light row"><div class="col-md-8">'
+        '<div class="margin-bottom-10">'
+        f'<span class="label label-default label-sm bg-blue-hoki">{m["fiction_type"].upper()}</span>'
+        f'<span class="label label-default label-sm bg-blue-hoki">{m["status"]}</span></div>'
+        f'<span class="tags">{tag_links}</span>{warning_box}'
+        f'<div class="description"><div class="hidden-content"><p>Synthetic fiction {fiction_id}.</p></div></div>'
+        '</div></div></div>'
+        '<div class="fiction-stats"><div class="portlet light"><div class="portlet-body">'
+        f'<div class="col-sm-12 stats-content"><div class="col-sm-6"><ul class="list-unstyled">{stats_html}</ul>'
+        '</div></div></div></div></div>'
+        '<div class="portlet light"><div class="portlet-body">'
+        f'<table class="table no-border" id="chapters" data-chapters="{len(chapter_times)}">'
+        '<thead><tr><th>Chapter Name</th><th class="text-right">Release Date</th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table></div></div>'
+        '</div><footer class="page-footer">&copy; Royal Road</footer></body></html>'
+    )
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+class MockRoyalRoad:
+    """
+    Shared state for the stand-in server: catalogue, fixtures, fault injection
+    settings and request statistics.
+    """
+
+    def __init__(self, fictions=1000, seed=0, latency="none", error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1, max_rps=None, fixtures=True,
+                 density=0.9, dead_zone_rate=0.05):
+        self.catalogue = Catalogue(fictions, seed=seed, density=density,
+                                   dead_zone_rate=dead_zone_rate)
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_rps = max_rps
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self._window = (0, 0)  # (second, requests in that second)
+        self.listing_fixtures = {}
+        self.fiction_fixtures = {}
+        if fixtures:
+            self._load_fixtures()
+
+    def _load_fixtures(self):
+        manifest_file = os.path.join(CORPUS_DIR, "manifest.json")
+        if not os.path.exists(manifest_file):
+            return
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for entry in manifest["entries"]:
+            with open(os.path.join(CORPUS_DIR, entry["file"]), "r", encoding="utf-8") as f:
+                body = f.read()
+            if entry["kind"] == "fiction":
+                self.fiction_fixtures[entry["fiction_id"]] = body
+            else:
+                self.listing_fixtures[entry["path"]] = body
+
+    def sample_latency(self):
+        with self.lock:
+            return self.latency(self.rng)
+
+    def roll(self, rate):
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    def over_rate(self):
+        """True if this request exceeds max_rps within the current second"""
+        if not self.max_rps:
+            return False
+        now = int(time.time())
+        with self.lock:
+            second, count = self._window
+            count = count + 1 if second == now else 1
+            self._window = (now, count)
+            return count > self.max_rps
+
+    def record(self, route, status):
+        with self.lock:
+            self.stats[f"{route}:{status}"] += 1
+            self.stats["total"] += 1
+
+    def record_connection(self):
+        with self.lock:
+            self.stats["connections"] += 1
+
+    def resolve(self, path, query):
+        """
+        Resolve a request to (route, html) or (route, None) for 404.
+        """
+        match = FICTION_ROUTE.match(path)
+        if match:
+            fid = int(match.group(1))
+            if fid in self.fiction_fixtures:
+                return "fiction", self.fiction_fixtures[fid]
+            if fid in self.catalogue:
+                return "fiction", render_fiction(self.catalogue, fid)
+            return "fiction", None
+
+        match = LISTING_ROUTE.match(path)
+        if match:
+            listing = match.group(1)
+            page = int(query.get("page", ["1"])[0])
+            fixture = self.listing_fixtures.get(f"/fictions/{listing}?page={page}")
+            if fixture is not None:
+                return "listing", fixture
+            if page < 1 or (page - 1) * LISTING_PAGE_SIZE >= len(self.catalogue.listing_order(listing)):
+                return "listing", None
+            return "listing", render_listing(self.catalogue, listing, page)
+
+        return "other", None
+
+    def respond(self, raw_path, if_none_match=None):
+        """
+        Handle one GET (shared by the HTTP/1.1 and HTTP/2 servers).
+
+        Returns:
+            tuple: (status, body bytes, content type or None, extra headers dict)
+        """
+        parts = urlsplit(raw_path)
+        if parts.path == "/__stats":
+            return 200, json.dumps(dict(self.stats)).encode("utf-8"), "application/json", {}
+
+        delay = self.sample_latency()
+        if delay:
+            time.sleep(delay)
+
+        if self.over_rate() or self.roll(self.throttle_rate):
+            self.record("throttle", 429)
+            return 429, b"Too Many Requests", "text/plain", {"Retry-After": str(self.retry_after)}
+
+        if self.roll(self.error_rate):
+            self.record("error", 503)
+            return 503, b"Service Unavailable", "text/plain", {}
+
+        route, html = self.resolve(parts.path, parse_qs(parts.query))
+        if html is None:
+            self.record(route, 404)
+            return 404, b"Not Found", "text/plain", {}
+
+        body = html.encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if if_none_match == etag:
+            self.record(route, 304)
+            return 304, b"", None, {"ETag": etag}
+
+        self.record(route, 200)
+        return 200, body, "text/html; charset=utf-8", {"ETag": etag}
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """Request handler delegating to the server's MockRoyalRoad state"""
+
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up (e.g. a cancelled hedge); nothing left to do
+            pass
+
+    def do_GET(self):
+        self._send(*self.server.state.respond(self.path, self.headers.get("If-None-Match")))
+
+    def _send(self, status, body, content_type, extra_headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockH2Handler(socketserver.BaseRequestHandler):
+    """
+    One cleartext HTTP/2 connection (prior knowledge). Each request stream is
+    answered on its own thread, so a single connection carries many
+    concurrent responses; DATA frames respect the client's flow-control window.
+    """
+
+    def handle(self):
+        self.server.state.record_connection()
+        self.conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        self.cond = threading.Condition()
+        self.closed = False
+        try:
+            with self.cond:
+                self.conn.initiate_connection()
+                self._flush()
+            while True:
+                data = self.request.recv(65536)
+                if not data:
+                    break
+                with self.cond:
+                    try:
+                        events = self.conn.receive_data(data)
+                    except h2.exceptions.ProtocolError:
+                        self._flush()  # Not an HTTP/2 client: send the GOAWAY and hang up
+                        break
+                    self._flush()
+                    self.cond.notify_all()  # Window updates may unblock senders
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        threading.Thread(target=self._respond, args=(event.stream_id, dict(event.headers)),
+                                         daemon=True).start()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+        except OSError:
+            pass
+        finally:
+            with self.cond:
+                self.closed = True
+                self.cond.notify_all()
+
+    def _flush(self):
+        data = self.conn.data_to_send()
+        if data:
+            self.request.sendall(data)
+
+    def _respond(self, stream_id, headers):
+        status, body, content_type, extra = self.server.state.respond(
+            headers.get(":path", "/"), headers.get("if-none-match"))
+        response_headers = [(":status", str(status)), ("content-length", str(len(body)))]
+        if content_type:
+            response_headers.append(("content-type", content_type))
+        response_headers += [(key.lower(), value) for key, value in extra.items()]
+        try:
+            with self.cond:
+                self.conn.send_headers(stream_id, response_headers, end_stream=not body)
+                self._flush()
+            sent = 0
+            while sent < len(body):
+                with self.cond:
+                    window = min(self.conn.local_flow_control_window(stream_id),
+                                 self.conn.max_outbound_frame_size)
+                    if window <= 0:
+                        if self.closed:
+                            return
+                        self.cond.wait(1)
+                        continue
+                    chunk = body[sent:sent + window]
+                    sent += len(chunk)
+                    self.conn.send_data(stream_id, chunk, end_stream=sent >= len(body))
+                    self._flush()
+        except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError, OSError):
+            pass  # Client reset the stream (early close, cancelled hedge)
+
+
+class MockH2Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _make_server(host, port, http2):
+    if not http2:
+        server = ThreadingHTTPServer((host, port), MockRequestHandler)
+        server.daemon_threads = True
+        return server
+    if h2 is None:
+        raise RuntimeError("The HTTP/2 stand-in needs the h2 package (pip install h2)")
+    return MockH2Server((host, port), MockH2Handler)
+
+
+def start_server(host="127.0.0.1", port=0, http2=False, **options):
+    """
+    Start the stand-in server on a background thread.
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free port)
+        http2 (bool): Speak cleartext HTTP/2 (prior knowledge) instead of HTTP/1.1
+        **options: Passed to MockRoyalRoad
+
+    Returns:
+        tuple: (server, base_url). Call server.shutdown() to stop it.
+    """
+    server = _make_server(host, port, http2)
+    server.state = MockRoyalRoad(**options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Royal Road stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fictions", type=int, default=60000, help="Catalogue size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=0.9,
+                        help="Fraction of IDs that exist outside dead zones")
+    parser.add_argument("--dead-zone-rate", type=float, default=0.05,
+                        help="Fraction of 1000-ID blocks with no fictions")
+    parser.add_argument("--latency", default="none",
+                        help="none | fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA | pareto:MIN,ALPHA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--max-rps", type=int, default=None, help="Return 429 above this request rate")
+    parser.add_argument("--no-fixtures", action="store_true", help="Serve only synthesized pages")
+    parser.add_argument("--http2", action="store_true",
+                        help="Speak cleartext HTTP/2 (prior knowledge) instead of HTTP/1.1")
+    args = parser.parse_args(argv)
+
+    server = _make_server(args.host, args.port, args.http2)
+    server.state = MockRoyalRoad(
+        fictions=args.fictions, seed=args.seed, latency=args.latency,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after, max_rps=args.max_rps,
+        fixtures=not args.no_fixtures, density=args.density,
+        dead_zone_rate=args.dead_zone_rate,
+    )
+    catalogue = server.state.catalogue
+    print("=" * 80)
+    print(f"Royal Road stand-in listening on http://{args.host}:{args.port}"
+          f"{' (HTTP/2, prior knowledge)' if args.http2 else ''}")
+    print(f"Catalogue: {len(catalogue):,} fictions, IDs 1-{catalogue.max_id:,}")
+    print(f"Latency: {args.latency}  Errors: {args.error_rate:.1%}  429s: {args.throttle_rate:.1%}")
+    print(f"Point the scraper at it with: RR_BASE_URL=http://{args.host}:{args.port}")
+    print("=" * 80)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
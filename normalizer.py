@@ -3,7 +3,10 @@ Data normalization and type conversion functions.
 Converts raw scraped data into database-ready format.
 """
 import json
+import sys
 from datetime import datetime
+from profiling import timed
+from records import FictionRecord
 
 
 def to_int(val):
@@ -42,33 +45,112 @@ def to_float(val):
         return None
 
 
+# JSON for each distinct tag list, shared by every record that carries it.
+# Most fictions reuse a few hundred tag combinations; the cache is cleared
+# when it grows past _TAG_CACHE_SIZE so a long crawl cannot grow it forever.
+_TAG_CACHE_SIZE = 50000
+_tag_json = {}
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def encode_tags(tags):
+    """
+    Serialize a tag list to JSON, returning one shared string per distinct list.
+
+    Args:
+        tags (list): Tag names (or None)
+
+    Returns:
+        str: JSON array, e.g. '["Fantasy", "LitRPG"]'
+    """
+    key = tuple(tags) if tags else ()
+    text = _tag_json.get(key)
+    if text is None:
+        if len(_tag_json) >= _TAG_CACHE_SIZE:
+            _tag_json.clear()
+        text = _tag_json[key] = sys.intern(_encode(list(key)))
+    return text
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _record(raw, scraped_at):
+    title = raw.get("title")
+    author = raw.get("author")
+    record = FictionRecord(
+        fiction_id=raw["fiction_id"],
+        title=title.strip() if title else None,
+        author=author.strip() if author else None,
+        tags=encode_tags(raw.get("tags")),
+        pages=to_int(raw.get("pages")),
+        views=to_int(raw.get("views")),
+        avg_views=to_int(raw.get("avg_views")),
+        followers=to_int(raw.get("followers")),
+        favorites=to_int(raw.get("favorites")),
+        rating_count=to_int(raw.get("rating_count")),
+        avg_rating=to_float(raw.get("avg_rating")),
+        status=_intern(raw.get("status")),
+        last_updated=raw.get("last_updated"),
+        scraped_at=scraped_at,
+    )
+    if "fiction_type" in raw:
+        record.fiction_type = _intern(raw.get("fiction_type"))
+        record.warn_tags = encode_tags(raw.get("warning_tags"))
+        record.content_warnings = encode_tags(raw.get("content_warnings"))
+    return record
+
+
+@timed("normalize")
+def normalize_record(raw, scraped_at=None):
+    """
+    Normalize raw fiction data into a FictionRecord.
+
+    Args:
+        raw (dict): Raw fiction data from parser with fiction_id added.
+                    If it also carries parse_fiction_details() fields
+                    (fiction_type, warning_tags, content_warnings), those
+                    are normalized too.
+        scraped_at (str): ISO timestamp to stamp the record with (default: now)
+
+    Returns:
+        FictionRecord: Normalized record ready for database insertion
+    """
+    return _record(raw, scraped_at or datetime.utcnow().isoformat())
+
+
+@timed("normalize")
+def normalize_batch(raws, scraped_at=None):
+    """
+    Normalize a whole batch in one pass.
+    Every record shares one scraped_at string, and identical tag lists and
+    status strings are stored once for the batch.
+
+    Args:
+        raws (list): Raw fiction dicts (see normalize_record)
+        scraped_at (str): ISO timestamp for the batch (default: now)
+
+    Returns:
+        list: FictionRecord per raw dict, in order
+    """
+    scraped_at = scraped_at or datetime.utcnow().isoformat()
+    return [_record(raw, scraped_at) for raw in raws]
+
+
+@timed("normalize")
 def normalize_fiction(raw):
     """
     Normalize raw fiction data into database-ready format.
+    Same as normalize_record(), returned as a plain dict.
     
     Args:
-        raw (dict): Raw fiction data from parser with fiction_id added
+        raw (dict): Raw fiction data from parser with fiction_id added.
+                    If it also carries parse_fiction_details() fields
+                    (fiction_type, warning_tags, content_warnings), those
+                    are normalized too.
         
     Returns:
         dict: Normalized data ready for database insertion
     """
-    return {
-        "fiction_id": raw["fiction_id"],
-        "title": raw["title"].strip() if raw.get("title") else None,
-        "author": raw["author"].strip() if raw.get("author") else None,
-
-        "tags": json.dumps(raw.get("tags", []), ensure_ascii=False),
-        "pages": to_int(raw.get("pages")),
-
-        "views": to_int(raw.get("views")),
-        "avg_views": to_int(raw.get("avg_views")),
-        "followers": to_int(raw.get("followers")),
-        "favorites": to_int(raw.get("favorites")),
-        "rating_count": to_int(raw.get("rating_count")),
-        "avg_rating": to_float(raw.get("avg_rating")),
-
-        "status": raw.get("status"),
-        "last_updated": raw.get("last_updated"),
-
-        "scraped_at": datetime.utcnow().isoformat()
-    }
+    return _record(raw, datetime.utcnow().isoformat()).as_dict()
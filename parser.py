@@ -4,10 +4,20 @@ Extracts structured data from Royal Road HTML pages.
 """
 import re
 import json
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
+from profiling import timed
 from config import BASE_URL
 
 
+def _soup(html):
+    """Build a soup from HTML, or pass through an already-parsed soup"""
+    if isinstance(html, BeautifulSoup):
+        return html
+    return BeautifulSoup(html, "html.parser")
+
+
+@timed("parse")
 def parse_listing_links(html):
     """
     Parse fiction links from a listing page.
@@ -31,12 +41,47 @@ def parse_listing_links(html):
     return links
 
 
+@timed("parse")
+def parse_latest_updates(html):
+    """
+    Parse fiction links and update times from a latest-updates listing page.
+    
+    Args:
+        html (str): HTML content of a latest-updates listing page
+        
+    Returns:
+        list: List of (url, unixtime) tuples in page order (newest first).
+              unixtime is the newest release time in the item, or None.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    items = []
+    
+    for item in soup.select("div.fiction-list-item"):
+        a = item.select_one("h2.fiction-title a")
+        if not a:
+            continue
+        href = a.get("href")
+        if not href or not href.startswith("/fiction/"):
+            continue
+        
+        times = []
+        for t in item.select("time[unixtime]"):
+            try:
+                times.append(int(t.get("unixtime")))
+            except (TypeError, ValueError):
+                pass
+        items.append((BASE_URL + href, max(times) if times else None))
+    
+    return items
+
+
+@timed("parse")
 def parse_fiction_page(html):
     """
     Parse fiction metadata from a fiction page.
     
     Args:
-        html (str): HTML content of a fiction page
+        html (str or BeautifulSoup): HTML content of a fiction page
         
     Returns:
         dict: Dictionary containing fiction metadata with keys:
@@ -54,7 +99,7 @@ def parse_fiction_page(html):
             - status (str or None)
             - last_updated (str or None)
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _soup(html)
     data = {}
     
     # Title - Royal Road uses h1.font-white for fiction titles
@@ -110,12 +155,13 @@ def parse_fiction_page(html):
     return data
 
 
+@timed("parse")
 def parse_fiction_details(html):
     """
     Parse detailed fields including warnings and status from fiction page.
     
     Args:
-        html (str): HTML content of a fiction page
+        html (str or BeautifulSoup): HTML content of a fiction page
         
     Returns:
         dict: Dictionary containing:
@@ -125,7 +171,7 @@ def parse_fiction_details(html):
             - warning_tags (list)
             - content_warnings (list)
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _soup(html)
     result = {
         'fiction_type': None,
         'status': None,
@@ -183,3 +229,168 @@ def parse_fiction_details(html):
                 result['content_warnings'].append(warning_text)
 
     return result
+
+
+@timed("parse")
+def parse_fiction_full(html):
+    """
+    Parse a fiction page once and combine parse_fiction_page() with
+    parse_fiction_details().
+    
+    Status and last_updated from the detail labels take precedence over the
+    stats block, matching what update_db.py stores.
+    
+    Args:
+        html (str): HTML content of a fiction page
+        
+    Returns:
+        dict: parse_fiction_page() fields plus fiction_type, warning_tags
+              and content_warnings
+    """
+    soup = _soup(html)
+    data = parse_fiction_page(soup)
+    details = parse_fiction_details(soup)
+    
+    data['fiction_type'] = details['fiction_type']
+    data['warning_tags'] = details['warning_tags']
+    data['content_warnings'] = details['content_warnings']
+    if details['status']:
+        data['status'] = details['status']
+    if details['last_updated']:
+        data['last_updated'] = details['last_updated']
+    
+    return data
+
+
+CHAPTER_ID_RE = re.compile(r"/chapter/(\d+)")
+
+
+def parse_chapter_count(html):
+    """
+    Chapter count announced by the table of contents (data-chapters).
+
+    Present in the page head, so it can be read without the chapter rows.
+
+    Returns:
+        int or None: Chapter count, or None if the page does not say
+    """
+    table = _soup(html).select_one("table#chapters")
+    try:
+        return int(table["data-chapters"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+@timed("parse")
+def parse_chapters(html):
+    """
+    Parse the table of contents of a fiction page.
+
+    Args:
+        html (str or BeautifulSoup): HTML content of a (complete) fiction page
+
+    Returns:
+        list: One dict per chapter in page order, with keys chapter_id (int),
+              position (int, 1-based), title (str) and published (int Unix
+              time, or None)
+    """
+    chapters = []
+    for row in _soup(html).select("table#chapters tr.chapter-row"):
+        link = row.select_one("a[href]")
+        match = CHAPTER_ID_RE.search(row.get("data-url") or (link["href"] if link else ""))
+        if not match:
+            continue
+        time_tag = row.select_one("time[unixtime]")
+        try:
+            published = int(time_tag["unixtime"]) if time_tag else None
+        except ValueError:
+            published = None
+        chapters.append({
+            "chapter_id": int(match.group(1)),
+            "position": len(chapters) + 1,
+            "title": link.get_text(strip=True) if link else "",
+            "published": published,
+        })
+    return chapters
+
+
+class FictionHeadScanner(HTMLParser):
+    """
+    Incremental scanner that reports when a streamed fiction page contains
+    every section parse_fiction_page() / parse_fiction_details() read.
+    
+    The title, labels, tags, warnings and stats block all sit above the
+    chapter table; the first chapter <time unixtime> tag (last_updated)
+    is the last field needed, so the scan is complete once the stats block
+    has closed and a time tag has been seen. Everything after that (the
+    rest of the table of contents, comments, footer) is not needed.
+
+    With `toc`, the whole chapter table may be kept too: when the table's
+    opening tag arrives, toc(chapter_count) (count from data-chapters, or
+    None) decides whether the scan continues to the end of the table.
+    """
+    
+    def __init__(self, toc=None):
+        super().__init__(convert_charrefs=False)
+        self.seen = set()
+        self._stats_depth = 0
+        self.toc = toc
+        self.want_toc = False
+    
+    @property
+    def done(self):
+        if self.want_toc and "toc" not in self.seen:
+            return False
+        return {"title", "stats", "time"} <= self.seen
+    
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        if tag == "h1":
+            self.seen.add("title")
+        elif tag == "time" and attrs.get("unixtime"):
+            self.seen.add("time")
+        elif tag == "table" and attrs.get("id") == "chapters" and self.toc is not None:
+            try:
+                count = int(attrs.get("data-chapters"))
+            except (TypeError, ValueError):
+                count = None
+            self.want_toc = bool(self.toc(count))
+        if tag == "div":
+            if self._stats_depth:
+                self._stats_depth += 1
+            elif "stats-content" in (attrs.get("class") or "").split():
+                self._stats_depth = 1
+    
+    def handle_endtag(self, tag):
+        if tag == "div" and self._stats_depth:
+            self._stats_depth -= 1
+            if not self._stats_depth:
+                self.seen.add("stats")
+        elif tag == "table" and self.want_toc:
+            self.seen.add("toc")
+
+
+def truncate_fiction_head(html, chunk_size=16384, toc=None):
+    """
+    Cut a fiction page after the last section the fiction parsers need.
+    
+    Applies the same FictionHeadScanner cut-off as scraper.fetch_fiction_head()
+    to an already-downloaded page (used by the benchmarks and tests).
+    
+    Args:
+        html (str): Full HTML of a fiction page
+        chunk_size (int): Feed granularity, matching the streaming fetch
+        toc (callable): Keep the chapter table when toc(chapter_count) is true
+        
+    Returns:
+        tuple: (html, truncated) - the head of the page and whether it was cut
+    """
+    scanner = FictionHeadScanner(toc)
+    for start in range(0, len(html), chunk_size):
+        scanner.feed(html[start:start + chunk_size])
+        if scanner.done:
+            end = start + chunk_size
+            return html[:end], end < len(html)
+    return html, False
@@ -0,0 +1,441 @@
+"""
+Profiling mode for the scrape and update entry points.
+Fetch, parse, normalize, upsert and sleep are timed as stages (wall and CPU
+time per call) and each fiction page's stage timings are tracked, so the
+slowest pages can be saved with their HTML and re-timed offline. Optional
+modes add more detail:
+
+    sample       - background stack sampling of the main thread (the default;
+                   ~25% overhead, collapsed stacks for flame graphs)
+    cprofile     - one cProfile per stage (.prof files + top functions; exact
+                   call counts but parsing runs ~3x slower)
+    tracemalloc  - bytes allocated per stage and top allocation sites/growth
+
+A report directory is written when the process exits.
+
+Usage:
+    python run_scrape.py --profile                     # timings, stack samples, slow pages
+    python run_scrape.py --profile=cprofile,tracemalloc
+    python run_scrape.py --profile=timings --frontier   # stage timings and slow pages only
+    python update_db.py --profile=cprofile
+    python profiling.py replay profiles/20260101-120000 [--cprofile]
+"""
+import argparse
+import atexit
+import contextlib
+import cProfile
+import heapq
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from functools import wraps
+from urllib.parse import urlsplit
+
+import events
+from config import PROFILE_DIR, PROFILE_SLOW_PAGES, PROFILE_SAMPLE_INTERVAL, PROFILE_TOP
+
+MODES = ("cprofile", "sample", "tracemalloc")
+DEFAULT_MODES = ("sample",)
+
+_NULL = contextlib.nullcontext()
+
+
+class StageStats:
+    """Running totals for one stage"""
+
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.max = 0.0
+        self.alloc = 0
+        self.durations = []
+
+    def add(self, wall, cpu, alloc):
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.max = max(self.max, wall)
+        self.alloc += alloc
+        self.durations.append(wall)
+
+    def percentile(self, pct):
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Profiler:
+    """Stage timer, optional profilers and slow-page keeper (disabled by default)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.modes = set()
+        self.out_dir = None
+        self.slow_pages = PROFILE_SLOW_PAGES
+        self.stats = defaultdict(StageStats)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles = {}
+        self._slowest = []
+        self._seq = itertools.count()
+        self._samples = Counter()
+        self._sampler = None
+        self._stop = threading.Event()
+        self._main_stack = None
+        self._baseline = None
+        self._started = None
+        self._finished = False
+
+    def start(self, modes=DEFAULT_MODES, out_dir=None, slow_pages=PROFILE_SLOW_PAGES):
+        """
+        Turn profiling on for the rest of the process; the report is written at exit.
+
+        Args:
+            modes (iterable): Any of MODES
+            out_dir (str): Report directory (default: PROFILE_DIR/<timestamp>)
+            slow_pages (int): Slowest pages to keep
+        """
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown profile mode(s): {', '.join(sorted(unknown))}")
+        self.modes = set(modes)
+        self.out_dir = out_dir or os.path.join(PROFILE_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        self.slow_pages = slow_pages
+        self._started = time.perf_counter()
+        self._main_stack = self._stack()
+        if "tracemalloc" in self.modes:
+            tracemalloc.start(1)  # Allocation sites by line; deeper tracebacks cost far more
+            self._baseline = tracemalloc.take_snapshot()
+        if "sample" in self.modes:
+            self._sampler = threading.Thread(target=self._sample_loop, args=(threading.get_ident(),),
+                                             name="profile-sampler", daemon=True)
+            self._sampler.start()
+        self.enabled = True
+        atexit.register(self.finish)
+        events.flush()
+        print(f"✓ Profiling on ({', '.join(sorted(self.modes)) or 'timings only'}) -> {self.out_dir}")
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    # ----------------------------------------------------------------- stages
+
+    def stage(self, name):
+        """Context manager timing one call of a stage (no-op while disabled)"""
+        if not self.enabled:
+            return _NULL
+        return self._stage(name)
+
+    @contextlib.contextmanager
+    def _stage(self, name):
+        stack = self._stack()
+        if name in stack:
+            # Same stage nested (e.g. a fetch falling back to another fetch): count once
+            yield
+            return
+        profile = None
+        if not stack and "cprofile" in self.modes and stack is self._main_stack:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+        tracing = tracemalloc.is_tracing()
+        mem_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        stack.append(name)
+        if profile:
+            profile.enable()
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            if profile:
+                profile.disable()
+            stack.pop()
+            alloc = max(tracemalloc.get_traced_memory()[0] - mem_before, 0) if tracing else 0
+            with self._lock:
+                self.stats[name].add(wall, cpu, alloc)
+            page = getattr(self._local, "page", None)
+            if page is not None:
+                page["stages"][name] = page["stages"].get(name, 0.0) + wall
+
+    # ------------------------------------------------------------------ pages
+
+    def page(self, url):
+        """Context manager grouping the stages of one page (no-op while disabled)"""
+        if not self.enabled:
+            return _NULL
+        return self._page(url)
+
+    @contextlib.contextmanager
+    def _page(self, url):
+        record = {"url": url, "stages": {}, "html": None}
+        self._local.page = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["total"] = time.perf_counter() - start
+            self._local.page = None
+            with self._lock:
+                entry = (record["total"], next(self._seq), record)
+                if len(self._slowest) < self.slow_pages:
+                    heapq.heappush(self._slowest, entry)
+                elif entry[0] > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    def capture_html(self, html):
+        """Attach fetched HTML to the current page (first fetch wins)"""
+        page = getattr(self._local, "page", None)
+        if page is not None and page["html"] is None:
+            page["html"] = html
+
+    # --------------------------------------------------------------- sampling
+
+    def _sample_loop(self, thread_id):
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < 64:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stage = self._main_stack[-1] if self._main_stack else "other"
+            self._samples[";".join([stage] + names[::-1])] += 1
+
+    # ----------------------------------------------------------------- report
+
+    def finish(self):
+        """Stop profiling and write the report directory (runs once, at exit)"""
+        if not self.enabled or self._finished:
+            return None
+        self._finished = True
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=1)
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        lines = self._stage_table()
+        for name, profile in sorted(self._profiles.items()):
+            path = os.path.join(self.out_dir, f"{name}.prof")
+            profile.dump_stats(path)
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            lines += ["", f"--- cProfile: {name} (top {PROFILE_TOP} by cumulative time) ---", out.getvalue().strip()]
+        if self._samples:
+            lines += self._sample_report()
+        if tracemalloc.is_tracing():
+            lines += self._memory_report()
+            tracemalloc.stop()
+        lines += self._save_slow_pages()
+
+        with open(os.path.join(self.out_dir, "report.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        with open(os.path.join(self.out_dir, "stages.json"), "w") as f:
+            json.dump({name: {"calls": s.count, "wall": s.wall, "cpu": s.cpu, "max": s.max,
+                              "p50": s.percentile(50), "p95": s.percentile(95), "alloc_bytes": s.alloc}
+                       for name, s in self.stats.items()}, f, indent=2)
+
+        events.flush()
+        print("\n".join(self._stage_table()))
+        print(f"✓ Profile report written to {self.out_dir}/report.txt")
+        return self.out_dir
+
+    def _stage_table(self):
+        elapsed = time.perf_counter() - self._started
+        lines = ["=" * 100, f"Profile: {elapsed:.1f}s wall, modes: {', '.join(sorted(self.modes)) or 'timings'}",
+                 "=" * 100,
+                 f"{'Stage':<14}{'calls':>8}{'total s':>10}{'share':>8}{'cpu s':>10}{'mean ms':>10}"
+                 f"{'p95 ms':>10}{'max ms':>10}{'alloc MB':>10}",
+                 "-" * 100]
+        for name, s in sorted(self.stats.items(), key=lambda item: -item[1].wall):
+            lines.append(f"{name:<14}{s.count:>8,}{s.wall:>10.2f}{s.wall / elapsed:>8.0%}{s.cpu:>10.2f}"
+                         f"{s.wall / s.count * 1000:>10.1f}{s.percentile(95) * 1000:>10.1f}"
+                         f"{s.max * 1000:>10.1f}{s.alloc / 1e6:>10.1f}")
+        lines.append("=" * 100)
+        return lines
+
+    def _sample_report(self):
+        with open(os.path.join(self.out_dir, "samples.folded"), "w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+        leaf = Counter()
+        for stack, count in self._samples.items():
+            parts = stack.split(";")
+            leaf[(parts[0], parts[-1])] += count
+        total = sum(self._samples.values())
+        lines = ["", f"--- Sampled stacks: {total:,} samples every {PROFILE_SAMPLE_INTERVAL * 1000:.0f} ms "
+                     f"(samples.folded) - top self time ---"]
+        for (stage, func), count in leaf.most_common(PROFILE_TOP):
+            lines.append(f"{count / total:>7.1%}  {stage:<12}{func}")
+        return lines
+
+    def _memory_report(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ["", f"--- tracemalloc: {current / 1e6:.1f} MB live, {peak / 1e6:.1f} MB peak ---",
+                 "Top allocation sites (live):"]
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            lines.append(f"  {stat.size / 1024:>10.1f} KiB {stat.count:>8,} blocks  {stat.traceback}")
+        if self._baseline is not None:
+            lines.append("Growth since start:")
+            for stat in snapshot.compare_to(self._baseline, "lineno")[:PROFILE_TOP]:
+                lines.append(f"  {stat.size_diff / 1024:>+10.1f} KiB {stat.count_diff:>+8,} blocks  {stat.traceback}")
+        return lines
+
+    def _save_slow_pages(self):
+        if not self._slowest:
+            return []
+        page_dir = os.path.join(self.out_dir, "slow_pages")
+        os.makedirs(page_dir, exist_ok=True)
+        index = []
+        lines = ["", f"--- {len(self._slowest)} slowest pages (slow_pages/) ---"]
+        for rank, (total, _, record) in enumerate(sorted(self._slowest, key=lambda e: -e[0]), 1):
+            filename = None
+            if record["html"] is not None:
+                filename = f"{rank:03d}.html"
+                with open(os.path.join(page_dir, filename), "w", encoding="utf-8") as f:
+                    f.write(record["html"])
+            index.append({"url": record["url"], "total": total, "stages": record["stages"], "file": filename})
+            timings = ", ".join(f"{k} {v * 1000:.0f}" for k, v in sorted(record["stages"].items(), key=lambda i: -i[1]))
+            lines.append(f"{rank:>4}. {total * 1000:>8.0f} ms  {record['url']}  ({timings})")
+        with open(os.path.join(page_dir, "index.json"), "w") as f:
+            json.dump(index, f, indent=2)
+        return lines
+
+
+profiler = Profiler()
+
+
+def timed(stage_name, capture_html=False):
+    """
+    Decorator timing a function as a profiling stage.
+
+    Args:
+        stage_name (str): Stage the call is counted under
+        capture_html (bool): Attach a str return value to the current page
+
+    Returns:
+        callable: Decorator (calls straight through while profiling is off)
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.stage(stage_name):
+                result = func(*args, **kwargs)
+            if capture_html and isinstance(result, str):
+                profiler.capture_html(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def enable_from_argv(argv):
+    """
+    Start profiling if argv has --profile[=modes] (or RR_PROFILE is set), and
+    remove the flag so the script's own argument handling never sees it.
+
+    Args:
+        argv (list): Command line, modified in place (usually sys.argv)
+
+    Returns:
+        bool: True if profiling was started
+    """
+    spec = os.environ.get("RR_PROFILE")
+    for arg in list(argv[1:]):
+        if arg == "--profile" or arg.startswith("--profile="):
+            argv.remove(arg)
+            spec = arg.partition("=")[2] or "default"
+    if spec is None or profiler.enabled:
+        return False
+    if spec in ("", "default", "1"):
+        modes = DEFAULT_MODES
+    elif spec == "timings":
+        modes = ()
+    else:
+        modes = [m.strip() for m in spec.split(",") if m.strip()]
+    profiler.start(modes)
+    return True
+
+
+def replay(report_dir, use_cprofile=False):
+    """
+    Re-time the parse and normalize stages on a run's saved slow pages.
+
+    Args:
+        report_dir (str): Profile report directory
+        use_cprofile (bool): Also print a cProfile of all replays
+
+    Returns:
+        list: (url, recorded_stages, replay_stages) per page
+    """
+    from parser import parse_fiction_page, parse_fiction_details
+    from normalizer import normalize_fiction
+
+    with open(os.path.join(report_dir, "slow_pages", "index.json")) as f:
+        index = json.load(f)
+    profile = cProfile.Profile() if use_cprofile else None
+    results = []
+    print(f"{'URL':<50}{'recorded ms':>14}{'parse ms':>10}{'details ms':>12}{'normalize ms':>14}")
+    print("-" * 100)
+    for entry in index:
+        if not entry.get("file"):
+            continue
+        with open(os.path.join(report_dir, "slow_pages", entry["file"]), encoding="utf-8") as f:
+            html = f.read()
+        if profile:
+            profile.enable()
+        t0 = time.perf_counter()
+        raw = parse_fiction_page(html)
+        t1 = time.perf_counter()
+        parse_fiction_details(html)
+        t2 = time.perf_counter()
+        normalize_fiction(dict(raw, fiction_id=0))
+        t3 = time.perf_counter()
+        if profile:
+            profile.disable()
+        timings = {"parse": t1 - t0, "details": t2 - t1, "normalize": t3 - t2}
+        results.append((entry["url"], entry["stages"], timings))
+        print(f"{urlsplit(entry['url']).path[-49:]:<50}{entry['total'] * 1000:>14.0f}{timings['parse'] * 1000:>10.1f}"
+              f"{timings['details'] * 1000:>12.1f}{timings['normalize'] * 1000:>14.2f}")
+    if profile:
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profiling reports and offline replay")
+    sub = parser.add_subparsers(dest="command")
+    rp = sub.add_parser("replay", help="Re-time parsing on a run's saved slowest pages")
+    rp.add_argument("report_dir")
+    rp.add_argument("--cprofile", action="store_true", help="Print a cProfile of the replays")
+    sp = sub.add_parser("show", help="Print a saved report")
+    sp.add_argument("report_dir")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        replay(args.report_dir, args.cprofile)
+    elif args.command == "show":
+        with open(os.path.join(args.report_dir, "report.txt"), encoding="utf-8") as f:
+            print(f.read())
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
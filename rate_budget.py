@@ -0,0 +1,323 @@
+"""
+Host-wide shared request budget.
+A token bucket stored in a small SQLite file, so every process on the host
+(run_scrape, update_db, id_crawler, verify/inspect scripts, ...) draws from
+one aggregate rate. Active tools share it by weighted fair queuing.
+
+Usage:
+    python rate_budget.py status     # current consumption per tool
+    python rate_budget.py reset      # clear usage history and refill the bucket
+"""
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+from runtime_config import settings
+from config import (
+    RATE_BUDGET_ENABLED,
+    RATE_BUDGET_DB,
+    RATE_BUDGET_RPS,
+    RATE_BUDGET_BURST,
+    RATE_BUDGET_ACTIVE_WINDOW,
+    RATE_BUDGET_WEIGHTS,
+)
+
+# A tool may run this many tokens (weight-normalized) ahead of a waiting contender
+FAIR_SLACK = 1.0
+USAGE_RETENTION_SECONDS = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clients (
+    tool TEXT PRIMARY KEY,
+    vtime REAL NOT NULL,
+    waiting INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage (
+    tool TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    count REAL NOT NULL,
+    PRIMARY KEY (tool, minute)
+);
+"""
+
+_tool_name = None
+_enabled = RATE_BUDGET_ENABLED
+
+
+def set_enabled(enabled):
+    """Turn budget enforcement on/off for this process (e.g. against a local stand-in)"""
+    global _enabled
+    _enabled = enabled
+
+
+def set_tool(name):
+    """Set the tool name this process reports to the shared budget"""
+    global _tool_name
+    _tool_name = name
+
+
+def current_tool():
+    """Tool name for this process (defaults to the script name)"""
+    if _tool_name:
+        return _tool_name
+    script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else ""
+    return os.path.splitext(script)[0] or "default"
+
+
+class RequestBudget:
+    """Cross-process token bucket with per-tool weighted fair sharing"""
+
+    def __init__(self, db_path=RATE_BUDGET_DB, rps=RATE_BUDGET_RPS, burst=RATE_BUDGET_BURST,
+                 weights=None, active_window=RATE_BUDGET_ACTIVE_WINDOW):
+        self.db_path = db_path
+        self.rps = rps
+        self.burst = burst
+        self.weights = dict(RATE_BUDGET_WEIGHTS if weights is None else weights)
+        self.active_window = active_window
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def weight(self, tool):
+        return self.weights.get(tool, self.weights.get("default", 0.5))
+
+    def _refill(self, conn, now):
+        row = conn.execute("SELECT tokens, updated FROM bucket WHERE id = 1").fetchone()
+        if row is None:
+            tokens = float(self.burst)
+        else:
+            tokens = min(float(self.burst), row[0] + max(0.0, now - row[1]) * self.rps)
+        return tokens
+
+    def try_acquire(self, tool, cost=1.0):
+        """
+        Attempt to take `cost` tokens for `tool` in one transaction.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds to wait before retrying
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens = self._refill(conn, now)
+            active_since = now - self.active_window
+
+            row = conn.execute("SELECT vtime, last_seen FROM clients WHERE tool = ?", (tool,)).fetchone()
+            floor = conn.execute(
+                "SELECT MIN(vtime) FROM clients WHERE last_seen >= ? AND tool != ?",
+                (active_since, tool)).fetchone()[0]
+            if row is None:
+                vtime = floor or 0.0
+            else:
+                vtime = row[0]
+                # A tool returning from idle must not spend credit it banked while away
+                if row[1] < active_since and floor is not None:
+                    vtime = max(vtime, floor)
+
+            contender = conn.execute(
+                "SELECT MIN(vtime) FROM clients WHERE waiting = 1 AND last_seen >= ? AND tool != ?",
+                (active_since, tool)).fetchone()[0]
+            fair = contender is None or vtime <= contender + FAIR_SLACK
+
+            if tokens >= cost and fair:
+                tokens -= cost
+                vtime += cost / self.weight(tool)
+                waiting, wait = 0, 0.0
+                conn.execute(
+                    "INSERT INTO usage (tool, minute, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT(tool, minute) DO UPDATE SET count = count + excluded.count",
+                    (tool, int(now // 60), cost))
+                if random.random() < 0.01:
+                    conn.execute("DELETE FROM usage WHERE minute < ?",
+                                 (int((now - USAGE_RETENTION_SECONDS) // 60),))
+            else:
+                waiting = 1
+                shortfall = max(0.0, cost - tokens) / self.rps
+                wait = max(shortfall, 0.5 / self.rps)
+
+            conn.execute("INSERT OR REPLACE INTO bucket (id, tokens, updated) VALUES (1, ?, ?)",
+                         (tokens, now))
+            conn.execute(
+                "INSERT INTO clients (tool, vtime, waiting, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(tool) DO UPDATE SET vtime = excluded.vtime, "
+                "waiting = excluded.waiting, last_seen = excluded.last_seen",
+                (tool, vtime, waiting, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, tool=None, cost=1.0, timeout=None):
+        """
+        Block until `cost` tokens are granted to `tool`.
+
+        Args:
+            tool (str): Tool name (defaults to current_tool())
+            cost (float): Tokens to take (1 per HTTP request)
+            timeout (float): Give up after this many seconds
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            TimeoutError: If timeout elapsed before tokens were granted
+        """
+        tool = tool or current_tool()
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(tool, cost)
+            if wait == 0:
+                return time.monotonic() - start
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise TimeoutError(f"Rate budget not granted to {tool} within {timeout}s")
+            time.sleep(wait)
+
+    def status(self):
+        """
+        Snapshot of the shared budget.
+
+        Returns:
+            dict: tokens, limits and per-tool request counts and rates
+                  over the last 1/10/60 minutes
+        """
+        now = time.time()
+        conn = self._conn()
+        tokens = self._refill(conn, now)
+        minute = int(now // 60)
+        windows = (1, 10, 60)
+        tools = {}
+        for tool, m, count in conn.execute(
+                "SELECT tool, minute, count FROM usage WHERE minute > ?", (minute - 60,)):
+            entry = tools.setdefault(tool, {f"{n}m": 0.0 for n in windows})
+            for n in windows:
+                if minute - m < n:
+                    entry[f"{n}m"] += count
+        # Windows cover n minute buckets, the newest of which is still filling
+        spans = {f"{n}m": (n - 1) * 60 + (now % 60 or 60) for n in windows}
+        for entry in tools.values():
+            entry["rates"] = {key: entry[key] / spans[key] for key in spans}
+        clients = {
+            tool: {"active": last_seen >= now - self.active_window, "waiting": bool(waiting),
+                   "weight": self.weight(tool)}
+            for tool, waiting, last_seen in conn.execute(
+                "SELECT tool, waiting, last_seen FROM clients")
+        }
+        return {"tokens": tokens, "rps": self.rps, "burst": self.burst,
+                "usage": tools, "clients": clients}
+
+    def reset(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM usage")
+        conn.execute("DELETE FROM clients")
+        conn.execute("DELETE FROM bucket")
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_budget():
+    """Process-wide RequestBudget instance"""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = RequestBudget()
+        # Follow live changes to the host-wide rate (runtime_config.py)
+        _budget.rps = settings.RATE_BUDGET_RPS
+        _budget.burst = settings.RATE_BUDGET_BURST
+        return _budget
+
+
+def acquire(cost=1.0, tool=None):
+    """
+    Take tokens from the shared budget before an HTTP request.
+    No-op when disabled (RATE_BUDGET_ENABLED / RR_RATE_BUDGET=0 / set_enabled). If the budget database cannot be
+    used, the request proceeds (fail open) with a warning.
+
+    Returns:
+        float: Seconds spent waiting
+    """
+    if not _enabled:
+        return 0.0
+    try:
+        return get_budget().acquire(tool=tool, cost=cost)
+    except sqlite3.Error as e:
+        print(f"⚠ Warning: shared rate budget unavailable ({e}); continuing unthrottled")
+        return 0.0
+
+
+def try_acquire(cost=1.0, tool=None):
+    """
+    Take tokens from the shared budget if they are available now.
+    Same fail-open behaviour as acquire().
+
+    Returns:
+        float: 0 if the tokens were taken, otherwise seconds to wait before retrying
+    """
+    if not _enabled:
+        return 0.0
+    try:
+        return get_budget().try_acquire(tool or current_tool(), cost)
+    except sqlite3.Error as e:
+        print(f"⚠ Warning: shared rate budget unavailable ({e}); continuing unthrottled")
+        return 0.0
+
+
+def print_status():
+    """Print current consumption per tool"""
+    budget = get_budget()
+    status = budget.status()
+    total_rate = sum(u["rates"]["1m"] for u in status["usage"].values())
+    print("=" * 72)
+    print("Shared Request Budget")
+    print("=" * 72)
+    print(f"Limit:        {status['rps']} req/s (burst {status['burst']})")
+    print(f"Tokens:       {status['tokens']:.2f}")
+    print(f"Utilization:  {total_rate / status['rps']:.0%} over the last minute")
+    print("-" * 72)
+    print(f"{'Tool':<22}{'weight':>8}{'state':>10}{'req/s 1m':>11}{'req/s 10m':>11}{'60m':>9}")
+    tools = sorted(set(status["usage"]) | set(status["clients"]))
+    for tool in tools:
+        usage = status["usage"].get(tool, {"60m": 0, "rates": {"1m": 0.0, "10m": 0.0}})
+        client = status["clients"].get(tool, {"active": False, "waiting": False,
+                                               "weight": budget.weight(tool)})
+        state = "waiting" if client["waiting"] and client["active"] else (
+            "active" if client["active"] else "idle")
+        print(f"{tool:<22}{client['weight']:>8}{state:>10}{usage['rates']['1m']:>11.2f}"
+              f"{usage['rates']['10m']:>11.2f}{int(usage['60m']):>9}")
+    print("=" * 72)
+
+
+def main():
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else "status"
+    if command == "status":
+        print_status()
+    elif command == "reset":
+        get_budget().reset()
+        print("✓ Shared rate budget reset")
+    else:
+        print(f"Unknown command: {command}")
+        print("Usage: python rate_budget.py [status|reset]")
+
+
+if __name__ == "__main__":
+    main()
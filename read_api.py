@@ -0,0 +1,578 @@
+"""
+Read-only HTTP/JSON API over the fictions database.
+Serves downstream consumers from read-only SQLite connections (WAL mode, so
+readers never block the scraper), with keyset pagination on the leaderboard
+indexes, pre-decoded JSON columns and an LRU response cache that is dropped
+whenever the database changes.
+
+Endpoints:
+    GET /fictions/<id>
+    GET /fictions?ids=1,2,3
+    GET /fictions?tag=Fantasy&sort=followers&limit=50&cursor=...
+        filters: tag, status, type (one at a time)
+        sort:    followers | avg_rating | views | fiction_id   order: desc | asc
+    GET /stats?kind=tag|status|type
+    GET /health
+
+Usage:
+    python read_api.py                          # serve on READ_API_HOST:READ_API_PORT
+    python read_api.py serve --port 8780 --db royalroad.db
+    python read_api.py serve --snapshots        # newest snapshot (snapshot.py)
+    python read_api.py loadtest --threads 16 --seconds 10
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from config import (
+    DB_PATH,
+    READ_API_HOST,
+    READ_API_PORT,
+    READ_API_CACHE_SIZE,
+    READ_API_PAGE_SIZE,
+    READ_API_MAX_PAGE_SIZE,
+    SNAPSHOT_DIR,
+)
+import snapshot
+
+COLUMNS = ("fiction_id", "title", "author", "tags", "pages", "views", "avg_views", "followers",
+           "favorites", "rating_count", "avg_rating", "status", "last_updated", "fiction_type",
+           "warn_tags", "content_warnings", "scraped_at")
+JSON_COLUMNS = ("tags", "warn_tags", "content_warnings")
+SORTS = ("followers", "avg_rating", "views", "fiction_id")
+FILTERS = {"tag": "tag:", "status": "status:", "type": "type:"}
+SELECT = ", ".join(f"f.{c}" for c in COLUMNS)
+
+
+class ApiError(Exception):
+    """Client error carrying an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+@lru_cache(maxsize=65536)
+def _decode_list(text):
+    """Decode a JSON list column once per distinct value (tag lists repeat a lot)"""
+    if not text:
+        return ()
+    try:
+        return tuple(json.loads(text))
+    except ValueError:
+        return ()
+
+
+def _to_dict(row):
+    item = dict(zip(COLUMNS, row))
+    for column in JSON_COLUMNS:
+        item[column] = list(_decode_list(item[column]))
+    return item
+
+
+def encode_cursor(value, fiction_id):
+    raw = json.dumps([value, fiction_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, fiction_id = json.loads(base64.urlsafe_b64decode(padded))
+        return value, int(fiction_id)
+    except (ValueError, TypeError):
+        raise ApiError(400, "Invalid cursor")
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class ResponseCache:
+    """
+    Thread-safe LRU of encoded responses.
+
+    Entries are tagged with the database generation; the generation advances
+    when FictionReader notices a commit (PRAGMA data_version changed), which
+    drops every cached response at once.
+    """
+
+    def __init__(self, size=READ_API_CACHE_SIZE):
+        self.size = size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, generation, value):
+        with self._lock:
+            if generation != self.generation:
+                return  # Computed before the latest change; do not cache
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "generation": self.generation,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 3) if total else None}
+
+
+# =============================================================================
+# Queries
+# =============================================================================
+
+class FictionReader:
+    """
+    Read-only queries on per-thread SQLite connections.
+
+    With snapshot_dir the reader serves the newest published snapshot
+    (snapshot.py) instead of the live database, and moves to a new one when
+    the LATEST pointer changes.
+    """
+
+    def __init__(self, db_file, cache=None, snapshot_dir=None):
+        self.snapshot_dir = snapshot_dir
+        self.cache = cache or ResponseCache()
+        self._local = threading.local()
+        self._watch_lock = threading.Lock()
+        if snapshot_dir is not None:
+            self._pointer_mtime = None
+            self.db_file = None
+            self._follow_latest()
+            if self.db_file is None:
+                raise FileNotFoundError(f"No snapshot published in {snapshot_dir}/")
+            return
+        self.db_file = db_file
+        # One long-lived connection watches PRAGMA data_version, which changes
+        # whenever any other connection (the scraper) commits
+        self._watcher = self._connect()
+        self._version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def _connect(self):
+        if self.snapshot_dir is not None:
+            # Published snapshots never change: no locks, no change checks
+            return sqlite3.connect(snapshot.snapshot_uri(self.db_file), uri=True, check_same_thread=False)
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, timeout=30,
+                               check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def check_for_changes(self):
+        """Drop cached responses if the database changed since the last check"""
+        if self.snapshot_dir is not None:
+            self._follow_latest()
+            return
+        with self._watch_lock:
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version:
+                self._version = version
+                self.cache.invalidate()
+
+    def _follow_latest(self):
+        """Switch to the newest snapshot if LATEST was replaced"""
+        try:
+            mtime = os.stat(os.path.join(self.snapshot_dir, snapshot.LATEST_FILE)).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._pointer_mtime:
+            return
+        with self._watch_lock:
+            if mtime == self._pointer_mtime:
+                return
+            entry = snapshot.latest(self.snapshot_dir)
+            self._pointer_mtime = mtime
+            if entry is not None and entry["path"] != self.db_file:
+                self.db_file = entry["path"]
+                self.cache.invalidate()
+
+    def conn(self):
+        """This thread's read-only connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.db_file != self.db_file:
+            if conn is not None:
+                conn.close()
+            self._local.db_file = self.db_file
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def by_id(self, fiction_id):
+        row = self.conn().execute(
+            f"SELECT {SELECT} FROM fictions f WHERE f.fiction_id = ?", (fiction_id,)).fetchone()
+        if row is None:
+            raise ApiError(404, f"Fiction {fiction_id} not found")
+        return _to_dict(row)
+
+    def by_ids(self, ids):
+        if len(ids) > READ_API_MAX_PAGE_SIZE:
+            raise ApiError(400, f"At most {READ_API_MAX_PAGE_SIZE} ids per request")
+        marks = ",".join("?" * len(ids))
+        rows = self.conn().execute(
+            f"SELECT {SELECT} FROM fictions f WHERE f.fiction_id IN ({marks})", ids).fetchall()
+        found = {row[0]: _to_dict(row) for row in rows}
+        return {"items": [found[i] for i in ids if i in found],
+                "missing": [i for i in ids if i not in found]}
+
+    def list(self, scope=None, sort="followers", order="desc", limit=READ_API_PAGE_SIZE, cursor=None):
+        """
+        One page of fictions, optionally in one scope, ordered by a stat.
+
+        Keyset pagination: the cursor holds the last (value, fiction_id) seen,
+        so every page is an index range scan however deep it is.
+        """
+        if sort not in SORTS:
+            raise ApiError(400, f"sort must be one of {', '.join(SORTS)}")
+        if order not in ("desc", "asc"):
+            raise ApiError(400, "order must be desc or asc")
+        limit = max(1, min(limit, READ_API_MAX_PAGE_SIZE))
+        cmp = "<" if order == "desc" else ">"
+        direction = order.upper()
+        params = []
+
+        if sort == "fiction_id":
+            if scope is None:
+                sql = f"SELECT {SELECT}, f.fiction_id FROM fictions f WHERE 1"
+                key = "f.fiction_id"
+            else:
+                sql = (f"SELECT {SELECT}, l.fiction_id FROM leaderboard_entries l "
+                       f"JOIN fictions f ON f.fiction_id = l.fiction_id WHERE l.scope = ?")
+                params.append(scope)
+                key = "l.fiction_id"
+            if cursor:
+                sql += f" AND {key} {cmp} ?"
+                params.append(decode_cursor(cursor)[1])
+            sql += f" ORDER BY {key} {direction} LIMIT ?"
+        else:
+            sql = (f"SELECT {SELECT}, l.{sort} FROM leaderboard_entries l "
+                   f"JOIN fictions f ON f.fiction_id = l.fiction_id "
+                   f"WHERE l.scope = ? AND l.{sort} IS NOT NULL")
+            params.append(scope or "all")
+            if cursor:
+                value, last_id = decode_cursor(cursor)
+                sql += f" AND (l.{sort}, l.fiction_id) {cmp} (?, ?)"
+                params.extend([value, last_id])
+            sql += f" ORDER BY l.{sort} {direction}, l.fiction_id {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self.conn().execute(sql, params).fetchall()
+        items = [_to_dict(row[:-1]) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[-1], last[0])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def stats(self, kind=None):
+        sql = ("SELECT scope, fiction_count, followers_sum, views_sum, rating_sum, rating_count "
+               "FROM aggregate_stats")
+        params = []
+        if kind:
+            if kind not in FILTERS:
+                raise ApiError(400, f"kind must be one of {', '.join(FILTERS)}")
+            sql += " WHERE scope LIKE ?"
+            params.append(FILTERS[kind] + "%")
+        sql += " ORDER BY fiction_count DESC"
+        return {"items": [
+            {"scope": scope, "fictions": count,
+             "avg_followers": followers / count if count else None,
+             "avg_views": views / count if count else None,
+             "avg_rating": rating / rated if rated else None}
+            for scope, count, followers, views, rating, rated in self.conn().execute(sql, params)
+        ]}
+
+
+def route(reader, path, query):
+    """
+    Resolve a request to a JSON-serializable result.
+
+    Raises:
+        ApiError: For unknown routes or bad parameters
+    """
+    def param(name, default=None):
+        values = query.get(name)
+        return values[0] if values else default
+
+    def int_param(name, default):
+        try:
+            return int(param(name, default))
+        except (TypeError, ValueError):
+            raise ApiError(400, f"{name} must be an integer")
+
+    parts = [p for p in path.split("/") if p]
+    if parts == ["health"]:
+        return {"ok": True, "cache": reader.cache.stats()}
+    if parts == ["stats"]:
+        return reader.stats(param("kind"))
+    if parts and parts[0] == "fictions":
+        if len(parts) == 2:
+            try:
+                return reader.by_id(int(parts[1]))
+            except ValueError:
+                raise ApiError(400, "Fiction id must be an integer")
+        if len(parts) == 1:
+            if "ids" in query:
+                try:
+                    ids = [int(i) for i in param("ids").split(",") if i]
+                except ValueError:
+                    raise ApiError(400, "ids must be comma-separated integers")
+                return reader.by_ids(ids)
+            filters = [(name, param(name)) for name in FILTERS if param(name)]
+            if len(filters) > 1:
+                raise ApiError(400, "Use one of tag, status or type per request")
+            scope = FILTERS[filters[0][0]] + filters[0][1] if filters else None
+            return reader.list(scope, param("sort", "followers"), param("order", "desc"),
+                               int_param("limit", READ_API_PAGE_SIZE), param("cursor"))
+    raise ApiError(404, f"Unknown endpoint: {path}")
+
+
+# =============================================================================
+# HTTP
+# =============================================================================
+
+class ReadApiHandler(BaseHTTPRequestHandler):
+    """Request handler delegating to the server's FictionReader"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        reader = self.server.reader
+        cache = reader.cache
+        parts = urlsplit(self.path)
+        key = self.path
+        try:
+            reader.check_for_changes()
+            cached = None if parts.path == "/health" else cache.get(key)
+            if cached is None:
+                generation = cache.generation
+                result = route(reader, parts.path, parse_qs(parts.query))
+                body = json.dumps(result, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                etag = f'"{generation:x}-{zlib.crc32(body):08x}"'
+                cached = (body, etag)
+                if parts.path != "/health":
+                    cache.put(key, generation, cached)
+        except ApiError as e:
+            self._send(e.status, json.dumps({"error": str(e)}).encode("utf-8"))
+            return
+        except sqlite3.Error as e:
+            self._send(503, json.dumps({"error": f"database unavailable: {e}"}).encode("utf-8"))
+            return
+
+        body, etag = cached
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        self._send(200, body, {"ETag": etag})
+
+    def _send(self, status, body, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        for k, v in (extra_headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def db_file_from_url(db_url=DB_PATH):
+    return db_url.replace("sqlite:///", "", 1)
+
+
+def start_server(host=READ_API_HOST, port=READ_API_PORT, db_file=None, cache_size=READ_API_CACHE_SIZE,
+                 snapshot_dir=None):
+    """
+    Start the API on a background thread.
+
+    Args:
+        snapshot_dir (str): Serve the newest snapshot in this directory
+                            instead of the live database
+
+    Returns:
+        tuple: (server, base_url) - call server.shutdown() to stop
+    """
+    if snapshot_dir is None:
+        db_file = db_file or db_file_from_url()
+        if not os.path.exists(db_file):
+            raise FileNotFoundError(f"Database not found: {db_file}")
+    reader = FictionReader(db_file, ResponseCache(cache_size), snapshot_dir=snapshot_dir)
+    server = ThreadingHTTPServer((host, port), ReadApiHandler)
+    server.daemon_threads = True
+    server.reader = reader
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# =============================================================================
+# Load test
+# =============================================================================
+
+def load_test(base_url, threads=16, seconds=10.0, seed=0):
+    """
+    Hammer the API with a mix of by-id, batch, filtered-list and deep-page requests.
+
+    Returns:
+        dict: requests, errors, req_per_sec and latency percentiles (ms)
+    """
+    import requests
+    from latency import LatencyTracker
+
+    session = requests.Session()
+    sample = session.get(f"{base_url}/fictions?sort=fiction_id&limit={READ_API_MAX_PAGE_SIZE}").json()
+    ids = [item["fiction_id"] for item in sample["items"]] or [1]
+    scopes = [s["scope"] for s in session.get(f"{base_url}/stats").json()["items"] if s["scope"] != "all"]
+    filters = [("tag" if s.startswith("tag:") else "status" if s.startswith("status:") else "type",
+                s.split(":", 1)[1]) for s in scopes[:40]] or [(None, None)]
+
+    tracker = LatencyTracker(window=1000000)
+    counts = {"requests": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        http = requests.Session()
+        cursors = {}
+        while time.monotonic() < deadline:
+            roll = rng.random()
+            listing = None
+            if roll < 0.4:
+                path = f"/fictions/{rng.choice(ids)}"
+            elif roll < 0.55:
+                path = "/fictions?ids=" + ",".join(str(i) for i in rng.sample(ids, min(20, len(ids))))
+            else:
+                name, value = rng.choice(filters)
+                listing = (f"/fictions?sort={rng.choice(SORTS[:3])}&limit=50"
+                           + (f"&{name}={value}" if name else ""))
+                # Follow pages deeper with the keyset cursor
+                cursor = cursors.get(listing)
+                path = listing + (f"&cursor={cursor}" if cursor else "")
+            start = time.monotonic()
+            try:
+                r = http.get(base_url + path, timeout=10)
+                ok = r.status_code == 200
+                if listing and ok:
+                    nxt = r.json().get("next_cursor")
+                    cursors[listing] = nxt if nxt and rng.random() < 0.7 else None
+            except requests.RequestException:
+                ok = False
+            tracker.record("api", time.monotonic() - start)
+            with lock:
+                counts["requests"] += 1
+                counts["errors"] += not ok
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.monotonic()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.monotonic() - started
+    summary = tracker.summary().get("api", {})
+    return {
+        "requests": counts["requests"],
+        "errors": counts["errors"],
+        "req_per_sec": round(counts["requests"] / elapsed, 1),
+        "p50_ms": round((summary.get("p50") or 0) * 1000, 2),
+        "p95_ms": round((summary.get("p95") or 0) * 1000, 2),
+        "p99_ms": round((summary.get("p99") or 0) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read-only HTTP/JSON API over the fictions DB")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="Run the API (default)")
+    serve.add_argument("--host", default=READ_API_HOST)
+    serve.add_argument("--port", type=int, default=READ_API_PORT)
+    serve.add_argument("--db", default=None, help="SQLite file (default: from DB_PATH)")
+    serve.add_argument("--snapshots", nargs="?", const=SNAPSHOT_DIR, default=None, metavar="DIR",
+                       help="Serve the newest snapshot (snapshot.py) instead of the live DB")
+    lt = sub.add_parser("loadtest", help="Start the API on a free port and load-test it")
+    lt.add_argument("--db", default=None)
+    lt.add_argument("--url", default=None, help="Test an already running API instead")
+    lt.add_argument("--threads", type=int, default=16)
+    lt.add_argument("--seconds", type=float, default=10.0)
+    lt.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        server = None
+        url = args.url
+        if url is None:
+            server, url = start_server(port=0, db_file=args.db, cache_size=0 if args.no_cache else READ_API_CACHE_SIZE)
+        print(f"Load testing {url} with {args.threads} threads for {args.seconds:g}s...")
+        try:
+            result = load_test(url, args.threads, args.seconds)
+        finally:
+            if server is not None:
+                cache = server.reader.cache.stats()
+                server.shutdown()
+                server.server_close()
+        print("=" * 60)
+        print(f"Requests:   {result['requests']:,} ({result['errors']} errors)")
+        print(f"Throughput: {result['req_per_sec']:,} req/s")
+        print(f"Latency:    p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms")
+        if server is not None:
+            print(f"Cache:      hit rate {cache['hit_rate']}, {cache['generation']} invalidations")
+        print("=" * 60)
+        return
+
+    host = getattr(args, "host", READ_API_HOST)
+    port = getattr(args, "port", READ_API_PORT)
+    server, url = start_server(host, port, getattr(args, "db", None),
+                               snapshot_dir=getattr(args, "snapshots", None))
+    print(f"✓ Read API serving {server.reader.db_file} at {url}")
+    if server.reader.snapshot_dir:
+        print(f"  Following new snapshots in {server.reader.snapshot_dir}/")
+    print("  Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n✓ Stopped")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Unified command-line entry point.
+Every script is a subcommand; its module (and requests/bs4/SQLAlchemy with
+it) is only imported when that subcommand runs, so quick commands like
+`rr status` start in about the time of a bare interpreter.
+
+Usage:
+    rr status                         # checkpoint + DB summary (stdlib only)
+    rr scrape [--incremental|--frontier]
+    rr checkpoint show
+    rr aggregates top --scope tag:Fantasy
+    rr startup-bench                  # time how fast subcommands start
+    rr <command> --help
+
+Install with `pip install -e .` for the `rr` command, or run `python rr.py ...`.
+"""
+import os
+import subprocess
+import sys
+import time
+
+# name -> (module, function, help). Arguments after the name are passed
+# through as the module's own command line.
+COMMANDS = {
+    "scrape": ("run_scrape", "_cli", "Scrape the best-rated listing (--incremental / --frontier)"),
+    "incremental": ("incremental", "main", "Refresh fictions updated since the last run"),
+    "frontier": ("frontier", "main", "Multi-seed frontier crawl"),
+    "id-crawl": ("id_crawler", "main", "Walk fiction ID ranges"),
+    "update": ("update_db", "main", "Backfill missing fields on existing fictions"),
+    "migrate": ("migrations", "main", "Schema migrations and chunked backfills: status, up, backfill"),
+    "checkpoint": ("manage_checkpoint", "main", "Show, clear or set the scrape checkpoint"),
+    "inspect": ("inspect_status", "main", "Print the labels on fiction pages"),
+    "verify-status": ("verify_status_fix", "main", "Check status parsing on known fictions"),
+    "aggregates": ("aggregates", "main", "Per-scope stats and leaderboards"),
+    "archive": ("archive", "main", "Page archive stats and offline re-parse"),
+    "similar": ("similarity", "main", "Tag-vector similarity index"),
+    "api": ("read_api", "main", "Read-only HTTP/JSON API"),
+    "budget": ("rate_budget", "main", "Shared request budget status/reset"),
+    "bench": ("benchmark", "main", "Pipeline benchmarks"),
+    "profile": ("profiling", "main", "Show or replay a --profile report"),
+    "health": ("health", "main", "Parser health alert: status, check, clear"),
+    "sample": ("sampling", "main", "Stratified sample estimates with confidence intervals"),
+    "snapshot": ("snapshot", "main", "Consistent read-only DB snapshots: take, watch, status"),
+    "shards": ("shards", "main", "Merge per-worker shard DBs into the main database"),
+    "config": ("runtime_config", "main", "Live runtime settings: show, set, unset, reload"),
+    "chapters": ("chapters", "main", "Tracked chapter lists and release cadence"),
+    "daemon": ("daemon", "main", "Long-running crawl scheduler: run, status, stop"),
+    "events": ("events", "main", "Render or summarise a JSON-lines crawl event log"),
+    "mock-server": ("mock_server", "main", "Local Royal Road stand-in"),
+}
+
+# Built into this file; they must not import anything heavy
+BUILTINS = {
+    "status": "Checkpoint and database summary",
+    "startup-bench": "Time interpreter startup for each subcommand",
+}
+
+HEAVY_MODULES = ("requests", "bs4", "sqlalchemy", "numpy", "scipy")
+
+# Commands timed by startup-bench (run in fresh interpreters)
+STARTUP_CASES = [
+    ("python -c pass", ["-c", "pass"]),
+    ("rr --help", ["rr.py", "--help"]),
+    ("rr status", ["rr.py", "status"]),
+    ("rr checkpoint show", ["rr.py", "checkpoint", "show"]),
+    ("rr aggregates --help", ["rr.py", "aggregates", "--help"]),
+    ("rr scrape (imports only)", ["-c", "import run_scrape"]),
+]
+
+
+def print_usage():
+    """Print the command list"""
+    print("Usage: rr <command> [args...]\n")
+    print("Commands:")
+    for name, text in BUILTINS.items():
+        print(f"  {name:<15}{text}")
+    for name, (_, _, text) in COMMANDS.items():
+        print(f"  {name:<15}{text}")
+    print("\nRun `rr <command> --help` for a command's own options.")
+
+
+def status():
+    """Print checkpoint and database summary using only the standard library"""
+    import json
+    import sqlite3
+    from config import CHECKPOINT_FILE, DB_PATH, HEALTH_ALERT_FILE, SNAPSHOT_DIR
+
+    print("=" * 60)
+    print("Royal Road Scraper Status")
+    print("=" * 60)
+    if os.path.exists(CHECKPOINT_FILE):
+        try:
+            with open(CHECKPOINT_FILE) as f:
+                cp = json.load(f)
+            print(f"Checkpoint:      page {cp.get('current_page')}, "
+                  f"{cp.get('total_scraped', 0):,} scraped ({cp.get('timestamp')})")
+        except (OSError, ValueError) as e:
+            print(f"Checkpoint:      ⚠ unreadable ({e})")
+    else:
+        print("Checkpoint:      none")
+    if os.path.exists(HEALTH_ALERT_FILE):
+        try:
+            with open(HEALTH_ALERT_FILE) as f:
+                alert = json.load(f)
+            print(f"Parser health:   ✗ {alert.get('reason')} ({alert.get('time')}) - crawls paused")
+        except (OSError, ValueError):
+            print(f"Parser health:   ✗ alert file {HEALTH_ALERT_FILE} present - crawls paused")
+    else:
+        print("Parser health:   ✓ ok")
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "LATEST")) as f:
+            snap = json.load(f)
+        print(f"Read snapshot:   {snap.get('name')} ({snap.get('taken_at')})")
+    except (OSError, ValueError):
+        print("Read snapshot:   none")
+
+    db_file = DB_PATH.replace("sqlite:///", "", 1)
+    if not DB_PATH.startswith("sqlite:///") or not os.path.exists(db_file):
+        print(f"Database:        not found ({DB_PATH})")
+        print("=" * 60)
+        return 1
+    try:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, timeout=5)
+        count, last = conn.execute("SELECT COUNT(*), MAX(scraped_at) FROM fictions").fetchone()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Database:        ✗ {e}")
+        print("=" * 60)
+        return 1
+    size_mb = os.path.getsize(db_file) / (1024 * 1024)
+    print(f"Database:        {db_file} ({size_mb:,.1f} MB)")
+    print(f"Fictions:        {count:,}")
+    print(f"Last scraped:    {last or '-'}")
+    print("=" * 60)
+    return 0
+
+
+def startup_bench(runs=5):
+    """
+    Time each STARTUP_CASES command in fresh interpreters and report which
+    heavy modules it ends up importing.
+
+    Args:
+        runs (int): Runs per command (the median is reported)
+
+    Returns:
+        list: (label, median_ms, heavy_modules) tuples
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    probe = ("import atexit, sys\n"
+             f"atexit.register(lambda: sys.stderr.write('RR_HEAVY=' + ','.join("
+             f"m for m in {HEAVY_MODULES!r} if m in sys.modules) + '\\n'))\n"
+             "sys.argv = sys.argv[1:]\n"
+             "import runpy; runpy.run_path(sys.argv[0], run_name='__main__') "
+             "if sys.argv[0] != '-c' else exec(sys.argv[1])\n")
+    results = []
+    print("=" * 60)
+    print(f"Startup time ({runs} runs each, median)")
+    print("=" * 60)
+    for label, args in STARTUP_CASES:
+        times, heavy = [], ""
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", probe] + args, cwd=here,
+                                  stdin=subprocess.DEVNULL, capture_output=True, text=True)
+            times.append((time.perf_counter() - start) * 1000)
+            for line in proc.stderr.splitlines():
+                if line.startswith("RR_HEAVY="):
+                    heavy = line[len("RR_HEAVY="):]
+        median = sorted(times)[len(times) // 2]
+        results.append((label, median, heavy.split(",") if heavy else []))
+        print(f"{label:<28}{median:>8.0f} ms   {heavy or '-'}")
+    print("=" * 60)
+    return results
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print_usage()
+        return 0
+    name, rest = argv[0], argv[1:]
+
+    if name == "status":
+        return status()
+    if name == "startup-bench":
+        startup_bench(int(rest[0]) if rest else 5)
+        return 0
+    if name not in COMMANDS:
+        print(f"✗ Unknown command: {name}\n")
+        print_usage()
+        return 2
+
+    module_name, func_name, _ = COMMANDS[name]
+    # The module sees its usual command line; argv[0] also names the tool
+    # for the shared request budget
+    sys.argv = [f"{module_name}.py"] + rest
+    import importlib
+    module = importlib.import_module(module_name)
+    result = getattr(module, func_name)()
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\nExiting...")
+        sys.exit(130)
@@ -2,23 +2,21 @@
 Main orchestration script for Royal Road scraper.
 Coordinates the entire scraping pipeline with checkpoint support.
 """
+import logging
 import signal
 import sys
+from itertools import count
 from db import init_db, get_session
-from scraper import fetch_listing_page, fetch_fiction_page
+from scraper import fetch_listing_page, fetch_fiction_head, print_latency_summary
 from parser import parse_listing_links, parse_fiction_page
-from normalizer import normalize_fiction
+from normalizer import normalize_record
 from loader import upsert_fictions
 from checkpoint import Checkpoint
+from profiling import profiler, enable_from_argv
+import events
+import health
 from utils import sleep_with_jitter, format_number, estimate_time_remaining
-from config import (
-    RATE_LIMIT_BETWEEN_PAGES,
-    RATE_LIMIT_BETWEEN_FICTIONS,
-    JITTER_PAGES,
-    JITTER_FICTIONS,
-    MAX_PAGES,
-    MAX_NOVELS
-)
+from runtime_config import settings
 
 
 # Global flag for graceful shutdown
@@ -54,19 +52,25 @@ def main():
     
     # Set up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
+    settings.install("run_scrape")
     
     print("=" * 80)
     print("Royal Road Scraper - Starting")
     print("=" * 80)
-    print(f"Max pages: {MAX_PAGES:,}")
-    print(f"Max novels: {MAX_NOVELS:,}")
-    print(f"Rate limits: {RATE_LIMIT_BETWEEN_PAGES}s ±{JITTER_PAGES}s (pages), "
-          f"{RATE_LIMIT_BETWEEN_FICTIONS}s ±{JITTER_FICTIONS}s (fictions)")
+    print(f"Max pages: {settings.MAX_PAGES:,}")
+    print(f"Max novels: {settings.MAX_NOVELS:,}")
+    print(f"Rate limits: {settings.RATE_LIMIT_BETWEEN_PAGES}s ±{settings.JITTER_PAGES}s (pages), "
+          f"{settings.RATE_LIMIT_BETWEEN_FICTIONS}s ±{settings.JITTER_FICTIONS}s (fictions)")
     print("=" * 80)
     
+    if not health.require_healthy():
+        return 1
+    
     # Initialize database
     init_db()
     session = get_session()
+    monitor = health.ParseHealth(tool="run_scrape")
+    events.start("run_scrape")
     
     # Load or create checkpoint
     checkpoint = Checkpoint()
@@ -80,25 +84,28 @@ def main():
         print(f"\n✓ Starting fresh scrape")
         print(f"  Press Ctrl+C to pause and save progress\n")
     
+    page = start_page
     try:
-        for page in range(start_page, MAX_PAGES + 1):
+        # MAX_PAGES is read every page so a raised limit applies mid-crawl
+        for page in count(start_page):
+            if page > settings.MAX_PAGES:
+                break
             # Check if we've hit the hard cap
-            if total_scraped >= MAX_NOVELS:
-                print(f"\n✓ Reached maximum novel limit ({MAX_NOVELS:,}). Stopping.")
+            if total_scraped >= settings.MAX_NOVELS:
+                events.emit("crawl.limit", max_novels=settings.MAX_NOVELS)
                 break
             
             # Check for shutdown request
             if shutdown_requested:
-                print(f"\n⚠ Shutdown requested. Saving checkpoint...")
+                events.emit("crawl.shutdown", logging.WARNING, page=page)
                 checkpoint.save(page, total_scraped)
                 break
             
-            novels_remaining = MAX_NOVELS - total_scraped
+            novels_remaining = settings.MAX_NOVELS - total_scraped
             time_est = estimate_time_remaining(novels_remaining)
             
-            print(f"\n[Page {page}/{MAX_PAGES}] Fetching listing page... "
-                  f"({format_number(total_scraped)}/{format_number(MAX_NOVELS)} novels, "
-                  f"~{time_est} remaining)")
+            events.emit("page.start", page=page, max_pages=settings.MAX_PAGES, scraped=total_scraped,
+                        max_novels=settings.MAX_NOVELS, remaining=time_est)
             
             try:
                 # Fetch and parse listing page
@@ -106,10 +113,10 @@ def main():
                 links = parse_listing_links(listing_html)
                 
                 if not links:
-                    print(f"  No links found on page {page}. Stopping.")
+                    events.emit("page.empty", logging.WARNING, page=page)
                     break
                 
-                print(f"  Found {len(links)} fiction links")
+                events.emit("page.links", page=page, links=len(links))
                 
                 batch = []
                 last_fiction_id = None
@@ -117,58 +124,77 @@ def main():
                 # Scrape each fiction on this page
                 for idx, link in enumerate(links, 1):
                     # Check hard cap before each fiction
-                    if total_scraped >= MAX_NOVELS:
-                        print(f"  ✓ Reached maximum novel limit ({MAX_NOVELS:,})")
+                    if total_scraped >= settings.MAX_NOVELS:
+                        events.emit("crawl.limit", max_novels=settings.MAX_NOVELS)
                         break
                     
                     # Check for shutdown request
                     if shutdown_requested:
                         break
                     
+                    fiction_id = None
                     try:
                         fiction_id = extract_fiction_id(link)
-                        print(f"  [{idx}/{len(links)}] Scraping fiction {fiction_id}...", end=" ")
                         
-                        # Fetch and parse fiction page
-                        fiction_html = fetch_fiction_page(link)
-                        raw = parse_fiction_page(fiction_html)
+                        with profiler.page(link):
+                            # Fetch and parse fiction page
+                            fiction_html = fetch_fiction_head(link)
+                            raw = parse_fiction_page(fiction_html)
+                            
+                            # Add fiction ID
+                            raw["fiction_id"] = fiction_id
+                            
+                            # Normalize and add to batch
+                            normalized = normalize_record(raw)
                         
-                        # Add fiction ID
-                        raw["fiction_id"] = fiction_id
+                        # Rows without the required fields are never upserted
+                        missing = monitor.observe(link, raw, fiction_html)
+                        if missing:
+                            events.emit("fiction.skipped", logging.WARNING, index=idx, count=len(links),
+                                        fiction_id=fiction_id, missing=", ".join(missing), page=page)
+                            if monitor.tripped:
+                                break
+                            sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
+                            continue
                         
-                        # Normalize and add to batch
-                        normalized = normalize_fiction(raw)
                         batch.append(normalized)
                         last_fiction_id = fiction_id
                         
-                        print(f"✓ {raw.get('title', 'Unknown')[:40]}")
+                        events.emit("fiction.scraped", index=idx, count=len(links), fiction_id=fiction_id,
+                                    title=raw.get("title") or "Unknown", page=page)
                         
                         # Rate limiting with jitter between fictions
-                        sleep_with_jitter(RATE_LIMIT_BETWEEN_FICTIONS, JITTER_FICTIONS)
+                        sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
                         
                     except Exception as e:
-                        print(f"✗ ERROR: {e}")
+                        events.emit("fiction.error", logging.ERROR, index=idx, count=len(links),
+                                    fiction_id=fiction_id, error=str(e), page=page, url=link)
                         continue
                 
                 # Insert batch into database
                 if batch:
                     upsert_fictions(session, batch)
                     total_scraped += len(batch)
-                    print(f"  ✓ Inserted {len(batch)} records (Total: {format_number(total_scraped)})")
+                    events.emit("page.inserted", page=page, rows=len(batch), total=total_scraped)
                     
                     # Save checkpoint after each successful page
                     checkpoint.save(page + 1, total_scraped, last_fiction_id)
                 
+                # Parser health tripped: resume from this page once the parser is fixed
+                if monitor.tripped:
+                    checkpoint.save(page, total_scraped, last_fiction_id)
+                    break
+                
                 # Check if we should stop
-                if shutdown_requested or total_scraped >= MAX_NOVELS:
+                if shutdown_requested or total_scraped >= settings.MAX_NOVELS:
                     break
                 
                 # Rate limiting with jitter between listing pages
-                print(f"  Sleeping {RATE_LIMIT_BETWEEN_PAGES}s ±{JITTER_PAGES}s...")
-                sleep_with_jitter(RATE_LIMIT_BETWEEN_PAGES, JITTER_PAGES)
+                events.emit("page.sleep", seconds=settings.RATE_LIMIT_BETWEEN_PAGES, jitter=settings.JITTER_PAGES)
+                sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_PAGES, settings.JITTER_PAGES)
                 
             except Exception as e:
-                print(f"  ERROR on page {page}: {e}")
+                events.emit("page.error", logging.ERROR, page=page, error=str(e))
                 # Save checkpoint even on error
                 checkpoint.save(page, total_scraped)
                 continue
@@ -179,14 +205,32 @@ def main():
     
     finally:
         session.close()
+        events.stop()  # Write out the queued events before the summary
         print("\n" + "=" * 80)
-        print(f"Scraping {'paused' if shutdown_requested else 'complete'}!")
+        print(f"Scraping {'paused' if shutdown_requested or monitor.tripped else 'complete'}!")
         print(f"Total records: {format_number(total_scraped)}")
         print(f"Last page: {page}")
-        if shutdown_requested:
+        print_latency_summary()
+        if monitor.tripped:
+            print(f"\n✗ Stopped by the parser health monitor - see {health.HEALTH_ALERT_FILE}")
+        elif shutdown_requested:
             print(f"\n✓ Progress saved. Run again to resume from page {page}")
         print("=" * 80)
+    return 1 if monitor.tripped else 0
+
+
+def _cli():
+    """Command-line entry: pick the crawl mode from the flags"""
+    enable_from_argv(sys.argv)
+    if "--incremental" in sys.argv[1:]:
+        from incremental import main as incremental_main
+        return incremental_main()
+    elif "--frontier" in sys.argv[1:]:
+        from frontier import main as frontier_main
+        return frontier_main()
+    else:
+        return main()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(_cli())
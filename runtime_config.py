@@ -0,0 +1,350 @@
+"""
+Live-reloadable runtime settings.
+The tuning knobs (request pacing, timeouts, limits, worker count, batch
+sizes) default to the constants in config.py, are overridden by
+RUNTIME_CONFIG_FILE (JSON) and then by RR_<NAME> environment variables.
+Running crawls read them through `settings` at each use, so editing the
+file (checked every RUNTIME_CHECK_INTERVAL seconds) or sending SIGHUP
+applies new values without a restart. An environment variable pins its
+value for the life of the process.
+
+Each running tool publishes its active values under RUNTIME_ACTIVE_DIR,
+which `show` lists.
+
+Usage:
+    python runtime_config.py show
+    python runtime_config.py set RATE_LIMIT_BETWEEN_FICTIONS 1.0
+    python runtime_config.py unset RATE_LIMIT_BETWEEN_FICTIONS
+    python runtime_config.py reload          # SIGHUP every running tool now
+"""
+import argparse
+import atexit
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+import config
+from config import RUNTIME_CONFIG_FILE, RUNTIME_ACTIVE_DIR, RUNTIME_CHECK_INTERVAL
+
+ENV_PREFIX = "RR_"
+
+# Reloadable settings: name -> (type, minimum)
+TUNABLES = {
+    "RATE_LIMIT_BETWEEN_PAGES": (float, 0),
+    "RATE_LIMIT_BETWEEN_FICTIONS": (float, 0),
+    "JITTER_PAGES": (float, 0),
+    "JITTER_FICTIONS": (float, 0),
+    "CONNECT_TIMEOUT": (float, 0.1),
+    "READ_TIMEOUT": (float, 0.1),
+    "TOTAL_TIMEOUT": (float, 0.1),
+    "MAX_PAGES": (int, 1),
+    "MAX_NOVELS": (int, 1),
+    "RATE_BUDGET_RPS": (float, 0.01),
+    "RATE_BUDGET_BURST": (float, 1),
+    "ID_CRAWL_WORKERS": (int, 1),
+    "CRAWL_BATCH_SIZE": (int, 1),
+    "UPDATE_BATCH_SIZE": (int, 1),
+}
+
+
+def _cast(name, value):
+    kind, minimum = TUNABLES[name]
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, not {value!r}") from None
+    if kind is int and not number.is_integer():
+        raise ValueError(f"{name} must be a whole number")
+    value = kind(number)
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+def read_file(path=RUNTIME_CONFIG_FILE):
+    """
+    Overrides from the runtime config file.
+
+    Returns:
+        dict: name -> raw value ({} if the file does not exist)
+
+    Raises:
+        ValueError: If the file is not a JSON object
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    return data
+
+
+def write_file(overrides, path=RUNTIME_CONFIG_FILE):
+    """Atomically replace the runtime config file"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(overrides, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+class RuntimeConfig:
+    """
+    Current values of the TUNABLES, reloaded when the file changes or on SIGHUP.
+
+    Read a setting as an attribute (settings.RATE_LIMIT_BETWEEN_FICTIONS);
+    every read checks, at most once per check_interval, whether to reload.
+    A file that fails to parse or validate is reported and its last good
+    values (none at startup) stay in effect; an RR_<NAME> value that fails
+    to validate is reported and ignored. Values in `pinned` (e.g. set by a command-line
+    flag) win over everything and are never reloaded.
+    """
+
+    def __init__(self, path=RUNTIME_CONFIG_FILE, env=None, check_interval=RUNTIME_CHECK_INTERVAL):
+        self.path = path
+        self.env = os.environ if env is None else env
+        self.check_interval = check_interval
+        self.tool = None
+        self.pinned = {}
+        self._lock = threading.RLock()
+        self._reload_requested = False
+        self._file_stamp = None
+        self._checked_at = 0.0
+        self.loaded_at = datetime.utcnow()
+        self._file_values = {}  # Last good overrides from the file
+        self._values = {name: getattr(config, name) for name in TUNABLES}
+        self._sources = dict.fromkeys(TUNABLES, "config.py")
+        self.reload(quiet=True)
+
+    def __getattr__(self, name):
+        if name not in TUNABLES:
+            raise AttributeError(name)
+        if name in self.pinned:
+            return self.pinned[name]
+        self.refresh()
+        return self._values[name]
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def request_reload(self):
+        """Reload on the next read (safe to call from a signal handler)"""
+        self._reload_requested = True
+
+    def refresh(self):
+        """Reload if SIGHUP arrived or the file changed since the last load"""
+        now = time.monotonic()
+        if not self._reload_requested and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            if self._reload_requested or self._stamp() != self._file_stamp:
+                self._reload_requested = False
+                self.reload()
+
+    def reload(self, quiet=False):
+        """
+        Re-read the file and environment.
+
+        Returns:
+            dict: name -> (old, new) for the values that changed
+        """
+        with self._lock:
+            self._file_stamp = self._stamp()
+            self._checked_at = time.monotonic()
+            values = {name: getattr(config, name) for name in TUNABLES}
+            sources = dict.fromkeys(TUNABLES, "config.py")
+            try:
+                file_values = {}
+                for name, value in read_file(self.path).items():
+                    if name not in TUNABLES:
+                        print(f"⚠ {self.path}: unknown setting {name} ignored")
+                        continue
+                    file_values[name] = _cast(name, value)
+                self._file_values = file_values
+            except (OSError, ValueError) as e:
+                print(f"⚠ {self.path} not reloaded ({e}); keeping its last good values")
+            values.update(self._file_values)
+            sources.update(dict.fromkeys(self._file_values, self.path))
+            for name in TUNABLES:
+                if ENV_PREFIX + name in self.env:
+                    try:
+                        values[name] = _cast(name, self.env[ENV_PREFIX + name])
+                    except ValueError as e:
+                        print(f"⚠ {ENV_PREFIX}{name} ignored ({e})")
+                        continue
+                    sources[name] = ENV_PREFIX + name
+
+            changes = {name: (self._values[name], values[name]) for name in TUNABLES
+                       if values[name] != self._values[name]}
+            self._values, self._sources = values, sources
+            self.loaded_at = datetime.utcnow()
+            if changes and not quiet:
+                print("\n✓ Runtime config reloaded: " +
+                      ", ".join(f"{name} {old} → {new}" for name, (old, new) in changes.items()))
+            if self.tool:
+                self._publish()
+            return changes
+
+    def values(self):
+        """All current values (after a refresh)"""
+        self.refresh()
+        return {**self._values, **self.pinned}
+
+    def sources(self):
+        """Where each current value came from: config.py, the file, RR_<NAME> or pinned"""
+        return {**self._sources, **dict.fromkeys(self.pinned, "pinned")}
+
+    # -------------------------------------------------------------------------
+    # Running tools
+    # -------------------------------------------------------------------------
+
+    def install(self, tool):
+        """
+        Reload on SIGHUP and publish this process's active values.
+
+        Call from the main thread of a tool's entry point.
+        """
+        self.tool = tool
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+        self._publish()
+        atexit.register(self._unpublish)
+
+    def _active_file(self):
+        return os.path.join(RUNTIME_ACTIVE_DIR, f"{self.tool}-{os.getpid()}.json")
+
+    def _publish(self):
+        try:
+            os.makedirs(RUNTIME_ACTIVE_DIR, exist_ok=True)
+            path = self._active_file()
+            with open(f"{path}.tmp", "w") as f:
+                json.dump({"tool": self.tool, "pid": os.getpid(),
+                           "loaded_at": self.loaded_at.isoformat(),
+                           "values": {**self._values, **self.pinned},
+                           "sources": self.sources()}, f, indent=2)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"⚠ Could not publish active runtime config: {e}")
+
+    def _unpublish(self):
+        try:
+            os.remove(self._active_file())
+        except OSError:
+            pass
+
+
+settings = RuntimeConfig()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def running_tools(active_dir=RUNTIME_ACTIVE_DIR):
+    """
+    Active values published by running tools (stale entries are removed).
+
+    Returns:
+        list: Published dicts (tool, pid, loaded_at, values, sources)
+    """
+    if not os.path.isdir(active_dir):
+        return []
+    result = []
+    for name in sorted(os.listdir(active_dir)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(active_dir, name)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if _pid_alive(entry["pid"]):
+            result.append(entry)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live-reloadable runtime settings")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("show", help="Effective values and the running tools' active values")
+    set_cmd = sub.add_parser("set", help="Override a setting in the runtime config file")
+    set_cmd.add_argument("name", choices=sorted(TUNABLES))
+    set_cmd.add_argument("value")
+    unset = sub.add_parser("unset", help="Drop an override (back to config.py)")
+    unset.add_argument("name", choices=sorted(TUNABLES))
+    sub.add_parser("reload", help="Send SIGHUP to every running tool")
+    args = parser.parse_args(argv)
+
+    if args.command in ("set", "unset"):
+        overrides = read_file()
+        if args.command == "set":
+            try:
+                overrides[args.name] = _cast(args.name, args.value)
+            except ValueError as e:
+                print(f"✗ {e}")
+                return 1
+        else:
+            overrides.pop(args.name, None)
+        write_file(overrides)
+        print(f"✓ {RUNTIME_CONFIG_FILE} updated; running tools apply it within "
+              f"{RUNTIME_CHECK_INTERVAL:g}s")
+        return 0
+
+    tools = running_tools()
+    if args.command == "reload":
+        if not hasattr(signal, "SIGHUP"):
+            print("✗ SIGHUP is not available on this platform; running tools still pick up file changes")
+            return 1
+        for entry in tools:
+            os.kill(entry["pid"], signal.SIGHUP)
+            print(f"✓ Sent SIGHUP to {entry['tool']} (pid {entry['pid']})")
+        if not tools:
+            print("No running tools")
+        return 0
+
+    print("=" * 60)
+    print("Runtime Settings")
+    print("=" * 60)
+    current = settings.values()
+    sources = settings.sources()
+    for name in TUNABLES:
+        print(f"{name:<30}{current[name]:<10g}{sources[name]}")
+    for entry in tools:
+        print("-" * 60)
+        print(f"{entry['tool']} (pid {entry['pid']}), loaded {entry['loaded_at']}")
+        differs = {n: v for n, v in entry["values"].items() if current.get(n) != v}
+        if differs:
+            for name, value in differs.items():
+                print(f"  {name:<28}{value:<10g}(not yet reloaded or pinned by {entry['sources'][name]})")
+        else:
+            print("  Running with the values above")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,821 @@
+"""
+Statistical sampling mode for catalogue-wide estimates.
+Draws a stratified random sample of fictions, either by fiction ID range or
+by rank on a listing (best-rated by default), fetches only those pages and
+reports estimates with confidence intervals. With --target the sample grows
+in rounds, allocating new units to the strata where the first metric varies
+most (Neyman allocation), until the interval is narrow enough or the
+request cap is reached. Fresh population-level numbers then cost a few
+hundred requests instead of a full crawl.
+
+Samples are saved as JSON, so further questions can be answered from the
+saved units with `estimate` without sending any requests.
+
+Metrics:
+    share:FIELD=VALUE    Fraction of fictions where FIELD is VALUE (for tags,
+                         warn_tags and content_warnings: VALUE is in the list)
+    mean:FIELD           Mean of a numeric field
+    median:FIELD         Median (p90:FIELD etc. for other quantiles)
+    count                Estimated number of fictions
+--where FIELD=VALUE restricts every metric to a domain (repeatable, all must
+match) and --by FIELD breaks each metric down per value.
+
+Usage:
+    python sampling.py run --metric "share:content_warnings=AI-Assisted Content" \\
+        --where status=ONGOING --target 0.03
+    python sampling.py run --frame rank --size 300 --metric median:followers --by tags
+    python sampling.py estimate samples/id-20260101-120000.json --metric mean:pages --by status
+    python sampling.py grow samples/id-20260101-120000.json --target 0.02 --metric count
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import signal
+from datetime import datetime
+from statistics import NormalDist
+
+import requests
+
+from scraper import fetch_listing_page, fetch_fiction_head
+from parser import parse_listing_links, parse_fiction_full
+from normalizer import normalize_record
+from loader import upsert_fictions
+from run_scrape import extract_fiction_id
+from id_bitmap import IdBitmap
+import health
+from utils import LiveRateLimiter, format_number
+from runtime_config import settings
+from config import (
+    BASE_URL,
+    ID_MISSING_FILE,
+    SAMPLE_DIR,
+    SAMPLE_STRATA,
+    SAMPLE_INITIAL_SIZE,
+    SAMPLE_MAX_REQUESTS,
+    SAMPLE_CONFIDENCE,
+    SAMPLE_MIN_GROUP,
+)
+
+FRAMES = ("id", "rank")
+LISTING_PAGE_SIZE = 20
+LIST_FIELDS = ("tags", "warn_tags", "content_warnings")
+SAVE_EVERY = 25  # Units fetched between saves of the sample file
+_shutdown_requested = False
+
+
+# =============================================================================
+# Sample
+# =============================================================================
+
+class Sample:
+    """
+    A stratified sample and the units fetched so far.
+
+    Units are fiction IDs (frame "id") or (listing page, position) pairs
+    (frame "rank"). A unit that turns out not to exist (a 404, or a position
+    past the end of the listing) is kept as a miss: the estimators then
+    account for the share of each stratum that holds no fiction.
+    """
+
+    def __init__(self, frame, strata, seed=None, units=None, listing="best-rated", created=None):
+        if frame not in FRAMES:
+            raise ValueError(f"Unknown frame: {frame}")
+        self.frame = frame
+        self.strata = [tuple(s) for s in strata]
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.units = units or []
+        self.listing = listing
+        self.created = created or datetime.utcnow().isoformat()
+        # Continue the random stream where a saved sample left off
+        self.rng = random.Random(f"{self.seed}:{len(self.units)}")
+        self._drawn = {self._key(u["key"]) for u in self.units}
+
+    @classmethod
+    def stratified(cls, frame, lo, hi, strata=SAMPLE_STRATA, **kwargs):
+        """New sample over [lo, hi] (IDs or listing pages) in equal-width strata"""
+        strata = max(1, min(strata, hi - lo + 1))
+        width = (hi - lo + 1) / strata
+        bounds = [lo + round(i * width) for i in range(strata)] + [hi + 1]
+        return cls(frame, [(a, b - 1) for a, b in zip(bounds, bounds[1:])], **kwargs)
+
+    def _key(self, key):
+        return tuple(key) if self.frame == "rank" else key
+
+    def size(self, h):
+        """Number of units in stratum h"""
+        lo, hi = self.strata[h]
+        return (hi - lo + 1) * (LISTING_PAGE_SIZE if self.frame == "rank" else 1)
+
+    def sizes(self):
+        return [self.size(h) for h in range(len(self.strata))]
+
+    def counts(self):
+        """Units fetched per stratum"""
+        counts = [0] * len(self.strata)
+        for unit in self.units:
+            counts[unit["h"]] += 1
+        return counts
+
+    def draw(self, h, k):
+        """Up to k random units from stratum h not drawn before"""
+        lo, hi = self.strata[h]
+        k = min(k, self.size(h) - sum(1 for key in self._drawn if self._stratum_of(key) == h))
+        keys = []
+        while len(keys) < k:
+            if self.frame == "id":
+                key = self.rng.randint(lo, hi)
+            else:
+                key = (self.rng.randint(lo, hi), self.rng.randrange(LISTING_PAGE_SIZE))
+            if key not in self._drawn:
+                self._drawn.add(key)
+                keys.append(key)
+        return keys
+
+    def _stratum_of(self, key):
+        value = key[0] if self.frame == "rank" else key
+        for h, (lo, hi) in enumerate(self.strata):
+            if lo <= value <= hi:
+                return h
+        return None
+
+    def add(self, h, key, found, row):
+        self.units.append({"h": h, "key": key, "found": found, "row": row})
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "frame": self.frame,
+            "listing": self.listing,
+            "strata": self.strata,
+            "seed": self.seed,
+            "created": self.created,
+            "saved": datetime.utcnow().isoformat(),
+            "units": self.units,
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["frame"], data["strata"], seed=data["seed"], units=data["units"],
+                   listing=data.get("listing", "best-rated"), created=data.get("created"))
+
+
+# =============================================================================
+# Fetching
+# =============================================================================
+
+class UnitFetcher:
+    """
+    Fetches sample units one paced request at a time.
+
+    Listing pages are cached, so several rank units on one page cost a
+    single listing request. IDs already known to 404 (id_missing.bitmap)
+    are recorded as misses without a request.
+    """
+
+    def __init__(self, frame, listing="best-rated", rate_limiter=None, monitor=None,
+                 known_missing=None):
+        self.frame = frame
+        self.listing = listing
+        self.rate_limiter = rate_limiter or LiveRateLimiter()
+        self.monitor = monitor or health.ParseHealth(tool="sampling")
+        self.known_missing = known_missing
+        self.listing_cache = {}
+        self.requests = 0
+        self.errors = 0
+
+    def _request(self, fetch, arg):
+        """Paced fetch; None on a 404"""
+        self.rate_limiter.wait()
+        self.requests += 1
+        try:
+            return fetch(arg)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def listing_links(self, page):
+        """Fiction URLs on one listing page ([] past the last page)"""
+        if page not in self.listing_cache:
+            html = self._request(lambda p: fetch_listing_page(p, self.listing), page)
+            self.listing_cache[page] = parse_listing_links(html) if html else []
+        return self.listing_cache[page]
+
+    def last_page(self, limit):
+        """Find the listing's last page with an exponential then binary search"""
+        if not self.listing_links(1):
+            return 0
+        lo, hi = 1, 2
+        while hi < limit and self.listing_links(hi):
+            lo, hi = hi, min(hi * 2, limit)
+        if hi >= limit and self.listing_links(limit):
+            return limit
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.listing_links(mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def fetch(self, key):
+        """
+        Fetch one unit.
+
+        Args:
+            key: Fiction ID (frame "id") or (page, position) (frame "rank")
+
+        Returns:
+            FictionRecord or None: The fiction, or None if the unit holds none
+
+        Raises:
+            requests.RequestException: On a failed request
+            ValueError: If the page is missing required fields
+        """
+        if self.frame == "id":
+            if self.known_missing is not None and key in self.known_missing:
+                return None
+            url, fiction_id = f"{BASE_URL}/fiction/{key}", key
+        else:
+            page, position = key
+            links = self.listing_links(page)
+            if position >= len(links):
+                return None
+            url = links[position]
+            fiction_id = extract_fiction_id(url)
+
+        html = self._request(fetch_fiction_head, url)
+        if html is None:
+            return None
+        raw = parse_fiction_full(html)
+        missing = self.monitor.observe(url, raw, html)
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        raw["fiction_id"] = fiction_id
+        return normalize_record(raw)
+
+
+def unit_row(record):
+    """The fields of a record kept in the sample file (list fields decoded)"""
+    row = record.as_dict()
+    for field in LIST_FIELDS:
+        if isinstance(row.get(field), str):
+            row[field] = json.loads(row[field])
+    return row
+
+
+# =============================================================================
+# Estimation
+# =============================================================================
+
+class Metric:
+    """One quantity to estimate, parsed from a spec like "median:followers" """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.kind, _, rest = spec.partition(":")
+        self.field = self.value = self.q = None
+        if self.kind == "count" and not rest:
+            pass
+        elif self.kind == "share" and "=" in rest:
+            self.field, _, self.value = rest.partition("=")
+        elif self.kind == "mean" and rest:
+            self.field = rest
+        elif self.kind == "median" and rest:
+            self.kind, self.field, self.q = "quantile", rest, 0.5
+        elif re.fullmatch(r"p\d{1,2}", self.kind) and rest:
+            self.kind, self.field, self.q = "quantile", rest, int(self.kind[1:]) / 100
+        else:
+            raise ValueError(f"Bad metric: {spec!r} (expected share:F=V, mean:F, median:F, pNN:F or count)")
+
+    def absolute(self):
+        """Shares are judged on absolute interval width, other metrics relative to the estimate"""
+        return self.kind == "share"
+
+
+def matches(row, field, value):
+    """True if row[field] equals value (case-insensitive), or contains it for list fields"""
+    actual = row.get(field)
+    if isinstance(actual, list):
+        return any(str(item).lower() == value.lower() for item in actual)
+    return actual is not None and str(actual).lower() == value.lower()
+
+
+def parse_conditions(specs):
+    """["status=ONGOING", ...] -> [("status", "ONGOING"), ...]"""
+    conditions = []
+    for spec in specs or ():
+        field, sep, value = spec.partition("=")
+        if not sep:
+            raise ValueError(f"Bad condition: {spec!r} (expected FIELD=VALUE)")
+        conditions.append((field, value))
+    return conditions
+
+
+def _observations(sample, metric, where, group):
+    """Per stratum: (N_h, [(in_domain, value), ...]) for every fetched unit"""
+    strata = [(size, []) for size in sample.sizes()]
+    for unit in sample.units:
+        row = unit["row"]
+        d, v = 0, 0.0
+        if unit["found"] and all(matches(row, f, val) for f, val in where) \
+                and (group is None or matches(row, group[0], group[1])):
+            if metric.kind == "share":
+                d, v = 1, float(matches(row, metric.field, metric.value))
+            elif metric.kind == "count":
+                d, v = 1, 1.0
+            elif isinstance(row.get(metric.field), (int, float)):
+                d, v = 1, float(row[metric.field])
+        strata[unit["h"]][1].append((d, v))
+    return strata
+
+
+def _ratio(strata, y):
+    """
+    Stratified ratio estimate sum(d * y) / sum(d) with its linearized
+    standard error and the per-stratum spread of the linearized variable.
+
+    Args:
+        strata (list): (N_h, [(d, v), ...]) per stratum
+        y (callable): Value function applied to v
+
+    Returns:
+        tuple: (estimate, se, domain_total) - estimate None if the domain is empty
+    """
+    total_y = total_d = 0.0
+    for size, obs in strata:
+        if obs:
+            total_y += size * sum(d * y(v) for d, v in obs) / len(obs)
+            total_d += size * sum(d for d, _ in obs) / len(obs)
+    if not total_d:
+        return None, None, 0.0
+    ratio = total_y / total_d
+    variance = 0.0
+    for size, obs in strata:
+        n = len(obs)
+        if n < 2:
+            continue
+        z = [d * (y(v) - ratio) / total_d for d, v in obs]
+        mean = sum(z) / n
+        s2 = sum((zi - mean) ** 2 for zi in z) / (n - 1)
+        variance += size * size * (1 - n / size) * s2 / n
+    return ratio, math.sqrt(variance), total_d
+
+
+def _total(strata):
+    """Stratified estimate of the domain size and its standard error"""
+    total = variance = 0.0
+    for size, obs in strata:
+        n = len(obs)
+        if not n:
+            continue
+        found = sum(d for d, _ in obs)
+        total += size * found / n
+        if n > 1:
+            # Smoothed so a stratum whose few units all agree does not
+            # claim zero variance
+            p = (found + 1) / (n + 2)
+            s2 = p * (1 - p) * n / (n - 1)
+            variance += size * size * (1 - n / size) * s2 / n
+    return total, math.sqrt(variance)
+
+
+def _weighted_quantile(strata, q):
+    points = []
+    for size, obs in strata:
+        if obs:
+            weight = size / len(obs)
+            points.extend((v, weight) for d, v in obs if d)
+    if not points:
+        return None
+    points.sort()
+    target = q * sum(w for _, w in points)
+    running = 0.0
+    for value, weight in points:
+        running += weight
+        if running >= target - 1e-9:
+            return value
+    return points[-1][0]
+
+
+def estimate(sample, metric, where=(), group=None, confidence=SAMPLE_CONFIDENCE):
+    """
+    Estimate one metric from the sample.
+
+    Shares and means are stratified ratio estimators (the domain size is
+    itself estimated, since a stratum's share of misses is only known from
+    the sample); their standard errors come from Taylor linearization with a
+    finite population correction. Quantile intervals use Woodruff's method.
+
+    Args:
+        sample (Sample): Fetched sample
+        metric (Metric): What to estimate
+        where (list): (field, value) domain conditions
+        group (tuple): Optional (field, value) group for --by breakdowns
+        confidence (float): Interval confidence level
+
+    Returns:
+        dict: estimate, se, lo, hi, n (domain units sampled), domain (estimated
+              domain size)
+    """
+    strata = _observations(sample, metric, where, group)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n = sum(d for _, obs in strata for d, _ in obs)
+    result = {"metric": metric.spec, "group": group[1] if group else None, "n": n,
+              "estimate": None, "se": None, "lo": None, "hi": None}
+
+    if metric.kind == "count":
+        total, se = _total(strata)
+        result.update(estimate=total, se=se, lo=max(total - z * se, 0), hi=total + z * se, domain=total)
+        return result
+
+    if metric.kind == "quantile":
+        value = _weighted_quantile(strata, metric.q)
+        if value is None:
+            result.update(domain=0.0)
+            return result
+        share, se_f, domain = _ratio(strata, lambda v: float(v <= value))
+        lo = _weighted_quantile(strata, max(metric.q - z * se_f, 0.0))
+        hi = _weighted_quantile(strata, min(metric.q + z * se_f, 1.0))
+        result.update(estimate=value, se=(hi - lo) / (2 * z), lo=lo, hi=hi,
+                      domain=domain)
+        return result
+
+    ratio, se, domain = _ratio(strata, lambda v: v)
+    result.update(domain=domain)
+    if ratio is not None:
+        lo, hi = ratio - z * se, ratio + z * se
+        if metric.kind == "share":
+            lo, hi = max(lo, 0.0), min(hi, 1.0)
+        result.update(estimate=ratio, se=se, lo=lo, hi=hi)
+    return result
+
+
+def planning_half_width(result, metric, confidence=SAMPLE_CONFIDENCE):
+    """
+    Interval half-width used to decide whether to stop growing.
+
+    Stopping on the observed width alone favours samples that happen to
+    show a narrow interval (for shares: a low estimate), which biases the
+    final estimate. Shares are therefore judged at the least favourable
+    proportion within a smoothed (Agresti-Coull) interval, keeping the
+    sample's design effect; other metrics use the observed width.
+    """
+    if result["estimate"] is None or result["n"] < 2:
+        return None
+    half_width = (result["hi"] - result["lo"]) / 2
+    if metric.kind != "share":
+        return half_width
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n, p = result["n"], result["estimate"]
+    deff = result["se"] ** 2 / (p * (1 - p) / n) if 0 < p < 1 else 1.0
+    smoothed = (n * p + z * z / 2) / (n + z * z)
+    spread = z * math.sqrt(smoothed * (1 - smoothed) / (n + z * z))
+    worst = min(max(0.5, smoothed - spread), smoothed + spread)
+    return max(half_width, z * math.sqrt(max(deff, 1e-9) * worst * (1 - worst) / n))
+
+
+def precise_enough(result, metric, target, confidence=SAMPLE_CONFIDENCE):
+    """True once the interval half-width is within target"""
+    half_width = planning_half_width(result, metric, confidence)
+    if half_width is None:
+        return False
+    if metric.absolute():
+        return half_width <= target
+    return half_width <= target * min(abs(result["lo"]), abs(result["hi"]))
+
+
+def group_values(sample, field, where=(), min_units=SAMPLE_MIN_GROUP):
+    """Values of `field` seen on at least min_units sampled fictions in the domain"""
+    seen = {}
+    for unit in sample.units:
+        row = unit["row"]
+        if not unit["found"] or not all(matches(row, f, v) for f, v in where):
+            continue
+        values = row.get(field)
+        for value in (values if isinstance(values, list) else [values]):
+            if value is not None:
+                seen[str(value)] = seen.get(str(value), 0) + 1
+    return [v for v, c in sorted(seen.items(), key=lambda kv: (-kv[1], kv[0])) if c >= min_units]
+
+
+# =============================================================================
+# Sampling runs
+# =============================================================================
+
+def stratum_spreads(sample, metric, where=()):
+    """
+    Relative per-stratum spread of the metric, for Neyman allocation.
+
+    The metric's spread within the domain is assumed equal across strata:
+    per-stratum estimates from a few units are too noisy, and would starve
+    strata that happened to look uniform and bias the estimate. What does
+    differ is how much of each stratum lies in the domain, since dead ID
+    ranges or pages past the end of a listing hold none. Domain densities
+    are smoothed so an empty-looking stratum still gets some units. Counts
+    use proportional allocation.
+
+    Returns:
+        list: Spread per stratum (arbitrary scale), or None for proportional
+    """
+    if metric.kind == "count":
+        return None
+    spreads = []
+    for _, obs in _observations(sample, metric, where, None):
+        spreads.append(math.sqrt((sum(d for d, _ in obs) + 0.5) / (len(obs) + 1)))
+    return spreads
+
+
+def allocate(sizes, counts, extra, spreads=None):
+    """
+    Split `extra` new units across strata.
+
+    Every stratum is first brought to 2 units (needed for a variance); the
+    rest goes towards Neyman allocation (n_h proportional to N_h * S_h) when
+    spreads are known, otherwise proportional to stratum size.
+
+    Returns:
+        list: New units per stratum
+    """
+    plan = [0] * len(sizes)
+    room = [size - count for size, count in zip(sizes, counts)]
+    for h in range(len(sizes)):
+        take = min(max(2 - counts[h], 0), room[h], extra - sum(plan))
+        plan[h] += max(take, 0)
+    extra -= sum(plan)
+    if extra <= 0:
+        return plan
+
+    if spreads and any(spreads):
+        weights = [size * s for size, s in zip(sizes, spreads)]
+    else:
+        weights = list(sizes)
+    total = sum(counts) + sum(plan) + extra
+    want = [max(total * w / sum(weights) - c - p, 0.0) for w, c, p in zip(weights, counts, plan)]
+    want = [min(w, r - p) for w, r, p in zip(want, room, plan)]
+    if sum(want) <= 0:
+        want = [max(r - p, 0) for r, p in zip(room, plan)]
+    if sum(want) <= 0:
+        return plan
+    scale = min(extra / sum(want), 1.0) if sum(want) > extra else 1.0
+    shares = [w * scale for w in want]
+    extra_plan = [int(s) for s in shares]
+    # Largest remainder for the units lost to rounding
+    left = min(extra, int(round(sum(shares)))) - sum(extra_plan)
+    for h in sorted(range(len(shares)), key=lambda i: shares[i] - extra_plan[i], reverse=True)[:max(left, 0)]:
+        extra_plan[h] += 1
+    return [p + e for p, e in zip(plan, extra_plan)]
+
+
+def run_sample(sample, fetcher, metrics, where=(), size=SAMPLE_INITIAL_SIZE, target=None,
+               max_requests=SAMPLE_MAX_REQUESTS, confidence=SAMPLE_CONFIDENCE,
+               path=None, session=None, should_stop=None):
+    """
+    Fetch units until the sample has `size` units, then (with a target) keep
+    growing it in rounds until the first metric is precise enough.
+
+    Each round at most doubles the sample, sized from how far the current
+    interval is from the target; new units go where the first metric's
+    linearized values vary most.
+
+    Args:
+        sample (Sample): Sample to extend (new or loaded)
+        fetcher (UnitFetcher): Fetches units
+        metrics (list): Metrics; the first one drives growth
+        where (list): (field, value) domain conditions
+        size (int): Units to reach before the first estimate
+        target (float): Interval half-width to reach (absolute for shares,
+                        relative to the estimate otherwise), or None
+        max_requests (int): Stop after this many HTTP requests
+        confidence (float): Interval confidence level
+        path (str): Sample file, saved as units arrive
+        session: Optional SQLAlchemy session; found fictions are upserted too
+        should_stop (callable): Optional callback returning True to stop
+
+    Returns:
+        dict: units, found, requests, errors, rounds and whether the target was met
+    """
+    stats = {"rounds": 0, "target_met": False}
+    batch = []
+    extra = max(size - len(sample.units), 0)
+
+    def stopping():
+        return ((should_stop and should_stop()) or fetcher.monitor.tripped
+                or fetcher.requests >= max_requests)
+
+    while extra > 0 and not stopping():
+        stats["rounds"] += 1
+        spreads = stratum_spreads(sample, metrics[0], where) if sample.units and metrics else None
+        plan = allocate(sample.sizes(), sample.counts(), extra, spreads)
+        keys = [(h, key) for h, k in enumerate(plan) for key in sample.draw(h, k)]
+        # Interleave strata so an interrupted round stays balanced
+        sample.rng.shuffle(keys)
+        print(f"Round {stats['rounds']}: {len(keys)} units "
+              f"({', '.join(str(k) for k in plan)} per stratum)")
+
+        for i, (h, key) in enumerate(keys, 1):
+            if stopping():
+                break
+            try:
+                record = fetcher.fetch(key)
+            except (requests.RequestException, ValueError) as e:
+                fetcher.errors += 1
+                print(f"  ✗ {key}: {e}")
+                continue
+            sample.add(h, list(key) if isinstance(key, tuple) else key,
+                       record is not None, unit_row(record) if record is not None else None)
+            if record is not None and session is not None:
+                batch.append(record)
+                if len(batch) >= 20:
+                    upsert_fictions(session, batch)
+                    batch = []
+            if path and i % SAVE_EVERY == 0:
+                sample.save(path)
+        if path:
+            sample.save(path)
+
+        if target is None or not metrics:
+            break
+        result = estimate(sample, metrics[0], where, confidence=confidence)
+        if precise_enough(result, metrics[0], target, confidence):
+            stats["target_met"] = True
+            break
+        n = len(sample.units)
+        half_width = planning_half_width(result, metrics[0], confidence)
+        if half_width is None:
+            needed = 2 * n
+        else:
+            goal = target if metrics[0].absolute() else target * abs(result["estimate"])
+            needed = n * (half_width / goal) ** 2 if goal else 2 * n
+        extra = int(min(max(needed - n, 2 * len(sample.strata)), n))
+        print(f"  {metrics[0].spec}: ±{_fmt(half_width, metrics[0])} - growing by {extra}")
+
+    if batch:
+        upsert_fictions(session, batch)
+    if path:
+        sample.save(path)
+    stats.update(units=len(sample.units), found=sum(1 for u in sample.units if u["found"]),
+                 requests=fetcher.requests, errors=fetcher.errors)
+    return stats
+
+
+# =============================================================================
+# Reporting
+# =============================================================================
+
+def _fmt(value, metric, scale=None):
+    """Format a value like the estimate it belongs to (scale)"""
+    if value is None:
+        return "-"
+    if metric.kind == "share":
+        return f"{value:.1%}"
+    if metric.kind == "count" or abs(value if scale is None else scale) >= 100:
+        return f"{value:,.0f}"
+    return f"{value:,.2f}"
+
+
+def print_estimates(sample, metrics, where=(), by=None, confidence=SAMPLE_CONFIDENCE):
+    """Print each metric (and its --by breakdown) with intervals"""
+    found = sum(1 for u in sample.units if u["found"])
+    print("=" * 80)
+    print(f"Sample Estimates - {sample.frame} frame, {len(sample.units):,} units "
+          f"({found:,} fictions), {len(sample.strata)} strata, {confidence:.0%} CI")
+    if where:
+        print(f"Where: {' and '.join(f'{f}={v}' for f, v in where)}")
+    print("=" * 80)
+    groups = [None]
+    if by:
+        groups += [(by, value) for value in group_values(sample, by, where)]
+    for metric in metrics:
+        print(f"{metric.spec}")
+        for group in groups:
+            r = estimate(sample, metric, where, group, confidence)
+            label = f"{by}={group[1]}" if group else "all"
+            scale = r["estimate"]
+            print(f"  {label:<32}{_fmt(scale, metric):>12}   "
+                  f"[{_fmt(r['lo'], metric, scale)}, {_fmt(r['hi'], metric, scale)}]   n={r['n']}")
+    print("=" * 80)
+
+
+def _signal_handler(signum, frame):
+    global _shutdown_requested
+    print("\n\n⚠ Interrupt received! Saving the sample after the current request...")
+    _shutdown_requested = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stratified sampling for catalogue-wide estimates")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_metric_args(p):
+        p.add_argument("--metric", action="append", default=[],
+                       help="share:F=V, mean:F, median:F, pNN:F or count (repeatable)")
+        p.add_argument("--where", action="append", default=[], help="FIELD=VALUE domain filter")
+        p.add_argument("--by", default=None, help="Break metrics down per value of this field")
+        p.add_argument("--confidence", type=float, default=SAMPLE_CONFIDENCE)
+
+    def add_growth_args(p):
+        p.add_argument("--size", type=int, default=SAMPLE_INITIAL_SIZE, help="Units before the first estimate")
+        p.add_argument("--target", type=float, default=None,
+                       help="Grow until the first metric's CI half-width is within this "
+                            "(absolute for shares, relative otherwise)")
+        p.add_argument("--max-requests", type=int, default=SAMPLE_MAX_REQUESTS)
+        p.add_argument("--save-db", action="store_true", help="Also upsert the sampled fictions")
+
+    run = sub.add_parser("run", help="Draw and fetch a new sample")
+    run.add_argument("--frame", choices=FRAMES, default="id")
+    run.add_argument("--listing", default="best-rated", help="Listing for the rank frame")
+    run.add_argument("--start", type=int, default=1, help="First ID (id frame)")
+    run.add_argument("--end", type=int, default=None, help="Last ID (id frame)")
+    run.add_argument("--pages", type=int, default=None, help="Listing pages (rank frame; found if omitted)")
+    run.add_argument("--strata", type=int, default=SAMPLE_STRATA)
+    run.add_argument("--seed", type=int, default=None)
+    run.add_argument("--out", default=None, help="Sample file")
+    add_metric_args(run)
+    add_growth_args(run)
+
+    grow = sub.add_parser("grow", help="Fetch more units into a saved sample")
+    grow.add_argument("file")
+    add_metric_args(grow)
+    add_growth_args(grow)
+
+    est = sub.add_parser("estimate", help="Estimate from a saved sample (no requests)")
+    est.add_argument("file")
+    add_metric_args(est)
+
+    args = parser.parse_args(argv)
+    try:
+        metrics = [Metric(spec) for spec in args.metric or ["count"]]
+        where = parse_conditions(args.where)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 2
+
+    if args.command == "estimate":
+        print_estimates(Sample.load(args.file), metrics, where, args.by, args.confidence)
+        return 0
+
+    if not health.require_healthy():
+        return 1
+    from db import init_db, get_session
+    init_db()
+    session = get_session()
+    try:
+        if args.command == "grow":
+            sample, path = Sample.load(args.file), args.file
+            fetcher = UnitFetcher(sample.frame, sample.listing,
+                                  known_missing=IdBitmap.load(ID_MISSING_FILE))
+        else:
+            fetcher = UnitFetcher(args.frame, args.listing, known_missing=IdBitmap.load(ID_MISSING_FILE))
+            if args.frame == "id":
+                from id_crawler import default_end
+                from config import ID_EXISTS_FILE
+                end = args.end or default_end(session, IdBitmap.load(ID_EXISTS_FILE))
+                sample = Sample.stratified("id", args.start, end, args.strata, seed=args.seed)
+            else:
+                pages = args.pages or fetcher.last_page(settings.MAX_PAGES)
+                if not pages:
+                    print(f"✗ Listing {args.listing} has no pages")
+                    return 1
+                sample = Sample.stratified("rank", 1, pages, args.strata, seed=args.seed,
+                                           listing=args.listing)
+            path = args.out or os.path.join(
+                SAMPLE_DIR, f"{args.frame}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+        signal.signal(signal.SIGINT, _signal_handler)
+        settings.install("sampling")
+        lo, hi = sample.strata[0][0], sample.strata[-1][1]
+        print("=" * 80)
+        print("Royal Road Sampling - Starting")
+        print("=" * 80)
+        print(f"Frame: {sample.frame} {lo:,}-{hi:,} in {len(sample.strata)} strata  "
+              f"Size: {args.size}  Target: {args.target or '-'}  Max requests: {args.max_requests}")
+        print(f"Sample file: {path}")
+        print("=" * 80)
+        stats = run_sample(sample, fetcher, metrics, where, size=args.size, target=args.target,
+                           max_requests=args.max_requests, confidence=args.confidence, path=path,
+                           session=session if args.save_db else None,
+                           should_stop=lambda: _shutdown_requested)
+    finally:
+        session.close()
+
+    print(f"\nRequests: {format_number(stats['requests'])}  Units: {format_number(stats['units'])}  "
+          f"Fictions: {format_number(stats['found'])}  Errors: {format_number(stats['errors'])}  "
+          f"Rounds: {stats['rounds']}")
+    if args.target is not None:
+        print("✓ Target precision reached" if stats["target_met"] else "⚠ Target precision not reached")
+    print_estimates(sample, metrics, where, args.by, args.confidence)
+    return 0 if not fetcher.monitor.tripped else 1
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,347 @@
 """
 HTTP fetching functions for Royal Road scraper.
 Handles all network requests with proper headers and rate limiting.
+Every request first takes a token from the host-wide shared budget
+(rate_budget.py), so concurrent tools never exceed the combined rate.
+
+Requests have separate connect/read/total deadlines. Latency is tracked
+per endpoint, and a request still running past the endpoint's observed
+p95 gets one speculative duplicate (a hedge) while the hedge budget
+allows: the first response wins and the other is cancelled.
+
+fetch_fiction_head() streams a fiction page through an incremental scanner
+and closes the connection once every section the parsers read has arrived,
+skipping the chapter list and footer.
+
+Every successful response is appended to the page archive (archive.py).
+
+With HTTP2_ENABLED, requests go through the HTTP/2 transport (transport.py),
+which multiplexes them over a couple of connections and falls back to
+HTTP/1.1 for hosts that do not speak HTTP/2.
 """
+import codecs
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 import requests
-from config import BASE_URL, HEADERS, TIMEOUT
+import urllib3
+import archive
+import rate_budget
+from latency import LatencyTracker
+from profiling import timed
+from parser import FictionHeadScanner
+from transport import http2
+from runtime_config import settings
+from config import (
+    BASE_URL,
+    HEADERS,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_BUDGET,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MIN_DELAY,
+    STREAM_FICTION_HEAD,
+)
+
+CHUNK_SIZE = 16384
+
+latency = LatencyTracker()
+hedge_stats = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+head_stats = {"fetches": 0, "early_closed": 0, "bytes": 0}
+_hedge_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fetch")
+
+
+class RequestCancelled(Exception):
+    """Raised inside a losing hedge attempt once the other attempt has won"""
+
+
+def _body_socket(r):
+    """The socket an HTTP/1.1 response body is read from, or None once it is released"""
+    try:
+        return r.raw._fp.fp.raw._sock
+    except AttributeError:
+        return None
+
+
+def _iter_body(r, url, deadline, total_timeout):
+    """
+    Yield body chunks as they arrive, within the total deadline.
+
+    iter_content() blocks until a whole chunk has arrived, so a body trickling
+    in a few bytes at a time could run far past the deadline. For urllib3
+    responses each read instead returns whatever has arrived (read1), with the
+    socket timeout shrunk to the time left. HTTP/2 streams yield data frames
+    as they arrive, so they are checked between chunks.
+
+    Raises:
+        requests.Timeout: If the deadline passes before the body is complete
+    """
+    raw = getattr(r, "raw", None)
+    if not (isinstance(raw, urllib3.HTTPResponse) and hasattr(raw, "read1")):
+        for chunk in r.iter_content(CHUNK_SIZE):
+            if time.monotonic() > deadline:
+                raise requests.Timeout(f"Total deadline of {total_timeout}s exceeded for {url}")
+            yield chunk
+        return
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"Total deadline of {total_timeout}s exceeded for {url}")
+        sock = _body_socket(r)
+        if sock is not None:
+            sock.settimeout(min(settings.READ_TIMEOUT, remaining))
+        try:
+            chunk = raw.read1(CHUNK_SIZE, decode_content=True)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.Timeout(f"{e} ({url})")
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except urllib3.exceptions.DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e)
+        except urllib3.exceptions.SSLError as e:
+            raise requests.exceptions.SSLError(e)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _download(url, endpoint, cancel=None, head=False, toc=None):
+    """
+    GET a URL, enforcing the total deadline while streaming the body.
+
+    Args:
+        url (str): URL to fetch
+        endpoint (str): Endpoint name for latency tracking
+        cancel (threading.Event): Set to abandon the download
+        head (bool): Stop once FictionHeadScanner has seen every needed section
+        toc (callable): With head, also read the chapter table if toc(chapter_count)
+
+    Returns:
+        str: Decoded response body (only its head if cut short)
+
+    Raises:
+        requests.HTTPError: On a 4xx/5xx response
+        requests.Timeout: If a connect, read or total deadline is exceeded
+        RequestCancelled: If cancel was set
+    """
+    start = time.monotonic()
+    total_timeout = settings.TOTAL_TIMEOUT
+    deadline = start + total_timeout
+    r = None
+    if http2.handles(url):
+        r = http2.open(url, settings.CONNECT_TIMEOUT, settings.READ_TIMEOUT)
+    if r is None:
+        r = requests.get(url, headers=HEADERS, timeout=(settings.CONNECT_TIMEOUT, settings.READ_TIMEOUT),
+                         stream=True)
+    try:
+        if r.status_code >= 400:
+            latency.record(endpoint, time.monotonic() - start)
+            r.raise_for_status()
+        decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+        scanner = FictionHeadScanner(toc) if head else None
+        parts = []
+        received = 0
+        early = False
+        for chunk in _iter_body(r, url, deadline, total_timeout):
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(url)
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if scanner is not None:
+                scanner.feed(text)
+                if scanner.done:
+                    early = True
+                    break
+        if not early:
+            parts.append(decoder.decode(b"", final=True))
+    finally:
+        # Closing mid-body drops the connection instead of reading the rest
+        r.close()
+    latency.record(endpoint, time.monotonic() - start)
+    if head:
+        with _hedge_lock:
+            head_stats["fetches"] += 1
+            head_stats["early_closed"] += early
+            head_stats["bytes"] += received
+    html = "".join(parts)
+    archive.record_page(url, html, endpoint, truncated=early)
+    return html
+
+
+def _hedge_delay(endpoint):
+    """Seconds to wait before hedging, or None if this endpoint is not hedged yet"""
+    if not HEDGE_ENABLED or HEDGE_BUDGET <= 0 or latency.count(endpoint) < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY, latency.percentile(endpoint, HEDGE_PERCENTILE))
+
+
+def _take_hedge():
+    """Reserve one hedge if the hedge budget allows it"""
+    with _hedge_lock:
+        if hedge_stats["hedged"] + 1 > HEDGE_BUDGET * hedge_stats["requests"]:
+            return False
+        hedge_stats["hedged"] += 1
+        return True
+
+
+def _return_hedge():
+    """Give back a hedge reservation that was not sent"""
+    with _hedge_lock:
+        hedge_stats["hedged"] -= 1
+
+
+def _acquire_for_hedge(primary):
+    """
+    Take a budget token for a hedge, giving up if the primary finishes while
+    waiting for it.
+
+    Returns:
+        bool: True if the token was taken
+    """
+    while not primary.done():
+        retry_in = rate_budget.try_acquire()
+        if retry_in == 0:
+            return True
+        wait([primary], timeout=retry_in)
+    return False
+
+
+def _get(url, endpoint, head=False, toc=None):
+    """
+    Fetch a URL through the shared budget, hedging it if it runs long.
+
+    Raises:
+        requests.HTTPError: If the request fails
+    """
+    rate_budget.acquire()
+    with _hedge_lock:
+        hedge_stats["requests"] += 1
+
+    delay = _hedge_delay(endpoint)
+    if delay is None:
+        return _download(url, endpoint, head=head, toc=toc)
+
+    attempts = {}
+    cancel = threading.Event()
+    primary = _executor.submit(_download, url, endpoint, cancel, head, toc)
+    attempts[primary] = cancel
+    done, _ = wait([primary], timeout=delay)
+    if done or not _take_hedge():
+        return primary.result()
+
+    # Neither the token nor the hedge count is spent once the primary has answered
+    if not _acquire_for_hedge(primary) or primary.done():
+        _return_hedge()
+        return primary.result()
+    cancel = threading.Event()
+    attempts[_executor.submit(_download, url, endpoint, cancel, head, toc)] = cancel
 
+    pending = set(attempts)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            exc = future.exception()
+            # An HTTP error status is a real answer; only transport failures fall through
+            if exc is None or isinstance(exc, requests.HTTPError):
+                for other in pending:
+                    attempts[other].set()
+                if future is not primary:
+                    with _hedge_lock:
+                        hedge_stats["hedge_wins"] += 1
+                return future.result()
+            error = exc
+    raise error
 
-def fetch_listing_page(page_num):
+
+@timed("fetch")
+def fetch_listing_page(page_num, listing="best-rated"):
     """
-    Fetch a listing page from Royal Road's best-rated section.
-    
+    Fetch a listing page from Royal Road (best-rated by default).
+
     Args:
         page_num (int): Page number to fetch (1-indexed)
-        
+        listing (str): Listing slug, e.g. "best-rated" or "latest-updates"
+
     Returns:
         str: HTML content of the listing page
-        
+
     Raises:
         requests.HTTPError: If the request fails
     """
-    url = f"{BASE_URL}/fictions/best-rated?page={page_num}"
-    r = requests.get(url, headers=HEADERS, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.text
+    url = f"{BASE_URL}/fictions/{listing}?page={page_num}"
+    return _get(url, "listing")
 
 
+@timed("fetch", capture_html=True)
 def fetch_fiction_page(url):
     """
     Fetch a specific fiction page.
-    
+
     Args:
         url (str): Full URL to the fiction page
-        
+
     Returns:
         str: HTML content of the fiction page
-        
+
+    Raises:
+        requests.HTTPError: If the request fails
+    """
+    return _get(url, "fiction")
+
+
+@timed("fetch", capture_html=True)
+def fetch_fiction_head(url, toc=None):
+    """
+    Fetch only the part of a fiction page the fiction parsers read.
+
+    The page is streamed and the connection closed as soon as the title,
+    stats block and first chapter timestamp have arrived. If any of them
+    never appears, the whole page has been read, so the result is always
+    safe to pass to parse_fiction_page() / parse_fiction_details() /
+    parse_fiction_full(). Use fetch_fiction_page() when the full chapter
+    list is needed, or pass `toc`: it is called with the chapter count
+    announced by the table of contents and, if it returns True, the whole
+    chapter table is read too (see chapters.ChapterTracker).
+
+    Args:
+        url (str): Full URL to the fiction page
+        toc (callable): toc(chapter_count) -> bool, whether to keep the chapter table
+
+    Returns:
+        str: HTML of the page head (or the whole page)
+
     Raises:
         requests.HTTPError: If the request fails
     """
-    r = requests.get(url, headers=HEADERS, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.text
+    if not STREAM_FICTION_HEAD:
+        return fetch_fiction_page(url)
+    return _get(url, "fiction-head", head=True, toc=toc)
+
+
+def print_latency_summary():
+    """Print per-endpoint latency percentiles and hedging counts"""
+    summary = latency.summary()
+    if not summary:
+        return
+    for endpoint, s in sorted(summary.items()):
+        print(f"Latency [{endpoint}]: p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s  "
+              f"p99 {s['p99']:.3f}s  max {s['max']:.3f}s  ({s['count']:,} requests)")
+    print(f"Hedged requests: {hedge_stats['hedged']:,} of {hedge_stats['requests']:,} "
+          f"({hedge_stats['hedge_wins']:,} won by the hedge)")
+    if head_stats["fetches"]:
+        print(f"Streamed fiction pages: {head_stats['fetches']:,} "
+              f"({head_stats['early_closed']:,} closed early, "
+              f"{head_stats['bytes'] / head_stats['fetches'] / 1024:.1f} KB avg)")
+    streams = http2.stream_stats()
+    if streams["streams"] or streams["fallbacks"]:
+        print(f"HTTP/2: {streams['streams']:,} streams over {streams['connections']:,} connections "
+              f"(peak {streams['peak_active']} in flight, {streams['reset']:,} reset early, "
+              f"{streams['http1']:,} negotiated HTTP/1.1, {streams['fallbacks']} fallbacks, "
+              f"{streams['retries']} retries)")
+        if streams["headers_p50"] is not None:
+            print(f"HTTP/2 streams: headers p50 {streams['headers_p50']:.3f}s  "
+                  f"p95 {streams['headers_p95']:.3f}s  duration p95 {streams['stream_p95']:.3f}s")
@@ -0,0 +1,357 @@
+"""
+Per-worker shard databases with a staged bulk merge.
+Instead of every crawler process writing (and waiting for the write lock on)
+royalroad.db, each one appends to its own small SQLite file under SHARD_DIR.
+`merge` attaches the shards, copies their rows into a temporary staging
+table and folds it into `fictions` with set-based INSERT ... SELECT ...
+ON CONFLICT statements, newest scraped_at wins, in one transaction that
+also updates the aggregate tables.
+
+A shard row remembers which columns it provides (a listing refresh carries
+fewer than a detail page), so the merge, like upsert_fictions, never wipes
+fields a row did not scrape. Merging a shard that is still being written
+is safe: only rows the main table now holds (or has something newer than)
+are removed from it, and a shard file is deleted once it is empty and its
+writer has exited.
+
+Usage:
+    python id_crawler.py --shard             # crawl into shards/id_crawler-<pid>-....db
+    python frontier.py --shard
+    python shards.py merge [--dir shards] [--keep-files]
+    python shards.py status
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks: shard files are never deleted
+    fcntl = None
+
+from records import FIELDS, as_rows
+from utils import format_number
+from config import SHARD_DIR, SHARD_ATTACH_BATCH
+
+COLUMNS = ("provided",) + FIELDS
+_BITS = {name: 1 << i for i, name in enumerate(FIELDS)}
+_SCHEMA = (f"CREATE TABLE IF NOT EXISTS {{table}} (provided INTEGER NOT NULL, "
+           f"fiction_id INTEGER NOT NULL, {', '.join(FIELDS[1:])}, "
+           f"PRIMARY KEY (fiction_id, provided))")
+_NEWER = "WHERE excluded.scraped_at > {table}.scraped_at"
+
+
+def provided_mask(row):
+    """Bitmask of the FIELDS a row provides"""
+    mask = 0
+    for name in row:
+        mask |= _BITS[name]
+    return mask
+
+
+def mask_columns(mask):
+    """FIELDS named by a provided_mask(), in column order"""
+    return [name for name in FIELDS if mask & _BITS[name]]
+
+
+def _upsert_sql(table, source):
+    columns = ", ".join(COLUMNS)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c not in ("fiction_id", "provided"))
+    return (f"INSERT INTO {table} ({columns}) {source} "
+            f"ON CONFLICT (fiction_id, provided) DO UPDATE SET {updates} "
+            f"{_NEWER.format(table=table.split('.')[-1])}")
+
+
+def _lock_path(path):
+    return f"{path}.lock"
+
+
+class ShardWriter:
+    """
+    One crawler process's shard database.
+
+    Thread-safe; write() has the same row semantics as upsert_fictions
+    (columns a row does not provide are left alone), and a fiction written
+    twice keeps the row with the newer scraped_at.
+    """
+
+    def __init__(self, path=None, tool="crawl", shard_dir=SHARD_DIR):
+        if path is None:
+            os.makedirs(shard_dir, exist_ok=True)
+            stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(shard_dir, f"{tool}-{os.getpid()}-{stamp}.db")
+        self.path = path
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        # Held until close(): tells `merge` the shard may still grow
+        self._lock_file = open(_lock_path(path), "a")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(_SCHEMA.format(table="fictions"))
+        self.conn.commit()
+        self._sql = _upsert_sql("fictions", f"VALUES ({', '.join('?' * len(COLUMNS))})")
+
+    def write(self, rows):
+        """
+        Store a batch of normalized rows.
+
+        Args:
+            rows (list): FictionRecords or dictionaries containing fiction data
+        """
+        if not rows:
+            return
+        params = []
+        for row in as_rows(rows):
+            if not row.get("scraped_at"):
+                raise ValueError(f"Fiction {row.get('fiction_id')} has no scraped_at")
+            params.append((provided_mask(row),) + tuple(row.get(name) for name in FIELDS))
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(self._sql, params)
+            self.rows_written += len(params)
+
+    def close(self):
+        with self._lock:
+            if self.conn is None:
+                return
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.close()
+            self.conn = None
+            self._lock_file.close()
+
+
+def list_shards(shard_dir=SHARD_DIR):
+    """Shard database paths, oldest first"""
+    if not os.path.isdir(shard_dir):
+        return []
+    return [os.path.join(shard_dir, name) for name in sorted(os.listdir(shard_dir))
+            if name.endswith(".db")]
+
+
+def is_live(path):
+    """True while a ShardWriter still has the shard open (or it cannot be told)"""
+    if fcntl is None:
+        return True
+    try:
+        with open(_lock_path(path), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(f, fcntl.LOCK_UN)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+def _remove_shard(path):
+    for name in (path, f"{path}-wal", f"{path}-shm", _lock_path(path)):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def _attached(conn, paths):
+    """Attach shards as shard0, shard1, ... (outside any transaction)"""
+    aliases = []
+    for i, path in enumerate(paths):
+        alias = f"shard{i}"
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (path,))
+        aliases.append(alias)
+    return aliases
+
+
+def _detach(conn, aliases):
+    for alias in aliases:
+        conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+
+
+def _stage(conn, paths, batch):
+    """Copy every shard row into temp.shard_staging (newest per fiction and column set)"""
+    conn.exec_driver_sql(_SCHEMA.format(table="temp.shard_staging"))
+    conn.exec_driver_sql("DELETE FROM temp.shard_staging")
+    conn.commit()
+    columns = ", ".join(COLUMNS)
+    for start in range(0, len(paths), batch):
+        aliases = _attached(conn, paths[start:start + batch])
+        try:
+            for alias in aliases:
+                # "WHERE true" keeps ON CONFLICT from parsing as a join constraint
+                conn.exec_driver_sql(_upsert_sql(
+                    "temp.shard_staging", f"SELECT {columns} FROM {alias}.fictions WHERE true"))
+            conn.commit()
+        finally:
+            _detach(conn, aliases)
+    return conn.exec_driver_sql("SELECT COUNT(*) FROM temp.shard_staging").scalar()
+
+
+def _merge_staged(conn):
+    """
+    Fold temp.shard_staging into fictions. Caller commits.
+
+    Column sets are merged widest first, and before each one the rows that
+    are not newer than what fictions now holds are dropped, so a listing
+    row only overrides a detail row for the same fiction if it was scraped
+    later, and aggregates.apply() sees exactly the rows that were written.
+
+    Returns:
+        int: Rows written to fictions
+    """
+    import aggregates
+
+    masks = [m for (m,) in conn.exec_driver_sql("SELECT DISTINCT provided FROM temp.shard_staging")]
+    masks.sort(key=lambda m: (-bin(m).count("1"), m))
+    written = 0
+    for mask in masks:
+        conn.exec_driver_sql(
+            "DELETE FROM temp.shard_staging WHERE provided = ? AND scraped_at <= "
+            "(SELECT f.scraped_at FROM main.fictions f WHERE f.fiction_id = shard_staging.fiction_id)",
+            (mask,))
+        columns = mask_columns(mask)
+        tracked = [c for c in aggregates.TRACKED if c in columns]
+        rows = [dict(zip(["fiction_id"] + tracked, r)) for r in conn.exec_driver_sql(
+            f"SELECT {', '.join(['fiction_id'] + tracked)} FROM temp.shard_staging WHERE provided = ?",
+            (mask,))]
+        if not rows:
+            continue
+        old = aggregates.snapshot(conn, [row["fiction_id"] for row in rows])
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "fiction_id")
+        conn.exec_driver_sql(
+            f"INSERT INTO main.fictions ({', '.join(columns)}) "
+            f"SELECT {', '.join(columns)} FROM temp.shard_staging WHERE provided = ? "
+            f"ON CONFLICT (fiction_id) DO UPDATE SET {updates} {_NEWER.format(table='fictions')}",
+            (mask,))
+        aggregates.apply(conn, old, rows)
+        written += len(rows)
+    return written
+
+
+def _clean(conn, paths, batch, remove_files):
+    """Delete merged rows from the shards; remove empty shards whose writer exited"""
+    removed = []
+    for start in range(0, len(paths), batch):
+        group = paths[start:start + batch]
+        live = {path: is_live(path) for path in group}
+        aliases = _attached(conn, group)
+        left = {}
+        try:
+            for path, alias in zip(group, aliases):
+                conn.exec_driver_sql(
+                    f"DELETE FROM {alias}.fictions WHERE scraped_at <= (SELECT f.scraped_at "
+                    f"FROM main.fictions f WHERE f.fiction_id = {alias}.fictions.fiction_id)")
+                conn.commit()
+                left[path] = conn.exec_driver_sql(f"SELECT COUNT(*) FROM {alias}.fictions").scalar()
+        finally:
+            _detach(conn, aliases)
+        for path in group:
+            if remove_files and not left.get(path) and not live[path]:
+                _remove_shard(path)
+                removed.append(path)
+    return removed
+
+
+def merge_shards(paths=None, shard_dir=SHARD_DIR, engine=None, remove_files=True,
+                 attach_batch=SHARD_ATTACH_BATCH):
+    """
+    Merge shard databases into the main fictions table.
+
+    Args:
+        paths (list): Shard files (default: every shard in shard_dir)
+        shard_dir (str): Directory scanned when paths is None
+        engine: SQLAlchemy engine of the main database (default: db.get_engine())
+        remove_files (bool): Delete shards that are empty after the merge
+                             and no longer being written
+        attach_batch (int): Shards attached at once while staging
+
+    Returns:
+        dict: shards, staged, written, removed (paths), seconds
+    """
+    if engine is None:
+        from db import get_engine
+        engine = get_engine()
+    paths = list_shards(shard_dir) if paths is None else list(paths)
+    stats = {"shards": len(paths), "staged": 0, "written": 0, "removed": [], "seconds": 0.0}
+    if not paths:
+        return stats
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        stats["staged"] = _stage(conn, paths, attach_batch)
+        try:
+            stats["written"] = _merge_staged(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS temp.shard_staging")
+        stats["removed"] = _clean(conn, paths, attach_batch, remove_files)
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def shard_status(shard_dir=SHARD_DIR):
+    """(path, rows, bytes, live) for every shard"""
+    result = []
+    for path in list_shards(shard_dir):
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            rows = conn.execute("SELECT COUNT(*) FROM fictions").fetchone()[0]
+        except sqlite3.Error:
+            rows = None
+        finally:
+            conn.close()
+        size = sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+        result.append((path, rows, size, is_live(path)))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-worker shard databases and their bulk merge")
+    sub = parser.add_subparsers(dest="command")
+    merge = sub.add_parser("merge", help="Merge every shard into the main database")
+    merge.add_argument("--dir", default=SHARD_DIR)
+    merge.add_argument("--keep-files", action="store_true",
+                       help="Keep empty shard files after merging")
+    status = sub.add_parser("status", help="List shards and their pending rows")
+    status.add_argument("--dir", default=SHARD_DIR)
+    args = parser.parse_args(argv)
+    shard_dir = getattr(args, "dir", SHARD_DIR)
+
+    if args.command == "merge":
+        from db import init_db
+
+        init_db()
+        stats = merge_shards(shard_dir=shard_dir, remove_files=not args.keep_files)
+        if not stats["shards"]:
+            print(f"No shards in {shard_dir}/")
+            return 0
+        print(f"✓ Merged {stats['shards']} shards: {format_number(stats['staged'])} staged rows, "
+              f"{format_number(stats['written'])} written in {stats['seconds']:.2f}s "
+              f"({len(stats['removed'])} shard files removed)")
+        return 0
+
+    print("=" * 60)
+    print("Shard Databases")
+    print("=" * 60)
+    shards = shard_status(shard_dir)
+    if not shards:
+        print(f"No shards in {shard_dir}/")
+    for path, rows, size, live in shards:
+        pending = "unreadable" if rows is None else f"{format_number(rows)} rows"
+        print(f"  {'*' if live else ' '} {os.path.basename(path):<40} {pending:>14}  "
+              f"{size / (1024 * 1024):,.1f} MB")
+    if shards:
+        print("  (* = still being written)")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
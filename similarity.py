@@ -0,0 +1,489 @@
+"""
+Tag-vector similarity index.
+Each fiction is a sparse vector over the tag vocabulary (IDF-weighted, L2
+normalized), optionally mixed with its normalized stats, so "fictions like X"
+is one sparse matrix-vector product instead of pairwise Python comparisons.
+
+The matrix is saved as CSR arrays (.npy) under SIMILARITY_DIR and loaded
+memory-mapped. `update` re-vectorizes only fictions scraped since the last
+build/update; IDF weights stay as of the build, so rebuild once a large share
+of rows has changed (see `info`).
+
+Usage:
+    python similarity.py build [--stats-weight 0.2]
+    python similarity.py similar 21220 -n 10
+    python similarity.py similar --tags Fantasy,LitRPG -n 10
+    python similarity.py update                     # fictions scraped since last build/update
+    python similarity.py all-pairs -k 10 --out neighbours.npz
+    python similarity.py info
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+
+from db import Fiction
+from config import SIMILARITY_DIR, SIMILARITY_STATS_WEIGHT, SIMILARITY_BLOCK_ROWS
+
+# Stats mixed into the vector when stats_weight > 0 (counts are log-scaled)
+STATS = ("followers", "avg_rating", "views", "pages")
+LOG_STATS = ("followers", "views", "pages")
+ARRAYS = ("data", "indices", "indptr", "ids")
+COLUMNS = (Fiction.fiction_id, Fiction.tags, Fiction.scraped_at) + tuple(getattr(Fiction, s) for s in STATS)
+REBUILD_SHARE = 0.2  # Suggest a rebuild once this share of rows was updated in place
+DENSE_ALL_PAIRS_BYTES = 512 * 1024 * 1024  # all_pairs densifies the matrix below this size
+
+
+def _tags_of(raw):
+    try:
+        tags = json.loads(raw or "[]")
+    except (TypeError, ValueError):
+        return []
+    return list(dict.fromkeys(t for t in tags if isinstance(t, str)))
+
+
+def _stat_matrix(rows):
+    """Stats columns of `rows` as floats (log1p for counts, NaN for missing)."""
+    out = np.full((len(rows), len(STATS)), np.nan)
+    for i, row in enumerate(rows):
+        for j, name in enumerate(STATS):
+            value = row[name]
+            if value is not None:
+                out[i, j] = np.log1p(max(value, 0)) if name in LOG_STATS else value
+    return out
+
+
+class SimilarityIndex:
+    """
+    Fiction x feature CSR matrix with unit-length rows, sorted by fiction_id.
+
+    Columns 0..len(STATS)-1 hold stats z-scores when stats_weight > 0; tag
+    columns follow, in vocabulary order (new tags are appended by `update`).
+    """
+
+    def __init__(self, ids, matrix, meta):
+        self.ids = ids
+        self.matrix = matrix
+        self.vocab = meta["vocab"]
+        self.df = np.asarray(meta["df"], dtype=np.int64)
+        self.idf = np.asarray(meta["idf"], dtype=np.float32)
+        self.n_docs = meta["n_docs"]
+        self.stats_weight = meta["stats_weight"]
+        self.stats_mean = np.asarray(meta["stats_mean"])
+        self.stats_std = np.asarray(meta["stats_std"])
+        self.watermark = meta["watermark"]
+        self.built_at = meta["built_at"]
+        self.updated = meta.get("updated", 0)
+        self._column = {tag: i for i, tag in enumerate(self.vocab)}
+
+    @property
+    def n_stats(self):
+        return len(STATS) if self.stats_weight > 0 else 0
+
+    def meta(self):
+        return {
+            "vocab": self.vocab, "df": self.df.tolist(), "idf": self.idf.tolist(),
+            "n_docs": self.n_docs, "stats_weight": self.stats_weight,
+            "stats_mean": self.stats_mean.tolist(), "stats_std": self.stats_std.tolist(),
+            "watermark": self.watermark, "built_at": self.built_at, "updated": self.updated,
+            "shape": list(self.matrix.shape),
+        }
+
+    # ------------------------------------------------------------------ build
+
+    @classmethod
+    def build(cls, session, stats_weight=SIMILARITY_STATS_WEIGHT):
+        """
+        Vectorize every fiction in the database.
+
+        Args:
+            session: SQLAlchemy session
+            stats_weight (float): Share of each vector given to stats (0-1)
+
+        Returns:
+            SimilarityIndex: The new (unsaved) index
+        """
+        rows = [r._mapping for r in session.execute(select(*COLUMNS).order_by(Fiction.fiction_id))]
+        tag_lists = [_tags_of(r["tags"]) for r in rows]
+
+        counts = {}
+        for tags in tag_lists:
+            for tag in tags:
+                counts[tag] = counts.get(tag, 0) + 1
+        vocab = sorted(counts)
+        df = np.array([counts[t] for t in vocab], dtype=np.int64)
+        n_docs = len(rows)
+
+        stats = _stat_matrix(rows)
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(stats, axis=0) if n_docs else np.zeros(len(STATS))
+            std = np.nanstd(stats, axis=0) if n_docs else np.ones(len(STATS))
+        mean = np.nan_to_num(mean)
+        std = np.where(np.nan_to_num(std) > 0, np.nan_to_num(std), 1.0)
+
+        meta = {
+            "vocab": vocab, "df": df, "idf": cls._idf(df, n_docs), "n_docs": n_docs,
+            "stats_weight": float(stats_weight), "stats_mean": mean, "stats_std": std,
+            "watermark": max((r["scraped_at"] or "" for r in rows), default=""),
+            "built_at": time.time(), "updated": 0,
+        }
+        index = cls(np.array([r["fiction_id"] for r in rows], dtype=np.int64), None, meta)
+        index.matrix = index._vectorize(tag_lists, stats)
+        return index
+
+    @staticmethod
+    def _idf(df, n_docs):
+        return (np.log((1 + n_docs) / (1 + np.asarray(df, dtype=np.float64))) + 1).astype(np.float32)
+
+    def _vectorize(self, tag_lists, stats):
+        """CSR rows for the given tag lists and stats matrix (unknown tags are skipped)."""
+        n_stats = self.n_stats
+        tag_share = np.sqrt(1 - self.stats_weight)
+        stat_share = np.sqrt(self.stats_weight)
+        z = np.nan_to_num((stats - self.stats_mean) / self.stats_std) if n_stats else None
+
+        indptr = [0]
+        indices, data = [], []
+        for i, tags in enumerate(tag_lists):
+            cols = [self._column[t] for t in tags if t in self._column]
+            weights = self.idf[cols].astype(np.float64)
+            tag_norm = np.sqrt(np.dot(weights, weights))
+            stat_norm = np.sqrt(np.dot(z[i], z[i])) if n_stats else 0.0
+            # A row with only one part gets all of its length from that part
+            t_scale = (tag_share if stat_norm else 1.0) / tag_norm if tag_norm else 0.0
+            s_scale = (stat_share if tag_norm else 1.0) / stat_norm if stat_norm else 0.0
+            if s_scale:
+                indices.extend(range(n_stats))
+                data.extend(z[i] * s_scale)
+            if t_scale:
+                indices.extend(n_stats + c for c in cols)
+                data.extend(weights * t_scale)
+            indptr.append(len(indices))
+
+        shape = (len(tag_lists), n_stats + len(self.vocab))
+        matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32),
+             np.array(indptr, dtype=np.int32)), shape=shape)
+        matrix.sort_indices()
+        return matrix
+
+    # ---------------------------------------------------------------- persist
+
+    def save(self, directory=SIMILARITY_DIR):
+        """
+        Write the index as a new generation and switch CURRENT to it atomically.
+        Readers that already memory-mapped the previous generation keep working.
+
+        Args:
+            directory (str): Index directory
+
+        Returns:
+            str: Path of the written generation
+        """
+        os.makedirs(directory, exist_ok=True)
+        previous = _current_generation(directory)
+        gen_dir = os.path.join(directory, f"gen-{time.time_ns()}")
+        os.makedirs(gen_dir)
+        arrays = {"data": self.matrix.data, "indices": self.matrix.indices,
+                  "indptr": self.matrix.indptr, "ids": self.ids}
+        for name, arr in arrays.items():
+            np.save(os.path.join(gen_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+        with open(os.path.join(gen_dir, "meta.json"), "w") as f:
+            json.dump(self.meta(), f)
+
+        tmp = os.path.join(directory, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            f.write(os.path.basename(gen_dir))
+        os.replace(tmp, os.path.join(directory, "CURRENT"))
+        if previous:
+            shutil.rmtree(os.path.join(directory, previous), ignore_errors=True)
+        return gen_dir
+
+    @classmethod
+    def load(cls, directory=SIMILARITY_DIR, mmap=True):
+        """
+        Load the current generation.
+
+        Args:
+            directory (str): Index directory
+            mmap (bool): Memory-map the arrays instead of reading them
+
+        Returns:
+            SimilarityIndex: The index
+
+        Raises:
+            FileNotFoundError: If no index has been built
+        """
+        gen = _current_generation(directory)
+        if not gen:
+            raise FileNotFoundError(f"No similarity index in {directory} - run: python similarity.py build")
+        gen_dir = os.path.join(directory, gen)
+        with open(os.path.join(gen_dir, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(gen_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAYS}
+        matrix = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                                   shape=tuple(meta["shape"]), copy=False)
+        return cls(arrays["ids"], matrix, meta)
+
+    # ---------------------------------------------------------------- queries
+
+    def row_of(self, fiction_id):
+        pos = int(np.searchsorted(self.ids, fiction_id))
+        if pos < len(self.ids) and self.ids[pos] == fiction_id:
+            return pos
+        return None
+
+    def _top(self, scores, k, exclude=None):
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(k, len(scores) - (exclude is not None))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((self.ids[best], -scores[best]))]
+        return [(int(self.ids[i]), float(scores[i])) for i in best if scores[i] > 0]
+
+    def similar(self, fiction_id, k=10):
+        """
+        Most similar fictions by cosine similarity.
+
+        Args:
+            fiction_id (int): Fiction to compare against
+            k (int): Number of results
+
+        Returns:
+            list: (fiction_id, score) pairs, best first (empty if the fiction is not indexed)
+        """
+        row = self.row_of(fiction_id)
+        if row is None:
+            return []
+        query = self.matrix[row].toarray().ravel()
+        return self._top(self.matrix @ query, k, exclude=row)
+
+    def similar_to_tags(self, tags, k=10):
+        """
+        Fictions closest to a set of tags (stats are ignored for the query).
+
+        Args:
+            tags (list): Tag names
+            k (int): Number of results
+
+        Returns:
+            list: (fiction_id, score) pairs, best first
+        """
+        query = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        cols = [self.n_stats + self._column[t] for t in dict.fromkeys(tags) if t in self._column]
+        if not cols:
+            return []
+        query[cols] = self.idf[[c - self.n_stats for c in cols]]
+        query /= np.linalg.norm(query)
+        return self._top(self.matrix @ query, k)
+
+    def all_pairs(self, k=10, block_rows=SIMILARITY_BLOCK_ROWS):
+        """
+        Top-k neighbours of every fiction, scored a block of rows at a time.
+
+        Args:
+            k (int): Neighbours per fiction
+            block_rows (int): Rows per block (memory is ~block_rows x fictions x 4 bytes)
+
+        Returns:
+            tuple: (neighbour_ids, scores) arrays of shape (fictions, k);
+                   missing neighbours have id -1 and score 0
+        """
+        n = self.matrix.shape[0]
+        k = min(k, max(n - 1, 0))
+        neighbours = np.full((n, k), -1, dtype=np.int64)
+        scores = np.zeros((n, k), dtype=np.float32)
+        if not k:
+            return neighbours, scores
+        # With a small vocabulary a dense product (BLAS) beats sparse x sparse by ~8x
+        dense = self.matrix.shape[0] * self.matrix.shape[1] * 4 <= DENSE_ALL_PAIRS_BYTES
+        rows = self.matrix.toarray() if dense else self.matrix
+        transposed = np.ascontiguousarray(rows.T) if dense else self.matrix.T.tocsr()
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            block = rows[start:stop] @ transposed
+            if not dense:
+                block = block.toarray()
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            best = np.sort(np.argpartition(block, n - k, axis=1)[:, n - k:], axis=1)
+            best_scores = np.take_along_axis(block, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            found = best_scores > 0
+            neighbours[start:stop] = np.where(found, self.ids[best], -1)
+            scores[start:stop] = np.where(found, best_scores, 0)
+        return neighbours, scores
+
+    # ----------------------------------------------------------------- update
+
+    def update(self, session, fiction_ids=None):
+        """
+        Re-vectorize changed fictions in place (rows are replaced, added or dropped).
+
+        Document frequencies are kept current and new tags get columns, but
+        the IDF weights of existing rows stay as of the build.
+
+        Args:
+            session: SQLAlchemy session
+            fiction_ids (list): Fictions to refresh; default is every fiction
+                scraped after the index watermark
+
+        Returns:
+            int: Number of fictions refreshed or removed
+        """
+        query = select(*COLUMNS)
+        if fiction_ids is None:
+            query = query.where(Fiction.scraped_at > self.watermark)
+        else:
+            fiction_ids = sorted(set(int(i) for i in fiction_ids))
+            if not fiction_ids:
+                return 0
+            query = query.where(Fiction.fiction_id.in_(fiction_ids))
+        rows = [r._mapping for r in session.execute(query)]
+        changed = set(fiction_ids or ()) | {r["fiction_id"] for r in rows}
+        if not changed:
+            return 0
+
+        changed_ids = np.fromiter(changed, dtype=np.int64)
+        old_rows = np.nonzero(np.isin(self.ids, changed_ids))[0]
+        n_stats = self.n_stats
+        for row in old_rows:
+            cols = self.matrix.indices[self.matrix.indptr[row]:self.matrix.indptr[row + 1]]
+            self.df[cols[cols >= n_stats] - n_stats] -= 1
+
+        tag_lists = [_tags_of(r["tags"]) for r in rows]
+        new_tags = sorted({t for tags in tag_lists for t in tags} - set(self._column))
+        for tag in new_tags:
+            self._column[tag] = len(self.vocab)
+            self.vocab.append(tag)
+        self.df = np.concatenate([self.df, np.zeros(len(new_tags), dtype=np.int64)])
+        for tags in tag_lists:
+            for tag in tags:
+                self.df[self._column[tag]] += 1
+        self.n_docs += len(rows) - len(old_rows)
+        if new_tags:
+            fresh = self._idf(self.df[-len(new_tags):], self.n_docs)
+            self.idf = np.concatenate([self.idf, fresh])
+
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[old_rows] = False
+        width = n_stats + len(self.vocab)
+        kept = self.matrix[keep]
+        kept.resize((kept.shape[0], width))
+        added = self._vectorize(tag_lists, _stat_matrix(rows))
+        ids = np.concatenate([self.ids[keep], np.array([r["fiction_id"] for r in rows], dtype=np.int64)])
+        order = np.argsort(ids, kind="stable")
+        self.matrix = sparse.vstack([kept, added], format="csr")[order]
+        self.ids = ids[order]
+        self.watermark = max([self.watermark] + [r["scraped_at"] or "" for r in rows])
+        self.updated += len(changed)
+        return len(changed)
+
+    def needs_rebuild(self):
+        """True once in-place updates have touched REBUILD_SHARE of the rows."""
+        return self.updated > REBUILD_SHARE * max(self.n_docs, 1)
+
+
+def _current_generation(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tag-vector similarity index")
+    parser.add_argument("--dir", default=SIMILARITY_DIR, help="Index directory")
+    sub = parser.add_subparsers(dest="command")
+    bp = sub.add_parser("build", help="Build the index from the database")
+    bp.add_argument("--stats-weight", type=float, default=SIMILARITY_STATS_WEIGHT)
+    sp = sub.add_parser("similar", help="Fictions most similar to one fiction or a tag set")
+    sp.add_argument("fiction_id", type=int, nargs="?")
+    sp.add_argument("--tags", default=None, help="Comma-separated tags instead of a fiction")
+    sp.add_argument("-n", type=int, default=10)
+    sub.add_parser("update", help="Re-vectorize fictions scraped since the last build/update")
+    ap = sub.add_parser("all-pairs", help="Top-k neighbours for every fiction")
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--out", default="neighbours.npz")
+    sub.add_parser("info", help="Show index size and freshness")
+    args = parser.parse_args(argv)
+
+    from db import init_db, get_session
+    if args.command == "build":
+        init_db()
+        session = get_session()
+        try:
+            start = time.perf_counter()
+            index = SimilarityIndex.build(session, args.stats_weight)
+            path = index.save(args.dir)
+        finally:
+            session.close()
+        print(f"✓ Indexed {len(index.ids):,} fictions x {len(index.vocab):,} tags "
+              f"({index.matrix.nnz:,} non-zeros) in {time.perf_counter() - start:.1f}s -> {path}")
+        return
+
+    index = SimilarityIndex.load(args.dir)
+    if args.command == "update":
+        init_db()
+        session = get_session()
+        try:
+            count = index.update(session)
+        finally:
+            session.close()
+        if count:
+            index.save(args.dir)
+        print(f"✓ Refreshed {count:,} fictions")
+        if index.needs_rebuild():
+            print(f"⚠ {index.updated:,} rows updated since the build - run: python similarity.py build")
+    elif args.command == "similar":
+        start = time.perf_counter()
+        if args.tags:
+            results = index.similar_to_tags([t.strip() for t in args.tags.split(",") if t.strip()], args.n)
+        elif args.fiction_id is not None:
+            if index.row_of(args.fiction_id) is None:
+                print(f"✗ Fiction {args.fiction_id} is not in the index")
+                return
+            results = index.similar(args.fiction_id, args.n)
+        else:
+            parser.error("give a fiction id or --tags")
+        elapsed = (time.perf_counter() - start) * 1000
+        init_db()
+        session = get_session()
+        try:
+            titles = dict(session.execute(select(Fiction.fiction_id, Fiction.title)
+                                          .where(Fiction.fiction_id.in_([f for f, _ in results]))).all())
+        finally:
+            session.close()
+        for rank, (fiction_id, score) in enumerate(results, 1):
+            print(f"{rank:>4}. {(titles.get(fiction_id) or '?')[:50]:<52}{score:>8.3f}  (ID {fiction_id})")
+        print(f"\n{len(results)} results in {elapsed:.1f} ms")
+    elif args.command == "all-pairs":
+        start = time.perf_counter()
+        neighbours, scores = index.all_pairs(args.k)
+        np.savez(args.out, ids=np.asarray(index.ids), neighbours=neighbours, scores=scores)
+        print(f"✓ Top-{args.k} neighbours for {len(index.ids):,} fictions in "
+              f"{time.perf_counter() - start:.1f}s -> {args.out}")
+    else:
+        age = (time.time() - index.built_at) / 3600
+        print(f"Fictions:      {len(index.ids):,}")
+        print(f"Tags:          {len(index.vocab):,}")
+        print(f"Non-zeros:     {index.matrix.nnz:,}")
+        print(f"Stats weight:  {index.stats_weight}")
+        print(f"Built:         {age:.1f}h ago, {index.updated:,} rows updated since")
+        print(f"Watermark:     {index.watermark or '-'}")
+        if index.needs_rebuild():
+            print("⚠ Many rows updated in place - run: python similarity.py build")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Consistent read-only snapshots of the fictions database.
+Copies royalroad.db with SQLite's online backup API, a few hundred pages per
+step with a short pause in between, while the crawlers keep writing. In WAL
+mode the copy runs inside one read transaction on the source: every step
+sees the same committed state (no half-written batch) and writers are never
+blocked. A rollback-journal database is copied between writes instead,
+falling back to holding a read lock after SNAPSHOT_MAX_RESTARTS restarts.
+
+Finished snapshots are renamed into SNAPSHOT_DIR and the LATEST pointer is
+replaced atomically, so readers always open a complete file. Snapshots never
+change once published and are opened immutable (no locking at all); old
+ones are pruned, and readers that still have them open keep working.
+
+Usage:
+    python snapshot.py take                 # one snapshot now
+    python snapshot.py watch [--interval 900]
+    python snapshot.py status
+    python read_api.py serve --snapshots    # serve the newest snapshot
+"""
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import time
+from datetime import datetime
+
+from config import (
+    DB_PATH,
+    SNAPSHOT_DIR,
+    SNAPSHOT_INTERVAL,
+    SNAPSHOT_KEEP,
+    SNAPSHOT_PAGES_PER_STEP,
+    SNAPSHOT_STEP_SLEEP,
+    SNAPSHOT_MAX_RESTARTS,
+)
+
+LATEST_FILE = "LATEST"
+_shutdown_requested = False
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def db_file_from_url(db_url=DB_PATH):
+    return db_url.replace("sqlite:///", "", 1)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _backup(src, dst, pages_per_step, step_sleep, max_restarts):
+    """Run the stepped backup; returns (steps, restarts)"""
+    progress = {"steps": 0, "restarts": 0, "remaining": None}
+
+    def on_step(status, remaining, total):
+        progress["steps"] += 1
+        # The source changed under the copy: SQLite starts over
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if max_restarts is not None and progress["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        progress["remaining"] = remaining
+
+    src.backup(dst, pages=pages_per_step, progress=on_step, sleep=step_sleep)
+    return progress["steps"], progress["restarts"]
+
+
+def take_snapshot(db_file=None, snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP,
+                  pages_per_step=SNAPSHOT_PAGES_PER_STEP, step_sleep=SNAPSHOT_STEP_SLEEP,
+                  max_restarts=SNAPSHOT_MAX_RESTARTS):
+    """
+    Copy the database into a new snapshot and publish it as LATEST.
+
+    Args:
+        db_file (str): Source SQLite file (default: from DB_PATH)
+        snapshot_dir (str): Where snapshots and the LATEST pointer live
+        keep (int): Snapshots to keep after publishing
+        pages_per_step (int): Pages copied per backup step
+        step_sleep (float): Pause between steps (seconds)
+        max_restarts (int): Restarts tolerated before pinning a read lock
+                            (rollback-journal databases only)
+
+    Returns:
+        dict: The published snapshot's LATEST entry (name, path, taken_at,
+              fictions, bytes, seconds, steps, restarts, pinned)
+    """
+    db_file = db_file or db_file_from_url()
+    if not os.path.exists(db_file):
+        raise FileNotFoundError(f"Database not found: {db_file}")
+    os.makedirs(snapshot_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_file))[0]
+    taken_at = datetime.utcnow()
+    name = f"{stem}-{taken_at.strftime('%Y%m%d-%H%M%S-%f')}.db"
+    path = os.path.join(snapshot_dir, name)
+    tmp = f"{path}.tmp"
+
+    start = time.perf_counter()
+    src = sqlite3.connect(db_file, timeout=30)
+    dst = None
+    try:
+        src.execute("PRAGMA query_only = ON")
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        pinned = False
+        earlier_restarts = 0
+        while True:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            dst = sqlite3.connect(tmp)
+            try:
+                if wal or pinned:
+                    # One read transaction for the whole copy: a consistent
+                    # view (in WAL mode without blocking writers)
+                    src.execute("BEGIN")
+                    src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                steps, restarts = _backup(src, dst, pages_per_step, step_sleep,
+                                          None if wal or pinned else max_restarts)
+                if src.in_transaction:
+                    src.rollback()
+                break
+            except _TooManyRestarts:
+                dst.close()
+                pinned = True
+                earlier_restarts = max_restarts + 1
+                print("⚠ Database kept changing during the copy; holding a read lock to finish")
+            finally:
+                if src.in_transaction:
+                    src.rollback()
+
+        # Readers open the copy immutable, so it must not need a WAL
+        dst.execute("PRAGMA journal_mode = DELETE")
+        check = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"Snapshot failed quick_check: {check}")
+        fictions = dst.execute("SELECT COUNT(*) FROM fictions").fetchone()[0]
+        dst.close()
+    except BaseException:
+        if dst is not None:
+            dst.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        src.close()
+
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    entry = {
+        "name": name,
+        "path": path,
+        "source": os.path.abspath(db_file),
+        "taken_at": taken_at.isoformat(),
+        "fictions": fictions,
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - start, 3),
+        "steps": steps,
+        "restarts": earlier_restarts + restarts,
+        "pinned": wal or pinned,
+    }
+    _write_latest(snapshot_dir, entry)
+    prune(snapshot_dir, keep)
+    return entry
+
+
+def _write_latest(snapshot_dir, entry):
+    pointer = os.path.join(snapshot_dir, LATEST_FILE)
+    tmp = f"{pointer}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(entry, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+    _fsync_dir(snapshot_dir)
+
+
+def latest(snapshot_dir=SNAPSHOT_DIR):
+    """
+    The newest published snapshot.
+
+    Returns:
+        dict or None: LATEST entry (with "path" resolved inside snapshot_dir)
+    """
+    try:
+        with open(os.path.join(snapshot_dir, LATEST_FILE)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    entry["path"] = os.path.join(snapshot_dir, entry["name"])
+    return entry
+
+
+def snapshot_uri(path):
+    """SQLite URI opening a published snapshot read-only and without locking"""
+    return f"file:{os.path.abspath(path)}?mode=ro&immutable=1"
+
+
+def connect_latest(snapshot_dir=SNAPSHOT_DIR, check_same_thread=True):
+    """
+    Open the newest snapshot read-only.
+
+    The connection keeps reading the same snapshot even after a newer one
+    is published (or this one is pruned); reopen to move on.
+
+    Returns:
+        sqlite3.Connection
+    """
+    entry = latest(snapshot_dir)
+    if entry is None:
+        raise FileNotFoundError(f"No snapshot published in {snapshot_dir}/")
+    return sqlite3.connect(snapshot_uri(entry["path"]), uri=True, check_same_thread=check_same_thread)
+
+
+def snapshot_engine(snapshot_dir=SNAPSHOT_DIR):
+    """SQLAlchemy engine on the newest snapshot (for ORM queries against db.Fiction)"""
+    from sqlalchemy import create_engine
+
+    entry = latest(snapshot_dir)
+    if entry is None:
+        raise FileNotFoundError(f"No snapshot published in {snapshot_dir}/")
+    uri = snapshot_uri(entry["path"])
+    return create_engine("sqlite://", creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False))
+
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR):
+    """Published snapshot file names, oldest first"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(n for n in os.listdir(snapshot_dir) if n.endswith(".db"))
+
+
+def prune(snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """
+    Delete all but the `keep` newest snapshots (never the LATEST one).
+
+    Returns:
+        list: Names of deleted snapshots
+    """
+    entry = latest(snapshot_dir)
+    current = entry["name"] if entry else None
+    names = list_snapshots(snapshot_dir)
+    removed = []
+    for name in names[:max(len(names) - keep, 0)]:
+        if name == current:
+            continue
+        try:
+            os.remove(os.path.join(snapshot_dir, name))
+            removed.append(name)
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def print_entry(entry):
+    print(f"✓ Snapshot {entry['name']}: {entry['fictions']:,} fictions, "
+          f"{entry['bytes'] / (1024 * 1024):,.1f} MB in {entry['seconds']:.2f}s "
+          f"({entry['steps']} steps, {entry['restarts']} restarts)")
+
+
+def _signal_handler(signum, frame):
+    global _shutdown_requested
+    print("\n\n⚠ Interrupt received! Stopping after the current snapshot...")
+    _shutdown_requested = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consistent read-only database snapshots")
+    sub = parser.add_subparsers(dest="command")
+    take = sub.add_parser("take", help="Take one snapshot now")
+    watch = sub.add_parser("watch", help="Take a snapshot every --interval seconds")
+    watch.add_argument("--interval", type=float, default=SNAPSHOT_INTERVAL)
+    for p in (take, watch):
+        p.add_argument("--db", default=None, help="SQLite file (default: from DB_PATH)")
+        p.add_argument("--dir", default=SNAPSHOT_DIR)
+        p.add_argument("--keep", type=int, default=SNAPSHOT_KEEP)
+    status = sub.add_parser("status", help="Show the published snapshots")
+    status.add_argument("--dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "take":
+        print_entry(take_snapshot(args.db, args.dir, args.keep))
+        return 0
+
+    if args.command == "watch":
+        signal.signal(signal.SIGINT, _signal_handler)
+        signal.signal(signal.SIGTERM, _signal_handler)
+        print(f"Taking a snapshot every {args.interval:g}s into {args.dir}/ (Ctrl+C to stop)")
+        while not _shutdown_requested:
+            try:
+                print_entry(take_snapshot(args.db, args.dir, args.keep))
+            except (OSError, sqlite3.Error) as e:
+                print(f"✗ Snapshot failed: {e}")
+            deadline = time.monotonic() + args.interval
+            while not _shutdown_requested and time.monotonic() < deadline:
+                time.sleep(min(1.0, deadline - time.monotonic()))
+        print("✓ Stopped")
+        return 0
+
+    snapshot_dir = getattr(args, "dir", SNAPSHOT_DIR)
+    entry = latest(snapshot_dir)
+    print("=" * 60)
+    print("Read Snapshots")
+    print("=" * 60)
+    if entry is None:
+        print(f"No snapshot published in {snapshot_dir}/")
+    else:
+        age = datetime.utcnow() - datetime.fromisoformat(entry["taken_at"])
+        print(f"Latest:    {entry['name']} ({age.total_seconds() / 60:,.0f} min old)")
+        print(f"Fictions:  {entry['fictions']:,}")
+        print(f"Copy time: {entry['seconds']:.2f}s, {entry['steps']} steps, {entry['restarts']} restarts")
+        for name in list_snapshots(snapshot_dir):
+            size = os.path.getsize(os.path.join(snapshot_dir, name)) / (1024 * 1024)
+            print(f"  {'*' if name == entry['name'] else ' '} {name}  {size:,.1f} MB")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import archive
+import rate_budget
+from db import Base, _sqlite_pragmas
+
+
+@pytest.fixture(autouse=True)
+def no_shared_budget():
+    """Tests talk to the local stand-in, which the host-wide budget does not guard"""
+    rate_budget.set_enabled(False)
+    yield
+    rate_budget.set_enabled(True)
+
+
+@pytest.fixture(autouse=True)
+def no_page_archive():
+    """Keep test fetches out of the working directory's page archive"""
+    archive.set_enabled(False)
+    yield
+    archive.set_enabled(True)
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Engine on a fresh tmp_path/royalroad.db with every table, set up like db.get_engine()"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'royalroad.db'}")
+    event.listen(engine, "connect", _sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    """Session on the db_engine database"""
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
@@ -0,0 +1,77 @@
+import json
+import random
+
+
+import aggregates
+from db import Fiction
+from loader import upsert_fictions
+
+TAGS = ["Fantasy", "LitRPG", "Romance", "Sci-fi", "Horror", "Comedy"]
+STATUSES = ["Ongoing", "Completed", "Hiatus", None]
+
+
+def _row(rng, fiction_id):
+    return {
+        "fiction_id": fiction_id,
+        "title": f"Fiction {fiction_id}",
+        "author": "Author",
+        "tags": json.dumps(rng.sample(TAGS, rng.randint(0, 3))),
+        "pages": rng.randint(10, 2000),
+        "views": rng.randint(0, 10 ** 6),
+        "followers": rng.randint(0, 5000),
+        "avg_rating": rng.choice([None, round(rng.uniform(1, 5), 2)]),
+        "status": rng.choice(STATUSES),
+        "scraped_at": "2026-01-01T00:00:00",
+    }
+
+
+def test_incremental_aggregates_match_full_recompute(db_session):
+    rng = random.Random(7)
+    upsert_fictions(db_session, [_row(rng, i) for i in range(1, 201)])
+
+    for step in range(10):
+        batch = [_row(rng, fiction_id) for fiction_id in rng.sample(range(1, 261), 30)]
+        if step % 2:
+            # Partial refresh of existing fictions: only some columns are written
+            batch = [dict({k: row[k] for k in ("fiction_id", "title", "author", "followers",
+                                               "status", "scraped_at")},
+                          fiction_type=rng.choice(["Original", "Fanfiction"]))
+                     for row in batch if row["fiction_id"] <= 200]
+        upsert_fictions(db_session, batch)
+
+    assert aggregates.verify(db_session) == []
+
+    stats = {s["scope"]: s for s in aggregates.scope_stats(db_session)}
+    assert stats["all"]["fictions"] == db_session.query(Fiction).count()
+
+    fantasy = [f for f in db_session.query(Fiction) if "Fantasy" in json.loads(f.tags)]
+    expected = sorted(fantasy, key=lambda f: f.followers, reverse=True)[:5]
+    top = aggregates.top(db_session, "tag:Fantasy", "followers", 5)
+    assert [value for _, _, value in top] == [f.followers for f in expected]
+
+
+def test_rebuild_repairs_drift(db_session):
+    rng = random.Random(3)
+    upsert_fictions(db_session, [_row(rng, i) for i in range(1, 51)])
+    # A write that bypassed the loader
+    db_session.query(Fiction).filter(Fiction.fiction_id == 1).update({"followers": 999999})
+    db_session.commit()
+
+    assert aggregates.verify(db_session)
+    assert aggregates.needs_rebuild(db_session) is False
+    assert aggregates.rebuild(db_session) == 50
+    assert aggregates.verify(db_session) == []
+    assert aggregates.top(db_session, "all", "followers", 1)[0][0] == 1
+
+
+def test_duplicate_ids_in_one_batch_count_once(db_session):
+    row = {"fiction_id": 1, "title": "Fiction 1", "author": "Author", "tags": '["Fantasy"]',
+           "status": "Ongoing", "scraped_at": "2026-01-01T00:00:00"}
+    upsert_fictions(db_session, [dict(row, followers=10, fiction_type="Original"), dict(row, followers=20)])
+
+    fiction = db_session.get(Fiction, 1)
+    assert fiction.followers == 20 and fiction.fiction_type == "Original"
+    stats = {s["scope"]: s for s in aggregates.scope_stats(db_session)}
+    for scope in ("all", "tag:Fantasy"):
+        assert stats[scope]["fictions"] == 1 and stats[scope]["avg_followers"] == 20
+    assert aggregates.verify(db_session) == []
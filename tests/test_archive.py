@@ -0,0 +1,83 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from archive import PageArchive, reparse
+from db import Fiction
+from loader import upsert_fictions
+from normalizer import normalize_fiction
+from parser import parse_fiction_page
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+
+
+def _corpus_fictions():
+    with open(os.path.join(CORPUS, "manifest.json")) as f:
+        manifest = json.load(f)
+    for entry in manifest["entries"]:
+        if entry["kind"] == "fiction":
+            with open(os.path.join(CORPUS, entry["file"]), encoding="utf-8") as f:
+                yield entry, f.read()
+
+
+def test_archive_roundtrip_and_dictionary(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), segment_bytes=256 * 1024)
+    pages = list(_corpus_fictions())
+    for copy in range(2):
+        for entry, html in pages:
+            archive.append(f"https://www.royalroad.com{entry['path']}", html, "fiction",
+                           fetched_at=f"2026-01-0{copy + 1}T00:00:00")
+    before = archive.stats()
+    assert before["records"] == 2 * len(pages)
+    assert before["segments"] > 1
+
+    writer = PageArchive(str(tmp_path / "archive"))
+    writer.append("https://www.royalroad.com/fiction/1", "<html></html>", "listing")
+    dict_id = archive.train_dictionary(size=16384)
+    # The trainer switches at once; another writer on its next segment
+    assert archive.current_dict_id() == dict_id
+    assert writer.current_dict_id() == 0
+    writer._open_segment()
+    assert writer.current_dict_id() == dict_id
+    writer.close()
+    for entry, html in pages:
+        archive.append(f"https://www.royalroad.com{entry['path']}", html, "fiction-head",
+                       fetched_at="2026-01-03T00:00:00", truncated=True)
+    after = archive.stats()
+    assert after["by_codec"]["zstd+dict"] == len(pages)
+    assert after["records"] == 3 * len(pages) + 1
+
+    for entry, html in pages:
+        header, stored = archive.latest(entry["fiction_id"])
+        assert stored == html
+        assert header["fetched_at"] == "2026-01-03T00:00:00"
+        assert header["dict_id"] == after["dict_id"]
+
+
+def test_reparse_backfills_new_fields(db_session, tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"))
+
+    rows = []
+    for entry, html in _corpus_fictions():
+        archive.append(f"https://www.royalroad.com{entry['path']}", html, "fiction")
+        # Stored before the detail fields existed: no fiction_type/warnings
+        raw = parse_fiction_page(html)
+        raw["fiction_id"] = entry["fiction_id"]
+        rows.append(normalize_fiction(raw))
+    # Re-scraped a day after its page was archived: the archived copy is older
+    rows[0]["scraped_at"] = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    upsert_fictions(db_session, rows[:-1])
+    scraped_at = {f.fiction_id: f.scraped_at for f in db_session.query(Fiction)}
+
+    stats = reparse(db_session, archive, fields=["fiction_type", "warn_tags", "content_warnings"],
+                    workers=2, chunk_size=3, commit_size=4)
+    assert stats["pages"] == len(rows)
+    assert stats["updated"] == len(rows) - 2
+    assert stats["missing"] == 1
+    assert stats["stale"] == 1
+    assert stats["errors"] == 0
+
+    db_session.expire_all()
+    fictions = db_session.query(Fiction).all()
+    assert all(bool(f.fiction_type) == (f.fiction_id != rows[0]["fiction_id"]) for f in fictions)
+    assert all(f.scraped_at == scraped_at[f.fiction_id] for f in fictions)
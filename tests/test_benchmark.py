@@ -0,0 +1,44 @@
+"""
+Tests for the offline benchmark suite and its recorded corpus.
+"""
+from benchmark import load_corpus, measure, compare_to_thresholds
+from parser import parse_listing_links, parse_fiction_page, parse_fiction_details
+
+
+def test_corpus_parses():
+    """Every recorded page should yield the fields the pipeline relies on"""
+    listings = load_corpus("listing")
+    fictions = load_corpus("fiction")
+    assert listings and fictions
+
+    for _, html in listings:
+        assert parse_listing_links(html)
+
+    for _, html in fictions:
+        data = parse_fiction_page(html)
+        assert data["title"] and data["author"] and data["followers"]
+        details = parse_fiction_details(html)
+        assert details["fiction_type"] and details["status"]
+
+
+def test_measure_reports_rates():
+    """measure() should report throughput and memory for each stage"""
+    stats = measure(lambda s: s.upper(), ["abc"] * 10, iterations=2)
+    assert stats["pages"] == 10
+    assert stats["pages_per_sec"] > 0
+    assert stats["peak_kb_per_page"] >= 0
+
+
+def test_thresholds_flag_regressions():
+    """A stage below its floor or above its ceiling is reported as a regression"""
+    results = {"stages": {
+        "parse_fiction_page": {"pages_per_sec": 1.0, "cpu_ms_per_page": 10, "peak_kb_per_page": 100},
+        "normalize_fiction": {"pages_per_sec": 50000, "cpu_ms_per_page": 0.01, "peak_kb_per_page": 1},
+    }}
+    thresholds = {
+        "parse_fiction_page": {"min_pages_per_sec": 5},
+        "normalize_fiction": {"min_pages_per_sec": 1000, "max_peak_kb_per_page": 16},
+    }
+    failures = compare_to_thresholds(results, thresholds)
+    assert len(failures) == 1
+    assert failures[0].startswith("parse_fiction_page")
@@ -0,0 +1,73 @@
+"""
+Tests for incremental chapter table-of-contents tracking.
+"""
+import time
+from datetime import datetime, timedelta
+
+import chapters
+from db import Chapter, ChapterStat, Fiction
+from mock_server import Catalogue, render_fiction
+from parser import parse_chapters, truncate_fiction_head
+
+
+def test_only_changed_tables_are_read_and_diffed(db_session):
+    catalogue = Catalogue(300, seed=1)
+    fid = next(f for f in catalogue.ids if catalogue.meta(f)["chapters"] >= 20)
+    tracker = chapters.ChapterTracker(db_session)
+
+    # First visit: the whole table is kept and every chapter stored
+    head, truncated = truncate_fiction_head(render_fiction(catalogue, fid), chunk_size=512,
+                                            toc=tracker.toc_for(fid))
+    count = len(catalogue.chapter_times(fid))
+    assert len(parse_chapters(head)) == count
+    assert tracker.observe(fid, head) == count
+    tracker.flush()
+    stat = db_session.get(ChapterStat, fid)
+    assert stat.chapter_count == count
+    assert abs(stat.interval_hours - catalogue.meta(fid)["release_interval"] / 3600) < 0.01
+
+    # Unchanged count: the scan stops at the first chapter and nothing is written
+    head, truncated = truncate_fiction_head(render_fiction(catalogue, fid), chunk_size=512,
+                                            toc=tracker.toc_for(fid))
+    assert truncated and len(parse_chapters(head)) < count
+    assert tracker.observe(fid, head) is None and not db_session.new and not db_session.dirty
+
+    # A new chapter: only that row is inserted
+    catalogue.touch(fid, int(time.time()))
+    head, _ = truncate_fiction_head(render_fiction(catalogue, fid), chunk_size=512,
+                                    toc=tracker.toc_for(fid))
+    assert tracker.observe(fid, head) == 1
+    tracker.flush()
+    assert tracker.stats["inserted"] == count + 1 and tracker.stats["updated"] == 0
+    rows = db_session.query(Chapter).filter(Chapter.fiction_id == fid).order_by(Chapter.position).all()
+    assert len(rows) == count + 1 and rows[-1].position == count + 1
+    assert db_session.get(ChapterStat, fid).chapter_count == count + 1
+
+
+def test_release_cadence_stretches_frontier_freshness(db_session, tmp_path):
+    import frontier as frontier_mod
+
+    now = time.time()
+    scraped = (datetime.utcnow() - timedelta(days=5)).isoformat()
+    db_session.add_all([Fiction(fiction_id=i, title=f"F{i}", author="A", scraped_at=scraped)
+                        for i in (1, 2, 3)])
+    checked = datetime.utcnow().isoformat()
+    # 1: dormant for 200 days; 2: weekly releases, last one yesterday; 3: untracked
+    db_session.add_all([
+        ChapterStat(fiction_id=1, chapter_count=50, interval_hours=24.0,
+                    last_published=int(now - 200 * 86400), toc_checked_at=checked),
+        ChapterStat(fiction_id=2, chapter_count=50, interval_hours=168.0,
+                    last_published=int(now - 86400), toc_checked_at=checked),
+    ])
+    db_session.commit()
+
+    assert chapters.refresh_hours(24.0, now - 200 * 86400, now) == 24 * 14
+    assert chapters.refresh_hours(168.0, now - 86400, now) == 84
+    assert chapters.refresh_hours(None, None, now) == 72
+    assert chapters.release_rate([0, 3600 * 24, None, 3600 * 48]) == (7.0, 24.0)
+    assert chapters.fresh_ids(db_session, [1, 2, 3], now) == {1}
+
+    frontier = frontier_mod.CrawlFrontier(db_session, state_file=str(tmp_path / "state.json"),
+                                          seen_file=str(tmp_path / "seen.bitmap"))
+    frontier.offer("trending", 1, [f"https://www.royalroad.com/fiction/{i}/f" for i in (1, 2, 3)])
+    assert frontier.stats["fresh"] == 1 and len(frontier) == 2
@@ -0,0 +1,126 @@
+"""
+Tests for the long-running crawl daemon.
+"""
+import calendar
+import json
+from datetime import datetime
+
+import daemon
+from db import Fiction
+from loader import upsert_fictions
+
+
+def _daemon(tmp_path, session, jobs):
+    return daemon.Daemon(
+        session, jobs=jobs, pid_file=str(tmp_path / "daemon.pid"),
+        status_file=str(tmp_path / "status.json"), idle_sleep=0.1, delays=False,
+        alert_file=str(tmp_path / "alert.json"), incremental_state=str(tmp_path / "inc.json"),
+        frontier_state=str(tmp_path / "frontier.json"), frontier_seen=str(tmp_path / "seen.bitmap"),
+        missing_file=str(tmp_path / "missing.bitmap"), stop=daemon.threading.Event())
+
+
+def test_windows_and_scheduling(tmp_path):
+    assert daemon.parse_window("22:30-04:00") == (1350, 240)
+    assert daemon.in_windows(None, datetime(2026, 1, 1, 12, 0))
+    assert daemon.in_windows(["22:30-04:00"], datetime(2026, 1, 1, 23, 0))
+    assert daemon.in_windows(["22:30-04:00"], datetime(2026, 1, 1, 3, 59))
+    assert not daemon.in_windows(["22:30-04:00", "10:00-11:00"], datetime(2026, 1, 1, 12, 0))
+
+    d = _daemon(tmp_path, None, {
+        "incremental": {"interval": 60, "budget": 10},
+        "refresh": {"interval": 60, "budget": 10, "windows": ["00:00-01:00"]},
+    })
+    inside = calendar.timegm(datetime(2026, 1, 1, 0, 30).timetuple())
+    noon = calendar.timegm(datetime(2026, 1, 1, 12).timetuple())
+    inc, refresh = d.jobs
+    inc.next_run, refresh.next_run = 5, 1
+    assert d.next_due(inside) is refresh  # earliest scheduled of the due jobs
+    assert d.next_due(noon) is inc  # refresh is outside its window
+    inc.next_run = noon + 10
+    assert d.next_due(noon) is None
+
+    # Only one daemon at a time
+    assert d.acquire()
+    other = _daemon(tmp_path, None, {"incremental": {"interval": 60, "budget": 1}})
+    assert not other.acquire() and daemon.is_running(d.pid_file)
+    d.release()
+    assert not daemon.is_running(d.pid_file) and other.acquire()
+    other.release()
+
+
+def test_jobs_run_with_budgets_and_stop_cleanly(db_session, tmp_path, monkeypatch):
+    """Stalest fictions are refreshed first, each run stops at its budget, status is kept"""
+    from mock_server import start_server
+    import scraper
+    import parser
+
+    server, url = start_server(fictions=200, fixtures=False, seed=5)
+    for module in (scraper, parser, daemon):
+        monkeypatch.setattr(module, "BASE_URL", url)
+    ids = server.state.catalogue.ids[:30]
+    # Rows scraped long ago, the first ten longest ago
+    upsert_fictions(db_session, [{"fiction_id": fid, "title": "Old", "author": "A", "tags": "[]",
+                                  "scraped_at": f"2025-0{1 if i < 10 else 2}-01T00:00:{i:02d}"}
+                                 for i, fid in enumerate(ids)])
+
+    d = _daemon(tmp_path, db_session, {
+        "refresh": {"interval": 3600, "budget": 10},
+        "incremental": {"interval": 3600, "budget": 5},
+    })
+    try:
+        assert d.acquire()
+        assert d.run(max_runs=2) == 2
+        # Both jobs are now waiting for their interval: a stop ends the idle sleep
+        d.stop_event.set()
+        assert d.run() == 0
+        d.release()
+        refreshed = {f.fiction_id for f in db_session.query(Fiction).filter(Fiction.title != "Old")}
+    finally:
+        server.shutdown()
+
+    assert set(ids[:10]) <= refreshed
+    with open(tmp_path / "status.json") as f:
+        status = json.load(f)
+    assert status["state"] == "stopped"
+    assert status["jobs"]["refresh"]["fetched"] == 10
+    assert status["jobs"]["incremental"]["runs"] == 1
+    assert 0 < status["jobs"]["incremental"]["fetched"] <= 5
+
+
+def test_refresh_skips_missing_and_backs_off_failures(db_session, tmp_path, monkeypatch):
+    """404s are marked missing and failing pages retried later, so they never block the stale head"""
+    import requests
+    from db import RefreshFailure
+    from id_bitmap import IdBitmap
+
+    upsert_fictions(db_session, [{"fiction_id": fid, "title": "Old", "author": "A", "tags": "[]",
+                                  "scraped_at": f"2025-01-01T00:00:{fid:02d}"} for fid in range(1, 11)])
+    missing_file = str(tmp_path / "missing.bitmap")
+
+    def fetch(url, toc=None):
+        fid = int(url.rsplit("/", 1)[1])
+        if fid in (1, 2):
+            response = requests.Response()
+            response.status_code = 404 if fid == 1 else 503
+            raise requests.HTTPError(str(response.status_code), response=response)
+        return f"page {fid}"
+
+    monkeypatch.setattr(daemon, "fetch_fiction_head", fetch)
+    monkeypatch.setattr(daemon, "parse_fiction_full",
+                        lambda html: {"title": html, "author": "A", "tags": []})
+    monitor = daemon.health.ParseHealth(required=("title",), alert_file=str(tmp_path / "alert.json"),
+                                        samples_dir=str(tmp_path / "samples"))
+    stats = daemon.refresh_stale(db_session, 3, fiction_delay=False, monitor=monitor,
+                                 missing_file=missing_file)
+    assert stats == {"fetched": 1, "errors": 1, "missing": 1}
+    assert 1 in IdBitmap.load(missing_file)
+    failure = db_session.get(RefreshFailure, 2)
+    assert failure.failures == 1 and "503" in failure.last_error
+
+    # The next run starts with the healthy rows behind them
+    assert daemon.stale_ids(db_session, 3, missing=IdBitmap.load(missing_file)) == [4, 5, 6]
+    # Once the retry is due the failed fiction is first again; a success clears it
+    later = failure.retry_after + 1
+    assert daemon.stale_ids(db_session, 2, now=later, missing=IdBitmap.load(missing_file)) == [2, 4]
+    daemon.record_failure(db_session, 2, "again", now=later)
+    assert db_session.get(RefreshFailure, 2).retry_after - later == 2 * daemon.REFRESH_RETRY_HOURS * 3600
@@ -0,0 +1,86 @@
+"""
+Tests for the structured event log.
+"""
+import io
+import json
+import logging
+import threading
+import time
+
+import events
+
+
+class SlowStream(io.StringIO):
+    """A console that takes 5ms per write (a slow SSH session)"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def write(self, text):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.005)
+        return super().write(text)
+
+
+def test_events_are_written_off_thread_rotated_and_sampled(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(events, "_enabled", True)
+    monkeypatch.setattr(events, "_sample_rates", {"fiction.scraped": 0.25})
+    stream = SlowStream()
+    path = events.start("crawl", log_dir=str(tmp_path), max_bytes=4096, backups=50, stream=stream)
+
+    start = time.monotonic()
+    for i in range(400):
+        events.emit("fiction.scraped", index=i + 1, count=400, fiction_id=i, title=f"Title {i}")
+    for i in range(50):
+        events.emit("fiction.error", logging.ERROR, index=i + 1, count=50, fiction_id=i, error="timeout")
+    emit_seconds = time.monotonic() - start
+    events.stop()
+
+    # Rendering to the slow console happened on the listener thread, not here
+    assert emit_seconds < 0.5
+    assert threading.current_thread().name not in stream.threads
+    lines = stream.getvalue().splitlines()
+    assert "  [1/50] Scraping fiction 0... ✗ ERROR: timeout" in lines
+
+    # Only the JSON log is sampled: the console shows every event
+    assert len(lines) == 450 and "  [400/400] Scraping fiction 399... ✓ Title 399" in lines
+
+    # Rotated files are gzipped; together with the live file they hold every kept event
+    rotated = sorted(tmp_path.glob("crawl.jsonl.*.gz"))
+    assert rotated and all(p.stat().st_size < 4096 for p in rotated)
+    kept = [e for p in [path] + [str(p) for p in rotated] for e in events.read_events(p)]
+    scraped = [e for e in kept if e["event"] == "fiction.scraped"]
+    errors = [e for e in kept if e["event"] == "fiction.error"]
+    assert len(errors) == 50 and all("sample_rate" not in e for e in errors)
+    assert 40 < len(scraped) < 180 and all(e["sample_rate"] == 0.25 for e in scraped)
+    assert len(kept) == len(scraped) + 50
+    assert {e["tool"] for e in kept} == {"crawl"} and errors[0]["level"] == "error"
+
+    # Before start (and after stop) events are printed directly
+    events.emit("page.links", page=1, links=20)
+    assert capsys.readouterr().out == "  Found 20 fiction links\n"
+
+
+def test_disabled_log_renders_directly_and_stats_reweight(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(events, "_enabled", False)
+    stream = io.StringIO()
+    assert events.start("update_db", log_dir=str(tmp_path), stream=stream) is None
+    events.emit("fiction.updated", index=3, title="A" * 50, fiction_id=7)
+    events.emit("custom.thing", size=2)
+    # Written synchronously: no listener thread, no log file
+    assert stream.getvalue().splitlines() == [f"[3] Updating {'A' * 30} (ID: 7)... ✓ Done",
+                                              "custom.thing size=2"]
+    events.stop()
+    assert list(tmp_path.iterdir()) == []
+
+    log = tmp_path / "update_db.jsonl"
+    log.write_text("\n".join(json.dumps(e) for e in [
+        {"ts": "2026-01-01T00:00:00.000+00:00", "level": "info", "event": "fiction.updated",
+         "sample_rate": 0.1, "index": 1, "title": "T", "fiction_id": 1},
+        {"ts": "2026-01-01T00:00:01.000+00:00", "level": "warning", "event": "fiction.update_skipped"},
+    ]) + "\n{\"cut off")
+    assert events.main(["stats", str(log)]) == 0
+    out = capsys.readouterr().out
+    assert "fiction.updated                         10" in out
+    assert "Levels: info 1, warning 1" in out
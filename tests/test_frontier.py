@@ -0,0 +1,98 @@
+"""
+Tests for the multi-seed crawl frontier (against the local stand-in).
+"""
+from db import Fiction
+
+
+def test_each_fiction_fetched_once_per_window(db_session, tmp_path, monkeypatch):
+    """Fictions on several seed listings are fetched once; a rerun inside the window fetches none"""
+    from mock_server import start_server
+    import scraper
+    import parser
+    import frontier as frontier_mod
+
+    server, url = start_server(fictions=120, fixtures=False)
+    monkeypatch.setattr(scraper, "BASE_URL", url)
+    monkeypatch.setattr(parser, "BASE_URL", url)
+
+    def make_frontier():
+        return frontier_mod.CrawlFrontier(
+            db_session, state_file=str(tmp_path / "state.json"),
+            seen_file=str(tmp_path / "seen.bitmap"), page_delay=False)
+
+    try:
+        frontier = make_frontier()
+        first = frontier_mod.run_frontier(db_session, frontier, max_fetches=50, fiction_delay=False)
+        assert first["fetched"] == 50
+
+        # Resume from persisted state and drain the rest
+        frontier = make_frontier()
+        stats = frontier_mod.run_frontier(db_session, frontier, fiction_delay=False)
+        assert first["duplicates"] + stats["duplicates"] > 0
+        assert server.state.stats["fiction:200"] == 120
+        assert db_session.query(Fiction).count() == 120
+
+        # Same window: every mention is suppressed
+        (tmp_path / "state.json").unlink()
+        (tmp_path / "seen.bitmap").unlink()
+        frontier = make_frontier()
+        stats = frontier_mod.run_frontier(db_session, frontier, fiction_delay=False)
+        assert stats["fetched"] == 0
+        assert stats["fresh"] == 120
+    finally:
+        server.shutdown()
+
+
+def test_best_score_wins(db_session, tmp_path):
+    """A fiction offered by two seeds keeps the better score and is popped once"""
+    import frontier as frontier_mod
+
+    frontier = frontier_mod.CrawlFrontier(
+        db_session, seeds={"trending": 2.0, "best-rated": 1.0},
+        state_file=str(tmp_path / "s.json"), seen_file=str(tmp_path / "s.bitmap"))
+    base = "https://www.royalroad.com/fiction"
+    frontier.offer("best-rated", 1, [f"{base}/1/a", f"{base}/2/b", f"{base}/3/c"])
+    frontier.offer("trending", 1, [f"{base}/3/c", f"{base}/4/d"])
+
+    order = [frontier.pop()[0] for _ in range(4)]
+    assert order == [3, 1, 4, 2]
+    assert frontier.pop() is None
+
+
+def test_failing_seed_backs_off_instead_of_spinning(db_session, tmp_path, monkeypatch):
+    """A listing that keeps erroring is retried with delays, backs off, and never stalls next()"""
+    import requests
+    import frontier as frontier_mod
+
+    base = "https://www.royalroad.com/fiction"
+    calls, sleeps = [], []
+
+    def fetch_listing_page(page, listing):
+        calls.append((listing, page))
+        if listing == "trending" or page > 1:
+            response = requests.Response()
+            response.status_code = 500 if listing == "trending" else 404
+            raise requests.HTTPError("boom", response=response)
+        return "listing"
+
+    monkeypatch.setattr(frontier_mod, "fetch_listing_page", fetch_listing_page)
+    monkeypatch.setattr(frontier_mod, "parse_listing_links",
+                        lambda html: [f"{base}/{i}/x" for i in (1, 2)])
+    monkeypatch.setattr(frontier_mod, "sleep_with_jitter", lambda *a: sleeps.append(a))
+    frontier = frontier_mod.CrawlFrontier(
+        db_session, seeds={"trending": 2.0, "best-rated": 1.0},
+        state_file=str(tmp_path / "s.json"), seen_file=str(tmp_path / "s.bitmap"))
+
+    # The healthy seed is drained; the failing one is not retried in a tight loop
+    assert [frontier.next()[0], frontier.next()[0]] == [1, 2]
+    assert frontier.next() is None
+    assert "best-rated" in frontier.exhausted and "trending" not in frontier.exhausted
+    errors = frontier.stats["listing_errors"]
+    assert 1 <= errors <= frontier_mod.FRONTIER_SEED_MAX_FAILURES and len(sleeps) >= errors
+
+    # Repeated calls: the seed backs off after FRONTIER_SEED_MAX_FAILURES errors in a row
+    for _ in range(10):
+        assert frontier.next() is None
+    assert frontier.stats["listing_errors"] == frontier_mod.FRONTIER_SEED_MAX_FAILURES
+    assert frontier.backoff_until["trending"] > 0
+    assert calls.count(("trending", 1)) == frontier_mod.FRONTIER_SEED_MAX_FAILURES
@@ -0,0 +1,76 @@
+"""
+Tests for the parser health monitor.
+"""
+import json
+import os
+
+import health
+from db import Fiction
+
+GOOD = {"title": "T", "author": "A", "followers": "10", "views": "100", "pages": "5", "tags": []}
+
+
+def _monitor(tmp_path, **kwargs):
+    return health.ParseHealth(alert_file=str(tmp_path / "alert.json"),
+                              samples_dir=str(tmp_path / "samples"), **kwargs)
+
+
+def test_trips_on_low_coverage_and_consecutive_failures(tmp_path):
+    # Sporadic misses keep coverage above the threshold
+    monitor = _monitor(tmp_path, window=20, min_pages=10, min_coverage=0.8, max_consecutive=5, max_samples=3)
+    for i in range(40):
+        raw = dict(GOOD, followers=None) if i % 10 == 0 else GOOD
+        monitor.observe(f"u{i}", raw, "<html></html>")
+    assert monitor.tripped is None
+    assert monitor.coverage()["followers"] == 0.9
+    assert len(os.listdir(tmp_path / "samples")) == 2 * 3
+
+    # Every third page losing its stats drags coverage below 80%
+    for i in range(20):
+        missing = monitor.observe(f"v{i}", dict(GOOD, views=None) if i % 3 == 0 else GOOD)
+        if monitor.tripped:
+            break
+    assert missing == ["views"]
+    assert "coverage" in monitor.tripped["reason"]
+    assert not health.require_healthy(str(tmp_path / "alert.json"))
+    assert health.clear_alert(str(tmp_path / "alert.json"))
+    assert health.require_healthy(str(tmp_path / "alert.json"))
+
+    # A markup change trips after max_consecutive pages, before min_pages
+    monitor = _monitor(tmp_path, min_pages=50, max_consecutive=5)
+    pages = 0
+    while not monitor.tripped:
+        monitor.observe("w", dict(GOOD, title=None))
+        pages += 1
+    assert pages == 5
+    assert json.loads((tmp_path / "alert.json").read_text())["coverage"]["title"] == 0.0
+
+
+def test_frontier_stops_on_markup_change(db_session, tmp_path, monkeypatch):
+    """Pages that stop yielding required fields are never upserted and the crawl halts early"""
+    from mock_server import start_server
+    import scraper
+    import parser
+    import frontier as frontier_mod
+
+    server, url = start_server(fictions=60, fixtures=False)
+    monkeypatch.setattr(scraper, "BASE_URL", url)
+    monkeypatch.setattr(parser, "BASE_URL", url)
+    # Markup change: the stats block is no longer found
+    real_parse = frontier_mod.parse_fiction_full
+    monkeypatch.setattr(frontier_mod, "parse_fiction_full",
+                        lambda html: dict(real_parse(html), followers=None, views=None, pages=None))
+    monitor = _monitor(tmp_path, max_consecutive=4)
+    try:
+        frontier = frontier_mod.CrawlFrontier(
+            db_session, state_file=str(tmp_path / "state.json"),
+            seen_file=str(tmp_path / "seen.bitmap"), page_delay=False)
+        stats = frontier_mod.run_frontier(db_session, frontier, fiction_delay=False, monitor=monitor)
+    finally:
+        server.shutdown()
+
+    assert monitor.tripped is not None
+    assert stats["errors"] == 4 and stats["fetched"] == 0
+    assert server.state.stats["fiction:200"] == 4
+    assert db_session.query(Fiction).count() == 0
+    assert len([p for p in os.listdir(tmp_path / "samples") if p.endswith(".html")]) == 4
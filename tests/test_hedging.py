@@ -0,0 +1,122 @@
+import pytest
+import requests
+
+import rate_budget
+import scraper
+from latency import LatencyTracker
+from runtime_config import settings
+
+
+@pytest.fixture
+def fresh_scraper(monkeypatch):
+    monkeypatch.setattr(scraper, "latency", LatencyTracker())
+    monkeypatch.setattr(scraper, "hedge_stats", {"requests": 0, "hedged": 0, "hedge_wins": 0})
+    monkeypatch.setattr(scraper, "HEDGE_MIN_SAMPLES", 10)
+    monkeypatch.setattr(scraper, "HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(scraper, "HEDGE_BUDGET", 0.2)
+    calls = []
+    monkeypatch.setattr(rate_budget, "acquire", lambda cost=1.0, tool=None: calls.append(cost))
+    monkeypatch.setattr(rate_budget, "try_acquire", lambda cost=1.0, tool=None: calls.append(cost) or 0.0)
+    return calls
+
+
+def test_latency_percentiles():
+    tracker = LatencyTracker()
+    for i in range(1, 101):
+        tracker.record("fiction", i / 100)
+    assert tracker.percentile("fiction", 50) == pytest.approx(0.5, abs=0.02)
+    assert tracker.percentile("fiction", 99) == pytest.approx(0.99, abs=0.02)
+    assert tracker.percentile("listing", 50) is None
+
+
+def test_slow_requests_are_hedged_within_budget(fresh_scraper):
+    from mock_server import start_server
+
+    # Heavy-tailed latency: most responses ~10ms, a few take far longer
+    server, url = start_server(fictions=50, fixtures=False, latency="pareto:0.01,1.1", seed=3, density=1.0, dead_zone_rate=0.0)
+    try:
+        for i in range(120):
+            html = scraper.fetch_fiction_page(f"{url}/fiction/{i % 50 + 1}")
+            assert "<h1" in html
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    stats = scraper.hedge_stats
+    assert stats["requests"] == 120
+    assert 0 < stats["hedged"] <= 0.2 * stats["requests"]
+    # Every hedge takes its own token from the shared budget
+    assert len(fresh_scraper) == stats["requests"] + stats["hedged"]
+
+
+def test_read_timeout_is_separate_from_connect(fresh_scraper, monkeypatch):
+    from mock_server import start_server
+
+    monkeypatch.setitem(settings.pinned, "READ_TIMEOUT", 0.2)
+    server, url = start_server(fictions=5, fixtures=False, latency="fixed:1.0")
+    try:
+        with pytest.raises(requests.Timeout):
+            scraper.fetch_fiction_page(f"{url}/fiction/1")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_no_hedge_when_the_primary_answers_while_waiting_for_budget(fresh_scraper, monkeypatch):
+    from mock_server import start_server
+
+    monkeypatch.setattr(scraper, "HEDGE_BUDGET", 1.0)
+    for _ in range(10):
+        scraper.latency.record("fiction", 0.01)
+    # The shared budget is empty: a hedge token would take longer than the primary
+    polls = []
+    monkeypatch.setattr(rate_budget, "try_acquire", lambda cost=1.0, tool=None: polls.append(cost) or 0.05)
+    server, url = start_server(fictions=5, fixtures=False, latency="fixed:0.2")
+    try:
+        assert "<h1" in scraper.fetch_fiction_page(f"{url}/fiction/1")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert polls and server.state.stats["fiction:200"] == 1
+    assert scraper.hedge_stats == {"requests": 1, "hedged": 0, "hedge_wins": 0}
+    assert fresh_scraper == [1.0]  # Only the primary's token
+
+
+def test_total_deadline_cuts_off_a_trickling_body(fresh_scraper, monkeypatch):
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Trickle(BaseHTTPRequestHandler):
+        """Sends a small page one byte every 50ms: never silent for a whole read timeout"""
+
+        def do_GET(self):
+            body = b"<h1>" + b"x" * 60 + b"</h1>"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                for i in range(len(body)):
+                    self.wfile.write(body[i:i + 1])
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass  # The client gave up
+
+        def log_message(self, *args):
+            pass
+
+    monkeypatch.setitem(settings.pinned, "TOTAL_TIMEOUT", 0.5)
+    monkeypatch.setitem(settings.pinned, "READ_TIMEOUT", 0.3)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Trickle)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        start = time.monotonic()
+        # The whole body fits in one 16 KB chunk and would arrive after ~3.3s
+        with pytest.raises(requests.Timeout):
+            scraper.fetch_fiction_page(f"http://127.0.0.1:{server.server_port}/fiction/1")
+        assert time.monotonic() - start < 1.0
+    finally:
+        server.shutdown()
+        server.server_close()
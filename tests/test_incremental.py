@@ -0,0 +1,72 @@
+"""
+Tests for the watermark-based incremental crawl (against the local stand-in).
+"""
+from db import Fiction
+
+
+def test_refreshes_only_fictions_above_watermark(db_session, tmp_path, monkeypatch):
+    """Only fictions updated after the watermark are fetched, and the watermark advances"""
+    from mock_server import start_server
+    import scraper
+    import parser
+    import incremental
+
+    server, url = start_server(fictions=300, fixtures=False)
+    monkeypatch.setattr(scraper, "BASE_URL", url)
+    monkeypatch.setattr(parser, "BASE_URL", url)
+    catalogue = server.state.catalogue
+
+    try:
+        latest = catalogue.listing_order("latest-updates")
+        since = catalogue.last_release(latest[45])
+        expected = {f for f in latest if catalogue.last_release(f) > since - incremental.INCREMENTAL_OVERLAP_SECONDS}
+
+        watermark = incremental.Watermark(str(tmp_path / "state.json"))
+        stats = incremental.run_incremental(db_session, watermark, since=since, fiction_delay=False)
+        assert stats["pages"] == 3
+        stored = {fid for (fid,) in db_session.query(Fiction.fiction_id)}
+        assert stored == expected
+        assert watermark.value == catalogue.last_release(latest[0])
+        assert db_session.get(Fiction, latest[0]).fiction_type in ("Original", "Fanfiction")
+
+        # Two authors publish; the next run picks up exactly those
+        before = server.state.stats["fiction:200"]
+        catalogue.touch(latest[200], watermark.value + 3600)
+        catalogue.touch(latest[250], watermark.value + 7200)
+        stats = incremental.run_incremental(db_session, watermark, fiction_delay=False)
+        assert stats["pages"] == 1
+        assert server.state.stats["fiction:200"] - before == stats["found"]
+        assert {latest[200], latest[250]} <= {fid for (fid,) in db_session.query(Fiction.fiction_id)}
+        assert watermark.value == catalogue.last_release(latest[250])
+    finally:
+        server.shutdown()
+
+
+def test_watermark_stays_when_max_pages_runs_out(db_session, tmp_path, monkeypatch, capsys):
+    """A walk capped before the watermark refreshes what it found but does not skip the rest"""
+    from mock_server import start_server
+    import scraper
+    import parser
+    import incremental
+
+    server, url = start_server(fictions=300, fixtures=False)
+    monkeypatch.setattr(scraper, "BASE_URL", url)
+    monkeypatch.setattr(parser, "BASE_URL", url)
+    catalogue = server.state.catalogue
+
+    try:
+        latest = catalogue.listing_order("latest-updates")
+        since = catalogue.last_release(latest[45])
+        watermark = incremental.Watermark(str(tmp_path / "state.json"))
+        stats = incremental.run_incremental(db_session, watermark, since=since, max_pages=1,
+                                            fiction_delay=False)
+        assert stats["pages"] == 1 and 0 < stats["refreshed"] < 45
+        assert watermark.value == since and stats["watermark"] == since
+        assert "without reaching the watermark" in capsys.readouterr().out
+
+        # The next, uncapped run still finds everything above the old watermark
+        stats = incremental.run_incremental(db_session, watermark, fiction_delay=False)
+        assert stats["pages"] == 3
+        assert watermark.value == catalogue.last_release(latest[0])
+    finally:
+        server.shutdown()
@@ -0,0 +1,84 @@
+"""
+Tests for versioned migrations and the chunked backfill runner.
+"""
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+
+
+def _legacy_db(path, rows):
+    # The fictions table as it was before the detail columns were added
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE fictions (fiction_id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, "
+                 "author VARCHAR NOT NULL, tags TEXT, pages INTEGER, views INTEGER, avg_views INTEGER, "
+                 "followers INTEGER, favorites INTEGER, rating_count INTEGER, avg_rating FLOAT, "
+                 "status VARCHAR, last_updated VARCHAR, scraped_at VARCHAR NOT NULL)")
+    conn.executemany("INSERT INTO fictions (fiction_id, title, author, scraped_at) VALUES (?, 't', 'a', "
+                     "'2026-01-01')", [(i,) for i in range(1, rows + 1)])
+    conn.commit()
+    conn.close()
+
+
+def test_versions_apply_once_on_a_legacy_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path, rows=50)
+    engine = create_engine(f"sqlite:///{path}")
+
+    result = migrations.migrate(engine, duty_cycle=1)
+    assert result["applied"] == [1, 2, 3]
+    columns = {c["name"] for c in inspect(engine).get_columns("fictions")}
+    assert {"fiction_type", "warn_tags", "content_warnings"} <= columns
+    assert "ix_fictions_scraped_at" in {i["name"] for i in inspect(engine).get_indexes("fictions")}
+    assert result["backfills"]["empty_warning_lists"]["completed"]
+
+    # Everything is recorded: a second run does nothing
+    assert migrations.pending(engine) == []
+    assert migrations.migrate(engine) == {"applied": [], "backfills": {}}
+    assert sorted(migrations.applied_versions(engine)) == [1, 2, 3]
+
+
+def test_backfill_is_chunked_resumable_and_leaves_the_lock_free(tmp_path):
+    path = str(tmp_path / "rr.db")
+    _legacy_db(path, rows=3000)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    migrations.migrate(engine, schema_only=True)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE fictions SET fiction_type = 'Original' WHERE fiction_id % 3 = 0"))
+    backfill = migrations.MIGRATIONS[2].backfill
+
+    # Interrupted after three chunks: progress is committed with each chunk
+    stats = migrations.run_backfill(engine, backfill, chunk_size=100, max_chunk_size=100,
+                                    duty_cycle=1, max_chunks=3)
+    assert stats == {**stats, "chunks": 3, "rows": 100, "last_key": 300, "completed": False}
+    assert migrations.unfinished_backfills(engine) == [backfill]
+
+    # Resume alongside a writer that must never wait long for the lock
+    waits = []
+
+    def writer():
+        conn = sqlite3.connect(path, timeout=5)
+        for i in range(30):
+            start = time.monotonic()
+            conn.execute("UPDATE fictions SET followers = ? WHERE fiction_id = ?", (i, 3000 - i))
+            conn.commit()
+            waits.append(time.monotonic() - start)
+            time.sleep(0.005)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    stats = migrations.run_backfill(engine, backfill, chunk_size=50, max_chunk_size=200,
+                                    target_seconds=0.01, duty_cycle=0.5)
+    thread.join()
+    assert stats["completed"] and stats["rows"] == 900 and stats["chunks"] > 5
+    assert len(waits) == 30 and max(waits) < 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM fictions WHERE warn_tags = '[]' "
+                                 "AND content_warnings = '[]'")).scalar() == 1000
+        assert conn.execute(text("SELECT COUNT(*) FROM fictions WHERE warn_tags IS NOT NULL "
+                                 "AND fiction_type IS NULL")).scalar() == 0
+    assert migrations.unfinished_backfills(engine) == []
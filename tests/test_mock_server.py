@@ -0,0 +1,61 @@
+"""
+Tests for the local Royal Road stand-in server.
+"""
+import requests
+from mock_server import start_server, parse_latency
+from parser import parse_listing_links, parse_fiction_page
+
+
+def test_serves_listing_and_fiction_routes():
+    """Synthesized listing and fiction pages parse like the real site"""
+    server, url = start_server(fictions=200, fixtures=False)
+    try:
+        html = requests.get(f"{url}/fictions/best-rated?page=3", timeout=5).text
+        links = parse_listing_links(html)
+        assert len(links) == 20
+
+        fiction_id = server.state.catalogue.ranking[40]
+        r = requests.get(f"{url}/fiction/{fiction_id}/some-slug", timeout=5)
+        assert r.status_code == 200
+        data = parse_fiction_page(r.text)
+        assert data["title"] and data["followers"]
+
+        missing = server.state.catalogue.max_id + 1
+        assert requests.get(f"{url}/fiction/{missing}", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+
+
+def test_etag_and_not_modified():
+    """A matching If-None-Match returns 304 with no body"""
+    server, url = start_server(fictions=50, fixtures=False)
+    try:
+        fiction_id = server.state.catalogue.ids[0]
+        first = requests.get(f"{url}/fiction/{fiction_id}", timeout=5)
+        etag = first.headers["ETag"]
+        second = requests.get(f"{url}/fiction/{fiction_id}", headers={"If-None-Match": etag}, timeout=5)
+        assert second.status_code == 304
+        assert second.content == b""
+    finally:
+        server.shutdown()
+
+
+def test_throttle_injection_sets_retry_after():
+    """Injected 429s carry a Retry-After header"""
+    server, url = start_server(fictions=50, fixtures=False, throttle_rate=1.0, retry_after=7)
+    try:
+        r = requests.get(f"{url}/fictions/best-rated?page=1", timeout=5)
+        assert r.status_code == 429
+        assert r.headers["Retry-After"] == "7"
+    finally:
+        server.shutdown()
+
+
+def test_latency_specs():
+    """Latency specs parse into samplers"""
+    import random
+    rng = random.Random(1)
+    assert parse_latency("none")(rng) == 0.0
+    assert parse_latency("fixed:0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("pareto:0.05,2.5")(rng) >= 0.05
@@ -0,0 +1,61 @@
+import json
+import os
+
+import profiling
+from normalizer import normalize_fiction
+from parser import parse_fiction_page
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+
+
+def _fiction_pages():
+    with open(os.path.join(CORPUS, "manifest.json")) as f:
+        manifest = json.load(f)
+    for entry in manifest["entries"]:
+        if entry["kind"] == "fiction":
+            with open(os.path.join(CORPUS, entry["file"]), encoding="utf-8") as f:
+                yield entry["path"], f.read()
+
+
+def test_stages_slow_pages_and_replay(monkeypatch, tmp_path):
+    prof = profiling.Profiler()
+    monkeypatch.setattr(profiling, "profiler", prof)
+    prof.start(("cprofile",), out_dir=str(tmp_path / "report"), slow_pages=2)
+
+    fetch = profiling.timed("fetch", capture_html=True)(lambda html: html)
+    pages = list(_fiction_pages())
+    for path, html in pages:
+        with prof.page(path):
+            with prof.stage("fetch"):  # nested same stage is counted once
+                raw = parse_fiction_page(fetch(html))
+            normalize_fiction(dict(raw, fiction_id=1))
+    prof.finish()
+
+    assert prof.stats["fetch"].count == len(pages)
+    assert prof.stats["parse"].count == len(pages)
+    assert prof.stats["normalize"].count == len(pages)
+    report_dir = tmp_path / "report"
+    assert "parse" in (report_dir / "report.txt").read_text(encoding="utf-8")
+    assert (report_dir / "fetch.prof").exists()
+
+    index = json.loads((report_dir / "slow_pages" / "index.json").read_text())
+    assert len(index) == 2 and index[0]["total"] >= index[1]["total"]
+    assert set(index[0]["stages"]) == {"fetch", "parse", "normalize"}
+    replayed = profiling.replay(str(report_dir))
+    assert [url for url, _, _ in replayed] == [e["url"] for e in index]
+
+
+def test_profile_flag_is_removed_from_argv(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("RR_PROFILE", raising=False)
+    prof = profiling.Profiler()
+    monkeypatch.setattr(profiling, "profiler", prof)
+
+    argv = ["run_scrape.py", "--frontier"]
+    assert not profiling.enable_from_argv(argv) and not prof.enabled
+
+    argv = ["run_scrape.py", "--profile=timings", "--frontier"]
+    assert profiling.enable_from_argv(argv)
+    assert argv == ["run_scrape.py", "--frontier"]
+    assert prof.enabled and prof.modes == set()
+    prof.finish()
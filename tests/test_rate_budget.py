@@ -0,0 +1,69 @@
+import multiprocessing
+import threading
+import time
+
+from rate_budget import RequestBudget
+
+
+def _hammer(db_path, tool, duration, counts):
+    budget = RequestBudget(db_path=db_path, rps=50, burst=5,
+                           weights={"a": 1.0, "b": 0.5, "default": 0.5})
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        budget.acquire(tool)
+        counts[tool] = counts.get(tool, 0) + 1
+
+
+def _process_worker(db_path, tool, duration, queue):
+    counts = {}
+    _hammer(db_path, tool, duration, counts)
+    queue.put(counts[tool])
+
+
+def test_aggregate_rate_across_processes(tmp_path):
+    db_path = str(tmp_path / "budget.db")
+    RequestBudget(db_path=db_path).reset()
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_process_worker, args=(db_path, tool, 2.0, queue))
+             for tool in ("a", "b", "c")]
+    for p in procs:
+        p.start()
+    total = sum(queue.get(timeout=30) for _ in procs)
+    for p in procs:
+        p.join()
+
+    # 50 req/s for 2s plus the initial burst, with slack for process startup
+    assert total <= 50 * 2.5 + 5
+    assert total >= 50 * 1.0
+
+
+def test_weighted_fair_share(tmp_path):
+    db_path = str(tmp_path / "budget.db")
+    counts = {}
+    threads = [threading.Thread(target=_hammer, args=(db_path, tool, 2.0, counts))
+               for tool in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # "a" has twice the weight of "b"
+    ratio = counts["a"] / counts["b"]
+    assert 1.5 <= ratio <= 2.6
+
+
+def test_idle_tool_does_not_bank_credit(tmp_path):
+    db_path = str(tmp_path / "budget.db")
+    budget = RequestBudget(db_path=db_path, rps=1000, burst=1000, active_window=0.2,
+                           weights={"a": 1.0, "b": 1.0})
+    for _ in range(50):
+        budget.acquire("a")
+    budget.acquire("b")
+    time.sleep(0.3)
+    for _ in range(20):
+        budget.acquire("a")
+    budget.acquire("b")  # b was idle; it resumes from a's clock, not its own
+
+    conn = budget._conn()
+    vtimes = dict(conn.execute("SELECT tool, vtime FROM clients"))
+    assert vtimes["b"] >= vtimes["a"] - 1
@@ -0,0 +1,76 @@
+import json
+import random
+
+import pytest
+import requests
+
+from loader import upsert_fictions
+from read_api import start_server
+
+TAGS = ["Fantasy", "LitRPG", "Romance", "Sci-fi"]
+
+
+@pytest.fixture
+def api(db_engine, db_session):
+    rng = random.Random(11)
+    rows = [{
+        "fiction_id": i,
+        "title": f"Fiction {i}",
+        "author": "Author",
+        "tags": json.dumps(rng.sample(TAGS, 2)),
+        # Plenty of ties so pagination has to break them by fiction_id
+        "followers": rng.randint(0, 20),
+        "avg_rating": round(rng.uniform(1, 5), 2),
+        "views": rng.randint(0, 1000),
+        "status": rng.choice(["Ongoing", "Completed"]),
+        "scraped_at": "2026-01-01T00:00:00",
+    } for i in range(1, 301)]
+    upsert_fictions(db_session, rows)
+    server, url = start_server(port=0, db_file=db_engine.url.database)
+    yield url, db_session, rows
+    server.shutdown()
+    server.server_close()
+
+
+def test_lookup_endpoints(api):
+    url, _, rows = api
+    item = requests.get(f"{url}/fictions/7").json()
+    assert item["title"] == "Fiction 7"
+    assert item["tags"] == json.loads(rows[6]["tags"])
+
+    batch = requests.get(f"{url}/fictions?ids=3,999,5").json()
+    assert [i["fiction_id"] for i in batch["items"]] == [3, 5]
+    assert batch["missing"] == [999]
+
+    assert requests.get(f"{url}/fictions/999").status_code == 404
+    assert requests.get(f"{url}/fictions?sort=title").status_code == 400
+
+
+def test_keyset_pagination_walks_every_row_once(api):
+    url, _, rows = api
+    seen = []
+    cursor = None
+    while True:
+        page = requests.get(f"{url}/fictions", params={
+            "tag": "Fantasy", "sort": "followers", "limit": 17, **({"cursor": cursor} if cursor else {})
+        }).json()
+        seen.extend((i["followers"], i["fiction_id"]) for i in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    expected = sorted(((r["followers"], r["fiction_id"]) for r in rows
+                       if "Fantasy" in json.loads(r["tags"])), reverse=True)
+    assert seen == expected
+
+
+def test_cache_is_dropped_when_the_database_changes(api):
+    url, session, _ = api
+    first = requests.get(f"{url}/fictions/9")
+    again = requests.get(f"{url}/fictions/9", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+
+    upsert_fictions(session, [{"fiction_id": 9, "title": "Renamed", "author": "Author",
+                               "scraped_at": "2026-02-01T00:00:00"}])
+    assert requests.get(f"{url}/fictions/9").json()["title"] == "Renamed"
+    assert requests.get(f"{url}/health").json()["cache"]["generation"] >= 1
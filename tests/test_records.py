@@ -0,0 +1,45 @@
+"""
+Tests for FictionRecord and batch normalization.
+"""
+import pickle
+
+from db import Fiction
+from loader import upsert_fictions
+from normalizer import normalize_batch, normalize_fiction, normalize_record
+from records import FictionRecord
+
+RAW = {"title": " Mother of Learning ", "author": "nobody103", "tags": ["Fantasy", "Magic"],
+       "pages": "1,234", "views": "24,822,333", "followers": "50,000", "avg_rating": "4.83",
+       "status": "COMPLETED", "last_updated": "2020-01-01"}
+
+
+def test_batch_shares_values_and_matches_dict_rows():
+    raws = [dict(RAW, fiction_id=i, tags=list(RAW["tags"])) for i in range(3)]
+    records = normalize_batch(raws, scraped_at="2026-01-01T00:00:00")
+
+    assert all(isinstance(r, FictionRecord) for r in records)
+    assert not hasattr(records[0], "__dict__")
+    assert records[0].tags is records[2].tags
+    assert records[0].scraped_at is records[1].scraped_at
+
+    expected = dict(normalize_fiction(dict(RAW, fiction_id=0)), scraped_at="2026-01-01T00:00:00")
+    assert records[0].as_dict() == expected
+    assert records[0]["pages"] == 1234 and records[0].get("title") == "Mother of Learning"
+
+    # Detail fields are only provided when the parser produced them
+    assert "fiction_type" not in records[0] and records[0].get("fiction_type") is None
+    detailed = normalize_record(dict(RAW, fiction_id=9, fiction_type="Original", warning_tags=None))
+    assert detailed["warn_tags"] == "[]" and "fiction_type" in set(detailed)
+    assert pickle.loads(pickle.dumps(detailed)) == detailed
+
+
+def test_upsert_mixed_columns_keeps_unscraped_fields(db_session):
+    upsert_fictions(db_session, [normalize_record(dict(RAW, fiction_id=1, fiction_type="Original")),
+                                 normalize_record(dict(RAW, fiction_id=2, fiction_type="Fan Fiction"))])
+    # A listing refresh for 1 batched with a detail refresh for 2
+    upsert_fictions(db_session, [normalize_record(dict(RAW, fiction_id=1, views="99")),
+                                 normalize_record(dict(RAW, fiction_id=2, fiction_type="Original"))])
+    rows = {f.fiction_id: f for f in db_session.query(Fiction)}
+
+    assert rows[1].views == 99 and rows[1].fiction_type == "Original"
+    assert rows[2].fiction_type == "Original"
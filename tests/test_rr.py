@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import rr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loaded_modules(code):
+    proc = subprocess.run([sys.executable, "-c", code + "\nimport sys; print(','.join(sorted(sys.modules)))"],
+                          cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return set(proc.stdout.strip().splitlines()[-1].split(","))
+
+
+def test_quick_commands_skip_heavy_imports():
+    loaded = _loaded_modules("import rr; rr.main(['status']); rr.main(['--help'])")
+    assert not loaded & set(rr.HEAVY_MODULES)
+
+    # Importing the models no longer creates the engine
+    loaded = _loaded_modules("import db; assert db._engine is None")
+    assert "sqlalchemy" in loaded
+
+
+def test_subcommand_gets_its_own_argv(monkeypatch, capsys):
+    calls = []
+    monkeypatch.setitem(rr.COMMANDS, "probe", ("config", "probe_main", "test"))
+    import config
+    monkeypatch.setattr(config, "probe_main", lambda: calls.append(list(sys.argv)) or 3, raising=False)
+    monkeypatch.setattr(sys, "argv", ["rr"])
+
+    assert rr.main(["probe", "--show", "5"]) == 3
+    assert calls == [["config.py", "--show", "5"]]
+    assert rr.main(["no-such-command"]) == 2
+    assert "Unknown command" in capsys.readouterr().out
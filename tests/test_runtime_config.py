@@ -0,0 +1,109 @@
+"""
+Tests for live-reloadable runtime settings.
+"""
+import json
+import threading
+
+import config
+import runtime_config
+from db import Fiction
+
+
+def _write(path, values):
+    with open(path, "w") as f:
+        json.dump(values, f)
+
+
+def test_file_and_env_overrides_reload(tmp_path, capsys):
+    path = str(tmp_path / "runtime_config.json")
+    settings = runtime_config.RuntimeConfig(path=path, env={"RR_MAX_PAGES": "10"}, check_interval=0)
+    assert settings.RATE_LIMIT_BETWEEN_FICTIONS == config.RATE_LIMIT_BETWEEN_FICTIONS
+    assert settings.MAX_PAGES == 10 and settings.sources()["MAX_PAGES"] == "RR_MAX_PAGES"
+
+    # A changed file applies on the next read; the environment still wins
+    _write(path, {"RATE_LIMIT_BETWEEN_FICTIONS": 2, "UPDATE_BATCH_SIZE": 10, "MAX_PAGES": 99})
+    assert settings.RATE_LIMIT_BETWEEN_FICTIONS == 2.0 and settings.UPDATE_BATCH_SIZE == 10
+    assert settings.MAX_PAGES == 10
+    assert "RATE_LIMIT_BETWEEN_FICTIONS" in capsys.readouterr().out
+
+    # Invalid values keep the last good configuration
+    _write(path, {"UPDATE_BATCH_SIZE": 2.5})
+    assert settings.UPDATE_BATCH_SIZE == 10
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert settings.RATE_LIMIT_BETWEEN_FICTIONS == 2.0
+    assert "not reloaded" in capsys.readouterr().out
+
+    # Without file changes, a reload only happens on request (SIGHUP)
+    slow = runtime_config.RuntimeConfig(path=path, env={}, check_interval=3600)
+    _write(path, {"JITTER_PAGES": 0.05})
+    assert slow.JITTER_PAGES == config.JITTER_PAGES
+    slow.request_reload()
+    assert slow.JITTER_PAGES == 0.05
+    slow.pinned["JITTER_PAGES"] = 0.5
+    assert slow.JITTER_PAGES == 0.5 and slow.sources()["JITTER_PAGES"] == "pinned"
+
+
+def test_bad_file_at_startup_keeps_defaults_and_env(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "runtime_config.json")
+    with open(path, "w") as f:
+        f.write("{bad")
+    monkeypatch.setattr(runtime_config, "RUNTIME_ACTIVE_DIR", str(tmp_path / "active"))
+    monkeypatch.setattr(runtime_config.signal, "signal", lambda signum, handler: None)
+    settings = runtime_config.RuntimeConfig(path=path, check_interval=0,
+                                            env={"RR_MAX_PAGES": "7", "RR_JITTER_PAGES": "lots"})
+    out = capsys.readouterr().out
+    assert "not reloaded" in out and "RR_JITTER_PAGES ignored" in out
+
+    # Valid env overrides still apply; everything else is config.py
+    assert settings.MAX_PAGES == 7 and settings.sources()["MAX_PAGES"] == "RR_MAX_PAGES"
+    assert settings.JITTER_PAGES == config.JITTER_PAGES
+    settings.install("run_scrape")
+    try:
+        published = runtime_config.running_tools(str(tmp_path / "active"))
+        assert [entry["values"]["MAX_PAGES"] for entry in published] == [7]
+    finally:
+        settings._unpublish()
+
+    # Fixing the file applies it
+    _write(path, {"RATE_LIMIT_BETWEEN_FICTIONS": 3})
+    assert settings.RATE_LIMIT_BETWEEN_FICTIONS == 3.0
+
+
+def test_id_crawler_follows_live_worker_count(db_session, tmp_path, monkeypatch):
+    from mock_server import start_server
+    import id_crawler
+
+    path = str(tmp_path / "runtime_config.json")
+    _write(path, {"ID_CRAWL_WORKERS": 1, "RATE_LIMIT_BETWEEN_FICTIONS": 0, "JITTER_FICTIONS": 0})
+    settings = runtime_config.RuntimeConfig(path=path, env={}, check_interval=0)
+    monkeypatch.setattr(runtime_config, "settings", settings)
+    monkeypatch.setattr(id_crawler, "settings", settings)
+
+    server, url = start_server(fictions=300, fixtures=False, seed=3)
+    monkeypatch.setattr(id_crawler, "BASE_URL", url)
+    crawler = id_crawler.IdRangeCrawler(
+        db_session, start=1, end=server.state.catalogue.max_id, chunk_size=10,
+        state_file=str(tmp_path / "state.json"), exists_file=str(tmp_path / "exists.bitmap"),
+        missing_file=str(tmp_path / "missing.bitmap"))
+
+    seen = []
+    walk = crawler.walk_chunk
+
+    def walk_chunk(chunk_start):
+        seen.append(crawler.active_workers)
+        if len(seen) == 3:
+            _write(path, {"ID_CRAWL_WORKERS": 4, "RATE_LIMIT_BETWEEN_FICTIONS": 0, "JITTER_FICTIONS": 0})
+        walk(chunk_start)
+
+    monkeypatch.setattr(crawler, "walk_chunk", walk_chunk)
+    try:
+        crawler.run()
+        stored = {fid for (fid,) in db_session.query(Fiction.fiction_id)}
+    finally:
+        server.shutdown()
+
+    assert seen[:3] == [1, 1, 1] and max(seen) == 4
+    assert crawler.active_workers == 0 and not crawler.pending_chunks()
+    assert stored == set(server.state.catalogue.ids)
+    assert threading.active_count() < 10
@@ -0,0 +1,76 @@
+"""
+Tests for the stratified sampling mode.
+"""
+import pytest
+
+import health
+import sampling
+from utils import RateLimiter
+
+
+def _unit(h, key, status=None, followers=0):
+    if status is None:
+        return {"h": h, "key": key, "found": False, "row": None}
+    return {"h": h, "key": key, "found": True,
+            "row": {"fiction_id": key, "status": status, "followers": followers, "tags": ["Fantasy"]}}
+
+
+def test_stratified_estimates_weight_strata_and_reload(tmp_path):
+    # Stratum 0 (10 IDs) is dense, half of stratum 1 (20 IDs) is missing
+    units = [_unit(0, 1, "COMPLETED", 10), _unit(0, 2, "COMPLETED", 20), _unit(0, 3, "ONGOING", 30),
+             _unit(0, 4, "ONGOING", 40), _unit(1, 11), _unit(1, 12), _unit(1, 13, "ONGOING", 50),
+             _unit(1, 14, "ongoing", 60)]
+    sample = sampling.Sample("id", [(1, 10), (11, 30)], seed=3, units=units)
+
+    share = sampling.estimate(sample, sampling.Metric("share:status=Completed"))
+    assert share["estimate"] == pytest.approx(0.25)  # unweighted it would be 2/6
+    assert share["lo"] < 0.25 < share["hi"] and share["n"] == 6
+    count = sampling.estimate(sample, sampling.Metric("count"))
+    assert count["estimate"] == pytest.approx(20)
+    ongoing = sampling.estimate(sample, sampling.Metric("mean:followers"), where=[("status", "ONGOING")])
+    assert ongoing["estimate"] == pytest.approx((10 * 70 / 4 + 20 * 110 / 4) / (10 * 2 / 4 + 20 * 2 / 4))
+    assert sampling.group_values(sample, "status", min_units=2) == ["ONGOING", "COMPLETED"]
+
+    # New draws never repeat a unit and stay inside their stratum
+    keys = sample.draw(1, 16)
+    assert len(keys) == 16 and all(11 <= k <= 30 for k in keys) and not {11, 12, 13, 14} & set(keys)
+    assert sample.draw(1, 5) == []
+
+    path = str(tmp_path / "sample.json")
+    sample.save(path)
+    again = sampling.Sample.load(path)
+    assert sampling.estimate(again, sampling.Metric("share:status=Completed"))["estimate"] == share["estimate"]
+
+    assert sampling.allocate([100, 100], [0, 0], 10) == [5, 5]
+    assert sampling.allocate([100, 100], [2, 2], 20, [1.0, 0.25]) == [17, 3]
+    with pytest.raises(ValueError):
+        sampling.Metric("sum:followers")
+
+
+def test_adaptive_sample_reaches_target_with_few_requests(tmp_path, monkeypatch):
+    from mock_server import start_server
+    import scraper
+    import parser
+
+    server, url = start_server(fictions=2000, fixtures=False)
+    monkeypatch.setattr(scraper, "BASE_URL", url)
+    monkeypatch.setattr(parser, "BASE_URL", url)
+    monkeypatch.setattr(sampling, "BASE_URL", url)
+    catalogue = server.state.catalogue
+    truth = sum(catalogue.meta(f)["status"] == "ONGOING" for f in catalogue.ids) / len(catalogue)
+    monitor = health.ParseHealth(alert_file=str(tmp_path / "alert.json"), samples_dir=str(tmp_path / "samples"))
+    fetcher = sampling.UnitFetcher("id", rate_limiter=RateLimiter(0), monitor=monitor)
+    sample = sampling.Sample.stratified("id", 1, catalogue.max_id, 8, seed=7)
+    metric = sampling.Metric("share:status=ONGOING")
+    try:
+        stats = sampling.run_sample(sample, fetcher, [metric], size=80, target=0.06,
+                                    max_requests=1000, path=str(tmp_path / "s.json"))
+    finally:
+        server.shutdown()
+
+    result = sampling.estimate(sample, metric)
+    assert stats["target_met"] and stats["rounds"] > 1
+    assert stats["requests"] == len(sample.units) < len(catalogue) / 4
+    assert (result["hi"] - result["lo"]) / 2 <= 0.06
+    assert result["lo"] <= truth <= result["hi"]
+    assert len(sampling.Sample.load(str(tmp_path / "s.json")).units) == len(sample.units)
@@ -0,0 +1,67 @@
+"""
+Tests for shard databases and their bulk merge.
+"""
+import os
+
+import aggregates
+import shards
+from db import Fiction
+from loader import upsert_fictions
+
+
+def _row(fiction_id, scraped_at, **values):
+    row = {"fiction_id": fiction_id, "title": f"Fiction {fiction_id}", "author": "A",
+           "tags": '["Fantasy"]', "followers": 10, "status": "ONGOING", "scraped_at": scraped_at}
+    row.update(values)
+    return row
+
+
+def test_merge_newest_scraped_at_wins_and_keeps_aggregates(db_engine, db_session, tmp_path):
+    upsert_fictions(db_session, [_row(1, "2026-01-02", fiction_type="Original", followers=5)])
+    shard_dir = str(tmp_path / "shards")
+
+    os.makedirs(shard_dir)
+    a = shards.ShardWriter(path=os.path.join(shard_dir, "a.db"))
+    b = shards.ShardWriter(path=os.path.join(shard_dir, "b.db"))
+    # Older than the main row: ignored
+    a.write([_row(1, "2026-01-01", title="Stale", fiction_type="Fan Fiction")])
+    # A newer listing refresh (no fiction_type) and two versions of fiction 2
+    b.write([_row(1, "2026-01-03", followers=50, status="COMPLETED")])
+    a.write([_row(2, "2026-01-02", fiction_type="Original", followers=7)])
+    b.write([_row(2, "2026-01-01", followers=1, fiction_type="Fan Fiction")])
+    a.write([_row(2, "2026-01-04", followers=9, fiction_type="Original")])
+    a.close()
+    b.close()
+
+    stats = shards.merge_shards(shard_dir=shard_dir, engine=db_engine)
+    db_session.expire_all()
+    rows = {f.fiction_id: f for f in db_session.query(Fiction)}
+    assert rows[1].title == "Fiction 1" and rows[1].fiction_type == "Original"
+    assert rows[1].followers == 50 and rows[1].status == "COMPLETED"
+    assert rows[2].followers == 9 and rows[2].fiction_type == "Original"
+    assert stats["staged"] == 3 and stats["written"] == 2
+    assert aggregates.verify(db_session) == []
+    assert shards.list_shards(shard_dir) == [] and os.listdir(shard_dir) == []
+
+    # Merging again is a no-op
+    assert shards.merge_shards(shard_dir=shard_dir, engine=db_engine)["written"] == 0
+
+
+def test_live_shard_keeps_unmerged_rows(db_engine, db_session, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    writer = shards.ShardWriter(tool="id_crawler", shard_dir=shard_dir)
+    writer.write([_row(i, "2026-01-01") for i in range(1, 101)])
+
+    stats = shards.merge_shards(shard_dir=shard_dir, engine=db_engine)
+    assert stats["written"] == 100 and stats["removed"] == []
+    assert shards.shard_status(shard_dir)[0][1:2] == (0,) and shards.is_live(writer.path)
+
+    # Rows written after the merge stay in the shard for the next one
+    writer.write([_row(5, "2026-01-02", followers=99), _row(101, "2026-01-02")])
+    writer.close()
+    assert not shards.is_live(writer.path)
+    stats = shards.merge_shards(shard_dir=shard_dir, engine=db_engine)
+    assert stats["written"] == 2 and stats["removed"] == [writer.path]
+    assert db_session.get(Fiction, 5).followers == 99
+    assert db_session.query(Fiction).count() == 101
+    assert aggregates.verify(db_session) == []
@@ -0,0 +1,96 @@
+import json
+import random
+
+import pytest
+
+from loader import upsert_fictions
+
+# numpy/scipy are the optional "similarity" extra
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from similarity import SimilarityIndex  # noqa: E402 - needs numpy/scipy
+
+TAGS = ["Fantasy", "LitRPG", "Romance", "Sci-fi", "Horror", "Comedy", "Progression", "Magic"]
+
+
+def _row(rng, fiction_id, tags=None, scraped_at="2026-01-01T00:00:00"):
+    return {
+        "fiction_id": fiction_id,
+        "title": f"Fiction {fiction_id}",
+        "author": "Author",
+        "tags": json.dumps(tags if tags is not None else rng.sample(TAGS, rng.randint(0, 4))),
+        "pages": rng.randint(10, 2000),
+        "views": rng.randint(0, 10 ** 6),
+        "followers": rng.randint(0, 5000),
+        "avg_rating": rng.choice([None, round(rng.uniform(1, 5), 2)]),
+        "scraped_at": scraped_at,
+    }
+
+
+def _brute_force(session, fiction_id, k):
+    """Cosine similarity on IDF-weighted tag sets, computed pairwise in Python."""
+    from db import Fiction
+    fictions = {f.fiction_id: set(json.loads(f.tags)) for f in session.query(Fiction)}
+    df = {}
+    for tags in fictions.values():
+        for t in tags:
+            df[t] = df.get(t, 0) + 1
+    idf = {t: np.log((1 + len(fictions)) / (1 + c)) + 1 for t, c in df.items()}
+
+    def norm(tags):
+        return np.sqrt(sum(idf[t] ** 2 for t in tags))
+
+    target = fictions[fiction_id]
+    scores = []
+    for other, tags in fictions.items():
+        if other == fiction_id or not tags or not target:
+            continue
+        score = sum(idf[t] ** 2 for t in target & tags) / (norm(target) * norm(tags))
+        if score > 0:
+            scores.append((round(score, 5), other))
+    scores.sort(key=lambda s: (-s[0], s[1]))
+    return scores[:k]
+
+
+def test_queries_match_brute_force_after_save_and_mmap_load(db_session, tmp_path):
+    rng = random.Random(3)
+    upsert_fictions(db_session, [_row(rng, i) for i in range(1, 301)])
+    SimilarityIndex.build(db_session, stats_weight=0.0).save(str(tmp_path / "index"))
+    index = SimilarityIndex.load(str(tmp_path / "index"))
+
+    for fiction_id in (1, 57, 300):
+        got = [(round(score, 5), other) for other, score in index.similar(fiction_id, 8)]
+        want = _brute_force(db_session, fiction_id, 8)
+        assert [s for s, _ in got] == [s for s, _ in want]
+
+    neighbours, scores = index.all_pairs(k=5, block_rows=64)
+    row = index.row_of(57)
+    assert np.allclose(scores[row], [score for _, score in index.similar(57, 5)], atol=1e-5)
+
+    by_tags = index.similar_to_tags(["Horror", "Comedy"], k=3)
+    assert all(score <= 1.0 + 1e-6 for _, score in by_tags)
+    assert index.similar(99999) == []
+
+
+def test_update_replaces_changed_rows(db_session, tmp_path):
+    rng = random.Random(5)
+    upsert_fictions(db_session, [_row(rng, i) for i in range(1, 101)])
+    index = SimilarityIndex.build(db_session, stats_weight=0.2)
+    index.save(str(tmp_path / "index"))
+    index = SimilarityIndex.load(str(tmp_path / "index"))
+
+    # One fiction retagged with a brand-new tag, one new fiction with the same tags
+    later = "2026-02-01T00:00:00"
+    upsert_fictions(db_session, [_row(rng, 10, tags=["Cultivation", "Fantasy"], scraped_at=later),
+                                 _row(rng, 500, tags=["Cultivation", "Fantasy"], scraped_at=later)])
+    assert index.update(db_session) == 2
+    index.save(str(tmp_path / "index"))
+    index = SimilarityIndex.load(str(tmp_path / "index"))
+
+    assert "Cultivation" in index.vocab
+    assert len(index.ids) == 101 and list(index.ids) == sorted(index.ids)
+    assert index.similar(10, 1)[0][0] == 500
+    assert index.update(db_session) == 0
+    rows = index.matrix.toarray()
+    assert np.allclose(np.linalg.norm(rows, axis=1)[np.abs(rows).sum(axis=1) > 0], 1.0, atol=1e-5)
@@ -0,0 +1,88 @@
+"""
+Tests for consistent read snapshots.
+"""
+import os
+import sqlite3
+import threading
+
+import pytest
+import requests
+from sqlalchemy.orm import sessionmaker
+
+import snapshot
+from db import Fiction
+from loader import upsert_fictions
+from read_api import start_server
+
+
+def _fill(session, rows=2000):
+    upsert_fictions(session, [{"fiction_id": i, "title": f"Fiction {i}", "author": "A",
+                               "tags": "[]", "followers": i, "scraped_at": "2026-01-01T00:00:00"}
+                              for i in range(1, rows + 1)])
+
+
+def test_snapshot_is_consistent_while_writer_commits(db_engine, db_session, tmp_path):
+    _fill(db_session)
+    db_session.close()
+    db_engine.dispose()
+    db_file = db_engine.url.database
+    snapshots = str(tmp_path / "snapshots")
+
+    # The writer commits fictions in pairs; a snapshot must never hold half a pair
+    stop = threading.Event()
+    written = []
+
+    def writer():
+        conn = sqlite3.connect(db_file, timeout=30)
+        next_id = 100_000
+        while not stop.is_set():
+            conn.executemany("INSERT INTO fictions (fiction_id, title, author, scraped_at) "
+                             "VALUES (?, 'w', 'w', '2026-01-01')",
+                             [(next_id,), (next_id + 1,)])
+            conn.commit()
+            next_id += 2
+            written.append(next_id)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        entries = [snapshot.take_snapshot(db_file, snapshots, keep=2, pages_per_step=8, step_sleep=0)
+                   for _ in range(3)]
+    finally:
+        stop.set()
+        thread.join()
+
+    assert written and all(e["restarts"] == 0 and e["pinned"] for e in entries)
+    assert all(e["fictions"] % 2 == 0 for e in entries)
+    assert snapshot.latest(snapshots)["name"] == entries[-1]["name"]
+    assert snapshot.list_snapshots(snapshots) == [e["name"] for e in entries[1:]]
+    assert not [n for n in os.listdir(snapshots) if n.endswith(".tmp")]
+
+    conn = snapshot.connect_latest(snapshots)
+    assert conn.execute("SELECT COUNT(*) FROM fictions").fetchone()[0] == entries[-1]["fictions"]
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM fictions")
+    conn.close()
+    orm = sessionmaker(bind=snapshot.snapshot_engine(snapshots))()
+    assert orm.get(Fiction, 7).title == "Fiction 7"
+    orm.close()
+
+
+def test_read_api_follows_latest_snapshot(db_engine, db_session, tmp_path):
+    _fill(db_session, rows=50)
+    db_file = db_engine.url.database
+    snapshots = str(tmp_path / "snapshots")
+    snapshot.take_snapshot(db_file, snapshots)
+    server, url = start_server(port=0, snapshot_dir=snapshots)
+    try:
+        assert requests.get(f"{url}/fictions/60").status_code == 404
+        upsert_fictions(db_session, [{"fiction_id": 60, "title": "New", "author": "A", "tags": "[]",
+                                      "scraped_at": "2026-01-02T00:00:00"}])
+        # The live database changed, the served snapshot did not
+        assert requests.get(f"{url}/fictions/60").status_code == 404
+        snapshot.take_snapshot(db_file, snapshots)
+        assert requests.get(f"{url}/fictions/60").json()["title"] == "New"
+    finally:
+        server.shutdown()
+        server.server_close()
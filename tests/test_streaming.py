@@ -0,0 +1,48 @@
+import json
+import os
+
+import scraper
+from parser import parse_fiction_full, truncate_fiction_head
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+
+
+def _corpus_fictions():
+    with open(os.path.join(CORPUS, "manifest.json")) as f:
+        manifest = json.load(f)
+    for entry in manifest["entries"]:
+        if entry["kind"] == "fiction":
+            with open(os.path.join(CORPUS, entry["file"]), encoding="utf-8") as f:
+                yield entry, f.read()
+
+
+def test_truncated_head_parses_identically():
+    cut = 0
+    for entry, html in _corpus_fictions():
+        head, truncated = truncate_fiction_head(html)
+        assert parse_fiction_full(head) == parse_fiction_full(html), entry["file"]
+        cut += truncated
+    assert cut > 0
+
+
+def test_streaming_fetch_closes_early(monkeypatch):
+    from mock_server import start_server
+
+    monkeypatch.setattr(scraper, "head_stats", {"fetches": 0, "early_closed": 0, "bytes": 0})
+    server, url = start_server(fictions=100)
+    try:
+        total_bytes = 0
+        for entry, html in _corpus_fictions():
+            page_url = url + entry["path"]
+            head = scraper.fetch_fiction_head(page_url)
+            full = scraper.fetch_fiction_page(page_url)
+            assert full == html
+            assert parse_fiction_full(head) == parse_fiction_full(full)
+            total_bytes += len(full.encode("utf-8"))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    stats = scraper.head_stats
+    assert stats["early_closed"] > 0
+    assert stats["bytes"] < total_bytes / 3
@@ -0,0 +1,110 @@
+"""
+Tests for the HTTP/2 transport (against the local HTTP/2 stand-in).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import transport
+
+pytestmark = pytest.mark.skipif(not transport.available(), reason="httpx[http2] not installed")
+
+
+def _setup(monkeypatch, http2_server, latency="none"):
+    from mock_server import start_server
+    import scraper
+    import parser
+
+    server, url = start_server(fictions=200, fixtures=False, seed=2, http2=http2_server,
+                               latency=latency)
+    monkeypatch.setattr(scraper, "BASE_URL", url)
+    monkeypatch.setattr(parser, "BASE_URL", url)
+    monkeypatch.setattr(transport, "_enabled", True)
+    client = transport.Http2Transport(max_connections=2)
+    monkeypatch.setattr(scraper, "http2", client)
+    return server, url, client
+
+
+def test_concurrent_fetches_share_two_connections(monkeypatch):
+    import scraper
+    from parser import parse_fiction_page
+
+    server, url, client = _setup(monkeypatch, http2_server=True, latency="fixed:0.05")
+    monkeypatch.setattr(scraper, "HEDGE_ENABLED", False)
+    ids = server.state.catalogue.ids[:60]
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            pages = list(pool.map(lambda fid: scraper.fetch_fiction_head(f"{url}/fiction/{fid}"), ids))
+        with pytest.raises(requests.HTTPError) as error:
+            scraper.fetch_fiction_page(f"{url}/fiction/{server.state.catalogue.max_id + 1}")
+        assert error.value.response.status_code == 404
+    finally:
+        client.close()
+        server.shutdown()
+
+    titles = [parse_fiction_page(html)["title"] for html in pages]
+    assert titles == [server.state.catalogue.meta(fid)["title"] for fid in ids]
+    stats = client.stream_stats()
+    assert stats["streams"] == 61 and stats["http2"] == 61
+    assert stats["fallbacks"] == 0 and stats["retries"] == 0
+    assert stats["connections"] <= 2 and server.state.stats["connections"] <= 2
+    assert stats["peak_active"] > 2 and stats["active"] == 0
+    # Streaming heads stop early by resetting their stream, not the connection
+    assert stats["reset"] > 0 and stats["headers_p95"] is not None
+
+
+def test_falls_back_to_http1(monkeypatch):
+    import scraper
+
+    server, url, client = _setup(monkeypatch, http2_server=False)
+    fid = server.state.catalogue.ids[0]
+    try:
+        first = scraper.fetch_fiction_page(f"{url}/fiction/{fid}")
+        second = scraper.fetch_fiction_page(f"{url}/fiction/{fid}")
+    finally:
+        client.close()
+        server.shutdown()
+
+    assert first == second and server.state.catalogue.meta(fid)["title"] in first
+    stats = client.stream_stats()
+    assert stats["fallbacks"] == 1 and stats["streams"] == 0
+    assert not client.handles(url)
+    monkeypatch.setattr(transport, "_enabled", False)
+    assert not transport.Http2Transport().handles(url)
+
+
+def test_mid_session_protocol_errors_retry_instead_of_falling_back(monkeypatch):
+    import httpx
+    import scraper
+
+    server, url, client = _setup(monkeypatch, http2_server=True)
+    ids = server.state.catalogue.ids
+    send = client._send
+    failures = []
+
+    def flaky_send(http_client, target, timeout):
+        if failures:
+            raise failures.pop()
+        return send(http_client, target, timeout)
+
+    monkeypatch.setattr(client, "_send", flaky_send)
+    try:
+        scraper.fetch_fiction_page(f"{url}/fiction/{ids[0]}")
+        # A GOAWAY after HTTP/2 has worked: retried on a fresh connection, no fallback
+        failures.append(httpx.RemoteProtocolError("<ConnectionTerminated error_code:1>"))
+        assert server.state.catalogue.meta(ids[1])["title"] in scraper.fetch_fiction_page(f"{url}/fiction/{ids[1]}")
+        # An error that repeats, or one httpx does not wrap, surfaces as ConnectionError
+        failures.extend([httpx.LocalProtocolError("state 5"), httpx.LocalProtocolError("state 5")])
+        with pytest.raises(requests.ConnectionError):
+            client.open(f"{url}/fiction/{ids[2]}", 5, 5)
+        failures.append(KeyError(37))
+        with pytest.raises(requests.ConnectionError):
+            client.open(f"{url}/fiction/{ids[2]}", 5, 5)
+    finally:
+        client.close()
+        server.shutdown()
+
+    stats = client.stream_stats()
+    assert stats["fallbacks"] == 0 and stats["retries"] == 2 and stats["active"] == 0
+    assert client.handles(url) and stats["http2"] == 2
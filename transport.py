@@ -0,0 +1,278 @@
+"""
+Optional HTTP/2 transport for the fetch layer.
+With HTTP2_ENABLED, scraper.py sends its requests through an httpx client
+that multiplexes every concurrent fetch (ID-crawl workers, hedges, streaming
+heads) as streams over at most HTTP2_MAX_CONNECTIONS connections, with HPACK
+header compression, instead of one HTTP/1.1 connection per in-flight request.
+Closing a response early (fetch_fiction_head, a cancelled hedge) resets only
+its stream; the connection stays up.
+
+Fallback to HTTP/1.1 (the requests path) is automatic:
+- without the optional httpx/h2 packages (pip install "httpx[http2]");
+- for https, when ALPN does not negotiate h2 (httpx then speaks HTTP/1.1);
+- for plain http, which has no ALPN and is tried with prior knowledge, when
+  the server answers with a protocol error before any HTTP/2 response has
+  come from it. The host stays on HTTP/1.1 for HTTP2_FALLBACK_SECONDS before
+  HTTP/2 is tried again.
+A protocol error from a host that has already answered over HTTP/2 (GOAWAY,
+a reset stream) is retried once on a fresh connection instead.
+
+Per-stream metrics (time to headers, stream duration, bytes, streams in
+flight, connections opened, retries) are kept in `stream_stats()` and printed by
+scraper.print_latency_summary().
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+try:
+    import httpx
+    import h2  # noqa: F401 - httpx needs it for http2=True
+except ImportError:  # Optional: HTTP/1.1 only
+    httpx = None
+
+import events
+from latency import LatencyTracker
+from config import HEADERS, HTTP2_ENABLED, HTTP2_MAX_CONNECTIONS, HTTP2_FALLBACK_SECONDS
+
+_enabled = HTTP2_ENABLED
+
+
+def set_enabled(enabled):
+    """Turn the HTTP/2 transport on/off for this process"""
+    global _enabled
+    _enabled = enabled
+
+
+def available():
+    """True if the optional httpx + h2 packages are installed"""
+    return httpx is not None
+
+
+class StreamResponse:
+    """
+    One HTTP/2 (or negotiated HTTP/1.1) response, exposing the part of the
+    requests.Response API that scraper._download uses.
+    """
+
+    def __init__(self, transport, response, url, start, client=None):
+        self._transport = transport
+        self._response = response
+        self._client = client  # Own one-off client (a retry), closed with the response
+        self.url = url
+        self.status_code = response.status_code
+        self.encoding = response.charset_encoding
+        self.http_version = response.http_version
+        self.stream_id = response.extensions.get("stream_id")
+        self.received = 0
+        self._start = start
+        self._closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def iter_content(self, chunk_size):
+        try:
+            for chunk in self._response.iter_bytes(chunk_size):
+                self.received += len(chunk)
+                yield chunk
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(f"{e} ({self.url})") from e
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(f"{e} ({self.url})") from e
+        except Exception as e:
+            raise requests.ConnectionError(f"HTTP/2 stream error for {self.url}: {e!r}") from e
+
+    def close(self):
+        """Finish the stream (resetting it if the body was not fully read)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._response.close()
+        if self._client is not None:
+            self._client.close()
+        self._transport._stream_closed(self)
+
+
+class Http2Transport:
+    """Shared httpx clients plus per-stream metrics (thread-safe)"""
+
+    def __init__(self, max_connections=HTTP2_MAX_CONNECTIONS, fallback_seconds=HTTP2_FALLBACK_SECONDS):
+        self.max_connections = max_connections
+        self.fallback_seconds = fallback_seconds
+        self.streams = LatencyTracker()  # "headers" / "stream" seconds per stream
+        self.stats = {"streams": 0, "active": 0, "peak_active": 0, "connections": 0,
+                      "http2": 0, "http1": 0, "fallbacks": 0, "retries": 0, "reset": 0, "bytes": 0}
+        self._clients = {}
+        self._fallback_until = {}  # origin -> monotonic time
+        self._h2_origins = set()  # Origins that have answered over HTTP/2
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()  # See _send
+
+    def _client(self, scheme):
+        with self._lock:
+            client = self._clients.get(scheme)
+            if client is None:
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                # https negotiates h2 or http/1.1 via ALPN; plain http uses prior knowledge
+                client = httpx.Client(http1=scheme == "https", http2=True, limits=limits,
+                                      headers=HEADERS, follow_redirects=True)
+                self._clients[scheme] = client
+            return client
+
+    def _trace(self, event, info):
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.stats["connections"] += 1
+
+    def handles(self, url):
+        """True if this URL should go over HTTP/2"""
+        if not (_enabled and available()):
+            return False
+        parts = urlsplit(url)
+        until = self._fallback_until.get((parts.scheme, parts.netloc))
+        return until is None or time.monotonic() >= until
+
+    def open(self, url, connect_timeout, read_timeout):
+        """
+        Start a GET and return once the response headers have arrived.
+
+        Returns:
+            StreamResponse, or None if the server does not speak HTTP/2 (the
+            caller falls back to HTTP/1.1)
+
+        Raises:
+            requests.Timeout: On a connect/read timeout
+            requests.ConnectionError: If the server cannot be reached, or a
+                protocol error repeats on a fresh connection
+        """
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout)
+        with self._lock:
+            self.stats["active"] += 1
+            self.stats["peak_active"] = max(self.stats["peak_active"], self.stats["active"])
+        start = time.monotonic()
+        client, fresh = self._client(parts.scheme), None
+        try:
+            while True:
+                try:
+                    response = self._send(client, url, timeout)
+                    break
+                except (httpx.RemoteProtocolError, httpx.LocalProtocolError) as e:
+                    if origin in self._h2_origins:
+                        # Mid-session (GOAWAY, stream state): the server does speak HTTP/2
+                        if fresh is not None:
+                            raise requests.ConnectionError(f"HTTP/2 protocol error for {url}: {e}") from e
+                        with self._lock:
+                            self.stats["retries"] += 1
+                        client = fresh = self._fresh_client(parts.scheme)
+                        continue
+                    if parts.scheme == "https":
+                        raise requests.ConnectionError(f"HTTP/2 protocol error for {url}") from e
+                    # Prior knowledge was refused before any HTTP/2 response: HTTP/1.1 server
+                    with self._lock:
+                        self._fallback_until[origin] = time.monotonic() + self.fallback_seconds
+                        self.stats["fallbacks"] += 1
+                    events.emit("transport.fallback", logging.WARNING, host=parts.netloc,
+                                seconds=self.fallback_seconds)
+                    self._open_failed(fresh)
+                    return None
+        except httpx.TimeoutException as e:
+            self._open_failed(fresh)
+            raise requests.Timeout(f"{e} ({url})") from e
+        except httpx.HTTPError as e:
+            self._open_failed(fresh)
+            raise requests.ConnectionError(f"{e} ({url})") from e
+        except requests.RequestException:
+            self._open_failed(fresh)
+            raise
+        except Exception as e:
+            # h2 state errors (e.g. a KeyError from its stream table) that httpx does not wrap
+            self._open_failed(fresh)
+            raise requests.ConnectionError(f"HTTP/2 stream error for {url}: {e!r}") from e
+
+        self.streams.record("headers", time.monotonic() - start)
+        result = StreamResponse(self, response, url, start, client=fresh)
+        with self._lock:
+            self.stats["streams"] += 1
+            if response.http_version == "HTTP/2":
+                self.stats["http2"] += 1
+                self._h2_origins.add(origin)
+            else:
+                self.stats["http1"] += 1
+        return result
+
+    def _send(self, client, url, timeout):
+        """
+        client.send, with opening the stream (stream ID, HEADERS frame)
+        serialized: httpcore's sync HTTP/2 connection does not lock its h2
+        state there, and two threads opening streams at once can pick the
+        same stream ID or interleave HPACK encoder updates.
+        """
+        lock, held = self._open_lock, [True]
+
+        def trace(event, info):
+            self._trace(event, info)
+            if event.endswith("send_request_headers.complete") and held[0]:
+                held[0] = False
+                lock.release()
+
+        lock.acquire()
+        try:
+            request = client.build_request("GET", url, timeout=timeout, extensions={"trace": trace})
+            return client.send(request, stream=True)
+        finally:
+            if held[0]:
+                held[0] = False
+                lock.release()
+
+    def _fresh_client(self, scheme):
+        """A one-connection client for retrying on a new connection"""
+        return httpx.Client(http1=scheme == "https", http2=True, headers=HEADERS, follow_redirects=True,
+                            limits=httpx.Limits(max_connections=1, max_keepalive_connections=0))
+
+    def _open_failed(self, fresh):
+        with self._lock:
+            self.stats["active"] -= 1
+        if fresh is not None:
+            fresh.close()
+
+    def _stream_closed(self, response):
+        self.streams.record("stream", time.monotonic() - response._start)
+        with self._lock:
+            self.stats["active"] -= 1
+            self.stats["bytes"] += response.received
+            if not response._response.is_stream_consumed:
+                self.stats["reset"] += 1
+
+    def stream_stats(self):
+        """
+        Per-stream metrics so far.
+
+        Returns:
+            dict: counters (streams, peak_active in flight, connections, http2,
+                  http1, fallbacks, retries, reset, bytes), plus streams_per_connection and
+                  p50/p95 seconds to headers and per stream
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats["streams_per_connection"] = stats["streams"] / max(stats["connections"], 1)
+        for name in ("headers", "stream"):
+            for pct in (50, 95):
+                stats[f"{name}_p{pct}"] = self.streams.percentile(name, pct)
+        return stats
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+http2 = Http2Transport()
@@ -4,19 +4,26 @@ Adds: fiction_type, warn_tags, content_warnings, and fixes status/last_updated.
 """
 import time
 import json
+import logging
 import os
 import signal
+import sys
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from db import Fiction, get_session
-from scraper import fetch_fiction_page
+from db import Fiction, init_db, get_session
+import aggregates
+import events
+from profiling import profiler, enable_from_argv
+import health
+from scraper import fetch_fiction_head
 from parser import parse_fiction_details
 from utils import sleep_with_jitter, format_number, estimate_time_remaining
-from config import RATE_LIMIT_BETWEEN_FICTIONS, JITTER_FICTIONS
+from runtime_config import settings
+from config import BASE_URL
 
 # Constants
 CHECKPOINT_FILE = "update_checkpoint.json"
-UPDATE_BATCH_SIZE = 50
+UPDATE_REQUIRED_FIELDS = ("fiction_type", "status")  # Parser health: fields every page should yield
 
 # Global shutdown flag
 shutdown_requested = False
@@ -48,13 +55,21 @@ def save_checkpoint(last_id):
 def main():
     global shutdown_requested
     signal.signal(signal.SIGINT, signal_handler)
+    settings.install("update_db")
+    enable_from_argv(sys.argv)
     
     print("=" * 80)
     print("Royal Road Database Updater")
     print("Adding: fiction_type, warnings, status, last_updated")
     print("=" * 80)
 
+    if not health.require_healthy():
+        return 1
+    
+    init_db()
     session = get_session()
+    monitor = health.ParseHealth(required=UPDATE_REQUIRED_FIELDS, tool="update_db")
+    events.start("update_db")
     
     try:
         last_id = load_checkpoint()
@@ -65,7 +80,7 @@ def main():
         
         print(f"Total fictions in DB: {format_number(total_count)}")
         print(f"Remaining to update: {format_number(remaining_count)}")
-        print(f"Est. time: {estimate_time_remaining(remaining_count, RATE_LIMIT_BETWEEN_FICTIONS + JITTER_FICTIONS/2)}")
+        print(f"Est. time: {estimate_time_remaining(remaining_count, settings.RATE_LIMIT_BETWEEN_FICTIONS + settings.JITTER_FICTIONS/2)}")
         print("-" * 80)
         
         # Fetch fictions in batches
@@ -81,7 +96,7 @@ def main():
         offset = 0
         while not shutdown_requested:
             # Get next batch
-            batch = query.limit(UPDATE_BATCH_SIZE).offset(offset).all()
+            batch = query.limit(settings.UPDATE_BATCH_SIZE).offset(offset).all()
             
             if not batch:
                 break
@@ -93,26 +108,41 @@ def main():
             pass 
             
             # Re-querying is cleaner for simple batching logic
-            batch = session.query(Fiction).filter(Fiction.fiction_id > last_id).order_by(Fiction.fiction_id).limit(UPDATE_BATCH_SIZE).all()
+            batch = session.query(Fiction).filter(Fiction.fiction_id > last_id).order_by(Fiction.fiction_id).limit(settings.UPDATE_BATCH_SIZE).all()
             
             if not batch:
                 break
+            
+            # Values before this batch's edits, for the aggregate tables
+            old_values = {f.fiction_id: aggregates.values_of(f) for f in batch}
 
             for fiction in batch:
                 if shutdown_requested:
                     break
                     
-                print(f"[{updated_count + 1}] Updating {fiction.title[:30]} (ID: {fiction.fiction_id})...", end=" ")
-                
                 try:
                     # Construct URL
-                    url = f"https://www.royalroad.com/fiction/{fiction.fiction_id}"
+                    url = f"{BASE_URL}/fiction/{fiction.fiction_id}"
                     
-                    # Fetch page
-                    html = fetch_fiction_page(url)
+                    with profiler.page(url):
+                        # Fetch page
+                        html = fetch_fiction_head(url)
+                        
+                        # Parse details
+                        details = parse_fiction_details(html)
                     
-                    # Parse details
-                    details = parse_fiction_details(html)
+                    missing = monitor.observe(url, details, html)
+                    if missing:
+                        events.emit("fiction.update_skipped", logging.WARNING, index=updated_count + 1,
+                                    title=fiction.title, fiction_id=fiction.fiction_id,
+                                    missing=", ".join(missing))
+                        if monitor.tripped:
+                            # Stop before this fiction so the next run retries it
+                            shutdown_requested = True
+                            break
+                        last_id = fiction.fiction_id
+                        sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
+                        continue
                     
                     # Update fields
                     if details['fiction_type']:
@@ -133,33 +163,39 @@ def main():
                     else:
                         fiction.content_warnings = "[]"
                         
-                    print("✓ Done")
+                    events.emit("fiction.updated", index=updated_count + 1, title=fiction.title,
+                                fiction_id=fiction.fiction_id, fiction_type=details['fiction_type'],
+                                status=details['status'])
                     
                     # Update loop vars
                     last_id = fiction.fiction_id
                     updated_count += 1
                     
                     # Rate limit
-                    sleep_with_jitter(RATE_LIMIT_BETWEEN_FICTIONS, JITTER_FICTIONS)
+                    sleep_with_jitter(settings.RATE_LIMIT_BETWEEN_FICTIONS, settings.JITTER_FICTIONS)
                     
                 except Exception as e:
-                    print(f"✗ Error: {e}")
+                    events.emit("fiction.update_error", logging.ERROR, index=updated_count + 1,
+                                title=fiction.title, fiction_id=fiction.fiction_id, error=str(e))
                     # Skip on error but advance last_id to avoid stuck loop
                     last_id = fiction.fiction_id
             
-            # Commit processing of the batch
+            # Commit processing of the batch (with its aggregate deltas)
+            aggregates.apply(session, old_values, [aggregates.values_of(f) for f in batch])
             session.commit()
             save_checkpoint(last_id)
             
             # If batch was empty or finished, loop condition handles it
             
     except Exception as e:
-        print(f"\n✗ Critical Error: {e}")
+        events.emit("crawl.error", logging.CRITICAL, error=str(e))
+        events.flush()
         import traceback
         traceback.print_exc()
         
     finally:
         session.close()
+        events.stop()  # Write out the queued events before the summary
         print("\n" + "=" * 80)
         print("Update Process Finished")
         print(f"Total updated this session: {updated_count}")
@@ -4,8 +4,11 @@ Includes rate limiting with jitter for anti-fingerprinting.
 """
 import time
 import random
+import threading
+from profiling import timed
 
 
+@timed("sleep")
 def sleep_with_jitter(base, jitter=0.3):
     """
     Sleep for a base duration plus random jitter.
@@ -22,6 +25,49 @@ def sleep_with_jitter(base, jitter=0.3):
     time.sleep(sleep_time)
 
 
+class RateLimiter:
+    """
+    Thread-safe request pacer shared by concurrent workers.
+    Spaces calls to wait() at least `interval` (+ random jitter) apart
+    across all threads, so adding workers does not raise the request rate.
+    """
+
+    def __init__(self, interval, jitter=0.0):
+        self.interval = interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        """Block until this caller may send its next request"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.interval + random.uniform(0, self.jitter)
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LiveRateLimiter(RateLimiter):
+    """
+    RateLimiter whose interval and jitter follow the live runtime settings
+    (runtime_config.py), so a changed rate applies to the next request.
+    """
+
+    def __init__(self, interval_setting="RATE_LIMIT_BETWEEN_FICTIONS", jitter_setting="JITTER_FICTIONS"):
+        super().__init__(0.0)
+        self.interval_setting = interval_setting
+        self.jitter_setting = jitter_setting
+
+    def wait(self):
+        from runtime_config import settings
+
+        self.interval = getattr(settings, self.interval_setting)
+        self.jitter = getattr(settings, self.jitter_setting)
+        super().wait()
+
+
 def format_number(num):
     """Format a number with commas for readability"""
     if num is None:
@@ -1,13 +1,15 @@
 """
 Verify the fix for INACTIVE status
 """
+import sys
 from scraper import fetch_fiction_page
 from parser import parse_fiction_details
+from config import BASE_URL
 
 def verify_fix(ids):
     print("Verifying fix for INACTIVE status...")
     for fid in ids:
-        url = f"https://www.royalroad.com/fiction/{fid}"
+        url = f"{BASE_URL}/fiction/{fid}"
         print(f"\nChecking ID {fid}...")
         try:
             html = fetch_fiction_page(url)
@@ -26,5 +28,9 @@ def verify_fix(ids):
         except Exception as e:
             print(f"  Error: {e}")
 
+def main():
+    """Verify the IDs given on the command line (or the known Inactive/Completed ones)"""
+    verify_fix([int(a) for a in sys.argv[1:]] or [25, 29, 31, 32, 33])
+
 if __name__ == "__main__":
-    verify_fix([25, 29, 31, 32, 33])
+    main()